@@ -0,0 +1,111 @@
+"""
+Cast代役サーバーに対して、接続時間・コマンド往復時間・切断からの復旧時間・終了処理の時間を計測するベンチマーク
+
+TLS・protobuf・pychromecastのソケットスレッドを含む本物の通信経路を、実機なしで計測する。
+
+使い方:
+    uv run python benchmarks/bench_cast_socket.py [--rounds 50] [--delay 0.02] [--drops 5]
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from pychromecast.error import PyChromecastError  # noqa: E402
+
+from nemucast.cache import connect_from_cache  # noqa: E402
+from nemucast.main import restore_volume_and_standby  # noqa: E402
+from nemucast.standin import StandInCastServer  # noqa: E402
+from nemucast.status import StatusMonitor  # noqa: E402
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(label: str, seconds) -> None:
+    ms = [s * 1000 for s in seconds]
+    print(f"{label:<22}{len(ms):>6}{statistics.median(ms):>10.2f}"
+          f"{percentile(ms, 0.95):>10.2f}{max(ms):>10.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50, help="計測回数")
+    parser.add_argument("--delay", type=float, default=0.0, help="サーバーの応答遅延（秒）")
+    parser.add_argument("--drops", type=int, default=5, help="切断を注入する回数")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    with StandInCastServer(response_delay=args.delay) as server:
+        connect_times = []
+        for _ in range(max(1, args.rounds // 5)):
+            started = time.perf_counter()
+            cast = connect_from_cache(server.endpoint())
+            connect_times.append(time.perf_counter() - started)
+            cast.disconnect(timeout=2)
+
+        cast = connect_from_cache(server.endpoint())
+        volume_times, status_times = [], []
+        for i in range(args.rounds):
+            started = time.perf_counter()
+            cast.set_volume(0.5 - (i % 10) * 0.01)
+            volume_times.append(time.perf_counter() - started)
+
+            done = []
+            started = time.perf_counter()
+            cast.socket_client.receiver_controller.update_status(
+                callback_function=lambda ok, _data: done.append(time.perf_counter())
+            )
+            while not done:
+                time.sleep(0.0005)
+            status_times.append(done[0] - started)
+
+        recover_times, failed = [], 0
+        for _ in range(args.drops):
+            server.drop_connections()
+            started = time.perf_counter()
+            while True:
+                try:
+                    cast.set_volume(0.4)
+                    break
+                except PyChromecastError:
+                    failed += 1
+                    time.sleep(0.01)
+            recover_times.append(time.perf_counter() - started)
+
+        # 初期音量への復元とスタンバイ（反映の確認まで。以前は固定で4秒待っていた）
+        monitor = StatusMonitor(cast).attach()
+        standby_times = []
+        for _ in range(max(1, args.rounds // 5)):
+            server.start_playback()
+            while cast.status.app_id is None:
+                time.sleep(0.001)
+            started = time.perf_counter()
+            restore_volume_and_standby(cast, 0.5, monitor)
+            standby_times.append(time.perf_counter() - started)
+        cast.disconnect(timeout=2)
+
+    print(
+        f"応答遅延 {args.delay}秒, 接続 {server.stats.connections}回, "
+        f"切断注入 {server.stats.drops}回"
+    )
+    print(f"{'measure':<22}{'n':>6}{'p50_ms':>10}{'p95_ms':>10}{'max_ms':>10}")
+    summarize("connect+wait", connect_times)
+    summarize("set_volume", volume_times)
+    summarize("receiver GET_STATUS", status_times)
+    if recover_times:
+        summarize("drop→set_volume", recover_times)
+        print(f"切断中に失敗したコマンド: {failed}回")
+    summarize("restore+standby", standby_times)
+
+
+if __name__ == "__main__":
+    main()
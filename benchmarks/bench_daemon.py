@@ -0,0 +1,107 @@
+"""
+常駐デーモンでのフェード開始時間のベンチマーク（毎回プロセスを起動する場合との比較）
+
+Cast代役サーバー（`nemucast.standin`）を接続先キャッシュに登録し、次の3つについて
+要求からサーバーが最初の SET_VOLUME を受け取るまでの時間を計測する。
+
+- spawn: `nemucast` を毎回別プロセスで起動する（従来のcron/systemdの使い方）
+- ctl: 接続済みのデーモンに `nemucast ctl fade` を別プロセスで送る
+- ipc: 接続済みのデーモンに制御ソケットで直接要求を送る
+
+使い方:
+    uv run python benchmarks/bench_daemon.py [--rounds 10]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from bench_startup import SRC, child_env, summarize, time_to_first_command
+
+sys.path.insert(0, str(SRC))
+
+from nemucast.ctl import request  # noqa: E402
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert  # noqa: E402
+
+
+def wait_for_daemon(socket_path: Path, name: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            devices = request({"cmd": "status"}, socket_path, timeout=1)["result"]["devices"]
+            if any(d["name"] == name and d["connected"] for d in devices):
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+        time.sleep(0.05)
+    raise RuntimeError("デーモンが起動しませんでした")
+
+
+def time_fade(server, socket_path: Path, send, rounds: int) -> list:
+    """`send()` から代役サーバーが SET_VOLUME を受け取るまでの時間（毎回 cancel で音量を戻す）"""
+    times = []
+    for _ in range(rounds):
+        before = len(server.stats.volume_history)
+        started = time.monotonic()
+        send()
+        deadline = started + 30
+        while len(server.stats.volume_history) == before and time.monotonic() < deadline:
+            time.sleep(0.0005)
+        if len(server.stats.volume_history) > before:
+            times.append(server.stats.volume_history[before][0] - started)
+        request({"cmd": "cancel"}, socket_path, timeout=10)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_dir = Path(tmp)
+        env = child_env(tmp)
+        spawn = time_to_first_command(env, state_dir, min(args.rounds, 5))
+
+        certfile, keyfile = ensure_self_signed_cert(state_dir / "standin")
+        with StandInCastServer(volume_level=0.5, certfile=certfile, keyfile=keyfile) as server:
+            entry = server.endpoint()
+            (state_dir / "devices.json").write_text(
+                json.dumps({entry.name: asdict(entry)}), encoding="utf-8"
+            )
+            socket_path = state_dir / "control.sock"
+            daemon = subprocess.Popen(
+                [sys.executable, "-m", "nemucast", "daemon", "--socket", str(socket_path),
+                 "-n", entry.name, "-c", entry.name],
+                env=dict(env, LOG_LEVEL="WARNING", STEP="-0.01", MIN_LEVEL="0.0",
+                         INTERVAL_SEC="600"),
+                cwd=state_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_for_daemon(socket_path, entry.name)
+                ctl = time_fade(server, socket_path, lambda: subprocess.run(
+                    [sys.executable, "-m", "nemucast", "ctl", "--socket", str(socket_path), "fade"],
+                    env=env, check=True, capture_output=True,
+                ), args.rounds)
+                ipc = time_fade(
+                    server, socket_path, lambda: request({"cmd": "fade"}, socket_path), args.rounds
+                )
+                connections = server.connection_count
+            finally:
+                request({"cmd": "shutdown"}, socket_path, timeout=10)
+                daemon.wait(timeout=10)
+
+    print(f"{'measure':<28}{'p50_ms':>10}{'min_ms':>10}{'max_ms':>10}")
+    summarize("spawn -> first SET_VOLUME", spawn)
+    summarize("ctl fade -> SET_VOLUME", ctl)
+    summarize("ipc fade -> SET_VOLUME", ipc)
+    print(f"デーモンの接続数: {connections}（{2 * args.rounds} 回のフェードで再接続なし）")
+
+
+if __name__ == "__main__":
+    main()
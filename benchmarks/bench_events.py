@@ -0,0 +1,88 @@
+"""
+イベントの送信（`events.emit()`）にかかる時間のベンチマーク
+
+制御ループから見た1回の `emit()` の時間を、送信先が無い場合、SSEのクライアントが
+読まずに止まっている場合、応答に1秒かかるWebhookがある場合で比較する
+（遅い送信先があっても、キューが溢れた分を捨てるだけで待たないことの確認）。
+
+使い方:
+    uv run python benchmarks/bench_events.py [--count 100000]
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from nemucast import events  # noqa: E402
+from nemucast.events import EventBus, WebhookSink  # noqa: E402
+from nemucast.sim import FakeCastInfo  # noqa: E402
+
+
+class Cast:
+    cast_info = FakeCastInfo(friendly_name="Living TV")
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(1.0)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(bus: EventBus, count: int) -> dict:
+    cast = Cast()
+    samples = []
+    for i in range(count):
+        started = time.perf_counter_ns()
+        bus.emit(events.VOLUME_CHANGED, cast, level=0.5, previous=0.54, confirmed=True)
+        samples.append(time.perf_counter_ns() - started)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[int(len(samples) * 0.99)],
+        "max": samples[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000)
+    args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/hook"
+
+    results = {}
+    bus = EventBus()
+    results["no sinks"] = (measure(bus, args.count), 0)
+
+    bus = EventBus()
+    queue = bus.subscribe("sse")
+    results["stalled SSE client"] = (measure(bus, args.count), queue.dropped)
+
+    bus = EventBus()
+    sink = WebhookSink(url, bus).start()
+    results["1s webhook"] = (measure(bus, args.count), sink.dropped)
+    sink.stop(timeout=0)
+    httpd.shutdown()
+
+    print(f"emit() {args.count}回")
+    print(f"{'case':<20}{'p50_ns':>10}{'p99_ns':>10}{'max_us':>10}{'dropped':>10}")
+    for case, (r, dropped) in results.items():
+        print(f"{case:<20}{r['p50']:>10.0f}{r['p99']:>10.0f}{r['max'] / 1000:>10.1f}{dropped:>10}")
+
+
+if __name__ == "__main__":
+    main()
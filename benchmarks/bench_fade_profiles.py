@@ -0,0 +1,55 @@
+"""
+フェードプロファイルごとの音量コマンド送信数を比較するベンチマーク
+
+使い方:
+    uv run python benchmarks/bench_fade_profiles.py [--start 0.6] [--min-level 0.3]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from nemucast.fade import (  # noqa: E402
+    DEFAULT_MAX_RATE,
+    DEFAULT_RESOLUTION_SEC,
+    PROFILES,
+    build_fade_table,
+    fade_duration,
+    plan_commands,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--start", type=float, default=0.6)
+    parser.add_argument("--min-level", type=float, default=0.3)
+    parser.add_argument("--step", type=float, default=-0.04)
+    parser.add_argument("--interval", type=int, default=1200)
+    parser.add_argument("--resolution", type=float, default=DEFAULT_RESOLUTION_SEC)
+    parser.add_argument("--max-rate", type=float, default=DEFAULT_MAX_RATE)
+    args = parser.parse_args()
+
+    duration = fade_duration(args.start, args.min_level, args.step, args.interval)
+    print(f"フェード: {args.start:.2f} → {args.min_level:.2f}, {duration:.0f}秒, "
+          f"分解能 {args.resolution}秒, 上限 {args.max_rate}回/秒")
+    print(f"{'profile':<12}{'table':>8}{'commands':>10}{'max_jump':>10}{'build_ms':>10}")
+
+    for profile in PROFILES:
+        started = time.perf_counter()
+        table = build_fade_table(
+            profile, args.start, args.min_level, duration, args.resolution,
+            step=args.step, interval_sec=args.interval,
+        )
+        plan = plan_commands(table, args.start, max_rate=args.max_rate)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        levels = [args.start] + [level for _, level in plan]
+        max_jump = max((abs(b - a) for a, b in zip(levels, levels[1:])), default=0.0)
+        print(f"{profile:<12}{len(table):>8}{len(plan):>10}{max_jump:>10.2f}{elapsed_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+キャストグループのメンバーへ音量を1台ずつ送った場合と同時に送った場合のベンチマーク
+
+メンバー数ぶんのCast代役サーバー（`nemucast.standin`）を起動し、応答の遅延
+（デバイスの処理時間とLANの往復を模したもの）を付けて、各ステップの `set_volume` を
+反映の確認まで送る。最初と最後のメンバーが反映するまでの時間差（スプレッド）と、
+1ステップの所要時間を比較する。
+
+- sequential: 1台ずつ順に送る（ワーカー1つ）
+- concurrent: 全メンバーへ同時に送る（`GroupSession` の既定）
+
+使い方:
+    uv run python benchmarks/bench_group_fanout.py [--members 4] [--steps 20] [--delay 0.08]
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from nemucast.cache import connect_from_cache  # noqa: E402
+from nemucast.group import CommandFanout, GroupMember, GroupSession  # noqa: E402
+from nemucast.multi import DeviceConfig  # noqa: E402
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert  # noqa: E402
+from nemucast.status import StatusMonitor  # noqa: E402
+
+MODES = ("sequential", "concurrent")
+
+
+def run_mode(mode: str, members, steps: int) -> dict:
+    workers = 1 if mode == "sequential" else len(members)
+    config = DeviceConfig("Bench Group", step=-0.02, min_level=0.0, interval_sec=0)
+    session = GroupSession(config, None, members, fanout=CommandFanout(workers))
+    step_times = []
+    level = 0.9
+    for _ in range(steps):
+        level = round(level - 0.02, 2)
+        started = time.perf_counter()
+        session.set_volumes({member.name: level for member in members})
+        step_times.append(time.perf_counter() - started)
+    session.fanout.close()
+    return {
+        "spread_p50": statistics.median(session.spreads),
+        "spread_max": max(session.spreads),
+        "step_p50": statistics.median(step_times),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.08,
+                        help="代役サーバーが音量の変更に応答するまでの遅延（秒）")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile, keyfile = ensure_self_signed_cert(Path(tmp))
+        servers = [
+            StandInCastServer(name=f"Speaker {i}", response_delay=args.delay,
+                              certfile=certfile, keyfile=keyfile).start()
+            for i in range(args.members)
+        ]
+        casts = []
+        try:
+            members = []
+            for server in servers:
+                cast = connect_from_cache(server.endpoint())
+                cast.wait()
+                casts.append(cast)
+                monitor = StatusMonitor(cast, ttl=300).attach()
+                members.append(GroupMember(server.name, cast, monitor))
+            for mode in MODES:
+                results[mode] = run_mode(mode, members, args.steps)
+        finally:
+            for cast in casts:
+                cast.disconnect(timeout=2)
+            for server in servers:
+                server.stop()
+
+    print(f"メンバー {args.members}台、応答の遅延 {args.delay * 1000:.0f}ms、{args.steps}ステップ")
+    print(f"{'mode':<12}{'spread_p50_ms':>15}{'spread_max_ms':>15}{'step_p50_ms':>13}")
+    for mode in MODES:
+        r = results[mode]
+        print(f"{mode:<12}{r['spread_p50'] * 1000:>15.1f}{r['spread_max'] * 1000:>15.1f}"
+              f"{r['step_p50'] * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
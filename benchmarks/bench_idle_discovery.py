@@ -0,0 +1,188 @@
+"""
+接続後にデバイス検索（zeroconf）を止めた場合と続けた場合の、待機中のCPU時間とRSSのベンチマーク
+
+Cast代役サーバー（`nemucast.standin`）に接続したまま待機する子プロセスを2つ起動し、
+同じmDNSトラフィック（他のCastデバイスやスマートフォンの告知を模したもの）を流しながら
+CPU時間・RSS・スレッド数を比較する。計測した時間の値を1晩（8時間）に換算して表示する。
+
+- keep: 従来の動作。終了までCastBrowserを動かし続ける
+- release: `ConnectionLifecycle` で接続後に検索を止める
+
+使い方:
+    uv run python benchmarks/bench_idle_discovery.py [--seconds 60] [--mdns-rate 5]
+"""
+
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+from nemucast.cache import CachedEndpoint, connect_from_cache  # noqa: E402
+from nemucast.discovery import discover_target_chromecast  # noqa: E402
+from nemucast.lifecycle import ConnectionLifecycle  # noqa: E402
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert  # noqa: E402
+
+NIGHT_SEC = 8 * 60 * 60
+MODES = ("keep", "release")
+
+
+def rss_kib() -> int:
+    with open("/proc/self/status", encoding="ascii") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_child(mode: str, endpoint: dict, seconds: float, warmup: float) -> None:
+    """接続して待機し、待機中のCPU時間・RSS・スレッド数をJSONで出力する"""
+    # 実際の接続経路と同じく、検索用のCastBrowserが動いている状態で接続する
+    _, browser, _ = discover_target_chromecast("(bench)", timeout=0.5)
+    cast = connect_from_cache(CachedEndpoint(**endpoint))
+    if mode == "release":
+        ConnectionLifecycle(cast).start(browser)
+    time.sleep(warmup)
+
+    started_cpu = cpu_seconds()
+    time.sleep(seconds)
+    result = {
+        "mode": mode,
+        "cpu_sec": cpu_seconds() - started_cpu,
+        "rss_kib": rss_kib(),
+        "threads": threading.active_count(),
+        "connected": cast.socket_client.is_connected,
+    }
+    print(json.dumps(result))
+    cast.disconnect(timeout=2)
+    if mode == "keep":
+        browser.stop_discovery()
+
+
+def _txt(values: dict) -> bytes:
+    out = b""
+    for key, value in values.items():
+        entry = f"{key}={value}".encode()
+        out += bytes([len(entry)]) + entry
+    return out
+
+
+class MdnsTraffic:
+    """LAN上の他のCastデバイスの告知を模したmDNS応答を一定の頻度で送る"""
+
+    def __init__(self, rate: float, devices: int = 12):
+        import zeroconf
+
+        self.rate = rate
+        self.devices = devices
+        self.sent = 0
+        self._zc = zeroconf.Zeroconf()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _packet(self, index: int):
+        from zeroconf import DNSAddress, DNSOutgoing, DNSPointer, DNSService, DNSText, const
+
+        name = f"Bench-{index % self.devices}._googlecast._tcp.local."
+        server = f"bench{index % self.devices}.local."
+        unique = const._CLASS_IN | const._CLASS_UNIQUE
+        out = DNSOutgoing(const._FLAGS_QR_RESPONSE | const._FLAGS_AA)
+        out.add_answer_at_time(
+            DNSPointer("_googlecast._tcp.local.", const._TYPE_PTR, const._CLASS_IN, 4500, name), 0
+        )
+        out.add_answer_at_time(
+            DNSService(name, const._TYPE_SRV, unique, 120, 0, 0, 8009, server), 0
+        )
+        # 再生状態の変化（rs）のたびにTXTレコードが変わる
+        out.add_answer_at_time(DNSText(name, const._TYPE_TXT, unique, 4500, _txt({
+            "id": "%032x" % (index % self.devices),
+            "fn": f"Bench {index % self.devices}",
+            "md": "Chromecast",
+            "rs": f"status {index}",
+        })), 0)
+        address = socket.inet_aton(f"10.99.0.{index % self.devices + 1}")
+        out.add_answer_at_time(DNSAddress(server, const._TYPE_A, unique, 120, address), 0)
+        return out
+
+    def _run(self) -> None:
+        interval = 1.0 / self.rate
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            self._zc.send(self._packet(self.sent))
+            self.sent += 1
+            next_at += interval
+            self._stop.wait(max(0.0, next_at - time.monotonic()))
+
+    def __enter__(self) -> "MdnsTraffic":
+        if self.rate > 0:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._zc.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60.0, help="各モードで計測する時間（秒）")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--mdns-rate", type=float, default=5.0,
+                        help="1秒あたりに流すmDNS応答の数（0で流さない）")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, json.loads(args.endpoint), args.seconds, args.warmup)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=str(SRC), NEMUCAST_STATE_DIR=tmp, LOG_LEVEL="WARNING")
+        certfile, keyfile = ensure_self_signed_cert(Path(tmp))
+        with StandInCastServer(certfile=certfile, keyfile=keyfile) as server, \
+                MdnsTraffic(args.mdns_rate) as traffic:
+            endpoint = json.dumps(asdict(server.endpoint()))
+            for mode in MODES:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--child", mode, "--endpoint", endpoint,
+                     "--seconds", str(args.seconds), "--warmup", str(args.warmup)],
+                    env=env, check=True, capture_output=True, text=True,
+                )
+                results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+            sent = traffic.sent
+
+    scale = NIGHT_SEC / args.seconds
+    print(f"計測 {args.seconds:.0f}秒/モード、mDNS応答 {args.mdns_rate:g}件/秒（計 {sent} 件）、"
+          f"8時間に換算")
+    print(f"{'mode':<10}{'cpu_ms/min':>12}{'cpu_s/night':>13}{'rss_MiB':>10}{'threads':>9}")
+    for mode in MODES:
+        r = results[mode]
+        print(f"{mode:<10}{r['cpu_sec'] / args.seconds * 60000:>12.1f}"
+              f"{r['cpu_sec'] * scale:>13.1f}{r['rss_kib'] / 1024:>10.1f}{r['threads']:>9}")
+    keep, release = results["keep"], results["release"]
+    print(f"差（keep - release）: CPU {(keep['cpu_sec'] - release['cpu_sec']) * scale:.1f}秒/夜、"
+          f"RSS {(keep['rss_kib'] - release['rss_kib']) / 1024:.1f} MiB、"
+          f"スレッド {keep['threads'] - release['threads']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+メトリクスの記録にかかる時間のベンチマーク（常時有効にしても制御ループの負担にならないかの確認）
+
+使い方:
+    uv run python benchmarks/bench_metrics.py [--count 200000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from nemucast import metrics  # noqa: E402
+
+
+def per_call_ns(func, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - started) / count * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=200000)
+    args = parser.parse_args()
+
+    cast = Mock()
+    cast.cast_info.friendly_name = "Living TV"
+    child = metrics.RPC_SECONDS.labels("Living TV", "set_volume")
+
+    def timed_noop():
+        with metrics.time_rpc("set_volume", cast):
+            pass
+
+    cases = [
+        ("empty loop", lambda: None),
+        ("histogram.observe", lambda: child.observe(0.02)),
+        ("labels().observe",
+         lambda: metrics.RPC_SECONDS.labels("Living TV", "set_volume").observe(0.02)),
+        ("counter inc", lambda: metrics.record_idle_skip(cast)),
+        ("time_rpc (no-op body)", timed_noop),
+        ("render_prometheus", metrics.REGISTRY.render_prometheus),
+    ]
+    print(f"{'measure':<26}{'ns/call':>12}")
+    for label, func in cases:
+        count = args.count if label != "render_prometheus" else max(1, args.count // 100)
+        print(f"{label:<26}{per_call_ns(func, count):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
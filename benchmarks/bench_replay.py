@@ -0,0 +1,84 @@
+"""
+トレースの再生速度を計測するベンチマーク
+
+疑似Chromecastで一晩分のフェードを `--nights` 回記録し（再生開始・一時停止・通信遅延を
+夜ごとに変える）、すべてを `nemucast.replay` で再生して1晩あたりの時間を比べる。
+
+使い方:
+    uv run python benchmarks/bench_replay.py [--nights 1000] [--keep DIR]
+"""
+
+import argparse
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from nemucast.fade import PROFILES  # noqa: E402
+from nemucast.replay import find_traces, replay_trace  # noqa: E402
+from nemucast.sim import NightScenario, run_simulated_night  # noqa: E402
+from nemucast.trace import TraceRecorder, load_trace  # noqa: E402
+
+
+def random_scenario(rng: random.Random) -> NightScenario:
+    """1晩分のシナリオ（途中で止めて再開する夜、再生開始が遅い夜を混ぜる）"""
+    transitions = []
+    start_active = rng.random() > 0.2
+    if not start_active:
+        transitions.append((rng.uniform(60, 3600), "active"))
+    if rng.random() < 0.3:
+        pause = rng.uniform(600, 6000)
+        transitions += [(pause, "idle"), (pause + rng.uniform(60, 1800), "active")]
+    return NightScenario(
+        initial_volume=round(rng.uniform(0.4, 0.8), 2),
+        profile=rng.choice(PROFILES),
+        interval_sec=rng.choice((600, 900, 1200)),
+        latency=rng.uniform(0.01, 0.1),
+        start_active=start_active,
+        transitions=sorted(transitions),
+        seed=rng.randrange(1 << 16),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nights", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", type=Path, help="記録したトレースを残すディレクトリ")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.keep or Path(tmp)
+        directory.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        for night in range(args.nights):
+            run_simulated_night(
+                random_scenario(rng), TraceRecorder(directory / f"night-{night:05d}.jsonl")
+            )
+        record_sec = time.perf_counter() - started
+
+        paths = find_traces([directory])
+        size = sum(path.stat().st_size for path in paths)
+        started = time.perf_counter()
+        traces = [load_trace(path) for path in paths]
+        load_sec = time.perf_counter() - started
+        started = time.perf_counter()
+        results = [replay_trace(trace) for trace in traces]
+        replay_sec = time.perf_counter() - started
+
+    diverged = sum(result.divergence() is not None for result in results)
+    simulated_h = sum(result.simulated_sec for result in results) / 3600
+    print(f"記録: {len(paths)}晩, {record_sec:.2f}秒, 平均 {size / len(paths) / 1024:.1f} KiB/晩")
+    print(f"読み込み: {load_sec:.2f}秒")
+    print(f"再生: {replay_sec:.2f}秒（{replay_sec / len(paths) * 1000:.2f} ms/晩, "
+          f"仮想 {simulated_h:.0f} 時間）, 不一致 {diverged}晩")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+全デバイスの状態の問い合わせを1台ずつ行った場合と同時に行った場合のベンチマーク
+
+台数ぶんのCast代役サーバー（`nemucast.standin`）を起動し、応答の遅延と、
+応答しないデバイス（`--offline` 台）を付けて、`nemucast scan` と同じ問い合わせ
+（接続、受信機の状態、アプリ起動中ならメディアの状態）の所要時間を比較する。
+
+- sequential: 1台ずつ順に問い合わせる（ワーカー1つ）
+- pooled: `--workers` 台まで同時に問い合わせる（`nemucast scan` の既定）
+
+使い方:
+    uv run python benchmarks/bench_scan.py [--devices 12] [--offline 1] [--delay 0.1]
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from nemucast.scan import DEFAULT_SCAN_WORKERS, scan_cast_infos  # noqa: E402
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=12)
+    parser.add_argument("--offline", type=int, default=1, help="応答しないデバイスの数")
+    parser.add_argument("--delay", type=float, default=0.1,
+                        help="代役サーバーが1件の要求に応答するまでの遅延（秒）")
+    parser.add_argument("--timeout", type=float, default=2.0,
+                        help="1台の問い合わせを待つ最大時間（秒）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_SCAN_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile, keyfile = ensure_self_signed_cert(Path(tmp))
+        servers = [
+            StandInCastServer(name=f"TV {i:02d}", response_delay=args.delay,
+                              app_id=None if i % 3 == 2 else "CC1AD845",
+                              certfile=certfile, keyfile=keyfile).start()
+            for i in range(args.devices)
+        ]
+        for server in servers[:args.offline]:
+            server.go_offline()
+        cast_infos = [server.endpoint().to_cast_info() for server in servers]
+        try:
+            for mode, workers in (("sequential", 1), ("pooled", args.workers)):
+                started = time.perf_counter()
+                probes = scan_cast_infos(cast_infos, workers=workers, timeout=args.timeout)
+                results[mode] = (time.perf_counter() - started, probes)
+        finally:
+            for server in servers:
+                server.stop()
+
+    print(f"デバイス {args.devices}台（応答なし {args.offline}台）、"
+          f"応答の遅延 {args.delay * 1000:.0f}ms")
+    print(f"{'mode':<12}{'wall_ms':>10}{'slowest_ms':>12}{'sum_ms':>10}{'ok':>5}")
+    for mode, (wall, probes) in results.items():
+        elapsed = [probe.elapsed for probe in probes]
+        ok = sum(probe.ok for probe in probes)
+        print(f"{mode:<12}{wall * 1000:>10.0f}{max(elapsed) * 1000:>12.0f}"
+              f"{sum(elapsed) * 1000:>10.0f}{ok:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+疑似Chromecastと仮想時計で一晩分の音量制御を実行し、シナリオごとに比較するベンチマーク
+
+使い方:
+    uv run python benchmarks/bench_simulated_night.py [--latency 0.05] [--drop-rate 0.1]
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from nemucast.deadline import MISSED_TICK_POLICIES  # noqa: E402
+from nemucast.fade import PROFILES  # noqa: E402
+from nemucast.sim import NightScenario, run_simulated_night  # noqa: E402
+
+
+def build_scenarios(args: argparse.Namespace):
+    """(ラベル, シナリオ) のリストを作る"""
+    common = dict(
+        initial_volume=args.start,
+        min_level=args.min_level,
+        step=args.step,
+        interval_sec=args.interval,
+        latency=args.latency,
+        seed=args.seed,
+    )
+    scenarios = [(profile, NightScenario(profile=profile, **common)) for profile in PROFILES]
+    scenarios += [
+        ("step+drop", NightScenario(drop_rate=args.drop_rate, **common)),
+        ("step+idle", NightScenario(
+            start_active=False, transitions=[(1800, "active")], **common,
+        )),
+        ("step+pause", NightScenario(
+            transitions=[(2500, "idle"), (4000, "active")], **common,
+        )),
+        ("linear+pause", NightScenario(
+            profile="linear", transitions=[(2500, "idle"), (4000, "active")], **common,
+        )),
+    ]
+    # 長い停止（サスペンドなど）で期限を過ぎた周期の扱いを比較
+    scenarios += [
+        (f"stall:{policy}", NightScenario(
+            stalls=[(args.interval + 100, args.stall)], missed_tick_policy=policy, **common,
+        ))
+        for policy in MISSED_TICK_POLICIES
+    ]
+    return scenarios
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--start", type=float, default=0.6)
+    parser.add_argument("--min-level", type=float, default=0.3)
+    parser.add_argument("--step", type=float, default=-0.04)
+    parser.add_argument("--interval", type=int, default=1200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--drop-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stall", type=float, default=5000, help="停止シナリオの停止時間（秒）")
+    parser.add_argument("--verbose", action="store_true", help="制御ループのログを表示する")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    print(f"フェード: {args.start:.2f} → {args.min_level:.2f}, 通信遅延 {args.latency}秒")
+    print(f"{'scenario':<18}{'commands':>10}{'dropped':>9}{'status_rt':>11}"
+          f"{'lag_ms':>9}{'late_p95':>10}{'missed':>8}{'night_h':>9}{'wall_ms':>9}")
+
+    for label, scenario in build_scenarios(args):
+        report = run_simulated_night(scenario)
+        lag = statistics.mean(report.decision_lags) * 1000 if report.decision_lags else None
+        lag_text = f"{lag:.0f}" if lag is not None else "-"
+        late = report.lateness.percentile(0.95)
+        late_text = f"{late:.2f}" if late is not None else "-"
+        print(f"{label:<18}{report.commands:>10}{report.dropped:>9}"
+              f"{report.status_round_trips:>11}{lag_text:>9}"
+              f"{late_text:>10}{report.lateness.missed:>8}"
+              f"{report.simulated_sec / 3600:>9.2f}{report.wall_sec * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
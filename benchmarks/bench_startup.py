@@ -0,0 +1,130 @@
+"""
+起動時間のベンチマーク（import時間、`--help` の応答時間、最初の音量コマンドまでの時間）
+
+最初の音量コマンドまでの時間は、Cast代役サーバー（`nemucast.standin`）を接続先キャッシュに
+登録した状態で `nemucast` を別プロセスで起動し、サーバーが SET_VOLUME を受け取るまでを計測する。
+
+使い方:
+    uv run python benchmarks/bench_startup.py [--rounds 5]
+"""
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert  # noqa: E402
+
+# 起動直後に読み込まれてはいけない重いモジュール
+HEAVY_MODULES = ("pychromecast", "zeroconf", "google.protobuf", "asyncio")
+
+
+def child_env(state_dir: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(SRC), NEMUCAST_STATE_DIR=state_dir)
+    env.pop("PYTHONSTARTUP", None)
+    return env
+
+
+def time_command(args, env, rounds: int) -> list:
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        subprocess.run(args, env=env, check=True, capture_output=True)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def loaded_heavy_modules(env) -> list:
+    """`import nemucast.main` と `parse_args()` の後に読み込まれている重いモジュール"""
+    code = (
+        "import sys, json, nemucast.main as m; m.parse_args([]); "
+        f"print(json.dumps([n for n in {list(HEAVY_MODULES)!r} if n in sys.modules]))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True
+    )
+    return json.loads(out.stdout)
+
+
+def time_to_first_command(env, state_dir: Path, rounds: int) -> list:
+    """プロセス起動から代役サーバーが最初の SET_VOLUME を受け取るまでの時間"""
+    certfile, keyfile = ensure_self_signed_cert(state_dir / "standin")
+    times = []
+    for _ in range(rounds):
+        with StandInCastServer(volume_level=0.5, certfile=certfile, keyfile=keyfile) as server:
+            entry = server.endpoint()
+            (state_dir / "devices.json").write_text(
+                json.dumps({entry.name: asdict(entry)}), encoding="utf-8"
+            )
+            started = time.monotonic()
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "nemucast.main", "-n", entry.name,
+                 "-s", "-0.01", "-m", "0.0", "-i", "600"],
+                env=dict(env, LOG_LEVEL="WARNING"), cwd=state_dir,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                deadline = started + 30
+                while not server.stats.volume_history and time.monotonic() < deadline:
+                    time.sleep(0.001)
+                if server.stats.volume_history:
+                    times.append(server.stats.volume_history[0][0] - started)
+            finally:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+    return times
+
+
+def summarize(label: str, seconds: list) -> None:
+    if not seconds:
+        print(f"{label:<28}{'-':>10}")
+        return
+    ms = [s * 1000 for s in seconds]
+    print(f"{label:<28}{statistics.median(ms):>10.1f}{min(ms):>10.1f}{max(ms):>10.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        state_dir = Path(tmp)
+        env = child_env(tmp)
+        baseline = time_command([sys.executable, "-c", "pass"], env, args.rounds)
+        import_main = time_command(
+            [sys.executable, "-c", "import nemucast.main"], env, args.rounds
+        )
+        import_cast = time_command(
+            [sys.executable, "-c", "import pychromecast"], env, args.rounds
+        )
+        help_times = time_command(
+            [sys.executable, "-m", "nemucast.main", "--help"], env, args.rounds
+        )
+        heavy = loaded_heavy_modules(env)
+        first_command = time_to_first_command(env, state_dir, args.rounds)
+
+    print(f"{'measure':<28}{'p50_ms':>10}{'min_ms':>10}{'max_ms':>10}")
+    summarize("python -c pass", baseline)
+    summarize("import nemucast.main", import_main)
+    summarize("import pychromecast", import_cast)
+    summarize("nemucast --help", help_times)
+    summarize("spawn -> first SET_VOLUME", first_command)
+    print(f"parse_args() 後に読み込み済みの重いモジュール: {heavy or 'なし'}")
+
+
+if __name__ == "__main__":
+    main()
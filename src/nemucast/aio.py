@@ -0,0 +1,698 @@
+"""asyncioベースの音量制御ループ（待機中も状態通知・停止要求に即応する）"""
+
+import asyncio
+import functools
+import logging
+import signal
+from dataclasses import dataclass, field
+from typing import Callable, Coroutine, List, Optional, Tuple
+
+from . import events, metrics, trace
+from .clock import get_loop_factory, monotonic
+from .commands import confirm_quit_app, confirm_set_volume
+from .config import SETTINGS, LiveSettings
+from .deadline import DEFAULT_MISSED_TICK_POLICY, DeadlineSchedule, LatenessStats
+from .fade import DEFAULT_MAX_RATE, FadeTable, plan_media_fade
+from .journal import FadeJournal
+from .main import (
+    COMMAND_RETRIES,
+    COMMAND_TIMEOUT,
+    RETRY_SEC,
+    adjust_volume,
+    get_current_volume,
+    is_chromecast_active,
+    log_active_app_status,
+    plan_profile_fade,
+)
+from .status import (
+    IDLE_APP_IDS,
+    MEDIA_STATUS,
+    MediaPosition,
+    StatusMonitor,
+    is_playback_event,
+)
+
+# アイドル中、状態通知が届かない場合に念のため状態を確認する間隔（秒）
+DEFAULT_IDLE_POLL_SEC = 300.0
+# 終了時刻まで残りこれ以下で項目が変わった場合は、次の項目の自動再生とみなして
+# メディアの終了とする（秒）
+MEDIA_END_GRACE_SEC = 5.0
+# 予測した再生位置とのずれがこれを超えたらシークとみなし、計画を作り直す（秒）
+SEEK_TOLERANCE_SEC = 2.0
+
+
+async def run_blocking(func: Callable, *args, **kwargs):
+    """pychromecastのブロッキング呼び出しをエグゼキューターで実行する"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+
+@dataclass
+class WakeStats:
+    """再生開始を検知してから最初の音量調整までの遅延（秒）の記録"""
+
+    lags: List[float] = field(default_factory=list)
+
+    def record(self, lag: float) -> None:
+        self.lags.append(lag)
+        logging.info("再生開始から音量調整までの遅延: %.3f秒", lag)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return sum(self.lags) / len(self.lags) if self.lags else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return max(self.lags) if self.lags else None
+
+
+class StatusWaker:
+    """
+    StatusMonitorの状態通知（ソケットスレッド）をasyncio.Eventに橋渡しする
+
+    `settings` を指定すると、設定の差し替え（`config.SETTINGS` の通知）でも起きる。
+    """
+
+    def __init__(self, monitor: Optional[StatusMonitor], settings: Optional[LiveSettings] = None):
+        self.monitor = monitor
+        self.settings = settings
+        self.event = asyncio.Event()
+        # 最後に起こされた時刻（イベントループの時計）
+        self.woken_at: Optional[float] = None
+        self._loop = asyncio.get_running_loop()
+        self._predicate: Optional[Callable[[str, object], bool]] = None
+
+    def _on_status(self, kind: str, status) -> None:
+        predicate = self._predicate
+        if predicate is None or predicate(kind, status):
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        self.woken_at = self._loop.time()
+        self.event.set()
+
+    def __enter__(self) -> "StatusWaker":
+        for source in (self.monitor, self.settings):
+            if source is not None:
+                source.add_listener(self._on_status)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for source in (self.monitor, self.settings):
+            if source is not None:
+                source.remove_listener(self._on_status)
+
+    def arm(self, predicate: Optional[Callable[[str, object], bool]] = None) -> None:
+        """
+        それまでの通知を捨て、以降の通知を `wait()` まで取っておく
+
+        状態を確認する前に呼ぶと、確認してから `wait()` を呼ぶまでに届いた通知を取りこぼさない。
+        """
+        self._predicate = predicate
+        self.event.clear()
+
+    async def wait(
+        self, timeout: float, predicate: Optional[Callable[[str, object], bool]] = None
+    ) -> bool:
+        """
+        状態通知が届くか `timeout` 秒経過するまで待つ
+
+        待ち始める前に届いていた通知があれば、待たずに戻る。通知は1回の `wait()` で消費する。
+
+        Args:
+            timeout: 最大待ち時間（秒）
+            predicate: 指定時は `predicate(kind, status)` がTrueの通知でだけ起きる
+
+        Returns:
+            bool: 状態通知で起こされた場合True
+        """
+        self._predicate = predicate
+        if not self.event.is_set() and timeout > 0:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        woken = self.event.is_set()
+        self.event.clear()
+        return woken
+
+
+async def wait_until_active(cast, monitor: Optional[StatusMonitor], waker: StatusWaker,
+                            poll_sec: float = DEFAULT_IDLE_POLL_SEC) -> float:
+    """
+    再生が始まるまで待機する
+
+    再生開始を示す状態通知（アイドル以外のアプリ起動、PLAYING/BUFFERING）で起き、
+    通知が無くても `poll_sec` 秒ごとに状態を確認する。
+
+    Returns:
+        再生開始を検知した時刻（イベントループの時計）
+    """
+    loop = asyncio.get_running_loop()
+    woken = False
+    while True:
+        # 確認の後に届いた再生開始の通知で起きられるよう、確認より前に待ち受けを始める
+        waker.arm(is_playback_event)
+        if await run_blocking(is_chromecast_active, cast, monitor):
+            if woken:
+                logging.info("再生開始を検知しました（状態通知）。")
+                return waker.woken_at
+            logging.info("再生開始を検知しました（定期確認）。")
+            return loop.time()
+        logging.debug("Chromecastはまだアイドル状態です。")
+        woken = await waker.wait(poll_sec, is_playback_event)
+
+
+async def async_restore_volume_and_standby(
+    cast, initial_volume: float, monitor: Optional[StatusMonitor] = None
+) -> bool:
+    """
+    `restore_volume_and_standby` の非同期版（反映を確認した時点で次へ進む）
+
+    Returns:
+        bool: 音量を初期値に戻せたことを確認できた場合True
+    """
+    restored = await run_blocking(
+        confirm_set_volume, cast, initial_volume, monitor, COMMAND_TIMEOUT, COMMAND_RETRIES
+    )
+    if restored:
+        logging.info("音量を初期値 %.2f に戻しました。", initial_volume)
+    events.emit(events.VOLUME_RESTORED, cast, level=initial_volume, confirmed=restored)
+
+    if await run_blocking(is_chromecast_active, cast, monitor):
+        logging.info("Chromecastをスタンバイモードにします。")
+        confirmed = await run_blocking(
+            confirm_quit_app, cast, monitor, COMMAND_TIMEOUT, COMMAND_RETRIES
+        )
+        if confirmed:
+            logging.info("Chromecastがスタンバイモードになりました。")
+        events.emit(events.STANDBY, cast, confirmed=confirmed, already=False)
+    else:
+        logging.info("Chromecastは既にスタンバイ状態です。")
+        events.emit(events.STANDBY, cast, confirmed=True, already=True)
+    return restored
+
+
+async def _finish_fade(
+    cast, initial_volume: float, monitor: Optional[StatusMonitor], journal: Optional[FadeJournal]
+) -> None:
+    """音量を初期値に戻してスタンバイにし、戻せたらジャーナルを削除する"""
+    restored = await async_restore_volume_and_standby(cast, initial_volume, monitor)
+    if restored and journal is not None:
+        await run_blocking(journal.complete)
+
+
+async def async_volume_control_loop(
+    cast,
+    interval_sec: int,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    monitor: Optional[StatusMonitor] = None,
+    idle_poll_sec: float = DEFAULT_IDLE_POLL_SEC,
+    wake_stats: Optional[WakeStats] = None,
+    missed_tick_policy: str = DEFAULT_MISSED_TICK_POLICY,
+    lateness_stats: Optional[LatenessStats] = None,
+    journal: Optional[FadeJournal] = None,
+    settings: Optional[LiveSettings] = None,
+) -> None:
+    """
+    `volume_control_loop` と同じ動作をするasyncio版の音量制御ループ
+
+    アイドル中は間隔を待たずに再生開始の状態通知を待ち、再生が始まったらすぐに音量を調整する。
+    再試行中の待機も状態通知で起こされ、すべての待機はキャンセルできる。
+    音量調整は再生開始時刻から `interval_sec` ごとの絶対期限で行うため、
+    状態取得や再試行にかかった時間で以降の周期がずれない。
+    `journal` があれば変更した音量を記録し、音量を戻し終えたら削除する。
+    `settings` があれば、差し替えられたステップ・最小音量・間隔を次の周期から使う
+    （待っている期限は前回の音量調整から新しい間隔の後に置き直す）。
+    """
+    loop = asyncio.get_running_loop()
+    wake_stats = wake_stats if wake_stats is not None else WakeStats()
+    schedule = DeadlineSchedule(interval_sec, missed_tick_policy, loop.time, lateness_stats)
+    playback_seen_at: Optional[float] = None
+    version = settings.version if settings is not None else 0
+    with StatusWaker(monitor, settings) as waker:
+        while True:
+            if settings is not None and settings.version != version:
+                version = settings.version
+                params = settings.current
+                step, min_level = params.step, params.min_level
+                schedule.policy = params.missed_tick_policy
+                schedule.set_interval(params.interval_sec)
+                logging.info(
+                    "新しい設定で続けます（間隔 %s秒, ステップ %s, 最小 %.2f）",
+                    params.interval_sec, step, min_level,
+                )
+
+            delay = schedule.delay()
+            if delay > 0:
+                if settings is None:
+                    await asyncio.sleep(delay)
+                else:
+                    # 設定が差し替えられたら期限を置き直すため、待つのをやめて先頭に戻る
+                    await waker.wait(delay, _is_settings_event)
+                    continue
+
+            # Chromecastがアクティブかどうかチェック
+            if not await run_blocking(is_chromecast_active, cast, monitor):
+                logging.info("Chromecastはアイドル状態です。再生が始まるまで待機します。")
+                metrics.record_idle_skip(cast)
+                events.emit(events.IDLE_SKIP, cast)
+                playback_seen_at = await wait_until_active(cast, monitor, waker, idle_poll_sec)
+                schedule.reset()
+                continue
+
+            # アクティブな場合、起動中のアプリをログ出力
+            log_active_app_status(cast)
+
+            cur = await run_blocking(get_current_volume, cast, monitor)
+            if cur is None:
+                logging.warning("音量レベルを取得できませんでした。再試行します。")
+                await waker.wait(RETRY_SEC)
+                continue
+
+            logging.info("現在の音量: %.2f", cur)
+
+            # 音量を調整
+            schedule.begin_tick()
+            new_volume = await run_blocking(adjust_volume, cast, cur, step, min_level, monitor)
+            if new_volume is None:
+                # 最小音量に到達した場合
+                schedule.stats.log_summary()
+                await _finish_fade(cast, initial_volume, monitor, journal)
+                logging.info("プログラムを終了します。")
+                return
+            if journal is not None:
+                await run_blocking(journal.record_level, new_volume)
+
+            if playback_seen_at is not None:
+                wake_stats.record(loop.time() - playback_seen_at)
+                playback_seen_at = None
+
+            schedule.advance()
+
+
+def _is_settings_event(kind: str, status) -> bool:
+    return kind == SETTINGS
+
+
+def _install_stop_handlers(task: asyncio.Task) -> None:
+    """SIGTERM/SIGINTで制御タスクをキャンセルする（メインスレッド以外では何もしない）"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, task.cancel)
+        except (ValueError, RuntimeError, NotImplementedError):
+            # メインスレッド以外、またはWindowsではシグナルハンドラを登録できない
+            pass
+
+
+async def async_profile_fade(
+    cast,
+    plan: FadeTable,
+    initial_volume: float,
+    monitor: Optional[StatusMonitor] = None,
+    idle_poll_sec: float = DEFAULT_IDLE_POLL_SEC,
+    wake_stats: Optional[WakeStats] = None,
+    missed_tick_policy: str = DEFAULT_MISSED_TICK_POLICY,
+    lateness_stats: Optional[LatenessStats] = None,
+    journal: Optional[FadeJournal] = None,
+    settings: Optional[LiveSettings] = None,
+) -> None:
+    """
+    事前計算した送信計画（`fade.plan_commands`）に沿って音量を下げる
+
+    アイドル中はフェードの経過時間を止め、再生が再開したら続きから下げる。
+    停止などで期限を過ぎた送信が複数ある場合は `missed_tick_policy` に従って扱う。
+    計画の最後まで送信したら音量を初期値に戻してスタンバイにする。
+    `journal` があれば送信した音量を記録し、音量を戻し終えたら削除する。
+    `settings` があれば、差し替えられた設定で今の音量から残りの計画を作り直す
+    （`duration_sec` はフェードの開始からの時間として扱う）。
+    """
+    loop = asyncio.get_running_loop()
+    anchor = loop.time()
+    wake_stats = wake_stats if wake_stats is not None else WakeStats()
+    lateness_stats = lateness_stats if lateness_stats is not None else LatenessStats()
+    playback_seen_at: Optional[float] = None
+    index = 0
+    level: Optional[float] = None
+    # 作り直す前の計画で経過したフェードの時間（秒）
+    consumed = 0.0
+    version = settings.version if settings is not None else 0
+    with StatusWaker(monitor, settings) as waker:
+        while index < len(plan):
+            if settings is not None and settings.version != version:
+                version = settings.version
+                params = settings.current
+                if level is None:
+                    level = await run_blocking(get_current_volume, cast, monitor)
+                    level = initial_volume if level is None else level
+                consumed += loop.time() - anchor
+                anchor = loop.time()
+                missed_tick_policy = params.missed_tick_policy
+                plan = replan_profile_fade(params, level, consumed)
+                index = 0
+                logging.info(
+                    "新しい設定で %.2f から計画を作り直しました"
+                    "（%s, 最小 %.2f, 音量コマンド %d 回）",
+                    level, params.profile, params.min_level, len(plan),
+                )
+                continue
+
+            delay = anchor + plan[index][0] - loop.time()
+            if delay > 0:
+                if settings is None:
+                    await asyncio.sleep(delay)
+                else:
+                    # 設定が差し替えられたら計画を作り直すため、待つのをやめて先頭に戻る
+                    await waker.wait(delay, _is_settings_event)
+                    continue
+            else:
+                index, missed = _skip_overdue(plan, index, loop.time() - anchor,
+                                              missed_tick_policy)
+                if missed:
+                    lateness_stats.missed += missed
+                    logging.info("期限を過ぎた音量変更 %d 回を %s しました。",
+                                 missed, missed_tick_policy)
+                    continue
+
+            while not await run_blocking(is_chromecast_active, cast, monitor):
+                logging.info("Chromecastはアイドル状態です。フェードを一時停止します。")
+                metrics.record_idle_skip(cast)
+                events.emit(events.IDLE_SKIP, cast)
+                paused_at = loop.time()
+                playback_seen_at = await wait_until_active(cast, monitor, waker, idle_poll_sec)
+                anchor += loop.time() - paused_at
+
+            t, level = plan[index]
+            index += 1
+            lateness_stats.record(max(0.0, loop.time() - (anchor + t)))
+            await _apply_level(cast, level, monitor, journal)
+            if playback_seen_at is not None:
+                wake_stats.record(loop.time() - playback_seen_at)
+                playback_seen_at = None
+
+    lateness_stats.log_summary()
+    if plan:
+        level = plan[-1][1]
+    logging.info("最小音量に到達 (%.2f)。", initial_volume if level is None else level)
+    await _finish_fade(cast, initial_volume, monitor, journal)
+    logging.info("プログラムを終了します。")
+
+
+def replan_profile_fade(params, level: float, elapsed: float) -> FadeTable:
+    """
+    設定の差し替え後、今の音量 `level` から残りのフェードの送信計画を作る
+
+    `params.duration_sec` があれば経過時間 `elapsed` を除いた残りで、無ければ
+    ステップ式で今の音量から最小音量に到達する時間でフェードする。
+    """
+    duration = None
+    if params.duration_sec is not None:
+        duration = max(0.0, params.duration_sec - elapsed)
+    return plan_profile_fade(
+        params.profile, params.interval_sec, params.step, params.min_level, level, duration,
+        params.max_rate,
+    )
+
+
+async def _apply_level(
+    cast, level: float, monitor: Optional[StatusMonitor], journal: Optional[FadeJournal]
+) -> None:
+    """計画の音量を送信して反映を確認し、ジャーナルに記録する"""
+    cur = await run_blocking(get_current_volume, cast, monitor)
+    confirmed = await run_blocking(
+        confirm_set_volume, cast, level, monitor, COMMAND_TIMEOUT, COMMAND_RETRIES
+    )
+    if confirmed and cur is None:
+        logging.info("音量を %.2f へ変更しました", level)
+    elif confirmed:
+        logging.info("音量を %.2f → %.2f へ変更しました", cur, level)
+    events.emit(events.VOLUME_CHANGED, cast, level=level, previous=cur, confirmed=confirmed)
+    if journal is not None:
+        await run_blocking(journal.record_level, level)
+
+
+def _is_media_event(kind: str, status) -> bool:
+    return kind == MEDIA_STATUS
+
+
+def _is_media_or_settings_event(kind: str, status) -> bool:
+    return kind in (MEDIA_STATUS, SETTINGS)
+
+
+def _media_ended(monitor: StatusMonitor) -> bool:
+    """アプリが終了した、またはメディアの再生が終わった（IDLE）か"""
+    return (
+        monitor.app_id is None
+        or monitor.app_id in IDLE_APP_IDS
+        or monitor.player_state == "IDLE"
+    )
+
+
+def media_change(monitor: StatusMonitor, planned: MediaPosition, now: float) -> Optional[str]:
+    """
+    状態スナップショットを、計画を作った時点のメディアの項目・再生位置と比べる（問い合わせはしない）
+
+    Returns:
+        "ended": 再生が終わった（停止・アプリ終了・終了間際の項目の切り替え）
+        "paused": 一時停止中またはバッファリング中
+        "item": 別の項目に切り替わった
+        "seek": 予測した再生位置から `SEEK_TOLERANCE_SEC` 秒を超えてずれた
+        None: 計画どおり
+    """
+    if _media_ended(monitor):
+        return "ended"
+    current = monitor.media_position()
+    if current is None:
+        # 長さの分からない状態（読み込み中など）では計画を変えない
+        return None
+    if current.content_id != planned.content_id:
+        return "ended" if planned.remaining_at(now) <= MEDIA_END_GRACE_SEC else "item"
+    if current.player_state != "PLAYING":
+        return "paused"
+    if abs(current.position_at(now) - planned.position_at(now)) > SEEK_TOLERANCE_SEC:
+        return "seek"
+    return None
+
+
+async def async_media_fade(
+    cast,
+    profile: str,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    monitor: StatusMonitor,
+    max_rate: float = DEFAULT_MAX_RATE,
+    idle_poll_sec: float = DEFAULT_IDLE_POLL_SEC,
+    journal: Optional[FadeJournal] = None,
+    start_level: Optional[float] = None,
+    settings: Optional[LiveSettings] = None,
+) -> int:
+    """
+    再生中のメディアの終了時刻にちょうど最小音量へ到達するよう音量を下げ、終了と同時にスタンバイにする
+
+    計画はメディアの残り時間から作り、メディアの状態通知で項目の切り替え・シーク・
+    一時停止からの再開を検知したときだけ作り直す（状態を定期的に問い合わせない）。
+    一時停止中はフェードも止める。終了時刻になるか、再生が終わったことを示す通知が届いたら
+    音量を初期値に戻してスタンバイにする。
+
+    Args:
+        start_level: フェードを始める音量（ジャーナルから再開する場合）。Noneなら `initial_volume`
+        settings: 差し替えられたらカーブ・ステップ・最小音量・送信レートを新しい値にして
+            計画を作り直す
+
+    Returns:
+        計画を作り直した回数
+    """
+    loop = asyncio.get_running_loop()
+    planned = monitor.media_position()
+    if planned is None:
+        raise ValueError("再生中のメディアの長さが分かりません")
+    level = initial_volume if start_level is None else start_level
+    replans = 0
+    version = -1
+    with StatusWaker(monitor, settings) as waker:
+        while True:
+            if settings is not None and settings.version != version:
+                version = settings.version
+                params = settings.current
+                profile, step, min_level = params.profile, params.step, params.min_level
+                max_rate = params.max_rate
+            remaining = planned.remaining_at(monotonic())
+            plan = plan_media_fade(profile, level, min_level, remaining, step, max_rate)
+            anchor = loop.time()
+            logging.info(
+                "メディアの残り %.0f秒で %.2f → %.2f に下げます（音量コマンド %d 回）",
+                remaining, level, min_level, len(plan),
+            )
+            index = 0
+            change = None
+            while change is None:
+                due = plan[index][0] if index < len(plan) else remaining
+                woken = await waker.wait(anchor + due - loop.time(), _is_media_or_settings_event)
+                change = media_change(monitor, planned, monotonic())
+                if change is None and settings is not None and settings.version != version:
+                    change = "settings"
+                if change is not None or woken:
+                    continue
+                if index == len(plan):
+                    change = "ended"
+                    break
+                level = plan[index][1]
+                index += 1
+                await _apply_level(cast, level, monitor, journal)
+
+            if change == "paused":
+                logging.info("メディアが一時停止しました。再開するまでフェードを止めます。")
+                while change == "paused":
+                    await waker.wait(idle_poll_sec, _is_media_event)
+                    if _media_ended(monitor):
+                        change = "ended"
+                    else:
+                        current = monitor.media_position()
+                        if current is not None and current.player_state == "PLAYING":
+                            change = "resumed"
+            if change == "ended":
+                break
+            current = monitor.media_position()
+            if current is None:
+                logging.info("長さの分からないメディアに切り替わりました。フェードを終了します。")
+                break
+            replans += 1
+            if change == "settings":
+                logging.info("設定が変わりました。残り時間から計画を作り直します。")
+            else:
+                logging.info(
+                    "メディアの変化（%s）を検知しました。残り時間から計画を作り直します。", change
+                )
+            planned = current
+
+    logging.info("メディアの終了に合わせてフェードを終えます（計画の作り直し %d 回）。", replans)
+    await _finish_fade(cast, initial_volume, monitor, journal)
+    return replans
+
+
+def _skip_overdue(plan: FadeTable, index: int, elapsed: float, policy: str) -> Tuple[int, int]:
+    """
+    送信計画のうち期限を過ぎたものを欠落周期ポリシーに従って読み飛ばす
+
+    Returns:
+        (index, missed): 次に送信する計画の位置と、読み飛ばした数。
+        missed が0でなければ、呼び出し側は改めて期限まで待つ
+    """
+    if policy == "catchup":
+        return index, 0
+    due = index
+    while due + 1 < len(plan) and plan[due + 1][0] <= elapsed:
+        due += 1
+    if due == index:
+        return index, 0
+    if policy == "skip" and due + 1 < len(plan):
+        # 過ぎた音量変更はすべて捨て、次の未来の期限まで待つ
+        return due + 1, due + 1 - index
+    # coalesce（または最後の音量）: 最後に過ぎた音量変更だけを送る
+    return due, due - index
+
+
+def _run(coro: Coroutine):
+    """`nemucast.clock` で指定されたイベントループ（通常は標準のループ）でコルーチンを実行する"""
+    with asyncio.Runner(loop_factory=get_loop_factory()) as runner:
+        return runner.run(coro)
+
+
+async def _run_until_stopped(
+    control: Coroutine, cast, initial_volume: float, journal: Optional[FadeJournal] = None
+) -> bool:
+    _install_stop_handlers(asyncio.current_task())
+    try:
+        await control
+        return True
+    except asyncio.CancelledError:
+        logging.info("停止要求を受信しました。音量を初期値に戻します...")
+        trace.record_stop(cast)
+        try:
+            if await run_blocking(
+                confirm_set_volume, cast, initial_volume, None, COMMAND_TIMEOUT, COMMAND_RETRIES
+            ):
+                logging.info("音量を初期値 %.2f に戻しました。", initial_volume)
+                if journal is not None:
+                    journal.complete()
+        except Exception as e:
+            logging.error("音量の復元に失敗しました: %s", e)
+        return False
+
+
+def run_async_volume_control(
+    cast,
+    interval_sec: int,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    monitor: Optional[StatusMonitor] = None,
+    idle_poll_sec: float = DEFAULT_IDLE_POLL_SEC,
+    wake_stats: Optional[WakeStats] = None,
+    missed_tick_policy: str = DEFAULT_MISSED_TICK_POLICY,
+    lateness_stats: Optional[LatenessStats] = None,
+    journal: Optional[FadeJournal] = None,
+    settings: Optional[LiveSettings] = None,
+) -> bool:
+    """
+    asyncioの音量制御ループを実行する同期エントリーポイント
+
+    Returns:
+        bool: 最小音量まで下げ終えた場合True、停止要求で中断した場合False
+    """
+    return _run(_run_until_stopped(
+        async_volume_control_loop(
+            cast, interval_sec, step, min_level, initial_volume, monitor,
+            idle_poll_sec, wake_stats, missed_tick_policy, lateness_stats, journal, settings,
+        ),
+        cast, initial_volume, journal,
+    ))
+
+
+def run_async_media_fade(
+    cast,
+    profile: str,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    monitor: StatusMonitor,
+    max_rate: float = DEFAULT_MAX_RATE,
+    idle_poll_sec: float = DEFAULT_IDLE_POLL_SEC,
+    journal: Optional[FadeJournal] = None,
+    start_level: Optional[float] = None,
+    settings: Optional[LiveSettings] = None,
+) -> bool:
+    """`async_media_fade` を実行する同期エントリーポイント（停止要求の扱いは同じ）"""
+    return _run(_run_until_stopped(
+        async_media_fade(
+            cast, profile, step, min_level, initial_volume, monitor, max_rate,
+            idle_poll_sec, journal, start_level, settings,
+        ),
+        cast, initial_volume, journal,
+    ))
+
+
+def run_async_profile_fade(
+    cast,
+    plan: FadeTable,
+    initial_volume: float,
+    monitor: Optional[StatusMonitor] = None,
+    idle_poll_sec: float = DEFAULT_IDLE_POLL_SEC,
+    wake_stats: Optional[WakeStats] = None,
+    missed_tick_policy: str = DEFAULT_MISSED_TICK_POLICY,
+    lateness_stats: Optional[LatenessStats] = None,
+    journal: Optional[FadeJournal] = None,
+    settings: Optional[LiveSettings] = None,
+) -> bool:
+    """`async_profile_fade` を実行する同期エントリーポイント（停止要求の扱いは同じ）"""
+    return _run(_run_until_stopped(
+        async_profile_fade(
+            cast, plan, initial_volume, monitor, idle_poll_sec, wake_stats,
+            missed_tick_policy, lateness_stats, journal, settings,
+        ),
+        cast, initial_volume, journal,
+    ))
@@ -0,0 +1,149 @@
+"""デバイス接続先（ホスト・ポート・UUID）のディスクキャッシュ"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+from uuid import UUID
+
+from .paths import get_state_dir
+
+if TYPE_CHECKING:
+    import pychromecast
+    from pychromecast.models import CastInfo
+
+# キャッシュを信用する最大経過時間（秒）。デフォルトは7日
+DEFAULT_CACHE_MAX_AGE = 7 * 24 * 60 * 60
+# キャッシュから直接接続するときの接続待ち時間（秒）
+DEFAULT_CONNECT_TIMEOUT = 5.0
+
+
+@dataclass
+class CachedEndpoint:
+    """キャッシュされたデバイスの接続先"""
+
+    name: str
+    host: str
+    port: int
+    uuid: str
+    model_name: Optional[str] = None
+    cast_type: Optional[str] = None
+    manufacturer: Optional[str] = None
+    last_seen: float = 0.0
+
+    def is_stale(self, max_age: float, now: Optional[float] = None) -> bool:
+        """最終確認から `max_age` 秒以上経過していればTrue"""
+        now = time.time() if now is None else now
+        return now - self.last_seen > max_age
+
+    def to_cast_info(self) -> "CastInfo":
+        """mDNSを使わずに直接接続するためのCastInfoを作成する"""
+        from pychromecast.models import CastInfo, HostServiceInfo
+
+        return CastInfo(
+            {HostServiceInfo(self.host, self.port)},
+            UUID(self.uuid),
+            self.model_name,
+            self.name,
+            self.host,
+            self.port,
+            self.cast_type,
+            self.manufacturer,
+        )
+
+
+def cache_key(target_name: str, target_uuid: Optional[UUID] = None) -> str:
+    """検索対象のキャッシュのキー（UUIDが指定されていればUUID、無ければ指定された名前）"""
+    return str(target_uuid) if target_uuid is not None else target_name
+
+
+class EndpointCache:
+    """検索対象（`cache_key()`）をキーにした接続先キャッシュ（JSONファイル）"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path or get_state_dir() / "devices.json"
+        self._entries: Dict[str, CachedEndpoint] = self._load()
+
+    def _load(self) -> Dict[str, CachedEndpoint]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            return {name: CachedEndpoint(**entry) for name, entry in data.items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, TypeError) as e:
+            logging.warning("接続先キャッシュを読み込めませんでした: %s", e)
+            return {}
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        data = {name: asdict(entry) for name, entry in self._entries.items()}
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def get(self, key: str) -> Optional[CachedEndpoint]:
+        """検索対象の名前またはUUID（`cache_key()`）に対応するキャッシュを返す"""
+        return self._entries.get(key)
+
+    def store(self, cast_info, key: Optional[str] = None) -> CachedEndpoint:
+        """
+        接続できたデバイスの情報でキャッシュを更新する
+
+        Args:
+            cast_info: 接続したデバイスのCastInfo
+            key: 検索に使ったキー（`cache_key()`）。省略時はfriendly_name
+
+        同じデバイスがUUIDをキーにしても保存されていれば、その接続先も更新する。
+        """
+        entry = CachedEndpoint(
+            name=cast_info.friendly_name,
+            host=cast_info.host,
+            port=cast_info.port,
+            uuid=str(cast_info.uuid),
+            model_name=cast_info.model_name,
+            cast_type=cast_info.cast_type,
+            manufacturer=cast_info.manufacturer,
+            last_seen=time.time(),
+        )
+        self._entries[key or entry.name] = entry
+        if entry.uuid in self._entries:
+            self._entries[entry.uuid] = entry
+        try:
+            self._save()
+        except OSError as e:
+            logging.warning("接続先キャッシュを保存できませんでした: %s", e)
+        return entry
+
+
+def connect_from_cache(
+    entry: CachedEndpoint, timeout: float = DEFAULT_CONNECT_TIMEOUT
+) -> Optional["pychromecast.Chromecast"]:
+    """
+    キャッシュされたホストに直接接続する（mDNS検索なし）
+
+    Args:
+        entry: キャッシュされた接続先
+        timeout: 接続確立を待つ最大時間（秒）
+
+    Returns:
+        接続済みのChromecast、接続できなかった場合はNone
+    """
+    import pychromecast
+
+    logging.info("キャッシュから直接接続します: %s (%s:%d)", entry.name, entry.host, entry.port)
+    started = time.monotonic()
+    cast = None
+    try:
+        cast = pychromecast.Chromecast(
+            entry.to_cast_info(), tries=1, timeout=timeout, retry_wait=0
+        )
+        cast.wait(timeout=timeout)
+    except Exception as e:
+        logging.warning("キャッシュされた接続先に接続できませんでした: %s", e)
+        if cast is not None:
+            cast.disconnect(timeout=0)
+        return None
+    logging.info("キャッシュ接続時間: %.3f秒", time.monotonic() - started)
+    return cast
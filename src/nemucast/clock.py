@@ -0,0 +1,42 @@
+"""差し替え可能な時計（シミュレーションで仮想時間を使うため）"""
+
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+if TYPE_CHECKING:
+    import asyncio
+
+_source: Callable[[], float] = time.monotonic
+_loop_factory: Optional[Callable[[], "asyncio.AbstractEventLoop"]] = None
+
+
+def monotonic() -> float:
+    """現在の時計の値（秒）を返す。通常は `time.monotonic()` と同じ"""
+    return _source()
+
+
+def get_loop_factory() -> Optional[Callable[[], "asyncio.AbstractEventLoop"]]:
+    """asyncioエンジンが使うイベントループの生成関数（Noneなら標準のループ）"""
+    return _loop_factory
+
+
+@contextmanager
+def use_clock(
+    source: Callable[[], float],
+    loop_factory: Optional[Callable[[], "asyncio.AbstractEventLoop"]] = None,
+) -> Iterator[None]:
+    """
+    `with` ブロックの間だけ時計とイベントループの生成関数を差し替える
+
+    Args:
+        source: `monotonic()` の代わりに使う関数
+        loop_factory: asyncioエンジンが使うイベントループの生成関数
+    """
+    global _source, _loop_factory
+    saved = (_source, _loop_factory)
+    _source, _loop_factory = source, loop_factory
+    try:
+        yield
+    finally:
+        _source, _loop_factory = saved
@@ -0,0 +1,151 @@
+"""
+反映を確認するCastコマンド（音量設定・アプリ終了）
+
+pychromecastの `set_volume()` / `quit_app()` は受信機の応答を待って戻り、応答の受信機状態は
+戻る前にスナップショットへ反映される。ここではその状態が期待通りかを確かめ、
+違えば GET_STATUS で最新の状態を問い合わせ、それでも反映されていなければ再送する。
+固定時間のスリープは使わず、デバイスが確認した時点で戻る。
+"""
+
+import logging
+import time
+from typing import Callable, Optional
+
+from . import metrics, trace
+from .status import IDLE_APP_IDS, StatusMonitor
+
+# 送信後、状態の問い合わせに応答が届くまで待つ最大時間（秒）
+DEFAULT_COMMAND_TIMEOUT = 5.0
+# 反映を確認できなかった場合の再送回数
+DEFAULT_COMMAND_RETRIES = 2
+# 音量が一致したとみなす誤差（デバイスは音量を丸めて返すことがある）
+VOLUME_TOLERANCE = 0.005
+# モニターが無い場合に状態を確認する間隔（秒）
+POLL_SEC = 0.05
+
+
+def set_volume(cast, level: float) -> None:
+    """音量を設定し、往復時間と音量をメトリクスに記録する（反映は確認しない）"""
+    trace.record_command(cast, "set_volume", level=level)
+    with metrics.time_rpc("set_volume", cast):
+        cast.set_volume(level)
+    metrics.record_volume(cast, level)
+
+
+def quit_app(cast) -> None:
+    """起動中のアプリを終了し、往復時間をメトリクスに記録する（反映は確認しない）"""
+    trace.record_command(cast, "quit_app")
+    with metrics.time_rpc("quit_app", cast):
+        cast.quit_app()
+
+
+def volume_matches(status, level: float) -> bool:
+    """受信機の状態が指定した音量（0〜1に丸めた値）を示しているか"""
+    current = getattr(status, "volume_level", None)
+    if not isinstance(current, (int, float)):
+        return False
+    return abs(current - min(max(0.0, level), 1.0)) <= VOLUME_TOLERANCE
+
+
+def app_stopped(status) -> bool:
+    """受信機の状態がアプリ終了（アプリなし、またはアイドル画面）を示しているか"""
+    if status is None:
+        return False
+    app_id = getattr(status, "app_id", None)
+    return app_id is None or app_id in IDLE_APP_IDS
+
+
+def _current_status(cast, monitor: Optional[StatusMonitor]):
+    return monitor.cast_status if monitor is not None else cast.status
+
+
+def _await_status(
+    cast, monitor: Optional[StatusMonitor], predicate: Callable[[object], bool], timeout: float
+) -> bool:
+    """
+    受信機の状態が条件を満たすか確認する
+
+    満たしていなければ GET_STATUS を送り、応答（モニターが無ければ `timeout` 秒以内の状態変化）
+    で改めて判定する。最新の状態が条件を満たさなければ、コマンドは失われたとみなす。
+    """
+    if predicate(_current_status(cast, monitor)):
+        return True
+    if monitor is not None:
+        monitor.refresh_cast_status(wait=timeout)
+        return predicate(monitor.cast_status)
+
+    cast.socket_client.receiver_controller.update_status()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate(cast.status):
+            return True
+        time.sleep(POLL_SEC)
+    return predicate(cast.status)
+
+
+def _confirmed(
+    op: str,
+    cast,
+    send: Callable[[], None],
+    predicate: Callable[[object], bool],
+    monitor: Optional[StatusMonitor],
+    timeout: float,
+    retries: int,
+) -> bool:
+    attempts = retries + 1
+    for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            metrics.RPC_RETRIES.labels(metrics.device_label(cast), op).inc()
+        try:
+            send()
+        except Exception as e:
+            logging.warning("%s の応答がありません (%d/%d回目): %s", op, attempt, attempts, e)
+            continue
+        if _await_status(cast, monitor, predicate, timeout):
+            return True
+        metrics.record_rpc_error(op, cast)
+        logging.warning("%s が反映されていません (%d/%d回目)。", op, attempt, attempts)
+    logging.error("%s の反映を確認できませんでした（%d回送信）。", op, attempts)
+    return False
+
+
+def confirm_set_volume(
+    cast,
+    level: float,
+    monitor: Optional[StatusMonitor] = None,
+    timeout: float = DEFAULT_COMMAND_TIMEOUT,
+    retries: int = DEFAULT_COMMAND_RETRIES,
+) -> bool:
+    """
+    音量を設定し、受信機の状態が新しい音量になったことを確認する
+
+    Args:
+        cast: Chromecastオブジェクト
+        level: 設定する音量
+        monitor: 状態スナップショット（無ければ `cast.status` で確認する）
+        timeout: 状態の問い合わせへの応答を待つ最大時間（秒）
+        retries: 反映を確認できなかった場合の再送回数
+
+    Returns:
+        bool: 反映を確認できた場合True
+    """
+    return _confirmed(
+        "set_volume", cast, lambda: set_volume(cast, level),
+        lambda status: volume_matches(status, level), monitor, timeout, retries,
+    )
+
+
+def confirm_quit_app(
+    cast,
+    monitor: Optional[StatusMonitor] = None,
+    timeout: float = DEFAULT_COMMAND_TIMEOUT,
+    retries: int = DEFAULT_COMMAND_RETRIES,
+) -> bool:
+    """
+    起動中のアプリを終了し、受信機の状態がアプリなし（アイドル）になったことを確認する
+
+    引数と戻り値は `confirm_set_volume` と同じ。
+    """
+    return _confirmed(
+        "quit_app", cast, lambda: quit_app(cast), app_stopped, monitor, timeout, retries,
+    )
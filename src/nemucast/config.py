@@ -0,0 +1,287 @@
+"""
+設定ファイル（TOML）によるフェードの設定と、実行中の再読み込み
+
+共通の設定と、デバイスごとの設定を書く:
+
+    device = "寝室のテレビ"        # 名前を省略した場合のデバイス
+
+    [defaults]
+    interval_sec = 1200
+    step = -0.04
+    min_level = 0.3
+
+    [devices."リビングのテレビ"]
+    profile = "linear"
+    duration_sec = 3600
+    min_level = 0.2
+
+設定の項目は `daemon.FadeParams` と同じ名前で、値の範囲も同じく検証する
+（`validate_fade_params` を共有する）。
+`ConfigWatcher` はファイルの更新時刻を定期的に確かめ、変わっていれば読み直して
+`on_reload` に渡す。不正な内容は読み込まずにログに残し、直前の設定を使い続ける。
+実行中のフェードは `LiveSettings` を通じて新しい設定を受け取り、接続とフェードの
+進み具合（起動時の音量・経過時間）を保ったまま、次の周期から新しい値で下げる。
+標準ライブラリだけを使う。
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import tomllib
+
+from . import metrics
+from .deadline import MISSED_TICK_POLICIES
+from .fade import PROFILES
+
+# 設定ファイルに書ける項目（`daemon.FadeParams` の項目名）
+FADE_KEYS = (
+    "profile",
+    "interval_sec",
+    "step",
+    "min_level",
+    "duration_sec",
+    "max_rate",
+    "missed_tick_policy",
+    "until_media_end",
+)
+# `LiveSettings` のリスナーに渡す通知の種類
+SETTINGS = "settings"
+# 設定ファイルの更新を確かめる間隔（秒）
+DEFAULT_CONFIG_POLL_SEC = 1.0
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_fade_params(values: Dict[str, object]) -> None:
+    """
+    フェードの設定の型と範囲を確認する（`values` にある項目だけを確かめる）
+
+    Raises:
+        ValueError: 値の型や範囲が不正な場合
+    """
+    profile = values.get("profile", PROFILES[0])
+    if profile not in PROFILES:
+        raise ValueError(f"フェードカーブは {', '.join(PROFILES)} のいずれかです: {profile!r}")
+    policy = values.get("missed_tick_policy", MISSED_TICK_POLICIES[0])
+    if policy not in MISSED_TICK_POLICIES:
+        raise ValueError(
+            f"欠落周期の扱いは {', '.join(MISSED_TICK_POLICIES)} のいずれかです: {policy!r}"
+        )
+    for key in ("interval_sec", "step", "min_level", "max_rate"):
+        if key in values and not is_number(values[key]):
+            raise ValueError(f"{key} は数値で指定してください")
+    if not isinstance(values.get("until_media_end", False), bool):
+        raise ValueError("until_media_end は true / false で指定してください")
+    duration = values.get("duration_sec")
+    if duration is not None and not is_number(duration):
+        raise ValueError("duration_sec は数値で指定してください")
+    if values.get("interval_sec", 1) <= 0 or values.get("max_rate", 1) <= 0:
+        raise ValueError("interval_sec と max_rate は正の値で指定してください")
+    if values.get("step", -1) >= 0:
+        raise ValueError("step は負の値で指定してください")
+    if duration is not None and duration <= 0:
+        raise ValueError("duration_sec は正の値で指定してください")
+    if not 0.0 <= values.get("min_level", 0.0) <= 1.0:
+        raise ValueError("min_level は0〜1で指定してください")
+
+
+def _check_table(table, where: str) -> Dict[str, object]:
+    if not isinstance(table, dict):
+        raise ValueError(f"{where} はテーブルで指定してください")
+    unknown = [key for key in table if key not in FADE_KEYS]
+    if unknown:
+        raise ValueError(f"{where}: 不明な設定です: {', '.join(unknown)}（{', '.join(FADE_KEYS)}）")
+    try:
+        validate_fade_params(table)
+    except ValueError as e:
+        raise ValueError(f"{where}: {e}") from None
+    return dict(table)
+
+
+@dataclass(frozen=True)
+class NemucastConfig:
+    """設定ファイルの内容（共通の設定と、デバイスごとの設定）"""
+
+    defaults: Dict[str, object] = field(default_factory=dict)
+    devices: Dict[str, Dict[str, object]] = field(default_factory=dict)
+    # 名前を省略した場合のデバイス
+    device: Optional[str] = None
+
+    @classmethod
+    def parse(cls, text: str) -> "NemucastConfig":
+        """
+        TOMLの文字列を解析し、各テーブルの設定の型と範囲を確かめる
+
+        Raises:
+            ValueError: TOMLの書式が不正、不明な項目がある、または値が不正な場合
+        """
+        try:
+            data = tomllib.loads(text)
+        except tomllib.TOMLDecodeError as e:
+            raise ValueError(f"TOMLを解析できません: {e}") from None
+        unknown = [key for key in data if key not in ("device", "defaults", "devices")]
+        if unknown:
+            raise ValueError(f"不明な項目です: {', '.join(unknown)}（device, defaults, devices）")
+        device = data.get("device")
+        if device is not None and not isinstance(device, str):
+            raise ValueError("device は文字列で指定してください")
+        devices = data.get("devices", {})
+        if not isinstance(devices, dict):
+            raise ValueError("devices はデバイス名ごとのテーブルで指定してください")
+        return cls(
+            defaults=_check_table(data.get("defaults", {}), "[defaults]"),
+            devices={
+                name: _check_table(table, f'[devices."{name}"]') for name, table in devices.items()
+            },
+            device=device,
+        )
+
+    def params_for(self, name: str) -> Dict[str, object]:
+        """デバイス `name` の設定（共通の設定をデバイスの設定で上書きしたもの）"""
+        return {**self.defaults, **self.devices.get(name, {})}
+
+    def changed_params(
+        self, previous: "NemucastConfig", name: str
+    ) -> Tuple[Dict[str, object], List[str]]:
+        """
+        `previous` から変わったデバイス `name` の設定
+
+        Returns:
+            (changed, removed): 値が変わった（追加された）項目と、削除された項目の名前
+        """
+        old, new = previous.params_for(name), self.params_for(name)
+        changed = {key: value for key, value in new.items() if old.get(key) != value}
+        removed = [key for key in old if key not in new]
+        return changed, removed
+
+
+def load_config(path: Path) -> NemucastConfig:
+    """
+    設定ファイルを読み込む
+
+    Raises:
+        OSError: ファイルを読めない場合
+        ValueError: 書式が不正な場合（ファイル名付き）
+    """
+    try:
+        return NemucastConfig.parse(Path(path).read_text(encoding="utf-8"))
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+class LiveSettings:
+    """
+    実行中のフェードが読むフェードの設定
+
+    再読み込みでは設定のオブジェクトを丸ごと差し替えるため、フェードの制御ループは
+    `current` を1回読めば、同じ版の値（ステップ・最小音量・間隔など）をそろって使える。
+    """
+
+    def __init__(self, params):
+        self._params = params
+        # 差し替えた回数（制御ループが変化を検知するのに使う）
+        self.version = 0
+        self._listeners: List[Callable[[str, object], None]] = []
+
+    @property
+    def current(self):
+        return self._params
+
+    def add_listener(self, callback: Callable[[str, object], None]) -> None:
+        """差し替え時に `callback(SETTINGS, params)` を呼び出す（差し替えたスレッドから呼ばれる）"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, object], None]) -> None:
+        """`add_listener` で登録したコールバックを解除する"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def update(self, params) -> None:
+        """設定を差し替えて通知する"""
+        self._params = params
+        self.version += 1
+        for callback in list(self._listeners):
+            try:
+                callback(SETTINGS, params)
+            except Exception as e:
+                logging.warning("設定の変更の通知に失敗しました: %s", e)
+
+
+class ConfigWatcher:
+    """
+    設定ファイルの更新を確かめ、変わっていれば読み直して `on_reload(config)` を呼ぶ
+
+    Args:
+        path: 設定ファイル
+        on_reload: 読み直した設定を受け取るコールバック（監視スレッドから呼ばれる）
+        load: 読み込みと検証を行う関数（不正なら OSError / ValueError を送出する）
+        poll_sec: 更新を確かめる間隔（秒）
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        on_reload: Callable[[NemucastConfig], None],
+        load: Callable[[Path], NemucastConfig] = load_config,
+        poll_sec: float = DEFAULT_CONFIG_POLL_SEC,
+    ):
+        self.path = Path(path)
+        self.on_reload = on_reload
+        self.load = load
+        self.poll_sec = poll_sec
+        self._signature = self._stat()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> Optional[NemucastConfig]:
+        """
+        ファイルが変わっていれば読み直す
+
+        Returns:
+            読み直した設定。変わっていない、または不正な内容で読み込まなかった場合はNone
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        # 不正な内容でも同じ内容を何度も読み直さない（次に保存されたときに読み直す）
+        self._signature = signature
+        try:
+            config = self.load(self.path)
+        except (OSError, ValueError) as e:
+            logging.error("設定ファイルの変更を読み込めません。直前の設定を使い続けます: %s", e)
+            metrics.CONFIG_RELOADS.labels("invalid").inc()
+            return None
+        logging.info("設定ファイルを読み直しました: %s", self.path)
+        metrics.CONFIG_RELOADS.labels("ok").inc()
+        self.on_reload(config)
+        return config
+
+    def start(self) -> "ConfigWatcher":
+        """監視スレッドを開始する"""
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.poll_sec):
+            try:
+                self.check()
+            except Exception as e:
+                logging.warning("設定ファイルの再読み込みに失敗しました: %s", e)
@@ -0,0 +1,157 @@
+"""
+常駐デーモン（`nemucast daemon`）を操作するクライアント `nemucast ctl`
+
+標準ライブラリのソケットとJSONだけを使い、pychromecastやasyncioは読み込まない。
+要求と応答は1行1件のJSONで、応答は `{"ok": true, "result": ...}` または
+`{"ok": false, "error": "..."}` の形をとる。
+"""
+
+import argparse
+import json
+import socket
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from .deadline import MISSED_TICK_POLICIES
+from .fade import PROFILES
+from .paths import get_socket_path
+
+# 応答を待つ最大時間（秒）。未接続のデバイスへの初回要求はデバイス検索を含むため長めにする
+DEFAULT_CTL_TIMEOUT = 30.0
+# 1行の要求・応答の最大サイズ（バイト）
+MAX_MESSAGE_BYTES = 1 << 20
+
+
+def request(
+    payload: dict, socket_path: Optional[Path] = None, timeout: float = DEFAULT_CTL_TIMEOUT
+) -> dict:
+    """
+    デーモンに要求を1件送り、応答を返す
+
+    Raises:
+        OSError: デーモンに接続できない、または応答が届かない場合
+        ValueError: 応答がJSONとして解析できない場合
+    """
+    path = socket_path or get_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(path))
+        sock.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as reader:
+            line = reader.readline(MAX_MESSAGE_BYTES)
+    if not line:
+        raise ConnectionError("デーモンが応答せずに接続を閉じました")
+    return json.loads(line)
+
+
+def _add_name(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-n", "--name", help="対象のChromecastの名前。デフォルト: デーモンの CHROMECAST_NAME"
+    )
+
+
+def parse_ctl_args(args=None) -> argparse.Namespace:
+    """`nemucast ctl` のコマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(
+        prog="nemucast ctl", description="常駐デーモン（nemucast daemon）を操作する"
+    )
+    parser.add_argument(
+        "--socket", type=Path, default=None,
+        help=(
+            "制御ソケットのパス。デフォルト: $NEMUCAST_SOCKET または"
+            "状態ディレクトリの control.sock"
+        ),
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_CTL_TIMEOUT,
+        help=f"応答を待つ最大時間（秒）。デフォルト: {DEFAULT_CTL_TIMEOUT}"
+    )
+    commands = parser.add_subparsers(dest="cmd", required=True, metavar="COMMAND")
+
+    commands.add_parser("ping", help="デーモンの応答を確認する")
+
+    status = commands.add_parser("status", help="接続中のデバイスとフェードの状態を表示する")
+    _add_name(status)
+
+    connect = commands.add_parser("connect", help="デバイスに接続しておく（フェードは開始しない）")
+    _add_name(connect)
+
+    fade = commands.add_parser("fade", help="フェードを開始する（省略した項目はデーモンの設定値）")
+    _add_name(fade)
+    fade.add_argument("-i", "--interval", type=float, help="音量調整の間隔（秒）")
+    fade.add_argument("-s", "--step", type=float, help="音量調整のステップ（負の値）")
+    fade.add_argument("-m", "--min-level", type=float, help="最小音量レベル")
+    fade.add_argument("-p", "--profile", choices=PROFILES, help="フェードカーブ")
+    fade.add_argument("--fade-duration", type=float, help="最小音量に到達するまでの時間（秒）")
+    fade.add_argument("--max-rate", type=float, help="1秒あたりの音量コマンド送信数の上限")
+    fade.add_argument("--missed-tick", choices=MISSED_TICK_POLICIES, help="期限を過ぎた周期の扱い")
+    fade.add_argument(
+        "--until-media-end", action="store_true", default=None,
+        help="再生中のメディアの終了時刻に最小音量へ到達させ、終了と同時にスタンバイにする",
+    )
+
+    cancel = commands.add_parser("cancel", help="フェードを中止して音量を初期値に戻す")
+    _add_name(cancel)
+    cancel.add_argument(
+        "--keep-volume", action="store_true", help="音量を戻さず、現在の音量のまま中止する"
+    )
+
+    restore = commands.add_parser("restore", help="フェードを中止して音量を戻す")
+    _add_name(restore)
+    restore.add_argument(
+        "--volume", type=float, help="戻す音量。デフォルト: 最後のフェード開始時の音量"
+    )
+
+    schedule = commands.add_parser("schedule", help="スケジュールのこれからの発火時刻を表示する")
+    schedule.add_argument(
+        "--count", type=int, help="表示する発火時刻の数。デフォルト: 10"
+    )
+
+    commands.add_parser("shutdown", help="フェードを中止して音量を戻し、デーモンを終了する")
+    return parser.parse_args(args)
+
+
+def build_request(args: argparse.Namespace) -> dict:
+    """解析した引数から要求を作る（指定されなかった項目は送らない）"""
+    fields = {
+        "name": "name",
+        "interval": "interval_sec",
+        "step": "step",
+        "min_level": "min_level",
+        "profile": "profile",
+        "fade_duration": "duration_sec",
+        "max_rate": "max_rate",
+        "missed_tick": "missed_tick_policy",
+        "until_media_end": "until_media_end",
+        "volume": "volume",
+        "count": "count",
+    }
+    payload = {"cmd": args.cmd}
+    for attr, key in fields.items():
+        value = getattr(args, attr, None)
+        if value is not None:
+            payload[key] = value
+    if getattr(args, "keep_volume", False):
+        payload["restore"] = False
+    return payload
+
+
+def ctl_main(argv: Optional[List[str]] = None) -> int:
+    """
+    `nemucast ctl` のエントリーポイント
+
+    Returns:
+        終了コード。成功は0、デーモンがエラーを返した場合は1、デーモンに接続できない場合は2
+    """
+    args = parse_ctl_args(argv)
+    try:
+        response = request(build_request(args), args.socket, args.timeout)
+    except (OSError, ValueError) as e:
+        print(f"デーモンに接続できません: {e}", file=sys.stderr)
+        return 2
+    if not response.get("ok"):
+        print(f"エラー: {response.get('error', '不明なエラー')}", file=sys.stderr)
+        return 1
+    print(json.dumps(response.get("result"), ensure_ascii=False, indent=2))
+    return 0
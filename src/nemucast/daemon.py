@@ -0,0 +1,921 @@
+"""
+常駐モード `nemucast daemon`
+
+デバイスへの接続と状態スナップショットを保ったまま、Unixドメインソケットで操作を受け付ける。
+毎晩のプロセス起動・デバイス検索・TLSハンドシェイクを省き、フェードの開始は
+接続済みのデバイスへのローカルな要求1回で済む。操作には `nemucast ctl` を使う。
+
+プロトコル（1行1件のJSON）:
+    要求: {"cmd": "fade", "name": "Living TV", "step": -0.04, ...}
+    応答: {"ok": true, "result": {...}} または {"ok": false, "error": "..."}
+
+コマンド: ping / status / connect / fade / cancel / restore / schedule / shutdown
+
+スケジュール（`--schedule` / `--at`）を指定すると、曜日と時刻で決めた発火時刻まで眠り、
+同じプロセス・同じ接続のまま毎晩フェードを開始する（`schedule.py`）。
+
+設定ファイル（`--config`）を指定すると、デバイスごとのフェードの設定をデフォルトにし、
+ファイルが変わったら読み直してフェード中のデバイスにも接続を保ったまま反映する（`config.py`）。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from . import metrics, trace
+from .aio import async_media_fade, async_profile_fade, async_volume_control_loop, run_blocking
+from .cache import EndpointCache
+from .clock import get_loop_factory, monotonic
+from .commands import confirm_set_volume
+from .config import (
+    ConfigWatcher,
+    LiveSettings,
+    NemucastConfig,
+    is_number,
+    load_config,
+    validate_fade_params,
+)
+from .ctl import MAX_MESSAGE_BYTES
+from .fade import resume_plan
+from .journal import RESUME_POLICIES, FadeJournal
+from .main import (
+    CHROMECAST_NAME,
+    COMMAND_RETRIES,
+    COMMAND_TIMEOUT,
+    CONFIG_FILE,
+    DEFAULT_INTERVAL_SEC,
+    DISCOVERY_TIMEOUT,
+    EVENTS_PORT,
+    FADE_PROFILE,
+    HEARTBEAT_TIMEOUT,
+    IDLE_POLL_SEC,
+    JOURNAL_MAX_AGE,
+    MAX_COMMAND_RATE,
+    METRICS_JSON,
+    METRICS_PORT,
+    MIN_LEVEL,
+    MISSED_TICK_POLICY,
+    RECONNECT_MAX_BACKOFF,
+    RESUME_POLICY,
+    SCHEDULE_FILE,
+    STATUS_TTL,
+    STEP,
+    TRACE_DIR,
+    begin_fade,
+    connect_chromecast,
+    log_chromecast_status,
+    plan_profile_fade,
+    setup_logging,
+    start_events,
+    start_metrics,
+    stop_discovery,
+    update_fade_settings,
+)
+from .paths import get_socket_path
+from .schedule import (
+    DEFAULT_DRY_RUN_COUNT,
+    DEFAULT_MISFIRE_GRACE,
+    Schedule,
+    ScheduleEntry,
+    format_fire,
+    sleep_until,
+)
+from .status import StatusMonitor
+from .supervisor import ConnectionSupervisor
+from .trace import TraceRecorder, trace_path
+
+# 終了時、デバイスとの切断を待つ最大時間（秒）
+DISCONNECT_TIMEOUT = 5.0
+
+
+class DaemonAlreadyRunningError(RuntimeError):
+    """制御ソケットで別のデーモンが既に応答している"""
+
+
+@dataclass
+class FadeParams:
+    """1回のフェードの設定（要求で省略した項目はデーモンの設定値を使う）"""
+
+    profile: str = FADE_PROFILE
+    interval_sec: float = DEFAULT_INTERVAL_SEC
+    step: float = STEP
+    min_level: float = MIN_LEVEL
+    duration_sec: Optional[float] = None
+    max_rate: float = MAX_COMMAND_RATE
+    missed_tick_policy: str = MISSED_TICK_POLICY
+    # 再生中のメディアの終了時刻に合わせて下げる（長さが分からなければ通常のフェード）
+    until_media_end: bool = False
+
+    @classmethod
+    def from_request(cls, request: dict, defaults: "FadeParams") -> "FadeParams":
+        """
+        要求の項目で `defaults` を上書きした設定を作る
+
+        Raises:
+            ValueError: 値の型や範囲が不正な場合
+        """
+        values = asdict(defaults)
+        for key in values:
+            if request.get(key) is not None:
+                values[key] = request[key]
+        params = cls(**values)
+        params.validate()
+        return params
+
+    def validate(self) -> None:
+        """値の型と範囲を確認する（不正なら ValueError）"""
+        validate_fade_params(asdict(self))
+
+    def apply_changes(self, values: dict) -> Tuple["FadeParams", List[str]]:
+        """
+        実行中のフェードに設定の変更を反映した設定を作る
+
+        step とそれ以外のカーブの切り替えと `until_media_end` は、フェードの進め方
+        （制御ループ）が変わるため今のフェードには反映しない。
+
+        Returns:
+            (params, deferred): 新しい設定と、反映しなかった項目の名前
+
+        Raises:
+            ValueError: 値の型や範囲が不正な場合
+        """
+        params = replace(self, **values)
+        params.validate()
+        deferred = []
+        if params.profile != self.profile and "step" in (params.profile, self.profile):
+            deferred.append("profile")
+        if params.until_media_end != self.until_media_end:
+            deferred.append("until_media_end")
+        if deferred:
+            params = replace(params, **{key: getattr(self, key) for key in deferred})
+        return params, deferred
+
+
+@dataclass
+class ManagedDevice:
+    """デーモンが接続を保っているデバイスと、実行中のフェード"""
+
+    name: str
+    cast: object
+    monitor: Optional[StatusMonitor] = None
+    journal: Optional[FadeJournal] = None
+    supervisor: Optional[ConnectionSupervisor] = None
+    task: Optional[asyncio.Task] = None
+    fade: Optional[FadeParams] = None
+    # 実行中のフェードが読む設定（設定ファイルの再読み込みで差し替える）
+    settings: Optional[LiveSettings] = None
+    initial_volume: Optional[float] = None
+    started_at: Optional[float] = None
+    last_result: Optional[str] = None
+
+    @property
+    def fading(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def describe(self) -> dict:
+        """`status` の応答に載せるデバイスの状態（スナップショットのみで、問い合わせはしない）"""
+        socket_client = getattr(self.cast, "socket_client", None)
+        return {
+            "name": self.name,
+            "host": getattr(getattr(self.cast, "cast_info", None), "host", None),
+            "connected": bool(getattr(socket_client, "is_connected", False))
+            and (self.supervisor is None or self.supervisor.connected),
+            "reconnects": len(self.supervisor.outages) if self.supervisor else 0,
+            "mean_time_to_reconnect": (
+                self.supervisor.mean_time_to_reconnect if self.supervisor else None
+            ),
+            "app_id": self.monitor.app_id if self.monitor else None,
+            "volume_level": self.monitor.volume_level if self.monitor else None,
+            "player_state": self.monitor.player_state if self.monitor else None,
+            "fading": self.fading,
+            "fade": asdict(self.fade) if self.fade else None,
+            "initial_volume": self.initial_volume,
+            "started_at": self.started_at,
+            "last_result": self.last_result,
+        }
+
+
+async def async_run_fade(
+    cast,
+    monitor: Optional[StatusMonitor],
+    params: FadeParams,
+    initial_volume: float,
+    resume_level: Optional[float] = None,
+    idle_poll_sec: float = IDLE_POLL_SEC,
+    journal: Optional[FadeJournal] = None,
+    settings: Optional[LiveSettings] = None,
+) -> None:
+    """`params` のフェードを、設定に合った制御ループ（メディア・ステップ・カーブ）で実行する"""
+    if params.until_media_end and monitor is not None and monitor.media_position():
+        await async_media_fade(
+            cast, params.profile, params.step, params.min_level, initial_volume, monitor,
+            params.max_rate, idle_poll_sec, journal, resume_level, settings,
+        )
+    elif params.profile == "step":
+        await async_volume_control_loop(
+            cast, params.interval_sec, params.step, params.min_level, initial_volume,
+            monitor, idle_poll_sec, missed_tick_policy=params.missed_tick_policy,
+            journal=journal, settings=settings,
+        )
+    else:
+        plan = plan_profile_fade(
+            params.profile, params.interval_sec, params.step, params.min_level,
+            initial_volume, params.duration_sec, params.max_rate,
+        )
+        if resume_level is not None:
+            plan = resume_plan(plan, resume_level)
+        await async_profile_fade(
+            cast, plan, initial_volume, monitor, idle_poll_sec,
+            missed_tick_policy=params.missed_tick_policy, journal=journal, settings=settings,
+        )
+
+
+class CastDaemon:
+    """デバイス接続を保ち、制御ソケットの要求でフェードを開始・中止する常駐プロセス"""
+
+    def __init__(
+        self,
+        socket_path: Optional[Path] = None,
+        defaults: Optional[FadeParams] = None,
+        default_name: str = CHROMECAST_NAME,
+        discovery_timeout: float = DISCOVERY_TIMEOUT,
+        use_cache: bool = True,
+        status_ttl: float = STATUS_TTL,
+        idle_poll_sec: float = IDLE_POLL_SEC,
+        use_journal: bool = True,
+        resume_policy: str = RESUME_POLICY,
+        schedule: Optional[Schedule] = None,
+        misfire_grace: float = DEFAULT_MISFIRE_GRACE,
+        heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+        max_backoff: float = RECONNECT_MAX_BACKOFF,
+        config: Optional[NemucastConfig] = None,
+        config_path: Optional[Path] = None,
+        trace_dir: Optional[Path] = None,
+    ):
+        self.socket_path = socket_path or get_socket_path()
+        self.defaults = defaults or FadeParams()
+        self.default_name = default_name
+        self.discovery_timeout = discovery_timeout
+        self.cache = EndpointCache() if use_cache else None
+        self.status_ttl = status_ttl
+        self.idle_poll_sec = idle_poll_sec
+        self.use_journal = use_journal
+        self.resume_policy = resume_policy
+        self.schedule = schedule or Schedule([])
+        self.misfire_grace = misfire_grace
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_backoff = max_backoff
+        self.config = config or NemucastConfig()
+        self.config_path = config_path
+        # フェードごとの状態とコマンドのトレースの保存先（Noneなら記録しない）
+        self.trace_dir = trace_dir
+        self.next_fire: Optional[Tuple[datetime, ScheduleEntry]] = None
+        self.devices: Dict[str, ManagedDevice] = {}
+        self._connecting: Dict[str, asyncio.Lock] = {}
+        self._stopped: Optional[asyncio.Event] = None
+        self._started_at = monotonic()
+        self._handlers = {
+            "ping": self.cmd_ping,
+            "status": self.cmd_status,
+            "connect": self.cmd_connect,
+            "fade": self.cmd_fade,
+            "cancel": self.cmd_cancel,
+            "restore": self.cmd_restore,
+            "schedule": self.cmd_schedule,
+            "shutdown": self.cmd_shutdown,
+        }
+
+    # ---- 待ち受けと終了 ----
+
+    async def serve(self, preconnect: Sequence[str] = (), install_signals: bool = True) -> None:
+        """
+        制御ソケットで待ち受け、`shutdown` 要求かSIGTERM/SIGINTで終了する
+
+        終了時はフェード中のデバイスの音量を初期値に戻し、すべての接続を閉じる。
+
+        Raises:
+            DaemonAlreadyRunningError: 同じソケットで別のデーモンが起動している場合
+        """
+        self._stopped = asyncio.Event()
+        self._prepare_socket()
+        # ソケットファイルは作成時から所有者だけが読み書きできるようにする
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(
+                self._handle_client, path=str(self.socket_path), limit=MAX_MESSAGE_BYTES
+            )
+        finally:
+            os.umask(umask)
+        loop = asyncio.get_running_loop()
+        if install_signals:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                try:
+                    loop.add_signal_handler(sig, self._stopped.set)
+                except (ValueError, RuntimeError, NotImplementedError):
+                    # メインスレッド以外、またはWindowsではシグナルハンドラを登録できない
+                    pass
+        logging.info("制御ソケットで待ち受けます: %s", self.socket_path)
+
+        schedule_task = None
+        watcher = None
+        if self.config_path is not None:
+            # 監視スレッドから読み直した設定を、イベントループのスレッドで反映する
+            watcher = ConfigWatcher(
+                self.config_path,
+                lambda config: loop.call_soon_threadsafe(self.apply_config, config),
+            ).start()
+        try:
+            # スケジュールのデバイスにも先に接続しておき、発火時には検索も接続もせずに始める
+            for name in dict.fromkeys([*preconnect, *self._scheduled_names()]):
+                try:
+                    await self.get_device(name)
+                except LookupError as e:
+                    logging.error("%s", e)
+            if self.schedule:
+                schedule_task = asyncio.create_task(self._run_schedule(), name="schedule")
+            await self._stopped.wait()
+        finally:
+            logging.info("デーモンを終了します。")
+            if watcher is not None:
+                await run_blocking(watcher.stop)
+            if schedule_task is not None:
+                schedule_task.cancel()
+                await asyncio.gather(schedule_task, return_exceptions=True)
+            server.close()
+            await self.close()
+            await server.wait_closed()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def stop(self) -> None:
+        """待ち受けを終了させる（イベントループのスレッドから呼ぶ）"""
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def _prepare_socket(self) -> None:
+        """残っているソケットファイルを片付ける（応答するデーモンがいれば起動しない）"""
+        path = self.socket_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            probe.settimeout(1.0)
+            try:
+                probe.connect(str(path))
+            except OSError:
+                logging.info("前回のソケットファイルを削除します: %s", path)
+                path.unlink()
+                return
+        raise DaemonAlreadyRunningError(f"別のデーモンが既に起動しています: {path}")
+
+    async def close(self) -> None:
+        """フェードを中止して音量を戻し、すべてのデバイスとの接続を閉じる"""
+        for device in list(self.devices.values()):
+            if device.fading:
+                await self._cancel_fade(device)
+                if device.initial_volume is not None:
+                    if await self._restore(device, device.initial_volume):
+                        await self._end_journal(device)
+            if device.supervisor is not None:
+                await run_blocking(device.supervisor.stop)
+            try:
+                await run_blocking(device.cast.disconnect, timeout=DISCONNECT_TIMEOUT)
+            except Exception as e:
+                logging.warning("%s との切断に失敗しました: %s", device.name, e)
+        self.devices.clear()
+
+    # ---- 要求の処理 ----
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            started = monotonic()
+            cmd, response = await self.handle_line(line)
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+            metrics.CONTROL_SECONDS.labels(cmd).observe(monotonic() - started)
+        except (ConnectionError, ValueError) as e:
+            # 途中で切断された、または1行が長すぎる要求
+            logging.warning("制御ソケットの要求を処理できませんでした: %s", e)
+        finally:
+            writer.close()
+
+    async def handle_line(self, line: bytes) -> Tuple[str, dict]:
+        """
+        1行のJSON要求を処理する
+
+        Returns:
+            (cmd, response): 処理したコマンド名（不正な要求は "invalid"）と応答
+        """
+        cmd = "invalid"
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("要求はJSONオブジェクトで送ってください")
+            handler = self._handlers.get(request.get("cmd"))
+            if handler is None:
+                raise ValueError(f"不明なコマンドです: {request.get('cmd')!r}")
+            cmd = request["cmd"]
+            response = {"ok": True, "result": await handler(request)}
+        except (ValueError, LookupError) as e:
+            response = {"ok": False, "error": str(e)}
+        except Exception as e:
+            logging.error("要求の処理に失敗しました (%s): %s", cmd, e)
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        logging.debug("制御要求 %s: %s", cmd, response)
+        return cmd, response
+
+    def _name(self, request: dict) -> str:
+        name = request.get("name") or self.default_name
+        if not isinstance(name, str):
+            raise ValueError("name は文字列で指定してください")
+        return name
+
+    def _known_device(self, request: dict) -> ManagedDevice:
+        name = self._name(request)
+        device = self.devices.get(name)
+        if device is None:
+            raise LookupError(f"'{name}' には接続していません")
+        return device
+
+    async def get_device(self, name: str) -> ManagedDevice:
+        """
+        接続済みのデバイスを返す（未接続なら接続する）
+
+        Raises:
+            LookupError: デバイスに接続できない場合
+        """
+        device = self.devices.get(name)
+        if device is not None:
+            return device
+        lock = self._connecting.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name not in self.devices:
+                self.devices[name] = await self._connect(name)
+                await self._resume_interrupted(self.devices[name])
+        return self.devices[name]
+
+    async def _connect(self, name: str) -> ManagedDevice:
+        cast, browser = await run_blocking(
+            connect_chromecast, name, None, self.discovery_timeout, self.cache
+        )
+        if cast is None:
+            if browser:
+                await run_blocking(stop_discovery, browser)
+            raise LookupError(f"Chromecast '{name}' に接続できませんでした")
+        logging.info("接続完了: %s (%s)", cast.cast_info.friendly_name, cast.cast_info.host)
+        await run_blocking(cast.wait)
+        metrics.watch_connection(cast)
+        monitor = StatusMonitor(cast, ttl=self.status_ttl).attach()
+        # 接続を保つ間はmDNSの検索を止めて接続を監視し、切断中はフェードを止めて再接続する
+        supervisor = ConnectionSupervisor(
+            cast, self.cache, self.discovery_timeout, monitor,
+            heartbeat_timeout=self.heartbeat_timeout, max_backoff=self.max_backoff,
+        )
+        await run_blocking(supervisor.start, browser)
+        await run_blocking(log_chromecast_status, cast, monitor)
+        journal = FadeJournal.for_cast(cast) if self.use_journal else None
+        return ManagedDevice(name, cast, monitor, journal, supervisor)
+
+    async def _resume_interrupted(self, device: ManagedDevice) -> None:
+        """
+        前回のフェードが途中で終わっていれば（デーモンの異常終了など）、同じ設定で再開する
+
+        再開しない場合（restore、または古いジャーナル）は音量を起動時の値に戻すだけにする。
+        """
+        if device.journal is None:
+            return
+        state = await run_blocking(device.journal.load)
+        if state is None:
+            return
+        if self.resume_policy != "resume" or state.age() > JOURNAL_MAX_AGE:
+            logging.warning(
+                "%s の前回のフェードが途中で終わっています。音量を起動時の %.2f に戻します。",
+                device.name, state.initial_volume,
+            )
+            device.initial_volume = state.initial_volume
+            if await self._restore(device, state.initial_volume):
+                await self._end_journal(device)
+            return
+        defaults = self.defaults_for(device.name)
+        try:
+            params = FadeParams.from_request(state.params, defaults)
+        except ValueError as e:
+            logging.warning("ジャーナルのフェード設定が不正なため、デフォルトで再開します: %s", e)
+            params = defaults
+        await self._start_fade(device, params)
+
+    # ---- 設定ファイル ----
+
+    def defaults_for(self, name: str) -> FadeParams:
+        """デバイス `name` のフェードの設定（デーモンの設定を設定ファイルで上書きしたもの）"""
+        return FadeParams.from_request(self.config.params_for(name), self.defaults)
+
+    def apply_config(self, config: NemucastConfig) -> List[str]:
+        """
+        読み直した設定ファイルに差し替え、フェード中のデバイスには変わった項目だけを反映する
+
+        フェード中のデバイスは接続・起動時の音量・経過時間を保ったまま、次の周期から
+        新しい値で下げる（`LiveSettings` を丸ごと差し替える）。削除された項目は
+        デーモンの設定値に戻す。
+
+        Returns:
+            新しい設定を反映したデバイスの名前
+        """
+        previous, self.config = self.config, config
+        applied = []
+        for device in self.devices.values():
+            if not device.fading or device.settings is None:
+                continue
+            changed, removed = config.changed_params(previous, device.name)
+            values = dict(changed, **{key: getattr(self.defaults, key) for key in removed})
+            if values and update_fade_settings(
+                device.name, device.settings, values, device.journal
+            ):
+                device.fade = device.settings.current
+                applied.append(device.name)
+        return applied
+
+    # ---- スケジュール ----
+
+    def _scheduled_names(self) -> List[str]:
+        return list(dict.fromkeys(
+            entry.name or self.default_name for entry in self.schedule.entries
+        ))
+
+    async def _run_schedule(self) -> None:
+        """次の発火時刻まで眠ってフェードを始める、を繰り返す"""
+        while True:
+            self.next_fire = self.schedule.next_fire(datetime.now().astimezone())
+            if self.next_fire is None:
+                return
+            fire_at, entry = self.next_fire
+            logging.info("次のスケジュール: %s", format_fire(fire_at, entry))
+            late = await sleep_until(fire_at.timestamp())
+            metrics.SCHEDULE_LATENESS_SECONDS.labels(entry.name or self.default_name).observe(late)
+            if late > self.misfire_grace:
+                # サスペンドなどで発火時刻を大きく過ぎた回は、今から始めずに見送る
+                logging.warning(
+                    "スケジュール %s を %.0f 秒過ぎていたため見送ります。",
+                    fire_at.isoformat(), late,
+                )
+                continue
+            await self._fire(entry, late)
+
+    async def _fire(self, entry: ScheduleEntry, late: float = 0.0) -> None:
+        """スケジュールの1回分のフェードを始める（失敗しても次の回は続ける）"""
+        name = entry.name or self.default_name
+        try:
+            params = FadeParams.from_request(entry.params, self.defaults_for(name))
+            device = await self.get_device(name)
+        except (ValueError, LookupError) as e:
+            logging.error("スケジュールのフェードを開始できませんでした (%s): %s", entry.spec, e)
+            return
+        if device.fading:
+            logging.warning(
+                "%s は既にフェード中のため、スケジュール %s を見送ります。", name, entry.spec
+            )
+            return
+        logging.info(
+            "スケジュール %s を開始します（予定時刻からの遅れ %.1fms）", entry.spec, late * 1000
+        )
+        await self._start_fade(device, params)
+
+    async def cmd_ping(self, request: dict) -> dict:
+        return {"pid": os.getpid(), "uptime": round(monotonic() - self._started_at, 3)}
+
+    async def cmd_status(self, request: dict) -> dict:
+        devices = [self._known_device(request)] if request.get("name") else self.devices.values()
+        return {
+            "pid": os.getpid(),
+            "socket": str(self.socket_path),
+            "devices": [device.describe() for device in devices],
+        }
+
+    async def cmd_connect(self, request: dict) -> dict:
+        device = await self.get_device(self._name(request))
+        return device.describe()
+
+    async def cmd_fade(self, request: dict) -> dict:
+        """フェードを開始してすぐに応答する（フェード自体はタスクとして進む）"""
+        name = self._name(request)
+        params = FadeParams.from_request(request, self.defaults_for(name))
+        device = await self.get_device(name)
+        if device.fading:
+            raise ValueError(f"'{device.name}' は既にフェード中です。先に cancel してください")
+        await self._start_fade(device, params)
+        return device.describe()
+
+    async def _start_fade(self, device: ManagedDevice, params: FadeParams) -> None:
+        initial_volume, resume_level = await run_blocking(
+            begin_fade, device.cast, device.journal, device.monitor, asdict(params),
+            self.resume_policy,
+        )
+        device.fade = params
+        device.settings = LiveSettings(params)
+        device.initial_volume = initial_volume
+        device.started_at = time.time()
+        device.last_result = None
+        device.task = asyncio.create_task(
+            self._run_fade(device, params, initial_volume, resume_level), name=f"fade:{device.name}"
+        )
+        logging.info(
+            "フェードを開始します: %s (%s, 間隔 %s秒, ステップ %s, 最小 %.2f)",
+            device.name, params.profile, params.interval_sec, params.step, params.min_level,
+        )
+
+    async def _run_fade(
+        self,
+        device: ManagedDevice,
+        params: FadeParams,
+        initial_volume: float,
+        resume_level: Optional[float] = None,
+    ) -> None:
+        recorder = None
+        if self.trace_dir is not None:
+            recorder = TraceRecorder(trace_path(device.name, self.trace_dir)).start(
+                device.cast, device.monitor, initial_volume, resume_level, asdict(params),
+                {"idle_poll_sec": self.idle_poll_sec, "status_ttl": self.status_ttl},
+            )
+        try:
+            await async_run_fade(
+                device.cast, device.monitor, params, initial_volume, resume_level,
+                self.idle_poll_sec, device.journal, device.settings,
+            )
+            device.last_result = "completed"
+        except asyncio.CancelledError:
+            device.last_result = "cancelled"
+            trace.record_stop(device.cast)
+            raise
+        except Exception as e:
+            device.last_result = "failed"
+            logging.error("%s のフェードが失敗しました: %s", device.name, e)
+        finally:
+            if recorder is not None:
+                recorder.stop()
+
+    async def _cancel_fade(self, device: ManagedDevice) -> bool:
+        """実行中のフェードを中止し、終わるまで待つ（中止した場合True）"""
+        if not device.fading:
+            return False
+        device.task.cancel()
+        await asyncio.gather(device.task, return_exceptions=True)
+        logging.info("%s のフェードを中止しました。", device.name)
+        return True
+
+    async def _restore(self, device: ManagedDevice, level: float) -> bool:
+        confirmed = await run_blocking(
+            confirm_set_volume, device.cast, level, device.monitor, COMMAND_TIMEOUT, COMMAND_RETRIES
+        )
+        if confirmed:
+            logging.info("%s の音量を %.2f に戻しました。", device.name, level)
+        return confirmed
+
+    async def _end_journal(self, device: ManagedDevice) -> None:
+        """中止したフェードのジャーナルを削除する（次回の接続で再開しない）"""
+        if device.journal is not None:
+            await run_blocking(device.journal.complete)
+
+    async def cmd_cancel(self, request: dict) -> dict:
+        """フェードを中止し、`restore` がFalseでなければ音量を初期値に戻す"""
+        device = self._known_device(request)
+        cancelled = await self._cancel_fade(device)
+        restored = None
+        if cancelled and request.get("restore", True) and device.initial_volume is not None:
+            restored = await self._restore(device, device.initial_volume)
+        if cancelled and restored is not False:
+            await self._end_journal(device)
+        return dict(device.describe(), cancelled=cancelled, restored=restored)
+
+    async def cmd_restore(self, request: dict) -> dict:
+        """フェードを中止し、音量を `volume`（省略時は最後のフェード開始時の音量）に戻す"""
+        device = self._known_device(request)
+        level = request.get("volume", device.initial_volume)
+        if level is None:
+            raise ValueError("戻す音量がありません。volume を指定してください")
+        if not is_number(level) or not 0.0 <= level <= 1.0:
+            raise ValueError("volume は0〜1の数値で指定してください")
+        cancelled = await self._cancel_fade(device)
+        restored = await self._restore(device, level)
+        if restored:
+            await self._end_journal(device)
+        return dict(device.describe(), cancelled=cancelled, restored=restored)
+
+    async def cmd_schedule(self, request: dict) -> dict:
+        """これからの発火時刻を `count` 件（省略時は10件）返す"""
+        count = request.get("count", DEFAULT_DRY_RUN_COUNT)
+        if not isinstance(count, int) or isinstance(count, bool) or count <= 0:
+            raise ValueError("count は正の整数で指定してください")
+        fires = self.schedule.upcoming(datetime.now().astimezone(), count)
+        return {
+            "entries": [entry.spec for entry in self.schedule.entries],
+            "upcoming": [
+                {"at": fire_at.isoformat(), "name": entry.name or self.default_name,
+                 "spec": entry.spec}
+                for fire_at, entry in fires
+            ],
+        }
+
+    async def cmd_shutdown(self, request: dict) -> dict:
+        self.stop()
+        return {"stopping": True}
+
+
+def parse_daemon_args(args=None) -> argparse.Namespace:
+    """`nemucast daemon` のコマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(
+        prog="nemucast daemon",
+        description="デバイス接続を保ったまま常駐し、nemucast ctl の操作でフェードを実行する",
+    )
+    parser.add_argument(
+        "--socket", type=Path, default=None,
+        help=(
+            "制御ソケットのパス。デフォルト: $NEMUCAST_SOCKET または"
+            "状態ディレクトリの control.sock"
+        ),
+    )
+    parser.add_argument(
+        "-c", "--connect", action="append", default=[], metavar="NAME",
+        help="起動時に接続しておくデバイス（繰り返し指定可）"
+    )
+    parser.add_argument(
+        "-n", "--name", default=None,
+        help="要求で名前を省略した場合のChromecast名。"
+             f"デフォルト: 設定ファイルの device、無ければ {CHROMECAST_NAME}"
+    )
+    parser.add_argument(
+        "--config", type=Path, default=CONFIG_FILE, metavar="PATH",
+        help="デバイスごとのフェードの設定ファイル（TOML）。変更すると読み直し、"
+             "フェード中のデバイスにも接続を保ったまま反映する。デフォルト: $CONFIG_FILE"
+    )
+    parser.add_argument(
+        "--discovery-timeout", type=float, default=DISCOVERY_TIMEOUT,
+        help=f"デバイス検索の最大待ち時間（秒）。デフォルト: {DISCOVERY_TIMEOUT}"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="接続先キャッシュを使わずにデバイスを検索する"
+    )
+    parser.add_argument(
+        "--status-ttl", type=float, default=STATUS_TTL,
+        help=f"状態スナップショットを問い合わせなしで信用する時間（秒）。デフォルト: {STATUS_TTL}"
+    )
+    parser.add_argument(
+        "--idle-poll", type=float, default=IDLE_POLL_SEC,
+        help=f"アイドル中、状態通知が無くても状態を確認する間隔（秒）。デフォルト: {IDLE_POLL_SEC}"
+    )
+    parser.add_argument(
+        "--heartbeat-timeout", type=float, default=HEARTBEAT_TIMEOUT,
+        help="デバイスからの応答がこの時間（秒）途絶えたら切断とみなし、フェードを止めて再接続する。"
+             f"デフォルト: {HEARTBEAT_TIMEOUT}"
+    )
+    parser.add_argument(
+        "--max-backoff", type=float, default=RECONNECT_MAX_BACKOFF,
+        help=f"再接続の間隔の上限（秒）。デフォルト: {RECONNECT_MAX_BACKOFF}"
+    )
+    parser.add_argument(
+        "--on-interrupted", choices=RESUME_POLICIES, default=RESUME_POLICY,
+        help="異常終了などで途中で終わったフェードの扱い（resume: 接続時に続きから再開する / "
+             f"restore: 音量を起動時の値に戻して始め直す）。デフォルト: {RESUME_POLICY}"
+    )
+    parser.add_argument(
+        "--no-journal", action="store_true",
+        help="フェードのジャーナルを記録しない（異常終了すると起動時の音量が失われる）"
+    )
+    parser.add_argument(
+        "--schedule", type=Path, default=SCHEDULE_FILE, metavar="PATH",
+        help=(
+            "フェードのスケジュールファイル（1行に「曜日 時刻 [設定=値 ...]」）。"
+            "デフォルト: $SCHEDULE_FILE"
+        ),
+    )
+    parser.add_argument(
+        "--at", action="append", default=[], metavar="SPEC",
+        help='スケジュールを1行追加する（例: "fri,sat 23:00 interval=600"、繰り返し指定可）'
+    )
+    parser.add_argument(
+        "--misfire-grace", type=float, default=DEFAULT_MISFIRE_GRACE,
+        help="発火時刻をこれより過ぎて目覚めた回（サスペンドからの復帰など）は見送る（秒）。"
+             f"デフォルト: {DEFAULT_MISFIRE_GRACE}"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="スケジュールのこれからの発火時刻を表示して終了する（デバイスには接続しない）"
+    )
+    parser.add_argument(
+        "--count", type=int, default=DEFAULT_DRY_RUN_COUNT,
+        help=f"--dry-run で表示する発火時刻の数。デフォルト: {DEFAULT_DRY_RUN_COUNT}"
+    )
+    parser.add_argument(
+        "--trace-dir", type=Path, default=TRACE_DIR, metavar="DIR",
+        help="フェードごとに状態通知と送信したコマンドをトレースファイルに記録する"
+             "（nemucast replay で再生できる）。デフォルト: $TRACE_DIR"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=METRICS_PORT,
+        help=f"Prometheus形式のメトリクスを公開するポート（0で無効）。デフォルト: {METRICS_PORT}"
+    )
+    parser.add_argument(
+        "--metrics-json", type=Path, default=METRICS_JSON, metavar="PATH",
+        help="終了時にメトリクスをJSONで書き出すファイル"
+    )
+    parser.add_argument(
+        "--event-webhook", action="append", default=None, metavar="URL",
+        help="音量の変更・スタンバイ・アイドルで見送った周期のイベントをPOSTするURL"
+             "（繰り返し指定可）。デフォルト: $EVENT_WEBHOOK_URL"
+    )
+    parser.add_argument(
+        "--events-port", type=int, default=EVENTS_PORT,
+        help=f"イベントをServer-Sent Eventsで配信するポート（0で無効）。デフォルト: {EVENTS_PORT}"
+    )
+    return parser.parse_args(args)
+
+
+def load_schedule(path: Optional[Path], specs: Sequence[str] = ()) -> Schedule:
+    """
+    スケジュールファイルと `--at` の行を読み込み、各行のフェード設定を検証する
+
+    Raises:
+        OSError: ファイルを読めない場合
+        ValueError: 書式や設定値が不正な場合
+    """
+    schedule = Schedule.load(path, specs) if path else Schedule.parse(specs)
+    for entry in schedule.entries:
+        try:
+            FadeParams.from_request(entry.params, FadeParams())
+        except ValueError as e:
+            raise ValueError(f"{entry.spec}: {e}") from None
+    return schedule
+
+
+def daemon_main(argv: Optional[List[str]] = None) -> int:
+    """
+    `nemucast daemon` のエントリーポイント
+
+    Returns:
+        終了コード。正常終了は0、別のデーモンが起動していた場合は1
+    """
+    args = parse_daemon_args(argv)
+    try:
+        schedule = load_schedule(args.schedule, args.at)
+    except (OSError, ValueError) as e:
+        print(f"スケジュールを読み込めません: {e}", file=sys.stderr)
+        return 2
+    try:
+        config = load_config(args.config) if args.config else NemucastConfig()
+    except (OSError, ValueError) as e:
+        print(f"設定ファイルを読み込めません: {e}", file=sys.stderr)
+        return 2
+    if args.dry_run:
+        fires = schedule.upcoming(datetime.now().astimezone(), args.count)
+        if not fires:
+            print("スケジュールがありません（--schedule または --at で指定してください）",
+                  file=sys.stderr)
+            return 2
+        for fire_at, entry in fires:
+            print(format_fire(fire_at, entry))
+        return 0
+
+    setup_logging()
+    start_metrics(args.metrics_port, args.metrics_json)
+    start_events(args.event_webhook, args.events_port)
+
+    daemon = CastDaemon(
+        socket_path=args.socket,
+        default_name=args.name or config.device or CHROMECAST_NAME,
+        discovery_timeout=args.discovery_timeout,
+        use_cache=not args.no_cache,
+        status_ttl=args.status_ttl,
+        idle_poll_sec=args.idle_poll,
+        use_journal=not args.no_journal,
+        resume_policy=args.on_interrupted,
+        schedule=schedule,
+        misfire_grace=args.misfire_grace,
+        heartbeat_timeout=args.heartbeat_timeout,
+        max_backoff=args.max_backoff,
+        config=config,
+        config_path=args.config,
+        trace_dir=args.trace_dir,
+    )
+    try:
+        with asyncio.Runner(loop_factory=get_loop_factory()) as runner:
+            runner.run(daemon.serve(args.connect))
+    except DaemonAlreadyRunningError as e:
+        logging.error("%s", e)
+        return 1
+    return 0
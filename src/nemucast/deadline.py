@@ -0,0 +1,143 @@
+"""単調時計上の絶対期限で周期処理を計画するスケジューラ（処理時間による遅れを積み重ねない）"""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from .clock import monotonic
+
+# サスペンドや長い停止で期限を過ぎた周期の扱い
+# - skip: 過ぎた周期はすべて捨て、次の未来の期限まで待つ
+# - coalesce: 過ぎた周期を1回にまとめてすぐ実行し、その後は元の周期に戻る
+# - catchup: 過ぎた周期を続けてすべて実行する
+MISSED_TICK_POLICIES = ("skip", "coalesce", "catchup")
+DEFAULT_MISSED_TICK_POLICY = "coalesce"
+
+
+def plan_next_deadline(
+    deadline: float, interval: float, now: float, policy: str = DEFAULT_MISSED_TICK_POLICY
+) -> Tuple[float, int]:
+    """
+    期限 `deadline` の周期を実行し終えた後、次の期限を決める
+
+    Args:
+        deadline: 実行し終えた周期の期限
+        interval: 周期（秒）
+        now: 現在時刻
+        policy: MISSED_TICK_POLICIES のいずれか
+
+    Returns:
+        (next_deadline, missed): 次の期限と、捨てた（まとめた）周期の数
+    """
+    if policy not in MISSED_TICK_POLICIES:
+        raise ValueError(f"未対応の欠落周期ポリシーです: {policy}")
+    next_deadline = deadline + interval
+    if next_deadline > now or interval <= 0 or policy == "catchup":
+        return next_deadline, 0
+
+    # 期限を過ぎた周期の数（next_deadline自身を含む）
+    overdue = math.floor((now - next_deadline) / interval) + 1
+    if policy == "skip":
+        return next_deadline + overdue * interval, overdue
+    # coalesce: 最後に過ぎた期限の周期だけを実行する
+    return next_deadline + (overdue - 1) * interval, overdue - 1
+
+
+@dataclass
+class LatenessStats:
+    """周期ごとの実行遅れ（期限から実際に実行を始めるまでの秒数）の記録"""
+
+    samples: List[float] = field(default_factory=list)
+    # 欠落周期ポリシーで捨てた（まとめた）周期の数
+    missed: int = 0
+
+    def record(self, lateness: float) -> None:
+        self.samples.append(lateness)
+
+    @property
+    def count(self) -> int:
+        return len(self.samples)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+    @property
+    def max(self) -> Optional[float]:
+        return max(self.samples) if self.samples else None
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """`fraction`（0.0～1.0）分位の遅れ"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def log_summary(self) -> None:
+        if not self.samples:
+            return
+        logging.info(
+            "スケジュール遅れ: %d回, 平均 %.3f秒, p95 %.3f秒, 最大 %.3f秒, 欠落 %d回",
+            self.count, self.mean, self.percentile(0.95), self.max, self.missed,
+        )
+
+
+class DeadlineSchedule:
+    """
+    `start + k * interval` の絶対期限で周期を刻む
+
+    周期の処理や再試行にかかった時間は、その周期の遅れとして記録されるだけで
+    以降の期限には影響しない。
+
+    Args:
+        interval: 周期（秒）
+        policy: 期限を過ぎた周期の扱い（MISSED_TICK_POLICIES）
+        clock: 単調時計
+        stats: 遅れの記録先
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        policy: str = DEFAULT_MISSED_TICK_POLICY,
+        clock: Callable[[], float] = monotonic,
+        stats: Optional[LatenessStats] = None,
+    ):
+        if policy not in MISSED_TICK_POLICIES:
+            raise ValueError(f"未対応の欠落周期ポリシーです: {policy}")
+        self.interval = interval
+        self.policy = policy
+        self.clock = clock
+        self.stats = stats if stats is not None else LatenessStats()
+        self.deadline = clock()
+
+    def reset(self, start: Optional[float] = None) -> None:
+        """期限を `start`（省略時は現在時刻）から刻み直す（アイドルからの復帰時など）"""
+        self.deadline = self.clock() if start is None else start
+
+    def set_interval(self, interval: float) -> None:
+        """周期を変える（待っている期限は、前回の実行から新しい周期の後に置き直す）"""
+        if self.deadline > self.clock():
+            self.deadline += interval - self.interval
+        self.interval = interval
+
+    def delay(self) -> float:
+        """現在の期限までの待ち時間（秒）。期限を過ぎていれば0"""
+        return max(0.0, self.deadline - self.clock())
+
+    def begin_tick(self) -> float:
+        """周期の実行を始める時に呼び、期限からの遅れを記録して返す"""
+        lateness = max(0.0, self.clock() - self.deadline)
+        self.stats.record(lateness)
+        return lateness
+
+    def advance(self) -> float:
+        """周期を実行し終えた時に呼び、次の期限を決めて返す"""
+        self.deadline, missed = plan_next_deadline(
+            self.deadline, self.interval, self.clock(), self.policy
+        )
+        if missed:
+            self.stats.missed += missed
+            logging.info("期限を過ぎた周期 %d 回を %s しました。", missed, self.policy)
+        return self.deadline
@@ -0,0 +1,239 @@
+"""Chromecastの検索（名前/UUID指定の高速検索と、`nemucast scan` の全台検索）"""
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from .metrics import DISCOVERY_SECONDS
+
+if TYPE_CHECKING:
+    import pychromecast
+    import zeroconf
+    from pychromecast.models import CastInfo
+
+# 目的のデバイスが見つかるまで待つ最大時間（秒）
+DEFAULT_DISCOVERY_TIMEOUT = 10.0
+
+
+def matches_target(cast_info, target_name: Optional[str], target_uuid: Optional[UUID]) -> bool:
+    """
+    検出したデバイスが検索対象かどうかを判定する
+
+    Args:
+        cast_info: pychromecastのCastInfo
+        target_name: 検索対象のfriendly_name（UUIDの指定が無いときだけ照合する）
+        target_uuid: 検索対象のUUID（指定されていればUUIDだけで判定する）
+
+    Returns:
+        bool: UUIDが指定されていればUUIDが、無ければ名前が一致すればTrue
+    """
+    if target_uuid is not None:
+        return cast_info.uuid == target_uuid
+    return target_name is not None and cast_info.friendly_name == target_name
+
+
+def _browse_for_target(
+    target_name: Optional[str],
+    target_uuid: Optional[UUID],
+    timeout: float,
+    method: str,
+) -> Tuple[Optional["CastInfo"], "pychromecast.discovery.CastBrowser", float]:
+    """
+    mDNSのレコードが届くたびに名前/UUIDを照合し、目的のデバイスが見つかった時点で返す
+
+    Returns:
+        (cast_info, browser, elapsed): 見つかったデバイスの情報（見つからなければNone）、
+        検索中のブラウザオブジェクト、検出までの秒数
+    """
+    import pychromecast
+    import zeroconf
+
+    logging.info("Chromecast デバイスを検索しています... (対象: %s)", target_uuid or target_name)
+    started = time.monotonic()
+    found = threading.Event()
+    matched: list = []
+
+    def on_cast(uuid: UUID, _service: str) -> None:
+        cast_info = browser.devices.get(uuid)
+        if cast_info is None or found.is_set():
+            return
+        logging.debug("検出: %s (%s)", cast_info.friendly_name, uuid)
+        if matches_target(cast_info, target_name, target_uuid):
+            matched.append(cast_info)
+            found.set()
+
+    listener = pychromecast.discovery.SimpleCastListener(
+        add_callback=on_cast, update_callback=on_cast
+    )
+    browser = pychromecast.discovery.CastBrowser(listener, zeroconf.Zeroconf())
+    browser.start_discovery()
+
+    found.wait(timeout)
+    elapsed = time.monotonic() - started
+    DISCOVERY_SECONDS.labels(method).observe(elapsed)
+
+    if not matched:
+        logging.error(
+            "目的の Chromecast '%s' が %.1f 秒以内に見つかりませんでした。",
+            target_uuid or target_name, timeout,
+        )
+        return None, browser, elapsed
+
+    logging.info("デバイス検出時間: %.3f秒 (%s)", elapsed, matched[0].friendly_name)
+    return matched[0], browser, elapsed
+
+
+def discover_target_chromecast(
+    target_name: Optional[str],
+    target_uuid: Optional[UUID] = None,
+    timeout: float = DEFAULT_DISCOVERY_TIMEOUT,
+) -> Tuple[
+    Optional["pychromecast.Chromecast"], Optional["pychromecast.discovery.CastBrowser"], float
+]:
+    """
+    mDNSのレコードが届くたびに名前/UUIDを照合し、目的のデバイスが見つかった時点で返す
+
+    `pychromecast.get_chromecasts()` のように検索の完了を待たないため、
+    目的のデバイスが最初に応答した時点で検索を打ち切れる。
+
+    Args:
+        target_name: 検索対象のChromecast名
+        target_uuid: 検索対象のUUID（名前より優先して照合する）
+        timeout: 目的のデバイスが見つかるまで待つ最大時間（秒）
+
+    Returns:
+        (cast, browser, elapsed): 見つかったChromecast、ブラウザオブジェクト、検出までの秒数
+    """
+    import pychromecast
+
+    cast_info, browser, elapsed = _browse_for_target(target_name, target_uuid, timeout, "target")
+    if cast_info is None:
+        return None, browser, elapsed
+    cast = pychromecast.get_chromecast_from_cast_info(cast_info, browser.zc)
+    return cast, browser, elapsed
+
+
+def rediscover_cast_info(
+    target_name: Optional[str],
+    target_uuid: Optional[UUID] = None,
+    timeout: float = DEFAULT_DISCOVERY_TIMEOUT,
+) -> Optional["CastInfo"]:
+    """
+    接続済みのデバイスの現在のホストを検索し、見つかった時点で検索を止めて返す
+
+    接続が失われ、覚えているホストが応答しなくなった場合だけ使う（IPアドレスの変更など）。
+    """
+    cast_info, browser, _ = _browse_for_target(target_name, target_uuid, timeout, "rediscover")
+    browser.stop_discovery()
+    return cast_info
+
+
+def discover_named_chromecasts(
+    target_names: List[str],
+    timeout: float = DEFAULT_DISCOVERY_TIMEOUT,
+) -> Tuple[
+    Dict[str, "pychromecast.Chromecast"], Optional["pychromecast.discovery.CastBrowser"], float
+]:
+    """
+    1つのCastBrowserで複数のデバイスを検索し、すべて見つかった時点で返す
+
+    Args:
+        target_names: 検索対象のChromecast名のリスト
+        timeout: すべてのデバイスが見つかるまで待つ最大時間（秒）
+
+    Returns:
+        (casts, browser, elapsed): 名前→Chromecastの辞書、共有ブラウザ、検出までの秒数
+    """
+    import pychromecast
+    import zeroconf
+
+    logging.info("Chromecast デバイスを検索しています... (対象: %s)", target_names)
+    started = time.monotonic()
+    wanted = set(target_names)
+    matched: Dict[str, object] = {}
+    lock = threading.Lock()
+    all_found = threading.Event()
+
+    def on_cast(uuid: UUID, _service: str) -> None:
+        cast_info = browser.devices.get(uuid)
+        if cast_info is None or cast_info.friendly_name not in wanted:
+            return
+        with lock:
+            matched.setdefault(cast_info.friendly_name, cast_info)
+            if len(matched) == len(wanted):
+                all_found.set()
+
+    listener = pychromecast.discovery.SimpleCastListener(
+        add_callback=on_cast, update_callback=on_cast
+    )
+    browser = pychromecast.discovery.CastBrowser(listener, zeroconf.Zeroconf())
+    browser.start_discovery()
+
+    all_found.wait(timeout)
+    elapsed = time.monotonic() - started
+    DISCOVERY_SECONDS.labels("named").observe(elapsed)
+
+    with lock:
+        found = dict(matched)
+    missing = [name for name in target_names if name not in found]
+    if missing:
+        logging.error(
+            "目的の Chromecast %s が %.1f 秒以内に見つかりませんでした。", missing, timeout
+        )
+    logging.info("デバイス検出時間: %.3f秒 (%d/%d台)", elapsed, len(found), len(wanted))
+
+    casts = {
+        name: pychromecast.get_chromecast_from_cast_info(cast_info, browser.zc)
+        for name, cast_info in found.items()
+    }
+    return casts, browser, elapsed
+
+
+def discover_all_chromecasts(
+    timeout: float,
+    on_found: Optional[Callable[["CastInfo"], None]] = None,
+    zconf: Optional["zeroconf.Zeroconf"] = None,
+) -> Tuple[List["CastInfo"], "pychromecast.discovery.CastBrowser"]:
+    """
+    `timeout` 秒のあいだ検索し、見つかったすべてのデバイスを返す
+
+    ネットワーク上の台数は事前に分からないため、検索は時間で区切る。
+    `on_found` はデバイスが見つかるたびにzeroconfのスレッドから呼ばれるので、
+    検索の完了を待たずに各デバイスへの接続を始められる（接続には同じ `zconf` を使う）。
+
+    Returns:
+        (cast_infos, browser): 見つかった順のデバイスの情報、検索中のブラウザオブジェクト
+    """
+    import pychromecast
+    import zeroconf
+
+    logging.info("Chromecast デバイスを検索しています... (%.1f秒)", timeout)
+    started = time.monotonic()
+    seen: Dict[UUID, "CastInfo"] = {}
+    lock = threading.Lock()
+
+    def on_cast(uuid: UUID, _service: str) -> None:
+        cast_info = browser.devices.get(uuid)
+        if cast_info is None:
+            return
+        with lock:
+            if uuid in seen:
+                return
+            seen[uuid] = cast_info
+        logging.debug("検出: %s (%s)", cast_info.friendly_name, uuid)
+        if on_found is not None:
+            on_found(cast_info)
+
+    listener = pychromecast.discovery.SimpleCastListener(
+        add_callback=on_cast, update_callback=on_cast
+    )
+    browser = pychromecast.discovery.CastBrowser(listener, zconf or zeroconf.Zeroconf())
+    browser.start_discovery()
+    time.sleep(timeout)
+
+    with lock:
+        found = list(seen.values())
+    logging.info("%d台のデバイスを検出しました (%.3f秒)", len(found), time.monotonic() - started)
+    return found, browser
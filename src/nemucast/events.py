@@ -0,0 +1,326 @@
+"""
+外部連携（ホームオートメーション）向けのイベントの送信
+
+音量の変更・音量の復元・スタンバイ・アイドルで見送った周期をイベントとして送る。
+制御ループは `emit()` で送信先ごとのキューに積むだけで、送信は送信先ごとのスレッドが行う。
+キューは上限つきで、溢れたら古いイベントから捨てる（`nemucast_events_dropped_total`）ため、
+応答の遅い送信先が制御ループを待たせることはない。送信先が無ければ `emit()` は何もしない。
+
+送信先:
+- Webhook: 届いたイベントをまとめて `{"events": [...]}` のJSONでPOSTする（`--event-webhook`）
+- SSE: `GET /events` に text/event-stream で流す（`--events-port`、localhostのみ）
+
+イベント:
+    {"id":12,"type":"volume_changed","device":"Living TV","time":1760000000.0,
+     "level":0.46,"previous":0.5,"confirmed":true}
+    {"id":13,"type":"volume_restored","device":"Living TV","time":...,"level":0.5,"confirmed":true}
+    {"id":14,"type":"standby","device":"Living TV","time":...,"confirmed":true,"already":false}
+    {"id":15,"type":"idle_skip","device":"Living TV","time":...}
+
+標準ライブラリだけを使い、HTTPのモジュールは送信先を開始するときに初めて読み込む。
+"""
+
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+from . import metrics
+
+VOLUME_CHANGED = "volume_changed"
+VOLUME_RESTORED = "volume_restored"
+STANDBY = "standby"
+IDLE_SKIP = "idle_skip"
+
+# 送信先ごとのキューに溜めておくイベントの上限（溢れたら古いものから捨てる）
+DEFAULT_EVENT_QUEUE_SIZE = 256
+# 1回のPOSTにまとめるイベントの上限
+DEFAULT_BATCH_SIZE = 32
+# 最初のイベントが届いてから、続くイベントをまとめるために待つ時間（秒）
+DEFAULT_BATCH_WAIT = 0.05
+# Webhookの応答を待つ最大時間（秒）
+DEFAULT_WEBHOOK_TIMEOUT = 5.0
+DEFAULT_EVENTS_HOST = "127.0.0.1"
+# SSEでイベントが無いときに接続の維持のためのコメントを送る間隔（秒）
+SSE_KEEPALIVE_SEC = 15.0
+
+
+class EventQueue:
+    """
+    1つの送信先の上限つきキュー
+
+    `put()` は待たずに戻り、上限を超えたら最も古いイベントを捨てる。
+    """
+
+    def __init__(self, sink: str, maxsize: int = DEFAULT_EVENT_QUEUE_SIZE):
+        self.sink = sink
+        self.dropped = 0
+        self.closed = False
+        self._items: deque = deque(maxlen=max(1, maxsize))
+        self._changed = threading.Condition()
+        self._dropped_metric = metrics.EVENTS_DROPPED.labels(sink, "overflow")
+
+    def put(self, event: dict) -> None:
+        with self._changed:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+                self._dropped_metric.inc()
+            self._items.append(event)
+            self._changed.notify_all()
+
+    def get_batch(
+        self, max_items: int, timeout: Optional[float] = None, batch_wait: float = 0.0
+    ) -> List[dict]:
+        """
+        イベントが届くまで最大 `timeout` 秒待ち、溜まっているイベントを最大 `max_items` 件返す
+
+        最初のイベントが届いたら、続くイベントをまとめるために最大 `batch_wait` 秒待つ。
+        閉じた後は残りのイベントを返し、空になったら空のリストを返す。
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._items or self.closed, timeout)
+            if self._items and batch_wait > 0 and not self.closed:
+                self._changed.wait_for(
+                    lambda: len(self._items) >= max_items or self.closed, batch_wait
+                )
+            count = min(max_items, len(self._items))
+            return [self._items.popleft() for _ in range(count)]
+
+    def close(self) -> None:
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+
+class EventBus:
+    """イベントを登録されたすべての送信先のキューに配る"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues: List[EventQueue] = []
+        self._ids = itertools.count(1)
+
+    def subscribe(self, sink: str, maxsize: int = DEFAULT_EVENT_QUEUE_SIZE) -> EventQueue:
+        queue = EventQueue(sink, maxsize)
+        with self._lock:
+            self._queues = self._queues + [queue]
+        return queue
+
+    def unsubscribe(self, queue: EventQueue) -> None:
+        queue.close()
+        with self._lock:
+            self._queues = [q for q in self._queues if q is not queue]
+
+    def emit(self, event_type: str, cast, **fields) -> None:
+        """イベントを各送信先のキューに積む（送信先が無ければ何もしない）"""
+        queues = self._queues
+        if not queues:
+            return
+        event = {
+            "id": next(self._ids), "type": event_type,
+            "device": metrics.device_label(cast), "time": time.time(), **fields,
+        }
+        for queue in queues:
+            queue.put(event)
+
+
+BUS = EventBus()
+
+
+def emit(event_type: str, cast, **fields) -> None:
+    """`BUS` にイベントを送る（`main.py` / `aio.py` / `group.py` の制御ループから呼ばれる）"""
+    BUS.emit(event_type, cast, **fields)
+
+
+class WebhookSink:
+    """
+    イベントをまとめてWebhookへPOSTする
+
+    送信に失敗したまとまりは再送せずに捨てる（`nemucast_events_dropped_total{reason="error"}`）。
+
+    Args:
+        url: POST先のURL
+        bus: イベントを受け取るバス
+        queue_size: 送信待ちのイベントの上限
+        batch_size: 1回のPOSTにまとめるイベントの上限
+        batch_wait: 続くイベントをまとめるために待つ時間（秒）
+        timeout: 応答を待つ最大時間（秒）
+    """
+
+    def __init__(
+        self,
+        url: str,
+        bus: EventBus = BUS,
+        queue_size: int = DEFAULT_EVENT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        batch_wait: float = DEFAULT_BATCH_WAIT,
+        timeout: float = DEFAULT_WEBHOOK_TIMEOUT,
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.delivered = 0
+        self.posts = 0
+        self._bus = bus
+        self._queue: Optional[EventQueue] = None
+        self._queue_size = queue_size
+        self._thread: Optional[threading.Thread] = None
+        self._errors = metrics.EVENTS_DROPPED.labels("webhook", "error")
+
+    @property
+    def dropped(self) -> int:
+        return self._queue.dropped if self._queue is not None else 0
+
+    def start(self) -> "WebhookSink":
+        self._queue = self._bus.subscribe("webhook", self._queue_size)
+        self._thread = threading.Thread(target=self._run, name="nemucast-webhook", daemon=True)
+        self._thread.start()
+        logging.info("イベントをWebhookに送ります: %s", self.url)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        受け付けを止め、溜まっているイベントを送り終えるまで最大 `timeout` 秒待つ
+
+        終了直前のスタンバイのイベントも届くよう、プロセスの終了時に呼ぶ。
+        """
+        if self._queue is None:
+            return
+        self._bus.unsubscribe(self._queue)
+        self._thread.join(self.timeout if timeout is None else timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._queue.get_batch(self.batch_size, batch_wait=self.batch_wait)
+            if not batch:
+                return
+            self._post(batch)
+
+    def _post(self, batch: List[dict]) -> None:
+        import urllib.request
+
+        body = json.dumps({"events": batch}, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=body, method="POST",
+            headers={"Content-Type": "application/json; charset=utf-8"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except Exception as e:
+            # 送信先の障害で音量制御を止めない
+            logging.warning("イベントをWebhookに送れませんでした（%d件）: %s", len(batch), e)
+            self._errors.inc(len(batch))
+            return
+        self.posts += 1
+        self.delivered += len(batch)
+
+
+def format_sse(events: List[dict]) -> bytes:
+    """イベントをtext/event-streamの形式にする（イベントの種類を `event:` に入れる）"""
+    return "".join(
+        f"id: {event['id']}\nevent: {event['type']}\n"
+        f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        for event in events
+    ).encode("utf-8")
+
+
+class EventStreamServer:
+    """
+    `GET /events` にイベントをServer-Sent Eventsで流すHTTPサーバー
+
+    接続ごとにキューを持ち、読むのが遅いクライアントの分は古いイベントから捨てる。
+    """
+
+    def __init__(
+        self,
+        port: int,
+        host: str = DEFAULT_EVENTS_HOST,
+        bus: EventBus = BUS,
+        queue_size: int = DEFAULT_EVENT_QUEUE_SIZE,
+        keepalive: float = SSE_KEEPALIVE_SEC,
+    ):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/events":
+                    self.send_error(404)
+                    return
+                queue = server._subscribe()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                    self.send_header("Cache-Control", "no-cache")
+                    self.end_headers()
+                    self.wfile.write(b": nemucast\n\n")
+                    self.wfile.flush()
+                    while True:
+                        batch = queue.get_batch(DEFAULT_BATCH_SIZE, keepalive)
+                        if batch:
+                            self.wfile.write(format_sse(batch))
+                        elif queue.closed:
+                            return
+                        else:
+                            self.wfile.write(b": keepalive\n\n")
+                        self.wfile.flush()
+                except OSError:
+                    # クライアントが切断した
+                    pass
+                finally:
+                    server._unsubscribe(queue)
+
+            def log_message(self, format, *args):
+                logging.debug("events: " + format, *args)
+
+        self._bus = bus
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._queues: List[EventQueue] = []
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, name="nemucast-events", daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> "EventStreamServer":
+        self.thread.start()
+        host, port = self.httpd.server_address[:2]
+        logging.info("イベントを配信しています: http://%s:%d/events", host, port)
+        return self
+
+    @property
+    def clients(self) -> int:
+        with self._lock:
+            return len(self._queues)
+
+    def stop(self) -> None:
+        """待ち受けを止め、接続中のクライアントには溜まっているイベントを送ってから切断する"""
+        with self._lock:
+            queues = list(self._queues)
+        for queue in queues:
+            queue.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def _subscribe(self) -> EventQueue:
+        queue = self._bus.subscribe("sse", self._queue_size)
+        with self._lock:
+            self._queues.append(queue)
+        return queue
+
+    def _unsubscribe(self, queue: EventQueue) -> None:
+        self._bus.unsubscribe(queue)
+        with self._lock:
+            self._queues.remove(queue)
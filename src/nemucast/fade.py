@@ -0,0 +1,213 @@
+"""フェードカーブ（音量の時間変化）の事前計算とコマンド送信計画"""
+
+import math
+from typing import List, Optional, Tuple
+
+# 従来のステップ式と、細かい分解能で滑らかに下げるカーブ
+PROFILES = ("step", "linear", "exponential", "perceptual")
+# Chromecastに送る音量の刻み幅
+DEFAULT_QUANTUM = 0.01
+# カーブを事前計算する時間分解能（秒）
+DEFAULT_RESOLUTION_SEC = 1.0
+# 1秒あたりに送信する set_volume の上限
+DEFAULT_MAX_RATE = 1.0
+# exponential プロファイルの減衰の速さ（大きいほど序盤に大きく下がる）
+EXPONENTIAL_RATE = 3.0
+# perceptual プロファイルで0音量を扱うときの下限
+MIN_AUDIBLE_LEVEL = 0.01
+
+FadeTable = List[Tuple[float, float]]
+
+
+def step_count(start: float, min_level: float, step: float) -> int:
+    """ステップ式で最小音量に到達するまでの `set_volume` の回数"""
+    if start <= min_level or step >= 0:
+        return 0
+    return math.ceil(round((start - min_level) / -step, 6))
+
+
+def fade_duration(start: float, min_level: float, step: float, interval_sec: float) -> float:
+    """ステップ式と同じ時刻に最小音量へ到達するフェード時間（秒）"""
+    return step_count(start, min_level, step) * interval_sec
+
+
+def curve_level(profile: str, start: float, end: float, fraction: float) -> float:
+    """
+    フェード開始からの進捗 `fraction`（0.0～1.0）における音量を返す
+
+    - linear: 音量を一定の速さで下げる
+    - exponential: 序盤に大きく下げ、終盤はゆっくり下げる
+    - perceptual: dB（対数）で一定の速さになるよう下げる
+    """
+    fraction = min(1.0, max(0.0, fraction))
+    if profile == "linear":
+        return start + (end - start) * fraction
+    if profile == "exponential":
+        eased = (1 - math.exp(-EXPONENTIAL_RATE * fraction)) / (1 - math.exp(-EXPONENTIAL_RATE))
+        return start + (end - start) * eased
+    if profile == "perceptual":
+        low = max(end, MIN_AUDIBLE_LEVEL)
+        high = max(start, low)
+        level = high * (low / high) ** fraction
+        return end if fraction >= 1.0 else level
+    raise ValueError(f"未対応のフェードプロファイルです: {profile}")
+
+
+def build_fade_table(
+    profile: str,
+    start: float,
+    end: float,
+    duration_sec: float,
+    resolution_sec: float = DEFAULT_RESOLUTION_SEC,
+    step: Optional[float] = None,
+    interval_sec: Optional[float] = None,
+) -> FadeTable:
+    """
+    フェードカーブを (経過秒, 音量) の表に事前計算する
+
+    Args:
+        profile: PROFILES のいずれか
+        start: 開始時の音量
+        end: 最小音量
+        duration_sec: フェード時間（秒）
+        resolution_sec: 表の時間分解能（秒）
+        step: step プロファイルの音量ステップ
+        interval_sec: step プロファイルの間隔（秒）
+
+    Returns:
+        経過秒の昇順に並んだ (経過秒, 音量) のリスト
+    """
+    if profile == "step":
+        if step is None or interval_sec is None:
+            raise ValueError("step プロファイルには step と interval_sec が必要です")
+        return [
+            (k * interval_sec, round(start + (k + 1) * step, 2))
+            for k in range(step_count(start, end, step))
+        ]
+
+    if duration_sec <= 0:
+        return [(0.0, end)]
+    points = max(1, math.ceil(duration_sec / resolution_sec))
+    table = []
+    for i in range(points + 1):
+        t = min(i * resolution_sec, duration_sec)
+        table.append((t, curve_level(profile, start, end, t / duration_sec)))
+    return table
+
+
+def quantize(level: float, quantum: float = DEFAULT_QUANTUM) -> float:
+    """音量を送信単位に丸める"""
+    return round(round(level / quantum) * quantum, 4)
+
+
+class VolumeDispatcher:
+    """
+    丸めた音量が変わったときだけ、上限レート以内で送信を許可する
+
+    `offer()` が音量を返したときだけ `set_volume` を送ればよい。
+    レート上限で送れなかった音量は次の機会にまとめて送る。
+    """
+
+    def __init__(
+        self,
+        start_level: float,
+        quantum: float = DEFAULT_QUANTUM,
+        max_rate: float = DEFAULT_MAX_RATE,
+    ):
+        self.quantum = quantum
+        self.min_gap = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.last_level = quantize(start_level, quantum)
+        self.last_sent_at: Optional[float] = None
+        self.sent = 0
+
+    def offer(self, now: float, level: float) -> Optional[float]:
+        """
+        `now` 秒時点の目標音量を渡す
+
+        Returns:
+            送信すべき音量、送信不要（変化なし・レート超過）ならNone
+        """
+        target = quantize(level, self.quantum)
+        if target == self.last_level:
+            return None
+        if self.last_sent_at is not None and now - self.last_sent_at < self.min_gap:
+            return None
+        self.last_level = target
+        self.last_sent_at = now
+        self.sent += 1
+        return target
+
+
+def plan_commands(
+    table: FadeTable,
+    start_level: float,
+    quantum: float = DEFAULT_QUANTUM,
+    max_rate: float = DEFAULT_MAX_RATE,
+) -> FadeTable:
+    """
+    フェード表から実際に送信する (経過秒, 音量) の計画を作る
+
+    丸めた音量が変わる時点だけを残し、送信間隔がレート上限を下回らないようにする。
+    最後の音量は必ず計画に含める。
+    """
+    dispatcher = VolumeDispatcher(start_level, quantum, max_rate)
+    plan = []
+    for t, level in table:
+        target = dispatcher.offer(t, level)
+        if target is not None:
+            plan.append((t, target))
+
+    if table:
+        final = quantize(table[-1][1], quantum)
+        if final != dispatcher.last_level:
+            t = table[-1][0]
+            if dispatcher.last_sent_at is not None:
+                t = max(t, dispatcher.last_sent_at + dispatcher.min_gap)
+            plan.append((t, final))
+    return plan
+
+
+def plan_media_fade(
+    profile: str,
+    start: float,
+    min_level: float,
+    remaining_sec: float,
+    step: float,
+    max_rate: float = DEFAULT_MAX_RATE,
+) -> FadeTable:
+    """
+    メディアの残り時間 `remaining_sec` でちょうど最小音量に到達する送信計画を作る
+
+    step プロファイルはステップの回数で残り時間を等分し、最後のステップを終了時刻に置く。
+    それ以外のプロファイルは残り時間をフェード時間としてカーブを計算する。
+    """
+    if start <= min_level:
+        return []
+    if profile == "step":
+        count = step_count(start, min_level, step)
+        if count == 0:
+            return []
+        interval = remaining_sec / count
+        return [
+            ((k + 1) * interval, max(min_level, round(start + (k + 1) * step, 2)))
+            for k in range(count)
+        ]
+    table = build_fade_table(profile, start, min_level, remaining_sec)
+    plan = plan_commands(table, start, max_rate=max_rate)
+    if plan:
+        # 丸めで手前に来た最小音量も終了時刻に合わせる
+        plan[-1] = (max(plan[-1][0], remaining_sec), plan[-1][1])
+    return plan
+
+
+def resume_plan(plan: FadeTable, level: float) -> FadeTable:
+    """
+    途中まで送信した計画の続きを返す（ジャーナルからフェードを再開する場合）
+
+    `level` より低い音量の送信だけを残し、時刻を最後に送信した時点からの経過秒に置き換える。
+    """
+    for index, (_, planned) in enumerate(plan):
+        if planned < level - 1e-9:
+            origin = plan[index - 1][0] if index else 0.0
+            return [(t - origin, planned) for t, planned in plan[index:]]
+    return []
@@ -0,0 +1,402 @@
+"""
+キャストグループ（マルチルームのスピーカーグループ）のフェード
+
+グループのメンバーをmultizoneの名前空間で問い合わせて各メンバーに接続し、
+グループ全体を1つのスケジューラの同じ周期で下げる。毎ステップの `set_volume` は
+全メンバーへ同時に送り（メンバーごとに1つのワーカースレッド）、最初と最後のメンバーが
+音量を反映するまでの時間差（スプレッド）を記録する。
+
+グループ自体の音量はメンバーの音量から決まるため、音量はメンバーにだけ送り、
+グループのデバイスは再生状態の確認と最後のスタンバイに使う。
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from . import events, metrics
+from .cache import EndpointCache, connect_from_cache
+from .clock import monotonic
+from .commands import confirm_quit_app, confirm_set_volume
+from .deadline import DEFAULT_MISSED_TICK_POLICY
+from .discovery import discover_named_chromecasts
+from .journal import FadeJournal
+from .lifecycle import ConnectionLifecycle
+from .main import (
+    CACHE_MAX_AGE,
+    COMMAND_RETRIES,
+    COMMAND_TIMEOUT,
+    RETRY_SEC,
+    StepResult,
+    begin_fade,
+    connect_chromecast,
+    get_current_volume,
+    is_chromecast_active,
+    log_chromecast_status,
+    stop_discovery,
+)
+from .multi import DeviceConfig, FadeScheduler
+from .status import StatusMonitor
+
+# グループのメンバー一覧（MULTIZONE_STATUS）を待つ最大時間（秒）
+DEFAULT_MEMBERS_TIMEOUT = 5.0
+
+
+def resolve_group_members(group_cast, timeout: float = DEFAULT_MEMBERS_TIMEOUT) -> Dict[str, str]:
+    """
+    キャストグループのメンバーを問い合わせる
+
+    Returns:
+        UUID→friendly_nameの辞書（応答が無ければ空）
+    """
+    from pychromecast.controllers.multizone import MultizoneController
+
+    received = threading.Event()
+
+    class _Listener:
+        def multizone_member_added(self, uuid: str) -> None:
+            pass
+
+        def multizone_member_removed(self, uuid: str) -> None:
+            pass
+
+        def multizone_status_received(self) -> None:
+            received.set()
+
+    controller = MultizoneController(group_cast.uuid)
+    controller.register_listener(_Listener())
+    group_cast.register_handler(controller)
+    controller.update_members()
+    if not received.wait(timeout):
+        logging.error("グループ %s のメンバーを %.1f 秒以内に取得できませんでした。",
+                      group_cast.cast_info.friendly_name, timeout)
+    # メンバーへは friendly_name で接続するため UUID→名前の対応が必要だが、pychromecastは
+    # 公開の members でUUIDしか返さない。そのため内部の辞書（_members）を読む
+    try:
+        members = controller._members
+    except AttributeError:
+        logging.error("このバージョンのpychromecast（MultizoneControllerに_membersが無い）では"
+                      "グループ %s のメンバー名を取得できません。",
+                      group_cast.cast_info.friendly_name)
+        return {}
+    return dict(members)
+
+
+def connect_members(
+    names: List[str],
+    discovery_timeout: float,
+    cache: Optional[EndpointCache],
+    cache_max_age: float = CACHE_MAX_AGE,
+) -> Dict[str, object]:
+    """
+    メンバーに接続する
+
+    キャッシュが新しいメンバーには直接接続し、残りは1つのCastBrowserでまとめて検索する。
+    接続後は再接続先を各メンバーのホストに固定し、検索に使ったブラウザを止める。
+
+    Returns:
+        friendly_name→接続済みChromecastの辞書（接続できなかったメンバーは含まない）
+    """
+    casts: Dict[str, object] = {}
+    for name in names:
+        entry = cache.get(name) if cache is not None else None
+        if entry is None or entry.is_stale(cache_max_age):
+            continue
+        cast = connect_from_cache(entry)
+        if cast is not None:
+            casts[name] = cast
+
+    missing = [name for name in names if name not in casts]
+    browser = None
+    if missing:
+        found, browser, _ = discover_named_chromecasts(missing, discovery_timeout)
+        casts.update(found)
+    for name, cast in casts.items():
+        cast.wait()
+        metrics.watch_connection(cast)
+        ConnectionLifecycle(cast, cache, discovery_timeout).start()
+        if cache is not None:
+            cache.store(cast.cast_info, name)
+    if browser is not None:
+        stop_discovery(browser)
+    return casts
+
+
+@dataclass
+class FanoutResult:
+    """1回の同時送信の結果（メンバーごとの、送信開始から反映を確認するまでの秒数）"""
+
+    applied: Dict[str, Optional[float]] = field(default_factory=dict)
+
+    @property
+    def confirmed(self) -> List[str]:
+        return [name for name, seconds in self.applied.items() if seconds is not None]
+
+    @property
+    def spread(self) -> Optional[float]:
+        """最初と最後のメンバーが反映した時刻の差（反映を確認できたメンバーが無ければNone）"""
+        times = [seconds for seconds in self.applied.values() if seconds is not None]
+        return max(times) - min(times) if times else None
+
+
+class CommandFanout:
+    """
+    メンバーへのコマンドを同時に送る
+
+    `workers` をメンバー数にすると全メンバーへ同時に、1にすると1台ずつ順に送る。
+    """
+
+    def __init__(self, workers: int, clock: Callable[[], float] = monotonic):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fanout")
+        self._clock = clock
+
+    def run(self, calls: Dict[str, Callable[[], bool]]) -> FanoutResult:
+        """
+        `calls`（名前→反映を確認できたらTrueを返す関数）を実行し、すべて終わるまで待つ
+        """
+        started = self._clock()
+
+        def timed(call: Callable[[], bool]) -> Optional[float]:
+            return self._clock() - started if call() else None
+
+        futures = {name: self._pool.submit(timed, call) for name, call in calls.items()}
+        result = FanoutResult()
+        for name, future in futures.items():
+            try:
+                result.applied[name] = future.result()
+            except Exception as e:
+                # 1台の失敗で他のメンバーを止めない
+                logging.error("[%s] コマンドの送信に失敗しました: %s", name, e)
+                result.applied[name] = None
+        return result
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+
+@dataclass
+class GroupMember:
+    """接続済みのグループメンバー"""
+
+    name: str
+    cast: object
+    monitor: Optional[StatusMonitor] = None
+    initial_volume: float = 0.5
+    journal: Optional[FadeJournal] = None
+
+
+def plan_group_step(levels: Dict[str, float], step: float, min_level: float) -> Dict[str, float]:
+    """
+    全メンバーの次の音量を決める
+
+    最小音量より上のメンバーだけを1ステップ下げる（最小音量で止める）。
+    全メンバーが最小音量に到達していれば空の辞書を返す。
+    """
+    return {
+        name: max(min_level, round(level + step, 2))
+        for name, level in levels.items()
+        if level > min_level
+    }
+
+
+class GroupSession:
+    """
+    キャストグループの音量調整状態（`multi.FadeScheduler` で実行する）
+
+    `tick()` の扱いは `multi.DeviceSession` と同じ。
+    """
+
+    def __init__(
+        self,
+        config: DeviceConfig,
+        group_cast,
+        members: List[GroupMember],
+        group_monitor: Optional[StatusMonitor] = None,
+        fanout: Optional[CommandFanout] = None,
+    ):
+        self.config = config
+        self.group_cast = group_cast
+        self.group_monitor = group_monitor
+        self.members = members
+        self.fanout = fanout or CommandFanout(len(members))
+        self.finished = False
+        self.spreads: List[float] = []
+        self._spread_metric = metrics.GROUP_SPREAD_SECONDS.labels(config.name)
+
+    def tick(self) -> Optional[StepResult]:
+        """1ステップ分、全メンバーの音量を同時に下げる（全員が最小音量なら元に戻して終了）"""
+        if not is_chromecast_active(self.group_cast, self.group_monitor):
+            logging.info(
+                "[%s] グループはアイドル状態です。音量調整をスキップします。", self.config.name
+            )
+            metrics.record_idle_skip(self.group_cast)
+            events.emit(events.IDLE_SKIP, self.group_cast)
+            return StepResult(self.config.interval_sec)
+
+        levels = {}
+        for member in self.members:
+            level = get_current_volume(member.cast, member.monitor)
+            if level is not None:
+                levels[member.name] = level
+        if not levels:
+            logging.warning(
+                "[%s] メンバーの音量を取得できませんでした。再試行します。", self.config.name
+            )
+            return StepResult(RETRY_SEC, retry=True)
+        targets = plan_group_step(levels, self.config.step, self.config.min_level)
+        if not targets:
+            logging.info("[%s] 全メンバーが最小音量に到達しました。", self.config.name)
+            self.restore_and_standby()
+            return None
+
+        result = self.set_volumes(targets)
+        for member in self.members:
+            if member.name not in targets:
+                continue
+            confirmed = result.applied.get(member.name) is not None
+            if member.journal is not None and confirmed:
+                member.journal.record_level(targets[member.name])
+            events.emit(
+                events.VOLUME_CHANGED, member.cast, level=targets[member.name],
+                previous=levels.get(member.name), confirmed=confirmed, group=self.config.name,
+            )
+        logging.info(
+            "[%s] 音量を変更しました: %s",
+            self.config.name,
+            ", ".join(f"{name} {levels[name]:.2f}→{level:.2f}" for name, level in targets.items()),
+        )
+        return StepResult(self.config.interval_sec)
+
+    def set_volumes(self, targets: Dict[str, float]) -> FanoutResult:
+        """メンバーごとの音量を同時に送り、反映までのスプレッドを記録する"""
+        by_name = {member.name: member for member in self.members}
+        result = self.fanout.run({
+            name: _set_volume_call(by_name[name], level) for name, level in targets.items()
+        })
+        spread = result.spread
+        if spread is not None:
+            self.spreads.append(spread)
+            self._spread_metric.observe(spread)
+            logging.info(
+                "[%s] %d/%d台が反映（スプレッド %.3f秒）",
+                self.config.name, len(result.confirmed), len(targets), spread,
+            )
+        return result
+
+    def restore(self) -> FanoutResult:
+        """全メンバーの音量を同時に起動時の値へ戻し、戻せたメンバーのジャーナルを削除する"""
+        result = self.set_volumes({member.name: member.initial_volume for member in self.members})
+        for member in self.members:
+            confirmed = result.applied.get(member.name) is not None
+            if confirmed:
+                logging.info(
+                    "[%s] 音量を初期値 %.2f に戻しました。", member.name, member.initial_volume
+                )
+                if member.journal is not None:
+                    member.journal.complete()
+            events.emit(
+                events.VOLUME_RESTORED, member.cast, level=member.initial_volume,
+                confirmed=confirmed, group=self.config.name,
+            )
+        return result
+
+    def restore_and_standby(self) -> None:
+        self.restore()
+        if is_chromecast_active(self.group_cast, self.group_monitor):
+            logging.info("[%s] グループをスタンバイモードにします。", self.config.name)
+            confirmed = confirm_quit_app(
+                self.group_cast, self.group_monitor, COMMAND_TIMEOUT, COMMAND_RETRIES
+            )
+            if confirmed:
+                logging.info("[%s] グループがスタンバイモードになりました。", self.config.name)
+            events.emit(events.STANDBY, self.group_cast, confirmed=confirmed, already=False)
+
+    def log_summary(self) -> None:
+        if self.spreads:
+            logging.info(
+                "[%s] メンバー間のスプレッド: 平均 %.3f秒、最大 %.3f秒（%d回）",
+                self.config.name, sum(self.spreads) / len(self.spreads), max(self.spreads),
+                len(self.spreads),
+            )
+
+
+def _set_volume_call(member: GroupMember, level: float) -> Callable[[], bool]:
+    return lambda: confirm_set_volume(
+        member.cast, level, member.monitor, COMMAND_TIMEOUT, COMMAND_RETRIES
+    )
+
+
+def run_group(
+    config: DeviceConfig,
+    discovery_timeout: float,
+    status_ttl: float,
+    missed_tick_policy: str = DEFAULT_MISSED_TICK_POLICY,
+    cache: Optional[EndpointCache] = None,
+    use_journal: bool = True,
+) -> bool:
+    """
+    キャストグループに接続し、メンバーを同じ周期で下げる
+
+    Returns:
+        bool: グループとメンバーに接続できた場合True
+    """
+    group_cast, browser = connect_chromecast(config.name, None, discovery_timeout, cache)
+    if group_cast is None:
+        if browser:
+            stop_discovery(browser)
+        return False
+
+    session: Optional[GroupSession] = None
+    try:
+        group_cast.wait()
+        metrics.watch_connection(group_cast)
+        ConnectionLifecycle(group_cast, cache, discovery_timeout).start(browser)
+        browser = None
+
+        members = resolve_group_members(group_cast)
+        if not members:
+            logging.error("グループ %s のメンバーが見つかりませんでした。", config.name)
+            return False
+        logging.info("グループ %s のメンバー: %s", config.name, list(members.values()))
+        member_casts = connect_members(list(members.values()), discovery_timeout, cache)
+        missing = [name for name in members.values() if name not in member_casts]
+        if missing:
+            logging.warning("接続できなかったメンバーを除いて続けます: %s", missing)
+        if not member_casts:
+            return False
+
+        params = {"profile": "step", "interval_sec": config.interval_sec,
+                  "step": config.step, "min_level": config.min_level}
+        group_members = []
+        for name, cast in member_casts.items():
+            monitor = StatusMonitor(cast, ttl=status_ttl).attach()
+            journal = FadeJournal.for_cast(cast) if use_journal else None
+            initial_volume, _ = begin_fade(cast, journal, monitor, params)
+            group_members.append(GroupMember(name, cast, monitor, initial_volume, journal))
+
+        group_monitor = StatusMonitor(group_cast, ttl=status_ttl).attach()
+        log_chromecast_status(group_cast, group_monitor)
+        session = GroupSession(config, group_cast, group_members, group_monitor)
+        scheduler = FadeScheduler(missed_tick_policy=missed_tick_policy)
+        scheduler.add(session)
+        scheduler.run()
+        scheduler.stats.log_summary()
+        session.log_summary()
+        logging.info("グループの音量調整が完了しました。プログラムを終了します。")
+        return True
+
+    except KeyboardInterrupt:
+        logging.info("\n中断されました。音量を初期値に戻します...")
+        if session is not None and not session.finished:
+            try:
+                session.restore()
+            except Exception as e:
+                logging.error("[%s] 音量の復元に失敗しました: %s", config.name, e)
+        raise
+    finally:
+        if session is not None:
+            session.fanout.close()
+        if browser:
+            stop_discovery(browser)
@@ -0,0 +1,191 @@
+"""
+フェードのジャーナル（異常終了や再起動の後も、起動時の音量を失わずに再開する）
+
+デバイスごとに追記専用のJSON Linesファイルを状態ディレクトリの `journal/` に置き、
+デバイスの識別子・起動時の音量・送信した音量を1行ずつ書き込んでfsyncする。
+フェードが完了するか音量を戻したらファイルを削除する。起動時にファイルが残っていれば、
+前回のフェードは途中で終わっている（OOM、systemdの再起動、停電など）。
+
+レコード:
+    {"event": "start", "name": ..., "uuid": ..., "initial_volume": 0.5, "level": null,
+     "params": {...}, "t": ...}
+    {"event": "step", "level": 0.46, "t": ...}
+    {"event": "params", "params": {...}, "t": ...}   # 設定ファイルの再読み込みで変わった設定
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Optional
+
+from .paths import get_state_dir
+
+# これより前に止まったフェードは再開せず、音量を戻してから始め直す（秒）。デフォルトは12時間
+DEFAULT_JOURNAL_MAX_AGE = 12 * 60 * 60
+# 中断されたフェードの扱い（resume: 続きから再開 / restore: 音量を戻して始め直す）
+RESUME_POLICIES = ("resume", "restore")
+DEFAULT_RESUME_POLICY = "resume"
+
+
+@dataclass
+class JournalState:
+    """ジャーナルから復元した、途中で終わったフェードの状態"""
+
+    name: str
+    uuid: str
+    initial_volume: float
+    # 最後に送信した音量（まだ送信していなければNone）
+    level: Optional[float] = None
+    params: dict = field(default_factory=dict)
+    started_at: float = 0.0
+    updated_at: float = 0.0
+    steps: int = 0
+
+    def age(self, now: Optional[float] = None) -> float:
+        """最後の記録からの経過秒数"""
+        now = time.time() if now is None else now
+        return now - self.updated_at
+
+
+def _file_name(key: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", key) + ".jsonl"
+
+
+class FadeJournal:
+    """1台のデバイスのフェードを記録する追記専用のジャーナル"""
+
+    def __init__(self, key: str, directory: Optional[Path] = None):
+        self.directory = directory or get_state_dir() / "journal"
+        self.path = self.directory / _file_name(key)
+        self._file: Optional[IO[str]] = None
+
+    @classmethod
+    def for_cast(cls, cast, directory: Optional[Path] = None) -> "FadeJournal":
+        """デバイスのUUID（無ければfriendly_name）をキーにしたジャーナル"""
+        info = cast.cast_info
+        return cls(str(info.uuid or info.friendly_name), directory)
+
+    def load(self) -> Optional[JournalState]:
+        """
+        ジャーナルを読み込む
+
+        書き込み途中で止まった最後の行など、解析できない行は読み飛ばす。
+
+        Returns:
+            途中で終わったフェードの状態、ジャーナルが無ければNone
+        """
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning("フェードのジャーナルを読み込めませんでした: %s", e)
+            return None
+
+        state: Optional[JournalState] = None
+        for line in lines:
+            try:
+                record = json.loads(line)
+                event = record["event"]
+                if event == "start":
+                    state = JournalState(
+                        name=record["name"],
+                        uuid=record["uuid"],
+                        initial_volume=float(record["initial_volume"]),
+                        level=record.get("level"),
+                        params=record.get("params") or {},
+                        started_at=record["t"],
+                        updated_at=record["t"],
+                    )
+                elif event == "step" and state is not None:
+                    state.level = float(record["level"])
+                    state.updated_at = record["t"]
+                    state.steps += 1
+                elif event == "params" and state is not None:
+                    state.params = dict(record["params"])
+                    state.updated_at = record["t"]
+            except (ValueError, KeyError, TypeError):
+                logging.warning("フェードのジャーナルの壊れた行を読み飛ばします: %r", line[:80])
+        return state
+
+    def begin(
+        self,
+        name: str,
+        uuid: str,
+        initial_volume: float,
+        params: Optional[dict] = None,
+        level: Optional[float] = None,
+    ) -> None:
+        """
+        フェードの開始を記録する
+
+        前回の記録は1行の開始レコードに置き換える（再開時は `level` に続きの音量を入れる）。
+        """
+        record = {
+            "event": "start", "name": name, "uuid": uuid, "initial_volume": initial_volume,
+            "level": level, "params": params or {}, "t": time.time(),
+        }
+        self.close()
+        tmp_path = self.path.with_suffix(".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning("フェードのジャーナルに書き込めませんでした: %s", e)
+            return
+        self._sync_directory()
+
+    def record_level(self, level: float) -> None:
+        """送信した音量を追記する（書き込みのたびにfsyncする）"""
+        self._append({"event": "step", "level": level, "t": time.time()})
+
+    def record_params(self, params: dict) -> None:
+        """フェードの途中で変わった設定を追記する（再開時はこの設定で続ける）"""
+        self._append({"event": "params", "params": params, "t": time.time()})
+
+    def complete(self) -> None:
+        """フェードの完了（または音量の復元）を記録し、ジャーナルを削除する"""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            return
+        self._sync_directory()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append(self, record: dict) -> None:
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            # 記録できなくても音量制御は続ける
+            logging.warning("フェードのジャーナルに書き込めませんでした: %s", e)
+
+    def _sync_directory(self) -> None:
+        """ファイルの作成・置き換え・削除をディレクトリのfsyncで確定させる"""
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
@@ -0,0 +1,145 @@
+"""
+接続のライフサイクル（接続後はデバイス検索を止め、必要な場合だけ再検索する）
+
+mDNSの検索（zeroconf）は接続先を見つけるためだけに使い、ソケットが確立したら
+再接続先を解決済みのホストに固定してブラウザを止める。切断後はpychromecastが
+そのホストへ再接続を続け、応答しない状態が続いた場合だけ、UUIDを指定した検索を
+一時的に行って新しいホスト（DHCPでのアドレス変更など）へ切り替える。
+"""
+
+import dataclasses
+import logging
+import threading
+from typing import Callable, Optional
+
+from . import metrics
+from .cache import EndpointCache
+from .discovery import DEFAULT_DISCOVERY_TIMEOUT, rediscover_cast_info
+
+# 固定したホストへの再接続がこの回数続けて失敗したら、デバイスを再検索する
+DEFAULT_REDISCOVER_AFTER = 2
+# 再接続を試みる間隔（秒）。失敗が続くとpychromecastがホストごとに最大300秒まで延ばす
+DEFAULT_RECONNECT_WAIT = 5.0
+
+# pychromecastの接続状態（socket_client.CONNECTION_STATUS_*）
+CONNECTED = "CONNECTED"
+FAILED_STATUSES = ("FAILED", "FAILED_RESOLVE")
+
+
+def pin_host(cast, host: str, port: int) -> None:
+    """
+    再接続先を固定のホストにする
+
+    mDNSのサービス名での解決とzeroconfへの参照をやめるため、この後はブラウザを止めてよい。
+    """
+    from pychromecast.models import HostServiceInfo
+
+    services = {HostServiceInfo(host, port)}
+    cast.socket_client.services = services
+    cast.socket_client.zconf = None
+    cast.cast_info = dataclasses.replace(cast.cast_info, services=services, host=host, port=port)
+
+
+class ConnectionLifecycle:
+    """
+    接続済みのChromecastをホスト直結にし、接続が戻らない場合だけ再検索する
+
+    pychromecastの接続状態リスナーとして登録し、通知はソケットスレッドから受け取る。
+    再検索はソケットスレッドを止めないよう別スレッドで行う。
+    """
+
+    def __init__(
+        self,
+        cast,
+        cache: Optional[EndpointCache] = None,
+        discovery_timeout: float = DEFAULT_DISCOVERY_TIMEOUT,
+        rediscover_after: int = DEFAULT_REDISCOVER_AFTER,
+        reconnect_wait: float = DEFAULT_RECONNECT_WAIT,
+        rediscover: Callable = rediscover_cast_info,
+    ):
+        self.cast = cast
+        self.cache = cache
+        self.discovery_timeout = discovery_timeout
+        self.rediscover_after = rediscover_after
+        self.reconnect_wait = reconnect_wait
+        self._rediscover = rediscover
+        self.name = cast.cast_info.friendly_name
+        self.uuid = cast.cast_info.uuid
+        # 最後に接続してから続けて失敗した再接続の回数
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, browser=None) -> "ConnectionLifecycle":
+        """
+        接続中のホストに再接続先を固定し、`browser` があれば検索を止める
+
+        キャッシュからの接続は再接続を1回しか試みない設定のため、
+        ここで回数の制限なく `reconnect_wait` 秒ごとに再接続するよう切り替える。
+        """
+        client = self.cast.socket_client
+        pin_host(self.cast, client.host, client.port)
+        client.tries = None
+        client.retry_wait = self.reconnect_wait
+        self.cast.register_connection_listener(self)
+        if browser is not None:
+            browser.stop_discovery()
+            logging.info("接続済みのためデバイス検索を停止しました。")
+        return self
+
+    @property
+    def rediscovering(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def new_connection_status(self, status) -> None:
+        """pychromecastの接続状態リスナー"""
+        if status.status == CONNECTED:
+            self.failures = 0
+            return
+        if status.status not in FAILED_STATUSES:
+            return
+        self.failures += 1
+        if self.failures < self.rediscover_after:
+            return
+        with self._lock:
+            if self.rediscovering:
+                return
+            self._thread = threading.Thread(
+                target=self.rediscover, name=f"rediscover:{self.name}", daemon=True
+            )
+            self._thread.start()
+
+    def rediscover(self) -> bool:
+        """
+        デバイスを検索し、ホストが変わっていれば再接続先を切り替える
+
+        Returns:
+            bool: 再接続先を切り替えた場合True
+        """
+        client = self.cast.socket_client
+        logging.warning(
+            "%s (%s:%s) に再接続できません。デバイスを再検索します。",
+            self.name, client.host, client.port,
+        )
+        metrics.REDISCOVERIES.labels(self.name).inc()
+        try:
+            cast_info = self._rediscover(self.name, self.uuid, self.discovery_timeout)
+        except Exception as e:
+            logging.error("デバイスの再検索に失敗しました: %s", e)
+            cast_info = None
+        finally:
+            self.failures = 0
+        if cast_info is None:
+            logging.warning("%s が見つかりません。同じホストへの再接続を続けます。", self.name)
+            return False
+        if (cast_info.host, cast_info.port) == (client.host, client.port):
+            logging.info("%s のホストは変わっていません。再接続を続けます。", self.name)
+            return False
+
+        logging.info(
+            "%s の再接続先を %s:%d に変更します。", self.name, cast_info.host, cast_info.port
+        )
+        pin_host(self.cast, cast_info.host, cast_info.port)
+        if self.cache is not None:
+            self.cache.store(self.cast.cast_info)
+        return True
@@ -0,0 +1,208 @@
+"""
+キュー経由のログ出力（ファイル・標準出力への書き込みをバックグラウンドスレッドで行う）
+
+制御ループの `logging.info()` はキューに積むだけで戻り、ディスクや標準出力の遅延を待たない。
+ログファイルは状態ディレクトリに置き、サイズまたは日付でローテーションして容量を抑える。
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from .paths import get_state_dir
+
+LOG_FILE_NAME = "nemucast.log"
+LOG_FORMATS = ("text", "json")
+LOG_ROTATIONS = ("size", "time")
+# size ローテーション: 1ファイルの上限（バイト）
+DEFAULT_LOG_MAX_BYTES = 5 * 1024 * 1024
+# 残す古いログファイルの数（time ローテーションでは日数）
+DEFAULT_LOG_BACKUP_COUNT = 5
+# キューに溜められるログの上限。書き込みが追いつかない場合は古いものを待たずに捨てる
+DEFAULT_QUEUE_SIZE = 10000
+
+TEXT_FORMAT = "[%(asctime)s] %(levelname)s: %(message)s"
+
+
+def get_log_dir() -> Path:
+    """
+    ログファイルの保存ディレクトリを返す（存在しなければ作成する）
+
+    環境変数 `LOG_DIR` が無ければ状態ディレクトリの `logs/`。
+    """
+    log_dir = os.getenv("LOG_DIR")
+    path = Path(log_dir).expanduser() if log_dir else get_state_dir() / "logs"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """1行1レコードのJSON形式で出力する"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """キューが満杯なら待たずにレコードを捨てる（制御ループを止めない）"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 引数と例外は呼び出し元のスレッドで文字列にしておく（後から値が変わらないように）。
+        # 標準の prepare と違い、例外はメッセージに混ぜずに exc_text に残す
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """停止時はキューが満杯でも空きを待って終了の目印を入れる"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """
+    ルートロガー → キュー → バックグラウンドの書き込みスレッド → ファイル・標準出力
+
+    Args:
+        level: ログレベル
+        log_dir: ログファイルの保存先（Noneなら `get_log_dir()`）
+        log_format: ファイルの形式（"text" または "json"）
+        rotation: "size"（`max_bytes` ごと）または "time"（毎日0時）
+        max_bytes: size ローテーションの上限（バイト）
+        backup_count: 残す古いログファイルの数
+        stream: 標準出力への出力先（Noneなら出力しない）
+        queue_size: キューに溜められるログの上限
+    """
+
+    def __init__(
+        self,
+        level: int = logging.INFO,
+        log_dir: Optional[Path] = None,
+        log_format: str = "text",
+        rotation: str = "size",
+        max_bytes: int = DEFAULT_LOG_MAX_BYTES,
+        backup_count: int = DEFAULT_LOG_BACKUP_COUNT,
+        stream=sys.stdout,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"未対応のログ形式です: {log_format}")
+        if rotation not in LOG_ROTATIONS:
+            raise ValueError(f"未対応のローテーション方式です: {rotation}")
+        self.level = level
+        self.log_file = (log_dir or get_log_dir()) / LOG_FILE_NAME
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.queue_handler = DroppingQueueHandler(self.queue)
+
+        if rotation == "size":
+            file_handler: logging.Handler = logging.handlers.RotatingFileHandler(
+                self.log_file, maxBytes=max_bytes, backupCount=backup_count,
+                encoding="utf-8", delay=True,
+            )
+        else:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                self.log_file, when="midnight", backupCount=backup_count,
+                encoding="utf-8", delay=True,
+            )
+        file_handler.setFormatter(
+            JsonLinesFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+        )
+        self.handlers: List[logging.Handler] = [file_handler]
+        if stream is not None:
+            stream_handler = logging.StreamHandler(stream)
+            stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+            self.handlers.append(stream_handler)
+        self.listener = _QueueListener(
+            self.queue, *self.handlers, respect_handler_level=False
+        )
+        self._started = False
+
+    @property
+    def dropped(self) -> int:
+        """キューが満杯で捨てたレコードの数"""
+        return self.queue_handler.dropped
+
+    def start(self) -> "LogPipeline":
+        """ルートロガーをキューにつなぎ、書き込みスレッドを開始する"""
+        root = logging.getLogger()
+        root.setLevel(self.level)
+        root.addHandler(self.queue_handler)
+        self.listener.start()
+        self._started = True
+        return self
+
+    def stop(self) -> None:
+        """キューに残ったログを書き出してから停止する"""
+        if not self._started:
+            return
+        self._started = False
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
+        if self.dropped:
+            print(
+                f"ログキューが満杯のため {self.dropped} 件のログを破棄しました。", file=sys.stderr
+            )
+
+
+_pipeline: Optional[LogPipeline] = None
+
+
+def start_logging(**kwargs) -> LogPipeline:
+    """
+    ログ出力を開始する（既に開始していれば止めてから作り直す）
+
+    引数は `LogPipeline` と同じ。プロセス終了時に残りのログを書き出す。
+    """
+    global _pipeline
+    stop_logging()
+    _pipeline = LogPipeline(**kwargs).start()
+    return _pipeline
+
+
+def stop_logging() -> None:
+    """`start_logging()` で開始したログ出力を停止する"""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
+
+
+atexit.register(stop_logging)
@@ -12,12 +12,51 @@ import time
 import logging
 import sys
 import argparse
+import atexit
 from pathlib import Path
-from typing import Optional, Tuple
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from uuid import UUID
 
-import pychromecast
 from dotenv import load_dotenv
 
+from .cache import DEFAULT_CACHE_MAX_AGE, EndpointCache, cache_key, connect_from_cache
+from .commands import (
+    DEFAULT_COMMAND_RETRIES,
+    DEFAULT_COMMAND_TIMEOUT,
+    confirm_quit_app,
+    confirm_set_volume,
+)
+from .deadline import DEFAULT_MISSED_TICK_POLICY, MISSED_TICK_POLICIES
+from .discovery import DEFAULT_DISCOVERY_TIMEOUT, discover_target_chromecast
+from .fade import (
+    DEFAULT_MAX_RATE,
+    PROFILES,
+    build_fade_table,
+    fade_duration,
+    plan_commands,
+    resume_plan,
+)
+from .journal import DEFAULT_JOURNAL_MAX_AGE, DEFAULT_RESUME_POLICY, RESUME_POLICIES, FadeJournal
+from . import events, metrics
+from .logpipeline import (
+    DEFAULT_LOG_BACKUP_COUNT,
+    DEFAULT_LOG_MAX_BYTES,
+    LOG_FORMATS,
+    LOG_ROTATIONS,
+    start_logging,
+)
+from .status import DEFAULT_STATUS_TTL, IDLE_APP_IDS, StatusMonitor
+from .supervisor import DEFAULT_HEARTBEAT_TIMEOUT, DEFAULT_MAX_BACKOFF, ConnectionSupervisor
+from .trace import TraceRecorder, record_stop, trace_path
+
+if TYPE_CHECKING:
+    # pychromecast（zeroconf・protobuf・TLS）の読み込みは重いため、
+    # `--help` や引数の検証では読み込まず、デバイスに接続するときに初めて読み込む
+    import pychromecast
+
+    from .config import ConfigWatcher, LiveSettings, NemucastConfig
+
 # .envファイルを読み込む
 load_dotenv()
 
@@ -26,11 +65,55 @@ CHROMECAST_NAME = os.getenv("CHROMECAST_NAME", "Dell")
 STEP = float(os.getenv("STEP", "-0.04"))
 MIN_LEVEL = float(os.getenv("MIN_LEVEL", "0.3"))
 DEFAULT_INTERVAL_SEC = int(os.getenv("INTERVAL_SEC", "1200"))
+CHROMECAST_UUID = os.getenv("CHROMECAST_UUID")
+CHROMECAST_GROUP = os.getenv("CHROMECAST_GROUP")
+DISCOVERY_TIMEOUT = float(os.getenv("DISCOVERY_TIMEOUT", str(DEFAULT_DISCOVERY_TIMEOUT)))
+CACHE_MAX_AGE = float(os.getenv("CACHE_MAX_AGE", str(DEFAULT_CACHE_MAX_AGE)))
+STATUS_TTL = float(os.getenv("STATUS_TTL", str(DEFAULT_STATUS_TTL)))
+HEARTBEAT_TIMEOUT = float(os.getenv("HEARTBEAT_TIMEOUT", str(DEFAULT_HEARTBEAT_TIMEOUT)))
+RECONNECT_MAX_BACKOFF = float(os.getenv("RECONNECT_MAX_BACKOFF", str(DEFAULT_MAX_BACKOFF)))
+FADE_PROFILE = os.getenv("FADE_PROFILE", "step")
+MAX_COMMAND_RATE = float(os.getenv("MAX_COMMAND_RATE", str(DEFAULT_MAX_RATE)))
+IDLE_POLL_SEC = float(os.getenv("IDLE_POLL_SEC", "300"))
+MISSED_TICK_POLICY = os.getenv("MISSED_TICK_POLICY", DEFAULT_MISSED_TICK_POLICY)
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", str(DEFAULT_COMMAND_TIMEOUT)))
+COMMAND_RETRIES = int(os.getenv("COMMAND_RETRIES", str(DEFAULT_COMMAND_RETRIES)))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_JSON = os.getenv("METRICS_JSON")
+RESUME_POLICY = os.getenv("RESUME_POLICY", DEFAULT_RESUME_POLICY)
+JOURNAL_MAX_AGE = float(os.getenv("JOURNAL_MAX_AGE", str(DEFAULT_JOURNAL_MAX_AGE)))
+SCHEDULE_FILE = os.getenv("SCHEDULE_FILE")
+CONFIG_FILE = os.getenv("CONFIG_FILE")
+TRACE_DIR = os.getenv("TRACE_DIR")
+# カンマ区切りで複数指定できる
+EVENT_WEBHOOK_URLS = [url for url in os.getenv("EVENT_WEBHOOK_URL", "").split(",") if url.strip()]
+EVENTS_PORT = int(os.getenv("EVENTS_PORT", "0"))
 # ========================
 
+# 設定ファイルの項目と、同じ設定のコマンドライン引数（`dest`）
+CONFIG_ARGS = {
+    "profile": "profile",
+    "interval_sec": "interval",
+    "step": "step",
+    "min_level": "min_level",
+    "duration_sec": "fade_duration",
+    "max_rate": "max_rate",
+    "missed_tick_policy": "missed_tick",
+    "until_media_end": "until_media_end",
+}
+
+
+def parse_args(args=None, config: Optional["NemucastConfig"] = None):
+    """
+    コマンドライン引数を解析する
+
+    `--config` の設定ファイル（または `config`）があれば、その値を引数のデフォルトにする
+    （優先順位: コマンドライン引数 > 設定ファイル > 環境変数）。
 
-def parse_args(args=None):
-    """コマンドライン引数を解析する"""
+    Args:
+        args: 引数のリスト（省略時は `sys.argv[1:]`）
+        config: 読み込み済みの設定（再読み込み時に使う。省略時は `--config` のファイルを読む）
+    """
     parser = argparse.ArgumentParser(
         description="Chromecast / Google TV の音量を定期的に下げるスクリプト"
     )
@@ -58,29 +141,216 @@ def parse_args(args=None):
         default=MIN_LEVEL,
         help=f"最小音量レベル。デフォルト: {MIN_LEVEL}"
     )
+    parser.add_argument(
+        "-u", "--uuid",
+        type=UUID,
+        default=UUID(CHROMECAST_UUID) if CHROMECAST_UUID else None,
+        help="ChromecastのUUID。指定すると名前より優先して照合します"
+    )
+    parser.add_argument(
+        "--discovery-timeout",
+        type=float,
+        default=DISCOVERY_TIMEOUT,
+        help=f"デバイス検索の最大待ち時間（秒）。デフォルト: {DISCOVERY_TIMEOUT}"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="接続先キャッシュを使わずに毎回デバイスを検索する"
+    )
+    parser.add_argument(
+        "-p", "--profile",
+        choices=PROFILES,
+        default=FADE_PROFILE,
+        help=f"フェードカーブ。step 以外は細かい分解能で滑らかに下げる。デフォルト: {FADE_PROFILE}"
+    )
+    parser.add_argument(
+        "--fade-duration",
+        type=float,
+        default=None,
+        help="最小音量に到達するまでの時間（秒）。デフォルト: ステップ式と同じ到達時刻"
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=MAX_COMMAND_RATE,
+        help=f"1秒あたりの音量コマンド送信数の上限。デフォルト: {MAX_COMMAND_RATE}"
+    )
+    parser.add_argument(
+        "--idle-poll",
+        type=float,
+        default=IDLE_POLL_SEC,
+        help=f"アイドル中、状態通知が無くても状態を確認する間隔（秒）。デフォルト: {IDLE_POLL_SEC}"
+    )
+    parser.add_argument(
+        "-d", "--device",
+        action="append",
+        metavar="NAME[:STEP[:MIN_LEVEL[:INTERVAL]]]",
+        help="複数デバイスを1プロセスで制御する（繰り返し指定可）。省略した項目は他のオプションの値を使う"
+    )
+    parser.add_argument(
+        "-g", "--group",
+        default=CHROMECAST_GROUP,
+        metavar="NAME",
+        help="キャストグループ（マルチルームのスピーカーグループ）の名前。メンバーを同時に同じステップで下げる"
+    )
+    parser.add_argument(
+        "--until-media-end",
+        action="store_true",
+        help="再生中のメディア（エピソードや曲）の終了時刻にちょうど最小音量へ到達するよう下げ、"
+             "終了と同時にスタンバイにする。長さの分からないメディアでは通常のフェードになる"
+    )
+    parser.add_argument(
+        "--status-ttl",
+        type=float,
+        default=STATUS_TTL,
+        help=f"状態スナップショットを問い合わせなしで信用する時間（秒）。デフォルト: {STATUS_TTL}"
+    )
+    parser.add_argument(
+        "--heartbeat-timeout",
+        type=float,
+        default=HEARTBEAT_TIMEOUT,
+        help="デバイスからの応答がこの時間（秒）途絶えたら切断とみなし、フェードを止めて再接続する。"
+             f"デフォルト: {HEARTBEAT_TIMEOUT}"
+    )
+    parser.add_argument(
+        "--max-backoff",
+        type=float,
+        default=RECONNECT_MAX_BACKOFF,
+        help="再接続の間隔の上限（秒）。1秒から失敗するたびに2倍にする。"
+             f"デフォルト: {RECONNECT_MAX_BACKOFF}"
+    )
+    parser.add_argument(
+        "--missed-tick",
+        choices=MISSED_TICK_POLICIES,
+        default=MISSED_TICK_POLICY,
+        help="サスペンドなどで期限を過ぎた周期の扱い（skip: 捨てる / coalesce: 1回にまとめる / "
+             f"catchup: すべて実行する）。デフォルト: {MISSED_TICK_POLICY}"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help="Prometheus形式のメトリクスを http://127.0.0.1:PORT/metrics で公開する（0で無効）。"
+             f"デフォルト: {METRICS_PORT}"
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=Path,
+        default=METRICS_JSON,
+        metavar="PATH",
+        help="終了時にメトリクスをJSONで書き出すファイル"
+    )
+    parser.add_argument(
+        "--event-webhook",
+        action="append",
+        default=None,
+        metavar="URL",
+        help="音量の変更・スタンバイ・アイドルで見送った周期のイベントをまとめてJSONでPOSTするURL"
+             "（繰り返し指定可）。デフォルト: $EVENT_WEBHOOK_URL"
+    )
+    parser.add_argument(
+        "--events-port",
+        type=int,
+        default=EVENTS_PORT,
+        help="イベントを http://127.0.0.1:PORT/events でServer-Sent Eventsとして配信する"
+             f"（0で無効）。デフォルト: {EVENTS_PORT}"
+    )
+    parser.add_argument(
+        "--on-interrupted",
+        choices=RESUME_POLICIES,
+        default=RESUME_POLICY,
+        help="前回のフェードが異常終了などで途中で終わっていた場合の扱い"
+             "（resume: 続きから再開する / restore: 音量を起動時の値に戻して始め直す）。"
+             f"デフォルト: {RESUME_POLICY}"
+    )
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help="フェードのジャーナルを記録しない（異常終了すると起動時の音量が失われる）"
+    )
+    parser.add_argument(
+        "--config",
+        type=Path,
+        default=CONFIG_FILE,
+        metavar="PATH",
+        help="デバイスごとのフェードの設定ファイル（TOML）。コマンドライン引数で指定した値が優先。"
+             "実行中に変更すると、接続を保ったまま新しい設定でフェードを続ける。"
+             "デフォルト: $CONFIG_FILE"
+    )
+    parser.add_argument(
+        "--trace-dir",
+        type=Path,
+        default=TRACE_DIR,
+        metavar="DIR",
+        help="状態通知と送信したコマンドをトレースファイルに記録する"
+             "（nemucast replay で再生できる）。デフォルト: $TRACE_DIR"
+    )
+    parsed = parser.parse_args(args)
+    if config is None and parsed.config is not None:
+        from .config import load_config
+
+        try:
+            config = load_config(parsed.config)
+        except (OSError, ValueError) as e:
+            parser.error(f"設定ファイルを読み込めません: {e}")
+    if config is None:
+        return parsed
+
+    # 名前が決まってからデバイスごとの設定を読む
+    if config.device:
+        parser.set_defaults(name=config.device)
+        parsed = parser.parse_args(args)
+    parser.set_defaults(**{
+        CONFIG_ARGS[key]: value for key, value in config.params_for(parsed.name).items()
+    })
     return parser.parse_args(args)
 
 
+def fade_params_from_args(args) -> dict:
+    """コマンドライン引数のフェードの設定（`daemon.FadeParams` の項目名）"""
+    return {key: getattr(args, dest) for key, dest in CONFIG_ARGS.items()}
+
+
 def setup_logging() -> None:
-    """ロギングの設定を行う"""
-    log_dir = Path(__file__).resolve().parent / "logs"
-    log_dir.mkdir(exist_ok=True)
-    log_file = log_dir / "lower_cast_volume.log"
+    """
+    ロギングの設定を行う
 
+    ログはキュー経由でバックグラウンドスレッドが書き出すため、制御ループはディスクや
+    標準出力を待たない。ログファイルは `LOG_DIR`（デフォルトは状態ディレクトリの `logs/`）に置き、
+    `LOG_ROTATION` に従ってローテーションする。
+    `LOG_FORMAT` / `LOG_ROTATION` が未対応の値ならエラーを記録してデフォルトで続ける。
+    """
     # 環境変数でログレベルを設定可能にする
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
-    
-    logging.basicConfig(
+
+    values = {}
+    invalid = []
+    for name, choices, default in (
+        ("LOG_FORMAT", LOG_FORMATS, "text"),
+        ("LOG_ROTATION", LOG_ROTATIONS, "size"),
+    ):
+        value = os.getenv(name, default).lower()
+        if value not in choices:
+            invalid.append((name, value, choices, default))
+            value = default
+        values[name] = value
+
+    start_logging(
         level=getattr(logging, log_level, logging.INFO),
-        format="[%(asctime)s] %(levelname)s: %(message)s",
-        handlers=[
-            logging.FileHandler(log_file, encoding="utf-8"),
-            logging.StreamHandler(sys.stdout),
-        ],
+        log_format=values["LOG_FORMAT"],
+        rotation=values["LOG_ROTATION"],
+        max_bytes=int(os.getenv("LOG_MAX_BYTES", str(DEFAULT_LOG_MAX_BYTES))),
+        backup_count=int(os.getenv("LOG_BACKUP_COUNT", str(DEFAULT_LOG_BACKUP_COUNT))),
     )
+    for name, value, choices, default in invalid:
+        logging.error(
+            "%s=%s には対応していません（%s のいずれか）。%s を使います。",
+            name, value, " / ".join(choices), default,
+        )
 
 
-def discover_chromecasts(target_name: str) -> Tuple[Optional[pychromecast.Chromecast], Optional[pychromecast.discovery.CastBrowser]]:
+def discover_chromecasts(target_name: str) -> Tuple[Optional["pychromecast.Chromecast"], Optional["pychromecast.discovery.CastBrowser"]]:
     """
     Chromecastデバイスを検索し、指定された名前のデバイスを返す
     
@@ -90,9 +360,15 @@ def discover_chromecasts(target_name: str) -> Tuple[Optional[pychromecast.Chrome
     Returns:
         (cast, browser): 見つかったChromecastとブラウザオブジェクト
     """
+    import pychromecast
+
     logging.info("Chromecast デバイスを検索しています...")
     
+    started = time.monotonic()
     chromecasts, browser = pychromecast.get_chromecasts()
+    elapsed = time.monotonic() - started
+    metrics.DISCOVERY_SECONDS.labels("get_chromecasts").observe(elapsed)
+    logging.info("デバイス検索時間: %.3f秒", elapsed)
     
     if not chromecasts:
         logging.error("ネットワーク上で Chromecast が見つかりませんでした。")
@@ -110,19 +386,80 @@ def discover_chromecasts(target_name: str) -> Tuple[Optional[pychromecast.Chrome
     return None, browser
 
 
+def connect_chromecast(
+    target_name: str,
+    target_uuid: Optional[UUID],
+    discovery_timeout: float,
+    cache: Optional[EndpointCache],
+    cache_max_age: float = CACHE_MAX_AGE,
+) -> Tuple[Optional["pychromecast.Chromecast"], Optional["pychromecast.discovery.CastBrowser"]]:
+    """
+    Chromecastに接続する
+
+    キャッシュが新しければmDNS検索をせずに直接接続し、
+    キャッシュが無い・古い・接続できない場合のみデバイス検索を行う。
+    キャッシュはUUIDが指定されていればUUID、無ければ指定された名前をキーにする。
+
+    Returns:
+        (cast, browser): 接続したChromecastとブラウザオブジェクト（キャッシュ接続時はNone）
+    """
+    key = cache_key(target_name, target_uuid)
+    if cache is not None:
+        entry = cache.get(key)
+        if entry is None:
+            logging.info("接続先キャッシュがありません。デバイスを検索します。")
+        elif target_uuid is not None and entry.uuid != str(target_uuid):
+            logging.info("キャッシュのUUIDが一致しません。デバイスを検索します。")
+        elif entry.is_stale(cache_max_age):
+            logging.info("接続先キャッシュが古いため、デバイスを検索します。")
+        else:
+            cast = connect_from_cache(entry)
+            if cast is not None:
+                cache.store(cast.cast_info, key)
+                return cast, None
+
+    cast, browser, _ = discover_target_chromecast(target_name, target_uuid, discovery_timeout)
+    if cast is not None and cache is not None:
+        cache.store(cast.cast_info, key)
+    return cast, browser
+
 
 
-def log_chromecast_status(cast) -> None:
+
+def get_media_status(cast, monitor: Optional[StatusMonitor] = None):
+    """
+    メディアの状態を取得する
+
+    monitorがあればスナップショットを返し、TTLを過ぎている場合だけ問い合わせる。
+    monitorが無ければ毎回 GET_STATUS を送信する。
+    """
+    if monitor is not None:
+        monitor.refresh()
+        return monitor.media_status
+    with metrics.time_rpc("update_status", cast):
+        cast.media_controller.update_status()
+    return getattr(cast.media_controller, 'status', None)
+
+
+def get_cast_status(cast, monitor: Optional[StatusMonitor] = None):
+    """受信機の状態（音量・app_idなど）を取得する"""
+    if monitor is not None:
+        monitor.refresh()
+        return monitor.cast_status
+    return cast.status
+
+
+def log_chromecast_status(cast, monitor: Optional[StatusMonitor] = None) -> None:
     """Chromecastの現在の状態をログ出力する"""
-    if cast.status.app_id:
+    if get_cast_status(cast, monitor).app_id:
         logging.info("Chromecast状態: アクティブ")
         
         # メディアコントローラーの情報も確認
         try:
-            cast.media_controller.update_status()
-            if cast.media_controller.status:
-                if cast.media_controller.status.player_state:
-                    logging.info("メディア状態: %s", cast.media_controller.status.player_state)
+            media_status = get_media_status(cast, monitor)
+            if media_status:
+                if media_status.player_state:
+                    logging.info("メディア状態: %s", media_status.player_state)
         except:
             pass
     else:
@@ -136,34 +473,42 @@ def log_active_app_status(cast) -> None:
             logging.info("再生状態: %s", cast.media_controller.status.player_state)
 
 
-def is_chromecast_active(cast) -> bool:
+def is_chromecast_active(cast, monitor: Optional[StatusMonitor] = None) -> bool:
     """
     Chromecastが実際にアクティブかどうかを確認する
     
+    Args:
+        cast: Chromecastオブジェクト
+        monitor: 状態スナップショット（指定時は毎回の問い合わせを省略する）
+    
     Returns:
         bool: アクティブならTrue、アイドル/スタンバイ状態ならFalse
     """
+    if monitor is not None and not monitor.connected:
+        logging.debug("Chromecastとの接続が切れています")
+        return False
     try:
+        status = get_cast_status(cast, monitor)
         # デバッグ情報を表示
-        logging.debug(f"Cast status - app_id: {cast.status.app_id}, "
-                     f"is_active_input: {cast.status.is_active_input}, "
-                     f"is_stand_by: {cast.status.is_stand_by}")
+        logging.debug(f"Cast status - app_id: {status.app_id}, "
+                     f"is_active_input: {status.is_active_input}, "
+                     f"is_stand_by: {status.is_stand_by}")
         
         # app_idがNoneの場合はアイドル状態
-        if cast.status.app_id is None:
+        if status.app_id is None:
             logging.debug("Chromecast is idle (no app running)")
             return False
             
         # IDLE_APP_IDまたはBackdropアプリの場合はアイドル状態
-        if cast.status.app_id in [pychromecast.IDLE_APP_ID, 'E8C28D3C', 'Backdrop']:
-            logging.debug(f"Chromecast is idle (app_id: {cast.status.app_id})")
+        if status.app_id in IDLE_APP_IDS:
+            logging.debug(f"Chromecast is idle (app_id: {status.app_id})")
             return False
         
         # メディアコントローラーの状態も確認
         try:
-            cast.media_controller.update_status()
-            if hasattr(cast.media_controller, 'status') and cast.media_controller.status:
-                player_state = cast.media_controller.status.player_state
+            media_status = get_media_status(cast, monitor)
+            if media_status:
+                player_state = media_status.player_state
                 logging.debug(f"Media player state: {player_state}")
                 # メディアが再生中または一時停止中の場合はアクティブ
                 if player_state in ['PLAYING', 'PAUSED', 'BUFFERING']:
@@ -172,28 +517,104 @@ def is_chromecast_active(cast) -> bool:
             pass
         
         # 何かアプリが起動している（AndroidNativeApp、YouTube、Netflixなど）
-        logging.debug(f"Chromecast is active - app_id: {cast.status.app_id}")
+        logging.debug(f"Chromecast is active - app_id: {status.app_id}")
         return True
         
     except Exception as e:
         logging.warning(f"Chromecastの状態確認に失敗しました: {e}")
-        # エラーの場合は動作を継続するためTrueを返す
-        return True
+        # エラーの場合は動作を継続するためTrueを返す（接続が切れていればフェードを止める）
+        return monitor is None or monitor.connected
 
 
-def get_initial_volume(cast) -> float:
+def get_initial_volume(cast, monitor: Optional[StatusMonitor] = None) -> float:
     """起動時の音量を取得する"""
-    cast.media_controller.update_status()
-    initial_volume = cast.status.volume_level
+    if monitor is not None:
+        initial_volume = get_cast_status(cast, monitor).volume_level
+    else:
+        with metrics.time_rpc("update_status", cast):
+            cast.media_controller.update_status()
+        initial_volume = cast.status.volume_level
     if initial_volume is None:
         logging.warning("起動時の音量を取得できませんでした。0.5を使用します。")
         initial_volume = 0.5
     else:
         logging.info("起動時の音量を保存しました: %.2f", initial_volume)
+    metrics.record_volume(cast, initial_volume, "initial")
+    metrics.record_volume(cast, initial_volume)
     return initial_volume
 
 
-def adjust_volume(cast, current_volume: float, step: float, min_level: float) -> Optional[float]:
+def _merge_journal_params(params: dict, recorded: dict) -> None:
+    """ジャーナルに記録された設定で `params` を上書きする（不正なら上書きしない）"""
+    from .config import validate_fade_params
+
+    merged = {**params, **{key: value for key, value in recorded.items() if key in params}}
+    try:
+        validate_fade_params(merged)
+    except ValueError as e:
+        logging.warning("ジャーナルのフェード設定が不正なため、現在の設定で再開します: %s", e)
+        return
+    if merged != params:
+        logging.info("ジャーナルに記録された設定で再開します。")
+        params.update(merged)
+
+
+def begin_fade(
+    cast,
+    journal: Optional[FadeJournal],
+    monitor: Optional[StatusMonitor] = None,
+    params: Optional[dict] = None,
+    policy: str = RESUME_POLICY,
+    max_age: float = JOURNAL_MAX_AGE,
+) -> Tuple[float, Optional[float]]:
+    """
+    フェード開始時の音量を決めてジャーナルに記録する
+
+    前回のフェードが途中で終わっていれば（ジャーナルが残っていれば）、今の音量ではなく
+    ジャーナルの起動時の音量を使う。`policy` が resume で最後の記録から `max_age` 秒以内なら
+    続きから再開し、それ以外は音量を起動時の値に戻してから始め直す。
+    再開する場合は、ジャーナルに記録された設定（設定ファイルの再読み込みで変わったもの）で
+    `params` をその場で上書きし、呼び出し側はその設定で続ける。
+
+    Returns:
+        (initial_volume, resume_level): 起動時の音量と、再開する場合は最後に送信した音量
+    """
+    state = journal.load() if journal is not None else None
+    resume_level = None
+    if state is None:
+        initial_volume = get_initial_volume(cast, monitor)
+    else:
+        initial_volume = state.initial_volume
+        metrics.record_volume(cast, initial_volume, "initial")
+        if policy == "resume" and state.age() <= max_age:
+            resume_level = state.level
+            logging.warning(
+                "前回のフェードが途中で終わっています。"
+                "続きから再開します（起動時の音量 %.2f、最後の音量 %s）。",
+                initial_volume, "なし" if resume_level is None else f"{resume_level:.2f}",
+            )
+            if params is not None and state.params:
+                _merge_journal_params(params, state.params)
+        else:
+            logging.warning(
+                "前回のフェードが途中で終わっています。音量を起動時の %.2f に戻してから始めます。",
+                initial_volume,
+            )
+            if confirm_set_volume(cast, initial_volume, monitor, COMMAND_TIMEOUT, COMMAND_RETRIES):
+                logging.info("音量を初期値 %.2f に戻しました。", initial_volume)
+    if journal is not None:
+        info = cast.cast_info
+        journal.begin(info.friendly_name, str(info.uuid), initial_volume, params, resume_level)
+    return initial_volume, resume_level
+
+
+def adjust_volume(
+    cast,
+    current_volume: float,
+    step: float,
+    min_level: float,
+    monitor: Optional[StatusMonitor] = None,
+) -> Optional[float]:
     """
     音量を調整する
     
@@ -202,6 +623,7 @@ def adjust_volume(cast, current_volume: float, step: float, min_level: float) ->
         current_volume: 現在の音量
         step: 音量調整ステップ
         min_level: 最小音量レベル
+        monitor: 状態スナップショット（反映の確認に使う）
         
     Returns:
         新しい音量レベル、または最小レベルに達した場合はNone
@@ -211,63 +633,355 @@ def adjust_volume(cast, current_volume: float, step: float, min_level: float) ->
         return None
     
     new_level = max(min_level-1, round(current_volume + step, 2))
-    cast.set_volume(new_level)
-    logging.info("音量を %.2f → %.2f へ変更しました", current_volume, new_level)
+    # 反映を確認できなければ再送する（それでも失敗した場合は次の周期に最新の音量から続ける）
+    confirmed = confirm_set_volume(cast, new_level, monitor, COMMAND_TIMEOUT, COMMAND_RETRIES)
+    if confirmed:
+        logging.info("音量を %.2f → %.2f へ変更しました", current_volume, new_level)
+    events.emit(
+        events.VOLUME_CHANGED, cast, level=new_level, previous=current_volume, confirmed=confirmed
+    )
     return new_level
 
 
-def restore_volume_and_standby(cast, initial_volume: float) -> None:
-    """音量を初期値に戻してスタンバイモードにする"""
+def restore_volume_and_standby(
+    cast, initial_volume: float, monitor: Optional[StatusMonitor] = None
+) -> None:
+    """
+    音量を初期値に戻してスタンバイモードにする
+
+    固定時間は待たず、デバイスが音量・アプリ終了の反映を返した時点で次へ進む。
+    """
     # ボリュームを初期値に戻す
-    cast.set_volume(initial_volume)
-    logging.info("音量を初期値 %.2f に戻しました。", initial_volume)
-    time.sleep(2)  # 音量設定が反映されるまで待機
+    restored = confirm_set_volume(cast, initial_volume, monitor, COMMAND_TIMEOUT, COMMAND_RETRIES)
+    if restored:
+        logging.info("音量を初期値 %.2f に戻しました。", initial_volume)
+    events.emit(events.VOLUME_RESTORED, cast, level=initial_volume, confirmed=restored)
     
     # Chromecastの電源を切る（スタンバイモードにする）
     # 既にスタンバイ状態でないかチェック
-    if is_chromecast_active(cast):
+    if is_chromecast_active(cast, monitor):
         logging.info("Chromecastをスタンバイモードにします。")
-        cast.quit_app()
-        time.sleep(2)  # 処理が完了するまで待機
-        logging.info("Chromecastがスタンバイモードになりました。")
+        confirmed = confirm_quit_app(cast, monitor, COMMAND_TIMEOUT, COMMAND_RETRIES)
+        if confirmed:
+            logging.info("Chromecastがスタンバイモードになりました。")
+        events.emit(events.STANDBY, cast, confirmed=confirmed, already=False)
     else:
         logging.info("Chromecastは既にスタンバイ状態です。")
+        events.emit(events.STANDBY, cast, confirmed=True, already=True)
 
 
-def volume_control_loop(cast, interval_sec: int, step: float, min_level: float, initial_volume: float) -> None:
-    """メインの音量制御ループ"""
-    while True:
-        # Chromecastがアクティブかどうかチェック
-        if not is_chromecast_active(cast):
-            logging.info("Chromecastはアイドル状態です。音量調整をスキップします。")
-            time.sleep(interval_sec)
-            continue
-        
-        # アクティブな場合、起動中のアプリをログ出力
-        log_active_app_status(cast)
-        
-        # 最新のステータスを更新して取得
+# 音量を取得できなかった場合に再試行するまでの時間（秒）
+RETRY_SEC = 5
+
+
+@dataclass(frozen=True)
+class StepResult:
+    """音量制御1回分の結果"""
+
+    # 次の実行までの待ち時間（秒）
+    delay: float
+    # 音量を取得できず、周期の途中でやり直す場合True
+    retry: bool = False
+
+
+def get_current_volume(cast, monitor: Optional[StatusMonitor] = None) -> Optional[float]:
+    """最新の音量を取得する（monitorがあれば直前の判定で得た状態を再利用）"""
+    if monitor is not None:
+        return monitor.volume_level
+    with metrics.time_rpc("update_status", cast):
         cast.media_controller.update_status()
-        cur = cast.status.volume_level
-        if cur is None:
-            logging.warning("音量レベルを取得できませんでした。再試行します。")
-            time.sleep(5)
-            continue
-            
-        logging.info("現在の音量: %.2f", cur)
+    return cast.status.volume_level
+
+
+def volume_control_step(
+    cast,
+    interval_sec: int,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    monitor: Optional[StatusMonitor] = None,
+) -> Optional[StepResult]:
+    """
+    音量制御を1回分実行する
+
+    Returns:
+        次の実行までの待ち時間と再試行かどうか、最小音量に到達して終了した場合はNone
+    """
+    # Chromecastがアクティブかどうかチェック
+    if not is_chromecast_active(cast, monitor):
+        logging.info("Chromecastはアイドル状態です。音量調整をスキップします。")
+        metrics.record_idle_skip(cast)
+        events.emit(events.IDLE_SKIP, cast)
+        return StepResult(interval_sec)
+    
+    # アクティブな場合、起動中のアプリをログ出力
+    log_active_app_status(cast)
+    
+    cur = get_current_volume(cast, monitor)
+    if cur is None:
+        logging.warning("音量レベルを取得できませんでした。再試行します。")
+        return StepResult(RETRY_SEC, retry=True)
         
-        # 音量を調整
-        new_volume = adjust_volume(cast, cur, step, min_level)
-        if new_volume is None:
-            # 最小音量に到達した場合
-            restore_volume_and_standby(cast, initial_volume)
-            logging.info("プログラムを終了します。")
-            break
+    logging.info("現在の音量: %.2f", cur)
+    
+    # 音量を調整
+    new_volume = adjust_volume(cast, cur, step, min_level, monitor)
+    if new_volume is None:
+        # 最小音量に到達した場合
+        restore_volume_and_standby(cast, initial_volume, monitor)
+        return None
+
+    return StepResult(interval_sec)
+
+
+def volume_control_loop(
+    cast,
+    interval_sec: int,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    monitor: Optional[StatusMonitor] = None,
+    idle_poll_sec: float = IDLE_POLL_SEC,
+    missed_tick_policy: str = MISSED_TICK_POLICY,
+    lateness_stats=None,
+    journal: Optional[FadeJournal] = None,
+    settings: Optional["LiveSettings"] = None,
+) -> None:
+    """
+    メインの音量制御ループ
+
+    asyncioエンジン（`aio.py`）の同期ラッパー。アイドル中は再生開始の状態通知を待ち、
+    待機中もSIGTERM/SIGINTに即応して音量を初期値に戻してから戻る。
+    音量調整は単調時計上の絶対期限で行い、処理時間による遅れを積み重ねない。
+    `settings` が差し替えられたら、次の周期から新しい設定で下げる。
+    """
+    from .aio import run_async_volume_control
+
+    run_async_volume_control(
+        cast, interval_sec, step, min_level, initial_volume, monitor, idle_poll_sec,
+        missed_tick_policy=missed_tick_policy, lateness_stats=lateness_stats, journal=journal,
+        settings=settings,
+    )
+
+
+def plan_profile_fade(
+    profile: str,
+    interval_sec: float,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    duration_sec: Optional[float] = None,
+    max_rate: float = DEFAULT_MAX_RATE,
+):
+    """
+    フェードカーブの送信計画を作成してログ出力する
+
+    `duration_sec` を省略した場合はステップ式と同じ時刻に最小音量へ到達させる。
+    """
+    if duration_sec is None:
+        duration_sec = fade_duration(initial_volume, min_level, step, interval_sec)
+    table = build_fade_table(profile, initial_volume, min_level, duration_sec)
+    plan = plan_commands(table, initial_volume, max_rate=max_rate)
+    logging.info(
+        "フェードカーブ: %s, %.0f秒で %.2f → %.2f（音量コマンド %d 回）",
+        profile, duration_sec, initial_volume, min_level, len(plan),
+    )
+    return plan
+
+
+def profile_fade_loop(
+    cast,
+    profile: str,
+    interval_sec: int,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    monitor: Optional[StatusMonitor] = None,
+    duration_sec: Optional[float] = None,
+    max_rate: float = DEFAULT_MAX_RATE,
+    idle_poll_sec: float = IDLE_POLL_SEC,
+    missed_tick_policy: str = MISSED_TICK_POLICY,
+    lateness_stats=None,
+    journal: Optional[FadeJournal] = None,
+    resume_level: Optional[float] = None,
+    settings: Optional["LiveSettings"] = None,
+) -> None:
+    """
+    フェードカーブに沿って音量を下げる（`--profile` が step 以外の場合）
+
+    カーブを事前計算し、丸めた音量が変わる時点だけ `set_volume` を送信する。
+    `resume_level` を指定した場合は、その音量より後の送信だけを続ける。
+    `settings` が差し替えられたら、今の音量から残りの計画を作り直す。
+    """
+    plan = plan_profile_fade(
+        profile, interval_sec, step, min_level, initial_volume, duration_sec, max_rate
+    )
+    if resume_level is not None:
+        plan = resume_plan(plan, resume_level)
+        logging.info("%.2f から再開します（残りの音量コマンド %d 回）", resume_level, len(plan))
+
+    from .aio import run_async_profile_fade
+
+    run_async_profile_fade(
+        cast, plan, initial_volume, monitor, idle_poll_sec,
+        missed_tick_policy=missed_tick_policy, lateness_stats=lateness_stats, journal=journal,
+        settings=settings,
+    )
+
+
+def media_fade_loop(
+    cast,
+    profile: str,
+    step: float,
+    min_level: float,
+    initial_volume: float,
+    monitor: StatusMonitor,
+    max_rate: float = DEFAULT_MAX_RATE,
+    idle_poll_sec: float = IDLE_POLL_SEC,
+    journal: Optional[FadeJournal] = None,
+    resume_level: Optional[float] = None,
+    settings: Optional["LiveSettings"] = None,
+) -> bool:
+    """
+    再生中のメディアの終了時刻に合わせて音量を下げる（`--until-media-end`）
+
+    Returns:
+        bool: メディアの長さが分からず開始できなかった場合False（呼び出し側は通常のフェードにする）
+    """
+    if monitor.media_position() is None:
+        logging.warning("再生中のメディアの長さが分からないため、通常のフェードにします。")
+        return False
+
+    from .aio import run_async_media_fade
+
+    run_async_media_fade(
+        cast, profile, step, min_level, initial_volume, monitor, max_rate, idle_poll_sec,
+        journal, resume_level, settings,
+    )
+    return True
+
+
+def update_fade_settings(
+    name: str, settings: "LiveSettings", values: dict, journal: Optional[FadeJournal] = None
+) -> bool:
+    """
+    実行中のフェードの設定（`config.LiveSettings`）に変わった項目 `values` を反映する
 
-        time.sleep(interval_sec)
+    反映した設定はジャーナルにも記録し、異常終了後はその設定で再開する。
+
+    Returns:
+        bool: 新しい設定に差し替えた場合True
+    """
+    current = settings.current
+    try:
+        params, deferred = current.apply_changes(values)
+    except ValueError as e:
+        logging.error("%s に新しい設定を反映できません: %s", name, e)
+        return False
+    if deferred:
+        logging.warning(
+            "%s: %s の変更はフェードの進め方が変わるため、次のフェードから使います。",
+            name, ", ".join(deferred),
+        )
+    if params == current:
+        return False
+    settings.update(params)
+    if journal is not None:
+        journal.record_params(asdict(params))
+    logging.info(
+        "%s のフェードに新しい設定を反映しました: %s", name,
+        ", ".join(f"{key}={getattr(params, key)}" for key in values if key not in deferred),
+    )
+    return True
+
+
+def watch_config(
+    path: Path, argv, name: str, settings: "LiveSettings", journal: Optional[FadeJournal] = None
+) -> "ConfigWatcher":
+    """
+    設定ファイルの変更を実行中のフェードに反映する監視を開始する
+
+    読み直すたびに同じコマンドライン引数を新しい設定で解析し直すため、コマンドラインで
+    指定した値は変わらず、設定ファイルから削除した項目は環境変数の値に戻る。
+    """
+    from .config import ConfigWatcher
+
+    # デバイスは接続中のものに固定する（設定ファイルの device を変えても切り替えない）
+    argv = [*argv, "--name", name]
+
+    def on_reload(config) -> None:
+        target = fade_params_from_args(parse_args(argv, config))
+        values = {
+            key: value for key, value in target.items() if getattr(settings.current, key) != value
+        }
+        if values:
+            update_fade_settings(name, settings, values, journal)
+
+    return ConfigWatcher(path, on_reload).start()
+
+
+def start_metrics(port: int, json_path: Optional[Path]) -> None:
+    """
+    メトリクスの公開と終了時の書き出しを設定する
+
+    公開に失敗しても音量制御は続ける。
+    """
+    if port:
+        try:
+            server = metrics.start_metrics_server(port)
+            atexit.register(server.stop)
+        except OSError as e:
+            logging.error("メトリクスを公開できませんでした (ポート %d): %s", port, e)
+    if json_path is not None:
+        atexit.register(metrics.dump_json, json_path)
+
+
+def start_events(webhooks: Optional[List[str]], port: int) -> None:
+    """
+    イベントのWebhookへの送信とSSEでの配信を開始する
+
+    終了時には溜まっているイベント（最後のスタンバイなど）を送り終えるまで少し待つ。
+    開始に失敗しても音量制御は続ける。
+    """
+    from .events import EventStreamServer, WebhookSink
+
+    for url in EVENT_WEBHOOK_URLS if webhooks is None else webhooks:
+        atexit.register(WebhookSink(url.strip()).start().stop)
+    if port:
+        try:
+            server = EventStreamServer(port).start()
+            atexit.register(server.stop)
+        except OSError as e:
+            logging.error("イベントを配信できませんでした (ポート %d): %s", port, e)
+
+
+def stop_discovery(browser) -> None:
+    """デバイス検索を停止する（検索した場合のみ呼ばれるため、ここでpychromecastを読み込む）"""
+    import pychromecast
+
+    pychromecast.stop_discovery(browser)
 
 
 def main() -> None:
+    # サブコマンド（常駐デーモンとその操作、トレースの再生、デバイスの一覧）は
+    # 専用のモジュールに任せる
+    if sys.argv[1:2] == ["daemon"]:
+        from .daemon import daemon_main
+
+        sys.exit(daemon_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["ctl"]:
+        from .ctl import ctl_main
+
+        sys.exit(ctl_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["replay"]:
+        from .replay import replay_main
+
+        sys.exit(replay_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["scan"]:
+        from .scan import scan_main
+
+        sys.exit(scan_main(sys.argv[2:]))
+
     # コマンドライン引数を解析
     args = parse_args()
     interval_sec = args.interval
@@ -283,38 +997,137 @@ def main() -> None:
     logging.info(f"音量調整ステップ: {step}")
     logging.info(f"最小音量レベル: {min_level}")
 
-    # Chromecastを検索
-    cast, browser = discover_chromecasts(chromecast_name)
+    start_metrics(args.metrics_port, args.metrics_json)
+    start_events(args.event_webhook, args.events_port)
+
+    if args.device:
+        # マルチデバイスモード（共有CastBrowser + 1つのスケジューラ）
+        from .multi import DeviceConfig, parse_device_spec, run_multi_device
+
+        default = DeviceConfig(chromecast_name, step, min_level, interval_sec)
+        try:
+            configs = [parse_device_spec(spec, default) for spec in args.device]
+        except ValueError as e:
+            logging.error("デバイス指定が不正です: %s", e)
+            sys.exit(2)
+        if not run_multi_device(
+            configs, args.discovery_timeout, args.status_ttl, args.missed_tick,
+            use_journal=not args.no_journal, heartbeat_timeout=args.heartbeat_timeout,
+            max_backoff=args.max_backoff,
+        ):
+            sys.exit(1)
+        return
+
+    if args.group:
+        # キャストグループモード（メンバーへ同時に音量コマンドを送る）
+        from .group import run_group
+        from .multi import DeviceConfig
+
+        config = DeviceConfig(args.group, step, min_level, interval_sec)
+        if not run_group(
+            config, args.discovery_timeout, args.status_ttl, args.missed_tick,
+            cache=None if args.no_cache else EndpointCache(), use_journal=not args.no_journal,
+        ):
+            sys.exit(1)
+        return
+
+    # Chromecastに接続（キャッシュ優先、必要な場合のみ検索）
+    cache = None if args.no_cache else EndpointCache()
+    cast, browser = connect_chromecast(
+        chromecast_name, args.uuid, args.discovery_timeout, cache
+    )
     if cast is None:
         if browser:
-            pychromecast.stop_discovery(browser)
+            stop_discovery(browser)
         sys.exit(1)
 
+    monitor = None
+    journal = None
+    watcher = None
+    recorder = None
     try:
         logging.info("接続完了: %s (%s)", cast.cast_info.friendly_name, cast.cast_info.host)
         cast.wait()  # ソケット接続確立を待つ
+        metrics.watch_connection(cast)
+
+        # プッシュ通知で状態を受け取るスナップショットを用意
+        monitor = StatusMonitor(cast, ttl=args.status_ttl).attach()
+
+        # 接続後はmDNSの検索を止めて接続を監視し、切断中はフェードを止めて再接続する
+        ConnectionSupervisor(
+            cast, cache, args.discovery_timeout, monitor,
+            heartbeat_timeout=args.heartbeat_timeout, max_backoff=args.max_backoff,
+        ).start(browser)
+        browser = None
         
         # Chromecastの状態をログ出力
-        log_chromecast_status(cast)
+        log_chromecast_status(cast, monitor)
         
-        # 起動時の音量を保存
-        initial_volume = get_initial_volume(cast)
+        # 起動時の音量を保存（前回のフェードが途中で終わっていればジャーナルから復旧）
+        journal = None if args.no_journal else FadeJournal.for_cast(cast)
+        fade_params = fade_params_from_args(args)
+        initial_volume, resume_level = begin_fade(
+            cast, journal, monitor, fade_params, args.on_interrupted
+        )
+        # 再開する場合は、ジャーナルに記録された設定で続ける
+        for key, dest in CONFIG_ARGS.items():
+            setattr(args, dest, fade_params[key])
+        interval_sec, step, min_level = args.interval, args.step, args.min_level
+        if args.trace_dir is not None:
+            recorder = TraceRecorder(trace_path(chromecast_name, args.trace_dir)).start(
+                cast, monitor, initial_volume, resume_level, fade_params,
+                {"idle_poll_sec": args.idle_poll, "status_ttl": args.status_ttl},
+            )
+
+        # 設定ファイルの変更は、接続とフェードの進み具合を保ったまま次の周期から使う
+        settings = None
+        if args.config is not None:
+            from .config import LiveSettings
+            from .daemon import FadeParams
+
+            settings = LiveSettings(FadeParams(**fade_params))
+            watcher = watch_config(args.config, sys.argv[1:], chromecast_name, settings, journal)
 
         # 音量制御ループを開始
-        volume_control_loop(cast, interval_sec, step, min_level, initial_volume)
+        if args.until_media_end and media_fade_loop(
+            cast, args.profile, step, min_level, initial_volume, monitor, args.max_rate,
+            args.idle_poll, journal, resume_level, settings,
+        ):
+            return
+        if args.profile == "step":
+            volume_control_loop(
+                cast, interval_sec, step, min_level, initial_volume, monitor, args.idle_poll,
+                args.missed_tick, journal=journal, settings=settings,
+            )
+        else:
+            profile_fade_loop(
+                cast, args.profile, interval_sec, step, min_level, initial_volume, monitor,
+                duration_sec=args.fade_duration, max_rate=args.max_rate,
+                idle_poll_sec=args.idle_poll, missed_tick_policy=args.missed_tick,
+                journal=journal, resume_level=resume_level, settings=settings,
+            )
         
     except KeyboardInterrupt:
         logging.info("\n中断されました。音量を初期値に戻します...")
+        record_stop(cast)
         try:
-            cast.set_volume(initial_volume)
-            logging.info("音量を初期値 %.2f に戻しました。", initial_volume)
-            time.sleep(1)  # 音量設定が反映されるまで待機
+            if confirm_set_volume(
+                cast, initial_volume, monitor, COMMAND_TIMEOUT, COMMAND_RETRIES
+            ):
+                logging.info("音量を初期値 %.2f に戻しました。", initial_volume)
+                if journal is not None:
+                    journal.complete()
         except Exception as e:
             logging.error("音量の復元に失敗しました: %s", e)
         raise
     finally:
+        if watcher is not None:
+            watcher.stop()
+        if recorder is not None:
+            recorder.stop()
         # Discoveryを適切に停止
-        pychromecast.stop_discovery(browser)
+        if browser:
+            stop_discovery(browser)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,426 @@
+"""
+動作計測（デバイス検索時間、Castコマンドの往復時間、再接続回数、音量など）
+
+記録は常に有効で、1回の記録はロック1つと数回の加算で済む。
+`start_metrics_server()` でPrometheusのテキスト形式を localhost に公開し、
+`dump_json()` で終了時にJSONへ書き出せる。
+"""
+
+import bisect
+import json
+import logging
+import math
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from .clock import monotonic
+
+# 秒単位のヒストグラムの区切り（Castコマンドは数ms〜数秒、デバイス検索は数秒〜十数秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """ラベルの値ごとに子を持つメトリクスの共通部分"""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """ラベルの値に対応する子を返す（無ければ作る）"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} のラベルは {self.labelnames} です: {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        with self._lock:
+            self._children.clear()
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in self._items():
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def to_dict(self) -> dict:
+        return {
+            "type": self.kind,
+            "help": self.help,
+            "samples": [
+                dict(labels=dict(zip(self.labelnames, key)), **self._child_dict(child))
+                for key, child in self._items()
+            ],
+        }
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+
+class _CounterChild(_Value):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_Value):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+
+class _ScalarMetric(_Metric):
+    """子が1つの値だけを持つメトリクス"""
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+    def _child_dict(self, child) -> dict:
+        return {"value": child.value}
+
+
+class Counter(_ScalarMetric):
+    """単調増加するカウンター"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_ScalarMetric):
+    """最新の値を保持するゲージ"""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(上限, その値以下の件数) のリスト（最後は +Inf）"""
+        with self._lock:
+            counts = list(self.counts)
+        total = 0
+        result = []
+        for bound, count in zip(self.bounds + (math.inf,), counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Histogram(_Metric):
+    """値の分布（Prometheusのヒストグラム形式）"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, key, child) -> List[str]:
+        lines = []
+        for bound, count in child.cumulative():
+            le = 'le="%s"' % _format_value(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+    def _child_dict(self, child) -> dict:
+        return {
+            "count": child.count,
+            "sum": child.sum,
+            "buckets": {_format_value(bound): count for bound, count in child.cumulative()},
+        }
+
+
+class MetricsRegistry:
+    """メトリクスの一覧と出力"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"メトリクス {metric.name} は登録済みです")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def get(self, name: str) -> _Metric:
+        return self._metrics[name]
+
+    def reset(self) -> None:
+        """記録した値をすべて消す（メトリクスの定義は残す）"""
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def render_prometheus(self) -> str:
+        """Prometheusのテキスト形式（0.0.4）で出力する"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        return {name: metric.to_dict() for name, metric in self._metrics.items()}
+
+
+REGISTRY = MetricsRegistry()
+
+DISCOVERY_SECONDS = REGISTRY.histogram(
+    "nemucast_discovery_seconds", "Chromecastの検索にかかった時間（秒）", ("method",),
+)
+RPC_SECONDS = REGISTRY.histogram(
+    "nemucast_rpc_seconds", "Castコマンドの往復時間（秒）", ("device", "op"),
+)
+RPC_ERRORS = REGISTRY.counter(
+    "nemucast_rpc_errors_total", "失敗したCastコマンドの数", ("device", "op"),
+)
+RPC_RETRIES = REGISTRY.counter(
+    "nemucast_rpc_retries_total", "反映を確認できずに再送したCastコマンドの数", ("device", "op"),
+)
+RECONNECTS = REGISTRY.counter(
+    "nemucast_reconnects_total", "デバイスへの再接続の回数", ("device",),
+)
+RECONNECT_SECONDS = REGISTRY.histogram(
+    "nemucast_reconnect_seconds",
+    "接続が切れてから再接続するまでの時間（秒）。sum / count が平均復旧時間（MTTR）",
+    ("device",), buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+HEARTBEAT_TIMEOUTS = REGISTRY.counter(
+    "nemucast_heartbeat_timeouts_total", "応答が途絶えて切断とみなした回数", ("device",),
+)
+CONNECTED = REGISTRY.gauge(
+    "nemucast_connected", "デバイスに接続しているか（1: 接続中、0: 切断中）", ("device",),
+)
+IDLE_SKIPS = REGISTRY.counter(
+    "nemucast_idle_skips_total", "アイドル状態のため音量調整を見送った周期の数", ("device",),
+)
+VOLUME = REGISTRY.gauge(
+    "nemucast_volume_level", "音量（kind=current: 最新、initial: 起動時）", ("device", "kind"),
+)
+REDISCOVERIES = REGISTRY.counter(
+    "nemucast_rediscoveries_total",
+    "固定したホストに再接続できず、デバイスを再検索した回数",
+    ("device",),
+)
+GROUP_SPREAD_SECONDS = REGISTRY.histogram(
+    "nemucast_group_spread_seconds",
+    "キャストグループの1ステップで、最初と最後のメンバーが音量を反映した時刻の差（秒）",
+    ("group",), buckets=(0.001, 0.0025) + DEFAULT_BUCKETS,
+)
+SCHEDULE_LATENESS_SECONDS = REGISTRY.histogram(
+    "nemucast_schedule_lateness_seconds",
+    "スケジュールの発火時刻から実際に目覚めるまでの遅れ（秒）", ("device",),
+    buckets=(0.001, 0.0025) + DEFAULT_BUCKETS,
+)
+CONFIG_RELOADS = REGISTRY.counter(
+    "nemucast_config_reloads_total",
+    "設定ファイルの再読み込みの回数（result=ok: 反映、invalid: 不正な内容のため見送り）",
+    ("result",),
+)
+EVENTS_DROPPED = REGISTRY.counter(
+    "nemucast_events_dropped_total",
+    "送信先に届けられずに捨てたイベントの数"
+    "（reason=overflow: キューが溢れた、error: 送信に失敗した）",
+    ("sink", "reason"),
+)
+CONTROL_SECONDS = REGISTRY.histogram(
+    "nemucast_control_seconds", "常駐デーモンが制御ソケットの要求に応答するまでの時間（秒）",
+    ("cmd",), buckets=(0.0005, 0.001, 0.0025) + DEFAULT_BUCKETS,
+)
+
+
+def device_label(cast) -> str:
+    """メトリクスのラベルに使うデバイス名"""
+    name = getattr(getattr(cast, "cast_info", None), "friendly_name", None)
+    return name if isinstance(name, str) else "unknown"
+
+
+def record_rpc(op: str, cast, seconds: float) -> None:
+    RPC_SECONDS.labels(device_label(cast), op).observe(seconds)
+
+
+def record_rpc_error(op: str, cast) -> None:
+    RPC_ERRORS.labels(device_label(cast), op).inc()
+
+
+@contextmanager
+def time_rpc(op: str, cast) -> Iterator[None]:
+    """`with` ブロックの実行時間をCastコマンドの往復時間として記録する（失敗は回数を数える）"""
+    started = monotonic()
+    try:
+        yield
+    except Exception:
+        record_rpc_error(op, cast)
+        raise
+    record_rpc(op, cast, monotonic() - started)
+
+
+def record_volume(cast, level: float, kind: str = "current") -> None:
+    VOLUME.labels(device_label(cast), kind).set(level)
+
+
+def record_idle_skip(cast) -> None:
+    IDLE_SKIPS.labels(device_label(cast)).inc()
+
+
+class ConnectionWatcher:
+    """
+    接続状態の通知を受け取り、接続完了のたびに再接続として数える
+
+    初回の接続が済んでから `watch_connection()` で登録する前提。
+    """
+
+    def __init__(self, device: str):
+        self._reconnects = RECONNECTS.labels(device)
+
+    def new_connection_status(self, status) -> None:
+        if getattr(status, "status", None) == "CONNECTED":
+            self._reconnects.inc()
+
+
+def watch_connection(cast) -> ConnectionWatcher:
+    """接続済みのChromecastに再接続の計数を登録する"""
+    watcher = ConnectionWatcher(device_label(cast))
+    cast.register_connection_listener(watcher)
+    return watcher
+
+
+class _Server:
+    """バックグラウンドスレッドで動くHTTPサーバー"""
+
+    def __init__(self, httpd):
+        self.httpd = httpd
+        self.thread = threading.Thread(
+            target=httpd.serve_forever, name="nemucast-metrics", daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+def start_metrics_server(
+    port: int, host: str = DEFAULT_METRICS_HOST, registry: MetricsRegistry = REGISTRY
+) -> _Server:
+    """
+    `GET /metrics` にPrometheusのテキスト形式を返すHTTPサーバーを開始する
+
+    Args:
+        port: 待ち受けポート（0なら空いているポート）
+        host: 待ち受けアドレス（デフォルトは localhost のみ）
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug("metrics: " + format, *args)
+
+    server = _Server(ThreadingHTTPServer((host, port), Handler))
+    server.thread.start()
+    logging.info("メトリクスを公開しています: http://%s:%d/metrics", host, server.port)
+    return server
+
+
+def dump_json(path: Path, registry: MetricsRegistry = REGISTRY) -> None:
+    """メトリクスをJSONファイルに書き出す"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps(registry.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    logging.info("メトリクスを書き出しました: %s", path)
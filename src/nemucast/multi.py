@@ -0,0 +1,261 @@
+"""複数デバイスを1プロセス・1スケジューラで制御するマルチデバイスモード"""
+
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from . import metrics
+from .commands import confirm_set_volume
+from .deadline import DEFAULT_MISSED_TICK_POLICY, LatenessStats, plan_next_deadline
+from .discovery import discover_named_chromecasts
+from .journal import FadeJournal
+from .main import (
+    COMMAND_RETRIES,
+    COMMAND_TIMEOUT,
+    StepResult,
+    begin_fade,
+    log_chromecast_status,
+    stop_discovery,
+    volume_control_step,
+)
+from .status import StatusMonitor
+from .supervisor import DEFAULT_HEARTBEAT_TIMEOUT, DEFAULT_MAX_BACKOFF, ConnectionSupervisor
+
+
+@dataclass
+class DeviceConfig:
+    """デバイスごとの音量調整設定"""
+
+    name: str
+    step: float
+    min_level: float
+    interval_sec: int
+
+
+def parse_device_spec(spec: str, default: DeviceConfig) -> DeviceConfig:
+    """
+    `NAME[:STEP[:MIN_LEVEL[:INTERVAL]]]` 形式のデバイス指定を解析する
+
+    省略した項目や空欄の項目は `default` の値を使う。
+
+    Raises:
+        ValueError: 名前が空、または数値を解析できない場合
+    """
+    name, *rest = spec.split(":")
+    if not name:
+        raise ValueError(f"デバイス名が指定されていません: {spec!r}")
+    if len(rest) > 3:
+        raise ValueError(f"デバイス指定の項目が多すぎます: {spec!r}")
+    rest += [""] * (3 - len(rest))
+    step, min_level, interval = rest
+    return DeviceConfig(
+        name=name,
+        step=float(step) if step else default.step,
+        min_level=float(min_level) if min_level else default.min_level,
+        interval_sec=int(interval) if interval else default.interval_sec,
+    )
+
+
+@dataclass
+class DeviceSession:
+    """接続済みデバイスの音量調整状態"""
+
+    config: DeviceConfig
+    cast: object
+    monitor: Optional[StatusMonitor] = None
+    initial_volume: float = 0.5
+    finished: bool = False
+    journal: Optional[FadeJournal] = None
+
+    def tick(self) -> Optional[StepResult]:
+        """1回分の音量制御を行い、次の実行までの待ち時間を返す（終了時はNone）"""
+        result = volume_control_step(
+            self.cast,
+            self.config.interval_sec,
+            self.config.step,
+            self.config.min_level,
+            self.initial_volume,
+            self.monitor,
+        )
+        if self.journal is not None:
+            if result is None:
+                self.journal.complete()
+            elif not result.retry and self.monitor is not None:
+                # 音量を変更した周期だけ、反映を確認した音量を記録する
+                level = self.monitor.volume_level
+                if level is not None:
+                    self.journal.record_level(level)
+        return result
+
+
+@dataclass(order=True)
+class _ScheduledTick:
+    due: float
+    seq: int
+    session: DeviceSession = field(compare=False)
+    # 周期の絶対期限（再試行中は due より前のまま）
+    deadline: float = field(default=0.0, compare=False)
+
+
+class FadeScheduler:
+    """
+    全デバイスの次回実行時刻を優先度付きキューで管理する
+
+    デバイスごとにスレッドやプロセスを持たず、最も早く実行すべきデバイスだけを待つ。
+    次回の期限は前回の期限から数えるため、処理時間や再試行で周期がずれていかない。
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        missed_tick_policy: str = DEFAULT_MISSED_TICK_POLICY,
+        stats: Optional[LatenessStats] = None,
+    ):
+        self._clock = clock
+        self._sleep = sleep
+        self.missed_tick_policy = missed_tick_policy
+        self.stats = stats if stats is not None else LatenessStats()
+        self._queue: List[_ScheduledTick] = []
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def add(self, session: DeviceSession, delay: float = 0.0) -> None:
+        """`delay` 秒後にセッションを実行するよう登録する"""
+        due = self._clock() + delay
+        self._push(due, session, due)
+
+    def _push(self, due: float, session: DeviceSession, deadline: float) -> None:
+        heapq.heappush(self._queue, _ScheduledTick(due, next(self._seq), session, deadline))
+
+    def run_once(self) -> Optional[DeviceSession]:
+        """次に実行すべきデバイスを待って1回分実行する"""
+        if not self._queue:
+            return None
+        item = heapq.heappop(self._queue)
+        wait = item.due - self._clock()
+        if wait > 0:
+            self._sleep(wait)
+
+        session = item.session
+        self.stats.record(max(0.0, self._clock() - item.due))
+        logging.debug("[%s] 音量制御を実行します", session.config.name)
+        try:
+            result = session.tick()
+        except Exception as e:
+            # 1台の失敗で他のデバイスを止めない
+            logging.error("[%s] 音量制御に失敗しました: %s", session.config.name, e)
+            result = StepResult(session.config.interval_sec)
+
+        if result is None:
+            session.finished = True
+            logging.info("[%s] 音量調整が完了しました。", session.config.name)
+        elif result.retry:
+            # 再試行: 周期の期限はそのままで、少し待ってからやり直す
+            self._push(self._clock() + result.delay, session, item.deadline)
+        else:
+            deadline, missed = plan_next_deadline(
+                item.deadline, result.delay, self._clock(), self.missed_tick_policy
+            )
+            self.stats.missed += missed
+            self._push(deadline, session, deadline)
+        return session
+
+    def run(self) -> None:
+        """すべてのデバイスが完了するまで実行する"""
+        while self._queue:
+            self.run_once()
+
+
+def run_multi_device(
+    configs: List[DeviceConfig],
+    discovery_timeout: float,
+    status_ttl: float,
+    missed_tick_policy: str = DEFAULT_MISSED_TICK_POLICY,
+    use_journal: bool = True,
+    heartbeat_timeout: float = DEFAULT_HEARTBEAT_TIMEOUT,
+    max_backoff: float = DEFAULT_MAX_BACKOFF,
+) -> bool:
+    """
+    複数デバイスを共有CastBrowserで検索し、1つのスケジューラで音量を下げる
+
+    デバイスごとにフェードのジャーナルを記録し、前回途中で終わっていれば起動時の音量を引き継ぐ。
+
+    Returns:
+        bool: 1台以上のデバイスに接続できた場合True
+    """
+    for config in configs:
+        logging.info(
+            "[%s] ステップ: %s, 最小音量: %s, 間隔: %d秒",
+            config.name, config.step, config.min_level, config.interval_sec,
+        )
+
+    casts, browser, _ = discover_named_chromecasts(
+        [config.name for config in configs], discovery_timeout
+    )
+    sessions: List[DeviceSession] = []
+    try:
+        scheduler = FadeScheduler(missed_tick_policy=missed_tick_policy)
+        for config in configs:
+            cast = casts.get(config.name)
+            if cast is None:
+                continue
+            cast.wait()
+            metrics.watch_connection(cast)
+            monitor = StatusMonitor(cast, ttl=status_ttl).attach()
+            log_chromecast_status(cast, monitor)
+            journal = FadeJournal.for_cast(cast) if use_journal else None
+            params = {"profile": "step", "interval_sec": config.interval_sec,
+                      "step": config.step, "min_level": config.min_level}
+            initial_volume, _ = begin_fade(cast, journal, monitor, params)
+            session = DeviceSession(config, cast, monitor, initial_volume, journal=journal)
+            sessions.append(session)
+            scheduler.add(session)
+
+        if not sessions:
+            return False
+
+        # すべて接続したら共有ブラウザを止め、以降は各デバイスの接続を監視してホストに直接再接続する
+        for session in sessions:
+            ConnectionSupervisor(
+                session.cast, discovery_timeout=discovery_timeout, monitor=session.monitor,
+                heartbeat_timeout=heartbeat_timeout, max_backoff=max_backoff,
+            ).start()
+        if browser:
+            stop_discovery(browser)
+            browser = None
+            logging.info("接続済みのためデバイス検索を停止しました。")
+
+        scheduler.run()
+        scheduler.stats.log_summary()
+        logging.info("すべてのデバイスの音量調整が完了しました。プログラムを終了します。")
+        return True
+
+    except KeyboardInterrupt:
+        logging.info("\n中断されました。音量を初期値に戻します...")
+        for session in sessions:
+            if session.finished:
+                continue
+            try:
+                if not confirm_set_volume(
+                    session.cast, session.initial_volume, session.monitor,
+                    COMMAND_TIMEOUT, COMMAND_RETRIES,
+                ):
+                    continue
+                logging.info(
+                    "[%s] 音量を初期値 %.2f に戻しました。",
+                    session.config.name, session.initial_volume,
+                )
+                if session.journal is not None:
+                    session.journal.complete()
+            except Exception as e:
+                logging.error("[%s] 音量の復元に失敗しました: %s", session.config.name, e)
+        raise
+    finally:
+        if browser:
+            stop_discovery(browser)
@@ -0,0 +1,35 @@
+"""状態ファイル（キャッシュ・ログなど）の保存先"""
+
+import os
+from pathlib import Path
+
+
+def get_state_dir() -> Path:
+    """
+    状態ファイルの保存ディレクトリを返す（存在しなければ作成する）
+
+    優先順位:
+        1. 環境変数 `NEMUCAST_STATE_DIR`
+        2. `$XDG_STATE_HOME/nemucast`
+        3. `~/.local/state/nemucast`
+    """
+    state_dir = os.getenv("NEMUCAST_STATE_DIR")
+    if state_dir:
+        path = Path(state_dir).expanduser()
+    else:
+        xdg_state = os.getenv("XDG_STATE_HOME") or str(Path.home() / ".local" / "state")
+        path = Path(xdg_state).expanduser() / "nemucast"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def get_socket_path() -> Path:
+    """
+    常駐デーモンの制御ソケットのパスを返す
+
+    環境変数 `NEMUCAST_SOCKET` があればそれを、無ければ状態ディレクトリの `control.sock` を使う。
+    """
+    socket_path = os.getenv("NEMUCAST_SOCKET")
+    if socket_path:
+        return Path(socket_path).expanduser()
+    return get_state_dir() / "control.sock"
@@ -0,0 +1,341 @@
+"""
+トレース（`trace.py`）の再生 `nemucast replay`
+
+記録した状態通知を疑似Chromecast（`sim.FakeChromecast`）から記録と同じ時刻に通知し、
+本物の判定関数と制御ループ（`is_chromecast_active` / `adjust_volume` / `aio` のループ）を
+仮想時計で最大速度で実行する。送ったコマンドを記録と比べ、判定の変化による回帰を見つける。
+
+音量は再生中に送った set_volume で決まる。記録した受信機の状態の音量は、nemucastの
+コマンドによらない変化（リモコンでの操作など）だけを反映する。記録の停止要求
+（SIGTERM、`ctl cancel` など）の時刻で制御ループを止め、それ以降のコマンドは比べない。
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass, field, fields
+from itertools import zip_longest
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .aio import _run
+from .commands import VOLUME_TOLERANCE
+from .daemon import FadeParams, async_run_fade
+from .main import IDLE_POLL_SEC, STATUS_TTL, is_chromecast_active
+from .sim import FakeCastStatus, FakeChromecast, FakeMediaStatus, VirtualClock, virtual_time
+from .status import StatusMonitor
+from .trace import Trace, TraceRecorder, load_trace
+
+# 記録と再生のコマンドの時刻の許容差（秒）
+DEFAULT_TIME_TOLERANCE = 1.0
+# 停止要求の無いトレースで、最後のレコードより後まで制御ループを動かす時間（秒）
+END_GRACE_SEC = 1.0
+# 比べるコマンド（状態の問い合わせはTTLと通知の順序で変わるため比べない）
+DECISION_OPS = ("set_volume", "quit_app")
+
+_CAST_KEYS = tuple(f.name for f in fields(FakeCastStatus))
+_MEDIA_KEYS = tuple(f.name for f in fields(FakeMediaStatus))
+
+Command = Tuple[float, str, dict]
+
+
+def decisions(commands: Sequence[Command], until: Optional[float] = None) -> List[Command]:
+    """
+    比べるコマンドだけを残す
+
+    反映を確認できずに同じ音量を再送したものは1回にまとめ、`until` 以降のものは除く。
+    """
+    result: List[Command] = []
+    for t, kind, data in commands:
+        op = data.get("op")
+        if op not in DECISION_OPS or (until is not None and t >= until):
+            continue
+        if result and result[-1][2] == data:
+            continue
+        result.append((t, kind, data))
+    return result
+
+
+def _describe(command: Command) -> str:
+    t, _, data = command
+    level = data.get("level")
+    return f"{data['op']}{'' if level is None else f' {level:.2f}'}（{t:.1f}秒）"
+
+
+@dataclass
+class ReplayResult:
+    """1件のトレースの再生結果"""
+
+    trace: Trace
+    # 再生で送ったコマンド（トレースと同じ (経過秒, "cmd", 項目) の並び）
+    commands: List[Command] = field(default_factory=list)
+    # 記録した状態ごとの `is_chromecast_active` の判定が変わった時点 (経過秒, 判定)
+    activity: List[Tuple[float, bool]] = field(default_factory=list)
+    # 制御ループが最小音量に到達して終わった場合True
+    completed: bool = False
+    simulated_sec: float = 0.0
+    wall_sec: float = 0.0
+
+    def divergence(self, tolerance_sec: float = DEFAULT_TIME_TOLERANCE) -> Optional[str]:
+        """
+        記録と再生で最初に食い違ったコマンドの説明
+
+        Returns:
+            食い違いの説明。コマンドの種類・音量・時刻（`tolerance_sec` 以内）が一致すればNone
+        """
+        recorded = decisions(self.trace.commands, self.trace.stopped_at)
+        replayed = decisions(self.commands, self.trace.stopped_at)
+        for index, (expected, actual) in enumerate(zip_longest(recorded, replayed), 1):
+            if expected is None:
+                return f"{index}件目: 記録に無い {_describe(actual)} を送りました"
+            if actual is None:
+                return f"{index}件目: 記録にある {_describe(expected)} を送りませんでした"
+            same_level = abs(
+                (expected[2].get("level") or 0.0) - (actual[2].get("level") or 0.0)
+            ) <= VOLUME_TOLERANCE
+            if (
+                expected[2]["op"] != actual[2]["op"] or not same_level
+                or abs(expected[0] - actual[0]) > tolerance_sec
+            ):
+                return f"{index}件目: 記録は {_describe(expected)}、再生は {_describe(actual)}"
+        return None
+
+    def to_dict(self, tolerance_sec: float = DEFAULT_TIME_TOLERANCE) -> dict:
+        """`--json` で出力する結果"""
+        return {
+            "path": str(self.trace.path) if self.trace.path else None,
+            "name": self.trace.name,
+            "recorded": len(decisions(self.trace.commands, self.trace.stopped_at)),
+            "replayed": len(decisions(self.commands, self.trace.stopped_at)),
+            "completed": self.completed,
+            "activity": self.activity,
+            "divergence": self.divergence(tolerance_sec),
+            "simulated_sec": self.simulated_sec,
+            "wall_sec": self.wall_sec,
+        }
+
+
+def _make_device(trace: Trace, virtual_clock: VirtualClock) -> FakeChromecast:
+    volume = trace.initial_volume
+    for _, kind, data in trace.events:
+        if kind == "cast" and data.get("volume_level") is not None:
+            volume = data["volume_level"]
+            break
+    return FakeChromecast(
+        virtual_clock, name=trace.name, volume_level=0.5 if volume is None else volume,
+        app_id=None, player_state=None, latency=0.0,
+    )
+
+
+def _schedule_events(trace: Trace, device: FakeChromecast, monitor: StatusMonitor) -> None:
+    """記録した状態通知を、記録と同じ時刻に疑似Chromecastから通知するよう登録する"""
+    # 最後に送った音量と最後に記録した音量。どちらとも違う音量はnemucastによらない変化
+    sent: Optional[float] = None
+    last: Optional[float] = None
+    for t, kind, data in trace.events:
+        if kind == "cmd":
+            if data.get("op") == "set_volume":
+                sent = data.get("level")
+            continue
+        if kind == "cast":
+            status = {key: value for key, value in data.items() if key in _CAST_KEYS}
+            volume = status.pop("volume_level", None)
+            external = (
+                volume is not None and last is not None
+                and abs(volume - last) > VOLUME_TOLERANCE
+                and (sent is None or abs(volume - sent) > VOLUME_TOLERANCE)
+            )
+            last = volume if volume is not None else last
+            action = functools.partial(
+                device.push_cast_status, volume if external else None, **status
+            )
+        elif kind == "media":
+            status = {key: value for key, value in data.items() if key in _MEDIA_KEYS}
+            action = functools.partial(device.push_media_status, **status)
+        elif kind == "connection":
+            action = functools.partial(monitor.set_connected, bool(data.get("connected")))
+        else:
+            continue
+        device.schedule(t, action)
+
+
+async def _replay_until(control, end: float) -> bool:
+    """制御ループを仮想時刻 `end` まで実行する（それまでに終われば True）"""
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.wait_for(control, max(0.0, end - loop.time()))
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def activity_timeline(trace: Trace) -> List[Tuple[float, bool]]:
+    """
+    記録した状態ごとに `is_chromecast_active` で判定し、判定が変わった時点を返す
+
+    制御ループを動かさずに、状態の判定だけを記録のすべての状態通知について確かめる。
+    """
+    virtual_clock = VirtualClock()
+    device = _make_device(trace, virtual_clock)
+    monitor = StatusMonitor(device, refresh_wait=0, clock=virtual_clock).attach()
+    timeline: List[Tuple[float, bool]] = []
+    for t, kind, data in trace.events:
+        virtual_clock.now = max(virtual_clock.now, t)
+        if kind == "cast":
+            device.push_cast_status(**{k: v for k, v in data.items() if k in _CAST_KEYS})
+        elif kind == "media":
+            device.push_media_status(**{k: v for k, v in data.items() if k in _MEDIA_KEYS})
+        elif kind == "connection":
+            monitor.set_connected(bool(data.get("connected")))
+        else:
+            continue
+        active = is_chromecast_active(device, monitor)
+        if not timeline or timeline[-1][1] != active:
+            timeline.append((t, active))
+    return timeline
+
+
+def replay_trace(trace: Trace, overrides: Optional[Dict[str, object]] = None) -> ReplayResult:
+    """
+    トレースを再生し、本物の制御ループが送るコマンドを記録する
+
+    Args:
+        trace: 再生するトレース
+        overrides: 記録したフェードの設定を上書きする項目（設定を変えた場合の確認用）
+
+    Raises:
+        ValueError: フェードの設定が不正な場合
+    """
+    started = time.perf_counter()
+    params = FadeParams.from_request({**trace.params, **(overrides or {})}, FadeParams())
+    options = trace.options
+    end = trace.stopped_at if trace.stopped_at is not None else trace.duration + END_GRACE_SEC
+
+    virtual_clock = VirtualClock()
+    device = _make_device(trace, virtual_clock)
+    recorder = TraceRecorder()
+    with virtual_time(virtual_clock):
+        monitor = StatusMonitor(
+            device, ttl=options.get("status_ttl", STATUS_TTL), refresh_wait=0
+        ).attach()
+        _schedule_events(trace, device, monitor)
+        # 記録の最初の状態を通知してからフェードを始める
+        virtual_clock.advance(0.0)
+        initial_volume = trace.initial_volume
+        if initial_volume is None:
+            initial_volume = device.status.volume_level
+        recorder.start(device, monitor, initial_volume, trace.resume_level)
+        try:
+            completed = _run(_replay_until(
+                async_run_fade(
+                    device, monitor, params, initial_volume, trace.resume_level,
+                    options.get("idle_poll_sec", IDLE_POLL_SEC),
+                ),
+                end,
+            ))
+        finally:
+            recorder.stop()
+
+    return ReplayResult(
+        trace=trace,
+        commands=[
+            (record["t"], "cmd", {k: v for k, v in record.items() if k not in ("t", "ev")})
+            for record in recorder.records if record.get("ev") == "cmd"
+        ],
+        activity=activity_timeline(trace),
+        completed=completed,
+        simulated_sec=virtual_clock.now,
+        wall_sec=time.perf_counter() - started,
+    )
+
+
+def find_traces(paths: Sequence[Path]) -> List[Path]:
+    """ファイルはそのまま、ディレクトリはその中の `*.jsonl` を名前順に並べる"""
+    found: List[Path] = []
+    for path in paths:
+        path = Path(path).expanduser()
+        found.extend(sorted(path.glob("*.jsonl")) if path.is_dir() else [path])
+    return found
+
+
+def _parse_override(spec: str) -> Tuple[str, object]:
+    key, sep, value = spec.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"KEY=VALUE の形で指定してください: {spec}")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def parse_replay_args(args=None) -> argparse.Namespace:
+    """`nemucast replay` のコマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(
+        prog="nemucast replay",
+        description="記録したトレースを再生し、今の判定と制御ループが記録と同じコマンドを送るか確かめる",
+    )
+    parser.add_argument(
+        "paths", nargs="+", type=Path, metavar="PATH",
+        help="トレースファイル、またはトレースを置いたディレクトリ（--trace-dir）"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TIME_TOLERANCE,
+        help=f"コマンドの時刻の許容差（秒）。デフォルト: {DEFAULT_TIME_TOLERANCE}"
+    )
+    parser.add_argument(
+        "--set", dest="overrides", action="append", default=[], type=_parse_override,
+        metavar="KEY=VALUE",
+        help="記録したフェードの設定を上書きして再生する（例: min_level=0.2、繰り返し指定可）"
+    )
+    parser.add_argument("--json", action="store_true", help="1件ごとの結果をJSONで出力する")
+    parser.add_argument("--verbose", action="store_true", help="制御ループのログを表示する")
+    return parser.parse_args(args)
+
+
+def replay_main(argv: Optional[List[str]] = None) -> int:
+    """
+    `nemucast replay` のエントリーポイント
+
+    Returns:
+        終了コード。すべて記録と一致すれば0、食い違いがあれば1、トレースを読めなければ2
+    """
+    args = parse_replay_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    paths = find_traces(args.paths)
+    if not paths:
+        print("トレースがありません", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    diverged = failed = 0
+    for path in paths:
+        try:
+            result = replay_trace(load_trace(path), dict(args.overrides))
+        except (OSError, ValueError) as e:
+            print(f"{path}: 再生できません: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        divergence = result.divergence(args.tolerance)
+        diverged += divergence is not None
+        if args.json:
+            print(json.dumps(result.to_dict(args.tolerance), ensure_ascii=False))
+            continue
+        summary = result.to_dict(args.tolerance)
+        print(
+            f"{'一致' if divergence is None else '不一致'}  {path.name}  {result.trace.name}  "
+            f"コマンド {summary['replayed']}/{summary['recorded']}  "
+            f"判定の変化 {len(result.activity)}回"
+            + (f"\n    {divergence}" if divergence else "")
+        )
+    if not args.json:
+        print(
+            f"{len(paths)}件を {time.perf_counter() - started:.2f}秒で再生しました"
+            f"（不一致 {diverged}件、再生できない {failed}件）"
+        )
+    if failed:
+        return 2
+    return 1 if diverged else 0
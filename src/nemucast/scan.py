@@ -0,0 +1,308 @@
+"""
+ネットワーク上のすべてのChromecastの状態を一覧する `nemucast scan`
+
+mDNSで見つかったデバイスから順に、上限つきのワーカープールで同時に接続し、
+音量・起動中のアプリ・スタンバイ・再生状態を問い合わせる。各デバイスは
+接続と問い合わせで数往復かかるが、デバイスどうしは待ち合わせないため、
+全体の時間は台数の合計ではなく最も遅い1台（と検索時間）で決まる。
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, List, Optional
+
+from .cache import DEFAULT_CONNECT_TIMEOUT
+from .clock import monotonic
+from .status import StatusMonitor
+
+# 同時に接続するデバイス数の上限
+DEFAULT_SCAN_WORKERS = 16
+# デバイスを検索する時間（秒）
+DEFAULT_SCAN_WINDOW = 5.0
+# 1台の接続と状態の問い合わせを待つ最大時間（秒）
+DEFAULT_PROBE_TIMEOUT = DEFAULT_CONNECT_TIMEOUT
+
+
+@dataclass
+class DeviceProbe:
+    """1台のデバイスの問い合わせ結果"""
+
+    name: str
+    uuid: Optional[str] = None
+    host: Optional[str] = None
+    port: Optional[int] = None
+    model_name: Optional[str] = None
+    cast_type: Optional[str] = None
+    volume_level: Optional[float] = None
+    volume_muted: Optional[bool] = None
+    app_id: Optional[str] = None
+    display_name: Optional[str] = None
+    is_stand_by: Optional[bool] = None
+    player_state: Optional[str] = None
+    # 接続開始から状態が揃うまで（失敗した場合は諦めるまで）の秒数
+    elapsed: float = 0.0
+    # 接続・問い合わせに失敗した理由（成功すればNone）
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @classmethod
+    def from_cast_info(cls, cast_info) -> "DeviceProbe":
+        return cls(
+            name=cast_info.friendly_name,
+            uuid=str(cast_info.uuid),
+            host=cast_info.host,
+            port=cast_info.port,
+            model_name=cast_info.model_name,
+            cast_type=cast_info.cast_type,
+        )
+
+
+def connect_cast_info(cast_info, zconf=None, timeout: float = DEFAULT_PROBE_TIMEOUT):
+    """検索で見つかったデバイスに1回だけ接続を試みる（再試行しない）"""
+    import pychromecast
+
+    return pychromecast.get_chromecast_from_cast_info(
+        cast_info, zconf, tries=1, retry_wait=0, timeout=timeout
+    )
+
+
+def probe_cast(cast, timeout: float = DEFAULT_PROBE_TIMEOUT) -> DeviceProbe:
+    """
+    接続したデバイスの受信機とメディアの状態を問い合わせる
+
+    受信機の状態は接続直後に届くものを使い、アプリが起動していればメディアの状態だけを問い合わせる。
+
+    Raises:
+        TimeoutError: `timeout` 秒以内に受信機の状態が届かない場合
+    """
+    probe = DeviceProbe.from_cast_info(cast.cast_info)
+    cast.wait(timeout=timeout)
+    if cast.status is None:
+        raise TimeoutError(f"{timeout:.1f}秒以内に応答がありません")
+    monitor = StatusMonitor(cast, refresh_wait=timeout).attach()
+    monitor.refresh()
+
+    status = monitor.cast_status
+    probe.volume_level = status.volume_level
+    probe.volume_muted = status.volume_muted
+    probe.app_id = status.app_id
+    probe.display_name = status.display_name
+    probe.is_stand_by = status.is_stand_by
+    probe.player_state = monitor.player_state
+    return probe
+
+
+class FleetScanner:
+    """
+    デバイスへの接続と状態の問い合わせを、上限つきのワーカープールで同時に行う
+
+    Args:
+        connect: CastInfoから（未接続の）Chromecastを作る関数
+        workers: 同時に接続するデバイス数の上限
+        timeout: 1台の接続と状態の問い合わせを待つ最大時間（秒）
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[object], object] = connect_cast_info,
+        workers: int = DEFAULT_SCAN_WORKERS,
+        timeout: float = DEFAULT_PROBE_TIMEOUT,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self._connect = connect
+        self._timeout = timeout
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scan")
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._closed = False
+
+    def submit(self, cast_info) -> None:
+        """
+        デバイスの問い合わせを始める（検索のコールバックから呼べるよう、すぐに戻る）
+
+        `close()` の後に見つかったデバイスは無視する。
+        """
+        with self._lock:
+            if self._closed:
+                logging.debug(
+                    "[%s] 検索の終了後に見つかったため無視します", cast_info.friendly_name
+                )
+                return
+            self._futures.append(self._pool.submit(self._probe, cast_info))
+
+    def results(self) -> List[DeviceProbe]:
+        """始めたすべての問い合わせが終わるまで待ち、名前順に返す"""
+        with self._lock:
+            futures = list(self._futures)
+        return sorted((future.result() for future in futures), key=lambda probe: probe.name)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=False)
+
+    def _probe(self, cast_info) -> DeviceProbe:
+        started = self._clock()
+        cast = None
+        try:
+            cast = self._connect(cast_info)
+            probe = probe_cast(cast, self._timeout)
+        except Exception as e:
+            # 1台の失敗で他のデバイスの問い合わせを止めない
+            probe = DeviceProbe.from_cast_info(cast_info)
+            probe.error = str(e) or type(e).__name__
+            logging.warning("[%s] 状態を取得できませんでした: %s", probe.name, probe.error)
+        finally:
+            if cast is not None:
+                try:
+                    cast.disconnect(timeout=0)
+                except Exception as e:
+                    logging.debug("[%s] 切断に失敗しました: %s", cast_info.friendly_name, e)
+        probe.elapsed = self._clock() - started
+        logging.debug("[%s] %.3f秒で問い合わせました", probe.name, probe.elapsed)
+        return probe
+
+
+def scan_cast_infos(
+    cast_infos,
+    connect: Callable[[object], object] = connect_cast_info,
+    workers: int = DEFAULT_SCAN_WORKERS,
+    timeout: float = DEFAULT_PROBE_TIMEOUT,
+) -> List[DeviceProbe]:
+    """既に分かっているデバイスをまとめて問い合わせる"""
+    scanner = FleetScanner(connect, workers, timeout)
+    try:
+        for cast_info in cast_infos:
+            scanner.submit(cast_info)
+        return scanner.results()
+    finally:
+        scanner.close()
+
+
+def scan_network(
+    window: float = DEFAULT_SCAN_WINDOW,
+    workers: int = DEFAULT_SCAN_WORKERS,
+    timeout: float = DEFAULT_PROBE_TIMEOUT,
+) -> List[DeviceProbe]:
+    """
+    `window` 秒のあいだデバイスを検索し、見つかったデバイスから順に問い合わせる
+
+    問い合わせは検索と並行して進むため、検索の終了後は残りの問い合わせだけを待つ。
+    結果に漏れが出ないよう、検索を止めてから問い合わせの結果を集め、
+    問い合わせが共有する `zconf` はすべての問い合わせが終わってから閉じる。
+    """
+    import zeroconf
+
+    from .discovery import discover_all_chromecasts
+
+    zconf = zeroconf.Zeroconf()
+    scanner = FleetScanner(
+        lambda cast_info: connect_cast_info(cast_info, zconf, timeout), workers, timeout
+    )
+    try:
+        _, browser = discover_all_chromecasts(window, scanner.submit, zconf)
+        browser.stop_discovery()
+        return scanner.results()
+    finally:
+        scanner.close()
+        zconf.close()
+
+
+def _width(text: str) -> int:
+    """端末での表示幅（全角文字は2桁）"""
+    return sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+
+
+def _pad(text: str, width: int) -> str:
+    return text + " " * (width - _width(text))
+
+
+def format_table(probes: List[DeviceProbe]) -> str:
+    """問い合わせ結果を表にする"""
+    header = ("名前", "種類", "ホスト", "音量", "アプリ", "スタンバイ", "再生状態", "応答")
+    rows = []
+    for probe in probes:
+        host = f"{probe.host}:{probe.port}" if probe.host else "-"
+        if not probe.ok:
+            rows.append((probe.name, probe.cast_type or "-", host, "-", "-", "-", "-",
+                         f"失敗: {probe.error}"))
+            continue
+        volume = "-" if probe.volume_level is None else f"{probe.volume_level:.2f}"
+        if probe.volume_muted:
+            volume += "（ミュート）"
+        stand_by = {True: "はい", False: "いいえ", None: "-"}[probe.is_stand_by]
+        rows.append((
+            probe.name, probe.cast_type or "-", host, volume,
+            probe.display_name or probe.app_id or "-", stand_by, probe.player_state or "-",
+            f"{probe.elapsed:.2f}秒",
+        ))
+    widths = [max(_width(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(_pad(cell, width) for cell, width in zip(row, widths)).rstrip()
+        for row in [header, *rows]
+    )
+
+
+def parse_scan_args(args=None) -> argparse.Namespace:
+    """`nemucast scan` のコマンドライン引数を解析する"""
+    parser = argparse.ArgumentParser(
+        prog="nemucast scan",
+        description="ネットワーク上のすべてのChromecastに同時に接続し、状態を一覧する",
+    )
+    parser.add_argument(
+        "--window", type=float, default=DEFAULT_SCAN_WINDOW,
+        help=f"デバイスを検索する時間（秒）。デフォルト: {DEFAULT_SCAN_WINDOW}"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_SCAN_WORKERS,
+        help=f"同時に接続するデバイス数の上限。デフォルト: {DEFAULT_SCAN_WORKERS}"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_PROBE_TIMEOUT,
+        help=f"1台の接続と状態の問い合わせを待つ最大時間（秒）。デフォルト: {DEFAULT_PROBE_TIMEOUT}"
+    )
+    parser.add_argument("--json", action="store_true", help="1台ごとの結果をJSONで出力する")
+    parser.add_argument("--verbose", action="store_true", help="検索と接続のログを表示する")
+    return parser.parse_args(args)
+
+
+def scan_main(argv: Optional[List[str]] = None) -> int:
+    """
+    `nemucast scan` のエントリーポイント
+
+    Returns:
+        終了コード。すべてのデバイスの状態を取得できれば0、取得できないデバイスがあれば1、
+        デバイスが見つからなければ2
+    """
+    args = parse_scan_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    started = time.perf_counter()
+    probes = scan_network(args.window, args.workers, args.timeout)
+    elapsed = time.perf_counter() - started
+    if not probes:
+        print("Chromecast が見つかりませんでした", file=sys.stderr)
+        return 2
+
+    failed = sum(not probe.ok for probe in probes)
+    if args.json:
+        for probe in probes:
+            print(json.dumps(asdict(probe), ensure_ascii=False))
+    else:
+        print(format_table(probes))
+        slowest = max(probe.elapsed for probe in probes)
+        print(
+            f"{len(probes)}台を {elapsed:.2f}秒で確認しました"
+            f"（検索 {args.window:.1f}秒、最も遅いデバイス {slowest:.2f}秒、失敗 {failed}台）"
+        )
+    return 1 if failed else 0
@@ -0,0 +1,236 @@
+"""
+曜日と時刻によるフェードのスケジュール（常駐デーモンで毎晩同じ接続のままフェードを始める）
+
+1行に1つ、曜日・開始時刻と、その回だけ上書きするフェードの設定を書く:
+
+    daily 22:00
+    fri,sat 23:00 interval=600
+    mon-fri 21:30 profile=linear duration=3600 min=0.2 name="寝室のテレビ"
+
+曜日は mon〜sun・`mon-fri` のような範囲・`daily` / `weekdays` / `weekends`、
+時刻はローカル時刻の `HH:MM` または `HH:MM:SS`。各行の次の発火時刻を求めておき、
+最も早いものを取り出しては同じ行の次の発火時刻を入れ直す。
+標準ライブラリだけを使う。
+"""
+
+import heapq
+import shlex
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from datetime import time as dtime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAY_ALIASES = {
+    "daily": frozenset(range(7)),
+    "*": frozenset(range(7)),
+    "weekdays": frozenset(range(5)),
+    "weekends": frozenset((5, 6)),
+}
+# 行ごとに上書きできる設定（キー→ `daemon.FadeParams` の項目）
+WINDOW_KEYS = {
+    "interval": "interval_sec",
+    "step": "step",
+    "min": "min_level",
+    "profile": "profile",
+    "duration": "duration_sec",
+    "max_rate": "max_rate",
+    "missed_tick": "missed_tick_policy",
+}
+# 文字列のまま扱う設定
+_TEXT_KEYS = ("profile", "missed_tick_policy")
+
+# 発火時刻をこれより過ぎて目覚めた場合（サスペンドからの復帰など）はその回を見送る（秒）
+DEFAULT_MISFIRE_GRACE = 15 * 60
+# `--dry-run` で表示する発火時刻の数
+DEFAULT_DRY_RUN_COUNT = 10
+# 発火時刻まで眠る1回の上限（秒）。サスペンド中は単調時計が止まるため、壁時計で確かめ直す
+MAX_SLEEP_CHUNK = 60.0
+
+
+def _parse_days(text: str) -> FrozenSet[int]:
+    days = set()
+    for part in text.lower().split(","):
+        if part in DAY_ALIASES:
+            days |= DAY_ALIASES[part]
+            continue
+        first, _, last = part.partition("-")
+        if first not in WEEKDAYS or (last and last not in WEEKDAYS):
+            raise ValueError(
+                "曜日は mon〜sun、範囲（mon-fri）、daily / weekdays / weekends で"
+                f"指定してください: {part!r}"
+            )
+        start = WEEKDAYS.index(first)
+        end = WEEKDAYS.index(last) if last else start
+        # fri-mon のように週をまたぐ範囲も受け付ける
+        days.update((start + i) % 7 for i in range((end - start) % 7 + 1))
+    return frozenset(days)
+
+
+def _parse_time(text: str) -> dtime:
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            return datetime.strptime(text, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(f"時刻は HH:MM または HH:MM:SS で指定してください: {text!r}")
+
+
+@dataclass(frozen=True)
+class ScheduleEntry:
+    """スケジュールの1行（曜日・開始時刻・その回のフェード設定）"""
+
+    days: FrozenSet[int]
+    at: dtime
+    # 上書きするフェードの設定（`daemon.FadeParams` の項目名）
+    params: Dict[str, object] = field(default_factory=dict, hash=False)
+    # 対象のデバイス（Noneならデーモンのデフォルト）
+    name: Optional[str] = None
+    spec: str = ""
+
+    @classmethod
+    def parse(cls, spec: str) -> "ScheduleEntry":
+        """
+        `DAYS HH:MM[:SS] [KEY=VALUE ...]` を解析する
+
+        Raises:
+            ValueError: 書式や値が不正な場合
+        """
+        try:
+            tokens = shlex.split(spec)
+        except ValueError as e:
+            raise ValueError(f"スケジュールを解析できません: {e}") from None
+        if len(tokens) < 2:
+            raise ValueError(
+                f"スケジュールは「曜日 時刻 [設定=値 ...]」で指定してください: {spec!r}"
+            )
+        days, at = _parse_days(tokens[0]), _parse_time(tokens[1])
+        params: Dict[str, object] = {}
+        name = None
+        for token in tokens[2:]:
+            key, sep, value = token.partition("=")
+            if not sep:
+                raise ValueError(f"設定は KEY=VALUE で指定してください: {token!r}")
+            if key == "name":
+                name = value
+            elif key in WINDOW_KEYS:
+                target = WINDOW_KEYS[key]
+                if target in _TEXT_KEYS:
+                    params[target] = value
+                else:
+                    try:
+                        params[target] = float(value)
+                    except ValueError:
+                        raise ValueError(f"{key} は数値で指定してください: {value!r}") from None
+            else:
+                known = ", ".join(["name", *WINDOW_KEYS])
+                raise ValueError(f"不明な設定です: {key!r}（{known}）")
+        return cls(days, at, params, name, " ".join(spec.split()))
+
+    def next_after(self, after: datetime) -> datetime:
+        """
+        `after`（タイムゾーン付き）より後の最初の発火時刻をローカル時刻で返す
+
+        夏時間の切り替えで存在しない時刻はずれた時刻に、2回ある時刻は1回目に発火する。
+        """
+        local_after = after.astimezone()
+        for offset in range(8):
+            day: date = local_after.date() + timedelta(days=offset)
+            if day.weekday() not in self.days:
+                continue
+            candidate = datetime.combine(day, self.at).astimezone()
+            if candidate > after:
+                return candidate
+        raise ValueError(f"曜日が指定されていません: {self.spec!r}")
+
+    def describe(self) -> str:
+        """対象のデバイスと上書きする設定（スケジュールの書き方で表示する）"""
+        keys = {target: key for key, target in WINDOW_KEYS.items()}
+        settings = " ".join(
+            f"{keys[target]}={value:g}" if isinstance(value, float) else f"{keys[target]}={value}"
+            for target, value in self.params.items()
+        )
+        return " ".join(part for part in (self.name, settings) if part) or "(デフォルト)"
+
+
+class Schedule:
+    """スケジュールの全行と、それぞれの次の発火時刻"""
+
+    def __init__(self, entries: Sequence[ScheduleEntry]):
+        self.entries = list(entries)
+
+    @classmethod
+    def parse(cls, specs: Sequence[str]) -> "Schedule":
+        return cls([ScheduleEntry.parse(spec) for spec in specs])
+
+    @classmethod
+    def load(cls, path: Path, extra: Sequence[str] = ()) -> "Schedule":
+        """
+        スケジュールファイルを読み込む（空行と `#` 以降は無視する）
+
+        Raises:
+            OSError: ファイルを読めない場合
+            ValueError: 書式が不正な行がある場合（行番号付き）
+        """
+        entries = []
+        for number, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines(), 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                entries.append(ScheduleEntry.parse(line))
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+        return cls(entries + [ScheduleEntry.parse(spec) for spec in extra])
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def upcoming(self, after: datetime, count: int) -> List[Tuple[datetime, ScheduleEntry]]:
+        """`after` より後の発火時刻を早い順に `count` 件返す（同時刻は書いた順）"""
+        heap = [(entry.next_after(after), index) for index, entry in enumerate(self.entries)]
+        heapq.heapify(heap)
+        fires = []
+        while heap and len(fires) < count:
+            fire_at, index = heapq.heappop(heap)
+            entry = self.entries[index]
+            fires.append((fire_at, entry))
+            heapq.heappush(heap, (entry.next_after(fire_at), index))
+        return fires
+
+    def next_fire(self, after: datetime) -> Optional[Tuple[datetime, ScheduleEntry]]:
+        fires = self.upcoming(after, 1)
+        return fires[0] if fires else None
+
+
+def format_fire(fire_at: datetime, entry: ScheduleEntry) -> str:
+    """発火時刻の1行表示（`--dry-run` とログで使う）"""
+    return f"{fire_at:%Y-%m-%d %a %H:%M:%S %z}  {entry.describe()}"
+
+
+async def sleep_until(
+    timestamp: float,
+    now: Callable[[], float] = time.time,
+    sleep: Optional[Callable[[float], Awaitable[None]]] = None,
+    max_chunk: float = MAX_SLEEP_CHUNK,
+) -> float:
+    """
+    壁時計が `timestamp`（エポック秒）に達するまで眠る
+
+    サスペンドや時計の調整で単調時計と壁時計がずれても、`max_chunk` 秒ごとに
+    壁時計で残り時間を計算し直す。
+
+    Returns:
+        予定時刻から実際に目覚めるまでの遅れ（秒）
+    """
+    if sleep is None:
+        import asyncio
+
+        sleep = asyncio.sleep
+    while True:
+        remaining = timestamp - now()
+        if remaining <= 0:
+            return -remaining
+        await sleep(min(remaining, max_chunk))
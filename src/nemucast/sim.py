@@ -0,0 +1,558 @@
+"""
+プロセス内で動く疑似Chromecastと仮想時計
+
+実機やネットワークなしで、一晩分の音量制御をミリ秒単位で実行するためのもの。
+`FakeChromecast` は nemucast が使う `cast.status` / `media_controller` /
+`set_volume` / `quit_app` などと同じインターフェースを持つ。
+"""
+
+import asyncio
+import functools
+import heapq
+import itertools
+import random
+import selectors
+import time
+from dataclasses import dataclass, field, replace
+from typing import Callable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from . import clock as clock_module
+from .deadline import DEFAULT_MISSED_TICK_POLICY, LatenessStats
+from .status import StatusMonitor
+from .trace import TraceRecorder
+
+# ---- 仮想時計 ----
+
+
+class VirtualClock:
+    """
+    手動で進める時計
+
+    `call_at()` で登録した処理は、時計がその時刻を通過するときに実行される。
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self._timers: List[Tuple[float, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+
+    def __call__(self) -> float:
+        return self.now
+
+    def call_at(self, when: float, callback: Callable[[], None]) -> None:
+        """時計が `when` に達したときに `callback` を実行する"""
+        heapq.heappush(self._timers, (when, next(self._seq), callback))
+
+    def next_timer(self) -> Optional[float]:
+        """次に実行される処理の時刻"""
+        return self._timers[0][0] if self._timers else None
+
+    def advance(self, seconds: float) -> bool:
+        """
+        時計を進める。途中で登録済みの処理があれば、その時刻で止めて実行する
+
+        Returns:
+            bool: 登録済みの処理を実行した場合True
+        """
+        target = self.now + max(0.0, seconds)
+        if self._timers and self._timers[0][0] <= target:
+            when = self._timers[0][0]
+            self.now = max(self.now, when)
+            while self._timers and self._timers[0][0] <= when:
+                _, _, callback = heapq.heappop(self._timers)
+                callback()
+            return True
+        self.now = target
+        return False
+
+    def sleep(self, seconds: float) -> None:
+        """`time.sleep()` の代わりに時計を進める（途中の処理もすべて実行する）"""
+        target = self.now + max(0.0, seconds)
+        while self.advance(target - self.now) and self.now < target:
+            pass
+
+
+class _VirtualSelector:
+    """待ち時間を実時間で待たずに仮想時計を進めるセレクタ"""
+
+    def __init__(self, virtual_clock: VirtualClock):
+        self._selector = selectors.DefaultSelector()
+        self._clock = virtual_clock
+
+    def select(self, timeout=None):
+        events = self._selector.select(0)
+        if events:
+            return events
+        if timeout is None:
+            # 予定された処理が無い: 別スレッドからの起床を実時間で待つ
+            next_timer = self._clock.next_timer()
+            if next_timer is None:
+                return self._selector.select(None)
+            timeout = next_timer - self._clock.now
+        if timeout > 0:
+            self._clock.advance(timeout)
+        return self._selector.select(0)
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    仮想時計で動くイベントループ
+
+    `asyncio.sleep(1200)` は実時間を待たずに完了する。
+    エグゼキューターへの処理はスレッドを使わずその場で実行するため、結果は決定的になる。
+    """
+
+    def __init__(self, virtual_clock: VirtualClock):
+        self.virtual_clock = virtual_clock
+        super().__init__(_VirtualSelector(virtual_clock))
+
+    def time(self) -> float:
+        return self.virtual_clock.now
+
+    def run_in_executor(self, executor, func, *args):
+        future = self.create_future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def virtual_time(virtual_clock: VirtualClock):
+    """`with virtual_time(clock):` の間、nemucast全体を仮想時計で動かす"""
+    return clock_module.use_clock(virtual_clock, lambda: VirtualTimeLoop(virtual_clock))
+
+
+# ---- 疑似Chromecast ----
+
+
+@dataclass(frozen=True)
+class FakeCastStatus:
+    """pychromecastのCastStatus相当"""
+
+    app_id: Optional[str] = None
+    display_name: Optional[str] = None
+    volume_level: float = 0.5
+    volume_muted: bool = False
+    is_active_input: Optional[bool] = None
+    is_stand_by: Optional[bool] = None
+
+
+@dataclass(frozen=True)
+class FakeMediaStatus:
+    """pychromecastのMediaStatus相当"""
+
+    player_state: Optional[str] = None
+    content_id: Optional[str] = None
+    duration: Optional[float] = None
+    current_time: float = 0.0
+
+
+@dataclass(frozen=True)
+class FakeCastInfo:
+    """pychromecastのCastInfo相当"""
+
+    friendly_name: str
+    host: str = "127.0.0.1"
+    port: int = 8009
+    uuid: UUID = field(default_factory=uuid4)
+    model_name: str = "Chromecast"
+    cast_type: str = "cast"
+    manufacturer: str = "Google Inc."
+    services: frozenset = frozenset()
+
+
+@dataclass
+class DeviceStats:
+    """疑似デバイスが受け取った通信の記録"""
+
+    set_volume: int = 0
+    quit_app: int = 0
+    dropped: int = 0
+    status_requests: int = 0
+    # (時刻, 音量) の履歴。適用されたものだけ
+    volume_history: List[Tuple[float, float]] = field(default_factory=list)
+
+    @property
+    def commands(self) -> int:
+        return self.set_volume + self.quit_app
+
+
+class _FakeMediaController:
+    def __init__(self, device: "FakeChromecast"):
+        self._device = device
+        self.status = FakeMediaStatus()
+        self._listeners: list = []
+
+    def register_status_listener(self, listener) -> None:
+        self._listeners.append(listener)
+
+    def update_status(self, callback_function=None) -> None:
+        self._device.stats.status_requests += 1
+        self._device._round_trip()
+        # 実機と同じく、問い合わせの応答には現在の再生位置を載せる
+        if self.status.player_state == "PLAYING" and self.status.duration:
+            self.status = replace(self.status, current_time=self._device.media_time())
+        self._fire()
+
+    def _fire(self) -> None:
+        for listener in list(self._listeners):
+            listener.new_media_status(self.status)
+
+
+class _FakeReceiverController:
+    def __init__(self, device: "FakeChromecast"):
+        self._device = device
+
+    def update_status(self, callback_function=None) -> None:
+        self._device.stats.status_requests += 1
+        self._device._round_trip()
+        self._device._fire_cast_status()
+
+
+class _FakeHeartbeatController:
+    """疑似デバイスはPINGに即座に応答するため、最後のPONGは常に現在の仮想時刻"""
+
+    def __init__(self, device: "FakeChromecast"):
+        self._device = device
+
+    @property
+    def last_pong(self) -> float:
+        return self._device.clock.now
+
+    def ping(self) -> None:
+        pass
+
+
+class _FakeSocketClient:
+    def __init__(self, device: "FakeChromecast"):
+        self.receiver_controller = _FakeReceiverController(device)
+        self.heartbeat_controller = _FakeHeartbeatController(device)
+        self.host = device.cast_info.host
+        self.port = device.cast_info.port
+        self.services: set = set(device.cast_info.services)
+        self.is_stopped = False
+
+
+class FakeChromecast:
+    """
+    プロセス内で動く疑似Chromecast
+
+    Args:
+        clock: 仮想時計（通信の遅延と状態遷移に使う）
+        name: friendly_name
+        volume_level: 初期音量
+        app_id: 起動中のアプリ（Noneならアイドル）
+        player_state: メディアの状態
+        latency: 1回の通信にかかる時間（秒）
+        drop_rate: set_volume が失われる確率
+        seed: drop_rate の乱数シード
+    """
+
+    APP_ID = "CC1AD845"
+
+    def __init__(
+        self,
+        clock: VirtualClock,
+        name: str = "Simulated TV",
+        volume_level: float = 0.6,
+        app_id: Optional[str] = APP_ID,
+        player_state: Optional[str] = "PLAYING",
+        latency: float = 0.05,
+        drop_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.clock = clock
+        self.cast_info = FakeCastInfo(friendly_name=name)
+        self.status = FakeCastStatus(app_id=app_id, volume_level=volume_level)
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.stats = DeviceStats()
+        self._random = random.Random(seed)
+        self._listeners: list = []
+        self.media_controller = _FakeMediaController(self)
+        self.media_controller.status = FakeMediaStatus(player_state=player_state)
+        self.socket_client = _FakeSocketClient(self)
+        self._stall_until = 0.0
+        # 再生位置の基準（仮想時刻, その時点の再生位置）
+        self._media_anchor = (clock.now, 0.0)
+        # 再生開始時刻（判定遅延の計測用）
+        self.playback_started: List[float] = []
+
+    # ---- pychromecast.Chromecast と同じインターフェース ----
+
+    @property
+    def uuid(self):
+        return self.cast_info.uuid
+
+    @property
+    def name(self) -> str:
+        return self.cast_info.friendly_name
+
+    def register_status_listener(self, listener) -> None:
+        self._listeners.append(listener)
+
+    def register_connection_listener(self, listener) -> None:
+        # 疑似デバイスは切断しないため、接続状態の通知は送らない
+        pass
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        self.clock.sleep(self.latency)
+
+    def disconnect(self, timeout: Optional[float] = None) -> None:
+        self.socket_client.is_stopped = True
+
+    def set_volume(self, volume: float, timeout: float = 10.0) -> float:
+        self.stats.set_volume += 1
+        self._round_trip()
+        if self.drop_rate and self._random.random() < self.drop_rate:
+            self.stats.dropped += 1
+            return volume
+        volume = min(1.0, max(0.0, volume))
+        self.status = replace(self.status, volume_level=volume)
+        self.stats.volume_history.append((self.clock.now, volume))
+        self._fire_cast_status()
+        return volume
+
+    def quit_app(self, timeout: float = 10.0) -> None:
+        self.stats.quit_app += 1
+        self._round_trip()
+        self.go_idle()
+
+    # ---- シナリオ操作 ----
+
+    def start_playback(self, app_id: str = APP_ID) -> None:
+        """アプリを起動して再生を始める"""
+        self.playback_started.append(self.clock.now)
+        self.status = replace(self.status, app_id=app_id)
+        self._fire_cast_status()
+        self.media_controller.status = FakeMediaStatus(player_state="PLAYING")
+        self.media_controller._fire()
+
+    def go_idle(self) -> None:
+        """アプリを終了してアイドル状態にする"""
+        self.status = replace(self.status, app_id=None)
+        self._fire_cast_status()
+        self.media_controller.status = FakeMediaStatus(player_state="IDLE")
+        self.media_controller._fire()
+
+    def play_media(self, content_id: str, duration: float, position: float = 0.0) -> None:
+        """長さ `duration` 秒のメディアを `position` 秒の位置から再生する"""
+        if self.status.app_id is None:
+            self.status = replace(self.status, app_id=self.APP_ID)
+            self._fire_cast_status()
+        self._set_media("PLAYING", content_id, duration, position)
+
+    def media_time(self) -> float:
+        """現在の再生位置（秒）"""
+        media = self.media_controller.status
+        started_at, position = self._media_anchor
+        if media.player_state == "PLAYING":
+            position += self.clock.now - started_at
+        return min(position, media.duration or position)
+
+    def seek(self, position: float) -> None:
+        media = self.media_controller.status
+        self._set_media(media.player_state, media.content_id, media.duration, position)
+
+    def pause(self) -> None:
+        media = self.media_controller.status
+        self._set_media("PAUSED", media.content_id, media.duration, self.media_time())
+
+    def resume(self) -> None:
+        media = self.media_controller.status
+        self._set_media("PLAYING", media.content_id, media.duration, self.media_time())
+
+    def finish_media(self) -> None:
+        """メディアを最後まで再生し終える（アプリは起動したまま）"""
+        media = self.media_controller.status
+        self._set_media("IDLE", media.content_id, media.duration, media.duration or 0.0)
+
+    def _set_media(
+        self,
+        player_state: str,
+        content_id: Optional[str],
+        duration: Optional[float],
+        position: float,
+    ) -> None:
+        self._media_anchor = (self.clock.now, position)
+        self.media_controller.status = FakeMediaStatus(
+            player_state=player_state, content_id=content_id, duration=duration,
+            current_time=position,
+        )
+        self.media_controller._fire()
+
+    def push_cast_status(self, volume_level: Optional[float] = None, **fields) -> None:
+        """
+        受信機の状態を `fields` に置き換えて通知する（トレースの再生用）
+
+        `volume_level` を省略した場合は今の音量のまま（音量は受け取った set_volume で決まる）。
+        """
+        if volume_level is None:
+            volume_level = self.status.volume_level
+        self.status = FakeCastStatus(volume_level=volume_level, **fields)
+        self._fire_cast_status()
+
+    def push_media_status(self, **fields) -> None:
+        """メディアの状態を `fields` に置き換えて通知する（トレースの再生用）"""
+        self._media_anchor = (self.clock.now, fields.get("current_time", 0.0))
+        self.media_controller.status = FakeMediaStatus(**fields)
+        self.media_controller._fire()
+
+    def stall(self, seconds: float) -> None:
+        """次の通信を `seconds` 秒止める（サスペンドや応答の無い状態）"""
+        self._stall_until = max(self._stall_until, self.clock.now + seconds)
+
+    def schedule(self, when: float, action: Callable[[], None]) -> None:
+        """仮想時計が `when` に達したときに `action` を実行する"""
+        self.clock.call_at(when, action)
+
+    # ---- 内部処理 ----
+
+    def _round_trip(self) -> None:
+        if self._stall_until > self.clock.now:
+            self.clock.sleep(self._stall_until - self.clock.now)
+        if self.latency:
+            self.clock.sleep(self.latency)
+
+    def _fire_cast_status(self) -> None:
+        for listener in list(self._listeners):
+            listener.new_cast_status(self.status)
+
+    def decision_lags(self) -> List[float]:
+        """再生開始から最初の set_volume までの時間（仮想秒）"""
+        lags = []
+        history = [t for t, _ in self.stats.volume_history]
+        for started in self.playback_started:
+            after = [t for t in history if t >= started]
+            if after:
+                lags.append(after[0] - started)
+        return lags
+
+
+# ---- 一晩分のシミュレーション ----
+
+
+@dataclass
+class NightScenario:
+    """一晩分のシミュレーション条件"""
+
+    initial_volume: float = 0.6
+    step: float = -0.04
+    min_level: float = 0.3
+    interval_sec: int = 1200
+    profile: str = "step"
+    status_ttl: float = 300.0
+    idle_poll_sec: float = 300.0
+    latency: float = 0.05
+    drop_rate: float = 0.0
+    start_active: bool = True
+    # (経過秒, "active" または "idle") の状態遷移
+    transitions: List[Tuple[float, str]] = field(default_factory=list)
+    # (経過秒, 秒数): その時刻から指定秒数、デバイスが応答しなくなる（サスペンド・長い停止）
+    stalls: List[Tuple[float, float]] = field(default_factory=list)
+    missed_tick_policy: str = DEFAULT_MISSED_TICK_POLICY
+    seed: int = 0
+
+
+@dataclass
+class NightReport:
+    """一晩分のシミュレーション結果"""
+
+    scenario: NightScenario
+    commands: int
+    set_volume: int
+    dropped: int
+    status_round_trips: int
+    decision_lags: List[float]
+    simulated_sec: float
+    wall_sec: float
+    final_volume: float
+    # 周期ごとの実行遅れ
+    lateness: LatenessStats = field(default_factory=LatenessStats)
+    # デバイスに適用された (時刻, 音量) の履歴
+    volume_history: List[Tuple[float, float]] = field(default_factory=list)
+
+
+def run_simulated_night(
+    scenario: NightScenario, recorder: Optional[TraceRecorder] = None
+) -> NightReport:
+    """
+    疑似Chromecastと仮想時計で一晩分の音量制御を実行する
+
+    main() と同じ順序（状態スナップショット作成 → 初期音量取得 → 音量制御ループ）で動かす。
+    `recorder` を指定すると、実機と同じく状態通知と送信したコマンドをトレースに記録する。
+    """
+    from .main import (
+        get_initial_volume,
+        log_chromecast_status,
+        profile_fade_loop,
+        volume_control_loop,
+    )
+
+    started = time.perf_counter()
+    virtual_clock = VirtualClock()
+    device = FakeChromecast(
+        virtual_clock,
+        volume_level=scenario.initial_volume,
+        app_id=FakeChromecast.APP_ID if scenario.start_active else None,
+        player_state="PLAYING" if scenario.start_active else None,
+        latency=scenario.latency,
+        drop_rate=scenario.drop_rate,
+        seed=scenario.seed,
+    )
+    for when, state in scenario.transitions:
+        device.schedule(when, device.start_playback if state == "active" else device.go_idle)
+    for when, seconds in scenario.stalls:
+        device.schedule(when, functools.partial(device.stall, seconds))
+    lateness = LatenessStats()
+
+    with virtual_time(virtual_clock):
+        monitor = StatusMonitor(device, ttl=scenario.status_ttl, refresh_wait=0).attach()
+        log_chromecast_status(device, monitor)
+        initial_volume = get_initial_volume(device, monitor)
+        if recorder is not None:
+            recorder.start(
+                device, monitor, initial_volume,
+                params={
+                    "profile": scenario.profile, "interval_sec": scenario.interval_sec,
+                    "step": scenario.step, "min_level": scenario.min_level,
+                    "missed_tick_policy": scenario.missed_tick_policy,
+                },
+                options={
+                    "idle_poll_sec": scenario.idle_poll_sec, "status_ttl": scenario.status_ttl,
+                },
+            )
+        if scenario.profile == "step":
+            volume_control_loop(
+                device, scenario.interval_sec, scenario.step, scenario.min_level,
+                initial_volume, monitor, scenario.idle_poll_sec,
+                scenario.missed_tick_policy, lateness,
+            )
+        else:
+            profile_fade_loop(
+                device, scenario.profile, scenario.interval_sec, scenario.step,
+                scenario.min_level, initial_volume, monitor,
+                idle_poll_sec=scenario.idle_poll_sec,
+                missed_tick_policy=scenario.missed_tick_policy, lateness_stats=lateness,
+            )
+        if recorder is not None:
+            recorder.stop()
+
+    return NightReport(
+        scenario=scenario,
+        commands=device.stats.commands,
+        set_volume=device.stats.set_volume,
+        dropped=device.stats.dropped,
+        status_round_trips=device.stats.status_requests,
+        decision_lags=device.decision_lags(),
+        simulated_sec=virtual_clock.now,
+        wall_sec=time.perf_counter() - started,
+        final_volume=device.status.volume_level,
+        lateness=lateness,
+        volume_history=list(device.stats.volume_history),
+    )
@@ -0,0 +1,458 @@
+"""
+Cast v2プロトコルを話すローカルの代役サーバー
+
+実機なしで、ソケット・TLS・protobufを含む本物の通信経路
+（`pychromecast.Chromecast` → `cast.wait()` → `set_volume()` / `quit_app()`）を計測するためのもの。
+mDNSは使わず、`endpoint()` の静的ホストで接続する。
+"""
+
+import json
+import logging
+import shutil
+import socket
+import ssl
+import struct
+import subprocess
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
+
+from pychromecast.generated.cast_channel_pb2 import CastMessage
+
+from .cache import CachedEndpoint
+from .paths import get_state_dir
+
+NS_CONNECTION = "urn:x-cast:com.google.cast.tp.connection"
+NS_HEARTBEAT = "urn:x-cast:com.google.cast.tp.heartbeat"
+NS_RECEIVER = "urn:x-cast:com.google.cast.receiver"
+NS_MEDIA = "urn:x-cast:com.google.cast.media"
+NS_MULTIZONE = "urn:x-cast:com.google.cast.multizone"
+PLATFORM_ID = "receiver-0"
+BROADCAST_ID = "*"
+
+# 代役サーバーが起動中とみなすアプリ（Default Media Receiver）
+DEFAULT_APP_ID = "CC1AD845"
+# 1メッセージの最大サイズ（Cast v2の上限）
+MAX_MESSAGE_SIZE = 64 * 1024
+# 停止要求を確認する間隔（秒）
+ACCEPT_POLL_SEC = 0.1
+
+
+def ensure_self_signed_cert(directory: Optional[Path] = None) -> Tuple[Path, Path]:
+    """
+    代役サーバー用の自己署名証明書を用意する（無ければopensslで作成）
+
+    pychromecastは証明書を検証しないため、自己署名で接続できる。
+
+    Returns:
+        (certfile, keyfile)
+
+    Raises:
+        RuntimeError: opensslが見つからない、または作成に失敗した場合
+    """
+    directory = directory or get_state_dir() / "standin"
+    directory.mkdir(parents=True, exist_ok=True)
+    certfile, keyfile = directory / "cert.pem", directory / "key.pem"
+    if certfile.exists() and keyfile.exists():
+        return certfile, keyfile
+
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        raise RuntimeError("証明書の作成に openssl が必要です")
+    try:
+        subprocess.run(
+            [
+                openssl, "req", "-x509", "-nodes", "-days", "3650",
+                "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+                "-subj", "/CN=nemucast-standin",
+                "-keyout", str(keyfile), "-out", str(certfile),
+            ],
+            check=True, capture_output=True,
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"証明書を作成できませんでした: {e.stderr.decode(errors='replace')}")
+    return certfile, keyfile
+
+
+@dataclass
+class ServerStats:
+    """代役サーバーが受け取った通信の記録"""
+
+    connections: int = 0
+    drops: int = 0
+    # (namespaceの末尾, type) ごとの受信数
+    messages: Counter = field(default_factory=Counter)
+    # (時刻, 音量) の履歴
+    volume_history: List[Tuple[float, float]] = field(default_factory=list)
+
+    def count(self, namespace: str, message_type: str) -> int:
+        return self.messages[(namespace.rsplit(".", 1)[-1], message_type)]
+
+
+class _Connection:
+    """1本のクライアント接続"""
+
+    def __init__(self, sock: ssl.SSLSocket, peer):
+        self.sock = sock
+        self.peer = peer
+        self.send_lock = threading.Lock()
+        # CONNECTされた仮想チャンネル（送信元ID）
+        self.sources: set = set()
+
+    def read_message(self) -> Optional[CastMessage]:
+        header = self._recv_exact(4)
+        if header is None:
+            return None
+        (length,) = struct.unpack(">I", header)
+        if length > MAX_MESSAGE_SIZE:
+            raise ValueError(f"メッセージが大きすぎます: {length}バイト")
+        payload = self._recv_exact(length)
+        if payload is None:
+            return None
+        message = CastMessage()
+        message.ParseFromString(payload)
+        return message
+
+    def _recv_exact(self, size: int) -> Optional[bytes]:
+        chunks = []
+        while size:
+            chunk = self.sock.recv(size)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def send(self, source_id: str, destination_id: str, namespace: str, data: dict) -> None:
+        message = CastMessage()
+        message.protocol_version = CastMessage.CASTV2_1_0
+        message.source_id = source_id
+        message.destination_id = destination_id
+        message.namespace = namespace
+        message.payload_type = CastMessage.STRING
+        message.payload_utf8 = json.dumps(data)
+        payload = message.SerializeToString()
+        with self.send_lock:
+            self.sock.sendall(struct.pack(">I", len(payload)) + payload)
+
+    def close(self) -> None:
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class StandInCastServer:
+    """
+    localhostで動くCast v2の代役サーバー
+
+    接続（CONNECT/CLOSE）、ハートビート（PING/PONG）、receiverの
+    GET_STATUS / SET_VOLUME / STOP / LAUNCH、mediaの GET_STATUS に応答する。
+    `members` を指定するとキャストグループとして振る舞い、multizoneの GET_STATUS にメンバーを返す。
+
+    Args:
+        host: 待ち受けアドレス
+        port: 待ち受けポート（0なら空きポート）
+        name: friendly_name
+        volume_level: 初期音量
+        app_id: 起動中のアプリ（Noneならアイドル）
+        player_state: メディアの状態
+        response_delay: 応答までの遅延（秒）。デバイスの処理時間を模擬する
+        certfile: TLS証明書（省略時は `ensure_self_signed_cert()`）
+        keyfile: TLS秘密鍵
+        members: グループのメンバー（(UUID, friendly_name) のリスト）
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        name: str = "Stand-in TV",
+        volume_level: float = 0.5,
+        app_id: Optional[str] = DEFAULT_APP_ID,
+        player_state: Optional[str] = "PLAYING",
+        response_delay: float = 0.0,
+        certfile: Optional[Path] = None,
+        keyfile: Optional[Path] = None,
+        members: Sequence[Tuple[str, str]] = (),
+    ):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.uuid: UUID = uuid4()
+        self.volume_level = volume_level
+        self.muted = False
+        self.app_id = app_id
+        self.player_state = player_state
+        self.response_delay = response_delay
+        self.members = list(members)
+        # Trueの間は何にも応答しない（Wi-Fiから外れたデバイスを模擬する）
+        self.offline = False
+        self.stats = ServerStats()
+        self._certfile = certfile
+        self._keyfile = keyfile
+        self._session_id = str(uuid4())
+        self._lock = threading.Lock()
+        self._connections: Dict[int, _Connection] = {}
+        self._listener: Optional[socket.socket] = None
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    # ---- 起動・停止 ----
+
+    def start(self) -> "StandInCastServer":
+        """待ち受けを開始する"""
+        if self._certfile is None or self._keyfile is None:
+            self._certfile, self._keyfile = ensure_self_signed_cert()
+        self._context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self._context.load_cert_chain(self._certfile, self._keyfile)
+
+        self._listener = socket.create_server((self.host, self.port))
+        # 停止要求を確認できるよう、acceptは短い間隔で戻す
+        self._listener.settimeout(ACCEPT_POLL_SEC)
+        self.port = self._listener.getsockname()[1]
+        self._stopped.clear()
+        self._spawn(self._accept_loop, "standin-accept")
+        logging.info("Cast代役サーバーを起動しました: %s:%d (%s)", self.host, self.port, self.name)
+        return self
+
+    def stop(self) -> None:
+        """待ち受けを停止し、すべての接続を閉じる"""
+        self._stopped.set()
+        self._close_all()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads.clear()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def __enter__(self) -> "StandInCastServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def endpoint(self) -> CachedEndpoint:
+        """mDNSなしで接続するための静的な接続先"""
+        return CachedEndpoint(
+            name=self.name,
+            host=self.host,
+            port=self.port,
+            uuid=str(self.uuid),
+            model_name="Google Cast Group" if self.members else "Chromecast",
+            cast_type="group" if self.members else "cast",
+            manufacturer="nemucast",
+            last_seen=time.time(),
+        )
+
+    # ---- 障害注入・シナリオ操作 ----
+
+    def drop_connections(self) -> int:
+        """接続中のソケットをすべて切断する（クライアントの再接続を試験する）"""
+        dropped = self._close_all()
+        self.stats.drops += dropped
+        logging.info("Cast代役サーバー: %d本の接続を切断しました", dropped)
+        return dropped
+
+    def go_offline(self) -> None:
+        """
+        接続を閉じずに応答だけを止め、新しい接続もすぐに閉じる
+
+        Wi-Fiから外れたデバイスのように、クライアントからはハートビートの途絶でしか分からない。
+        """
+        self.offline = True
+        logging.info("Cast代役サーバー: 応答を止めました")
+
+    def come_online(self) -> None:
+        """`go_offline()` の後、再び接続と応答を受け付ける"""
+        self.offline = False
+        logging.info("Cast代役サーバー: 応答を再開しました")
+
+    @property
+    def connection_count(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+    def start_playback(self, app_id: str = DEFAULT_APP_ID) -> None:
+        """アプリを起動して再生を始め、接続中のクライアントに通知する"""
+        self.app_id = app_id
+        self.player_state = "PLAYING"
+        self._broadcast_receiver_status()
+
+    def go_idle(self) -> None:
+        """アプリを終了してアイドル状態にし、接続中のクライアントに通知する"""
+        self.app_id = None
+        self.player_state = None
+        self._broadcast_receiver_status()
+
+    # ---- 内部処理 ----
+
+    def _spawn(self, target, name: str, *args) -> None:
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _close_all(self) -> int:
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        return len(connections)
+
+    def _accept_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                raw, peer = self._listener.accept()
+            except socket.timeout:
+                continue
+            except (OSError, AttributeError):
+                return
+            raw.settimeout(None)
+            self._spawn(self._serve, "standin-conn", raw, peer)
+
+    def _serve(self, raw: socket.socket, peer) -> None:
+        if self.offline:
+            raw.close()
+            return
+        try:
+            sock = self._context.wrap_socket(raw, server_side=True)
+        except (ssl.SSLError, OSError) as e:
+            logging.debug("Cast代役サーバー: TLSハンドシェイクに失敗しました: %s", e)
+            raw.close()
+            return
+        conn = _Connection(sock, peer)
+        with self._lock:
+            self._connections[id(conn)] = conn
+            self.stats.connections += 1
+        try:
+            while not self._stopped.is_set():
+                message = conn.read_message()
+                if message is None:
+                    break
+                self._handle(conn, message)
+        except (OSError, ValueError) as e:
+            logging.debug("Cast代役サーバー: 接続を終了します: %s", e)
+        finally:
+            with self._lock:
+                self._connections.pop(id(conn), None)
+            conn.close()
+
+    def _handle(self, conn: _Connection, message: CastMessage) -> None:
+        if self.offline:
+            return
+        data = json.loads(message.payload_utf8) if message.payload_utf8 else {}
+        message_type = data.get("type", "")
+        namespace = message.namespace
+        self.stats.messages[(namespace.rsplit(".", 1)[-1], message_type)] += 1
+
+        def reply(payload: dict) -> None:
+            if "requestId" in data:
+                payload["requestId"] = data["requestId"]
+            conn.send(message.destination_id, message.source_id, namespace, payload)
+
+        if namespace == NS_CONNECTION:
+            if message_type == "CONNECT":
+                conn.sources.add(message.source_id)
+            return
+        if namespace == NS_HEARTBEAT:
+            if message_type == "PING":
+                reply({"type": "PONG"})
+            return
+
+        if self.response_delay:
+            time.sleep(self.response_delay)
+
+        if namespace == NS_RECEIVER:
+            if message_type == "SET_VOLUME":
+                volume = data.get("volume", {})
+                if "level" in volume:
+                    self.volume_level = min(1.0, max(0.0, float(volume["level"])))
+                    self.stats.volume_history.append((time.monotonic(), self.volume_level))
+                if "muted" in volume:
+                    self.muted = bool(volume["muted"])
+            elif message_type == "STOP":
+                self.app_id = None
+                self.player_state = None
+            elif message_type == "LAUNCH":
+                self.app_id = data.get("appId", DEFAULT_APP_ID)
+                self.player_state = "IDLE"
+            elif message_type != "GET_STATUS":
+                return
+            reply(self._receiver_status())
+            if message_type != "GET_STATUS":
+                self._broadcast_receiver_status(exclude=conn)
+        elif namespace == NS_MEDIA and message_type == "GET_STATUS":
+            reply(self._media_status())
+        elif namespace == NS_MULTIZONE and message_type == "GET_STATUS" and self.members:
+            reply(self._multizone_status())
+
+    def _transport_id(self) -> str:
+        return f"web-{self._session_id[:8]}"
+
+    def _receiver_status(self) -> dict:
+        status: dict = {
+            "volume": {
+                "level": self.volume_level,
+                "muted": self.muted,
+                "controlType": "attenuation",
+                "stepInterval": 0.05,
+            },
+            "isActiveInput": self.app_id is not None,
+            "isStandBy": self.app_id is None,
+        }
+        if self.app_id is not None:
+            status["applications"] = [{
+                "appId": self.app_id,
+                "displayName": "Default Media Receiver",
+                "namespaces": [{"name": NS_MEDIA}],
+                "sessionId": self._session_id,
+                "transportId": self._transport_id(),
+                "statusText": "",
+            }]
+        return {"type": "RECEIVER_STATUS", "status": status}
+
+    def _multizone_status(self) -> dict:
+        devices = [
+            {"deviceId": uuid, "name": name, "capabilities": 4,
+             "volume": {"level": 1.0, "muted": False}}
+            for uuid, name in self.members
+        ]
+        return {"type": "MULTIZONE_STATUS", "status": {"devices": devices, "isMultichannel": False}}
+
+    def _media_status(self) -> dict:
+        if self.app_id is None or self.player_state is None:
+            return {"type": "MEDIA_STATUS", "status": []}
+        return {
+            "type": "MEDIA_STATUS",
+            "status": [{
+                "mediaSessionId": 1,
+                "playbackRate": 1,
+                "playerState": self.player_state,
+                "currentTime": 0,
+                "supportedMediaCommands": 15,
+                "volume": {"level": 1, "muted": False},
+                "media": {
+                    "contentId": "nemucast-standin",
+                    "streamType": "BUFFERED",
+                    "contentType": "audio/mpeg",
+                },
+            }],
+        }
+
+    def _broadcast_receiver_status(self, exclude: Optional[_Connection] = None) -> None:
+        """状態変化を全クライアントに通知する（実機と同じくrequestIdは0）"""
+        payload = dict(self._receiver_status(), requestId=0)
+        with self._lock:
+            connections = [c for c in self._connections.values() if c is not exclude]
+        for conn in connections:
+            try:
+                conn.send(PLATFORM_ID, BROADCAST_ID, NS_RECEIVER, payload)
+            except OSError:
+                pass
@@ -0,0 +1,241 @@
+"""プッシュ通知で更新されるChromecastの状態スナップショット"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from . import trace
+from .clock import monotonic
+from .metrics import record_rpc, record_rpc_error
+
+# スナップショットをネットワーク問い合わせなしで信用する時間（秒）
+DEFAULT_STATUS_TTL = 300.0
+# 問い合わせ後に応答を待つ最大時間（秒）
+DEFAULT_REFRESH_WAIT = 1.0
+
+CAST_STATUS = "cast"
+MEDIA_STATUS = "media"
+# 接続状態の変化（`set_connected`）。通知の status は接続中かどうか
+CONNECTION = "connection"
+
+# アイドル画面（IDLE_APP_ID）とBackdrop（アンビエントモード）はアプリ起動中とみなさない
+IDLE_APP_IDS = ("E8C28D3C", "Backdrop")
+# 再生中とみなすメディアの状態
+PLAYBACK_STATES = ("PLAYING", "BUFFERING")
+
+
+@dataclass(frozen=True)
+class MediaPosition:
+    """再生中のメディアの項目と再生位置（状態通知を受け取った時点の値）"""
+
+    content_id: Optional[str]
+    player_state: Optional[str]
+    duration: float
+    current_time: float
+    # 状態通知を受け取った時刻（`clock.monotonic()`）
+    received_at: float
+
+    def position_at(self, now: float) -> float:
+        """`now` 時点の再生位置（再生中なら受信後の経過時間だけ進める）"""
+        elapsed = now - self.received_at if self.player_state == "PLAYING" else 0.0
+        return min(self.duration, self.current_time + max(0.0, elapsed))
+
+    def remaining_at(self, now: float) -> float:
+        """`now` 時点のメディアの残り時間（秒）"""
+        return max(0.0, self.duration - self.position_at(now))
+
+
+def is_playback_event(kind: str, status) -> bool:
+    """
+    状態通知が再生開始（アイドル以外のアプリ起動、またはPLAYING/BUFFERING）を示すか判定する
+    """
+    if status is None:
+        return False
+    if kind == CAST_STATUS:
+        app_id = getattr(status, "app_id", None)
+        return app_id is not None and app_id not in IDLE_APP_IDS
+    if kind == MEDIA_STATUS:
+        return getattr(status, "player_state", None) in PLAYBACK_STATES
+    return False
+
+
+class StatusMonitor:
+    """
+    cast-status / media-status リスナーで受け取った最新状態を保持する
+
+    呼び出し側はスナップショットを読むだけでよく、
+    スナップショットが `ttl` 秒より古い場合だけ GET_STATUS を送信する。
+    """
+
+    def __init__(
+        self,
+        cast,
+        ttl: float = DEFAULT_STATUS_TTL,
+        refresh_wait: float = DEFAULT_REFRESH_WAIT,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.cast = cast
+        self.ttl = ttl
+        self.refresh_wait = refresh_wait
+        self._clock = clock
+        self._changed = threading.Condition()
+        self._listeners: List[Callable[[str, object], None]] = []
+
+        self.cast_status = cast.status
+        self.cast_status_at: Optional[float] = clock() if cast.status is not None else None
+        self.media_status = None
+        self.media_status_at: Optional[float] = None
+        # 接続中か（`supervisor.ConnectionSupervisor` が切断を検知したらFalse）
+        self.connected = True
+        # 送信した GET_STATUS の回数
+        self.refresh_count = 0
+        # 応答が無くても同じTTL内に何度も問い合わせないよう送信時刻を記録する
+        self._requested_at = {CAST_STATUS: None, MEDIA_STATUS: None}
+        # 受信した状態の通し番号（問い合わせへの応答待ちに使う）
+        self._versions = {CAST_STATUS: 0, MEDIA_STATUS: 0}
+
+    def attach(self) -> "StatusMonitor":
+        """Chromecastにリスナーとして登録する"""
+        self.cast.register_status_listener(self)
+        self.cast.media_controller.register_status_listener(self)
+        return self
+
+    def add_listener(self, callback: Callable[[str, object], None]) -> None:
+        """状態更新時に `callback(kind, status)` を呼び出す（ソケットスレッドから呼ばれる）"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, object], None]) -> None:
+        """`add_listener` で登録したコールバックを解除する"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    # ---- pychromecast のリスナーインターフェース ----
+
+    def new_cast_status(self, status) -> None:
+        """受信機の状態（音量・app_idなど）を受け取る"""
+        with self._changed:
+            self.cast_status = status
+            self.cast_status_at = self._clock()
+            self._versions[CAST_STATUS] += 1
+            self._changed.notify_all()
+        self._fire(CAST_STATUS, status)
+
+    def new_media_status(self, status) -> None:
+        """メディアの状態（player_stateなど）を受け取る"""
+        with self._changed:
+            self.media_status = status
+            self.media_status_at = self._clock()
+            self._versions[MEDIA_STATUS] += 1
+            self._changed.notify_all()
+        self._fire(MEDIA_STATUS, status)
+
+    def set_connected(self, connected: bool) -> None:
+        """接続状態を更新し、`CONNECTION` の通知として伝える"""
+        with self._changed:
+            self.connected = connected
+            self._changed.notify_all()
+        self._fire(CONNECTION, connected)
+
+    def load_media_failed(self, queue_item_id: int, error_code: int) -> None:
+        """メディアの読み込み失敗は状態判定に使わない"""
+
+    def _fire(self, kind: str, status) -> None:
+        for callback in self._listeners:
+            try:
+                callback(kind, status)
+            except Exception as e:
+                logging.warning("状態通知の処理に失敗しました: %s", e)
+
+    # ---- スナップショットの参照 ----
+
+    def _is_stale(self, kind: str) -> bool:
+        updated_at = self.cast_status_at if kind == CAST_STATUS else self.media_status_at
+        times = [t for t in (updated_at, self._requested_at[kind]) if t is not None]
+        return not times or self._clock() - max(times) > self.ttl
+
+    @property
+    def app_id(self) -> Optional[str]:
+        return self.cast_status.app_id if self.cast_status is not None else None
+
+    @property
+    def volume_level(self) -> Optional[float]:
+        return self.cast_status.volume_level if self.cast_status is not None else None
+
+    @property
+    def player_state(self) -> Optional[str]:
+        return self.media_status.player_state if self.media_status is not None else None
+
+    def media_position(self) -> Optional[MediaPosition]:
+        """
+        スナップショットからメディアの再生位置を返す（問い合わせはしない）
+
+        メディアの状態が無い、または長さの分からないメディア（ライブ配信など）ではNone。
+        """
+        status = self.media_status
+        duration = getattr(status, "duration", None)
+        if status is None or not duration or duration <= 0 or self.media_status_at is None:
+            return None
+        return MediaPosition(
+            content_id=getattr(status, "content_id", None),
+            player_state=status.player_state,
+            duration=float(duration),
+            current_time=float(getattr(status, "current_time", None) or 0.0),
+            received_at=self.media_status_at,
+        )
+
+    def refresh(self, force: bool = False, wait: Optional[float] = None) -> int:
+        """
+        古くなったスナップショットだけをネットワークから更新する
+
+        Args:
+            force: TTLに関わらず問い合わせる
+            wait: 応答を待つ最大時間（秒）。Noneなら `refresh_wait`
+
+        切断中は問い合わせない（再接続後に `ConnectionSupervisor` が取り直す）。
+
+        Returns:
+            送信した GET_STATUS の数
+        """
+        if not self.connected:
+            return 0
+        sent = 0
+        if force or self._is_stale(CAST_STATUS):
+            self._request(
+                CAST_STATUS, self.cast.socket_client.receiver_controller.update_status, wait
+            )
+            sent += 1
+        if self.app_id is not None and (force or self._is_stale(MEDIA_STATUS)):
+            self._request(MEDIA_STATUS, self.cast.media_controller.update_status, wait)
+            sent += 1
+        return sent
+
+    def refresh_cast_status(self, wait: Optional[float] = None) -> None:
+        """受信機の状態だけをTTLに関わらず問い合わせる（コマンドの反映確認用）"""
+        self._request(
+            CAST_STATUS, self.cast.socket_client.receiver_controller.update_status, wait
+        )
+
+    def _request(
+        self, kind: str, update_status: Callable[[], None], wait: Optional[float] = None
+    ) -> None:
+        """
+        GET_STATUS を送信し、応答でスナップショットが更新されるまで少し待つ
+
+        応答までの時間を往復時間として記録し、待ちきれなかった場合は失敗として数える。
+        """
+        with self._changed:
+            before = self._versions[kind]
+            logging.debug("状態を問い合わせます (%s)", kind)
+            trace.record_command(self.cast, "get_status", kind=kind)
+            started = self._clock()
+            update_status()
+            self.refresh_count += 1
+            self._requested_at[kind] = self._clock()
+            if self._changed.wait_for(
+                lambda: self._versions[kind] != before,
+                timeout=self.refresh_wait if wait is None else wait,
+            ):
+                record_rpc("update_status", self.cast, self._clock() - started)
+            else:
+                record_rpc_error("update_status", self.cast)
@@ -0,0 +1,328 @@
+"""
+接続の監視（ハートビートで切断を数秒で検知し、上限付きの指数バックオフで再接続する）
+
+pychromecastは10秒ごとのPINGに20秒応答が無いと切断とみなし、再接続の間隔も
+ホストごとに最大300秒まで延ばす。`ConnectionSupervisor` は最後にメッセージ
+（PONGや状態通知）を受け取ってからの時間を追い、短い間隔でPINGを送って
+`heartbeat_timeout` 秒を超えたら接続を切って再接続を始める。
+
+切断中はpychromecastの再接続先を空にして試行を止め、監視スレッドが前回のホストに
+届くかを上限付きの指数バックオフで確かめてから再接続先を戻す。続けて届かなければ
+`ConnectionLifecycle` と同じくデバイスを再検索する。切断中は `StatusMonitor` を
+切断状態にするため、音量制御ループはアイドル中と同じくフェードを止め、再接続後の
+状態通知で再開する。
+"""
+
+import logging
+import socket
+import threading
+from typing import Callable, List, Optional
+
+from . import metrics
+from .cache import EndpointCache
+from .clock import monotonic
+from .discovery import DEFAULT_DISCOVERY_TIMEOUT, rediscover_cast_info
+from .lifecycle import (
+    CONNECTED,
+    DEFAULT_REDISCOVER_AFTER,
+    FAILED_STATUSES,
+    ConnectionLifecycle,
+    pin_host,
+)
+from .status import StatusMonitor
+
+# 最後にメッセージを受け取ってからこの時間（秒）を超えたら切断とみなす
+DEFAULT_HEARTBEAT_TIMEOUT = 6.0
+# 再接続の間隔（秒）。失敗するたびに2倍にし、上限で打ち止めにする
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_MAX_BACKOFF = 30.0
+# 前回のホストに届くかを確かめるTCP接続の待ち時間（秒）
+DEFAULT_PROBE_TIMEOUT = 2.0
+# 切断中にpychromecastが再接続先の変更を確かめる間隔（秒）
+RETRY_POLL_SEC = 0.5
+
+LOST = "LOST"
+
+# 接続の監視で書き換える pychromecast の SocketClient の内部の属性（公開の方法が無い）
+SOCKET_CLIENT_INTERNALS = ("services", "_force_recon", "socketpair")
+_warned_internals: set = set()
+
+
+def _socket_client_has(client, *names: str) -> bool:
+    """
+    SocketClientに内部の属性があるか確かめる
+
+    pychromecastの変更で無くなっていれば、属性ごとに1回だけ警告してFalseを返す。
+    """
+    missing = [name for name in names if not hasattr(client, name)]
+    unwarned = [name for name in missing if name not in _warned_internals]
+    if unwarned:
+        _warned_internals.update(unwarned)
+        logging.warning(
+            "このバージョンのpychromecastのSocketClientには %s がありません。"
+            "切断時の再接続の制御を行いません。",
+            ", ".join(unwarned),
+        )
+    return not missing
+
+
+def stop_socket_client_retries(client) -> None:
+    """pychromecast自身の再接続を止める（再接続先を空にする）"""
+    if _socket_client_has(client, "services"):
+        client.services = set()
+
+
+def force_socket_client_reconnect(client) -> None:
+    """ソケットスレッドに今の接続を捨てさせる（pychromecastが切断時に使う方法と同じ）"""
+    if not _socket_client_has(client, "_force_recon", "socketpair"):
+        return
+    client._force_recon = True
+    try:
+        client.socketpair[1].send(b"x")
+    except OSError:
+        pass
+
+
+class Backoff:
+    """上限付きの指数バックオフ（`base`, `base * factor`, ... を `cap` で打ち止めにする）"""
+
+    def __init__(
+        self, base: float = DEFAULT_BACKOFF_BASE, cap: float = DEFAULT_MAX_BACKOFF,
+        factor: float = 2.0,
+    ):
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempts = 0
+
+    def next(self) -> float:
+        """次の待ち時間（秒）を返し、その次を延ばす"""
+        delay = min(self.cap, self.base * self.factor ** self.attempts)
+        if delay < self.cap:
+            self.attempts += 1
+        return delay
+
+    def reset(self) -> None:
+        self.attempts = 0
+
+
+def probe_host(host: str, port: int, timeout: float = DEFAULT_PROBE_TIMEOUT) -> bool:
+    """ホストのポートにTCPで接続できるか確かめる"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class ConnectionSupervisor(ConnectionLifecycle):
+    """
+    接続の健全性を監視し、切断を検知したら上限付きの指数バックオフで再接続する
+
+    `ConnectionLifecycle` と同じくホスト直結にして検索を止め、加えて監視スレッドで
+    ハートビートと最後のメッセージからの経過時間を確かめる。
+    接続状態の通知はソケットスレッドから、状態通知は `monitor` 経由で受け取る。
+    """
+
+    def __init__(
+        self,
+        cast,
+        cache: Optional[EndpointCache] = None,
+        discovery_timeout: float = DEFAULT_DISCOVERY_TIMEOUT,
+        monitor: Optional[StatusMonitor] = None,
+        heartbeat_timeout: float = DEFAULT_HEARTBEAT_TIMEOUT,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        rediscover_after: int = DEFAULT_REDISCOVER_AFTER,
+        probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+        clock: Callable[[], float] = monotonic,
+        rediscover: Callable = rediscover_cast_info,
+        probe: Callable[..., bool] = probe_host,
+    ):
+        super().__init__(
+            cast, cache, discovery_timeout, rediscover_after,
+            reconnect_wait=RETRY_POLL_SEC, rediscover=rediscover,
+        )
+        self.monitor = monitor
+        self.heartbeat_timeout = heartbeat_timeout
+        # タイムアウトまでに3回PINGを送る
+        self.heartbeat_interval = heartbeat_timeout / 3
+        self.backoff = Backoff(cap=max_backoff)
+        self.probe_timeout = probe_timeout
+        self._clock = clock
+        self._probe = probe
+
+        self.connected = True
+        self.disconnected_at: Optional[float] = None
+        self.last_message_at = clock()
+        # 切断から再接続までの時間（秒）の履歴
+        self.outages: List[float] = []
+        self._state = threading.Condition()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        self._last_pong: Optional[float] = None
+        self._next_attempt_at: Optional[float] = None
+        self._refresh_pending = False
+
+    def start(self, browser=None) -> "ConnectionSupervisor":
+        """ホスト直結にして検索を止め、監視スレッドを開始する"""
+        super().start(browser)
+        if self.monitor is not None:
+            self.monitor.add_listener(self._on_status)
+        self._last_pong = self.cast.socket_client.heartbeat_controller.last_pong
+        metrics.CONNECTED.labels(self.name).set(1)
+        self._watchdog = threading.Thread(
+            target=self._run, name=f"supervisor:{self.name}", daemon=True
+        )
+        self._watchdog.start()
+        return self
+
+    def stop(self) -> None:
+        """監視スレッドを止める（接続そのものは閉じない）"""
+        self._stopped.set()
+        self._wake.set()
+        if self.monitor is not None:
+            self.monitor.remove_listener(self._on_status)
+        if self._watchdog is not None and self._watchdog is not threading.current_thread():
+            self._watchdog.join(timeout=2)
+
+    @property
+    def mean_time_to_reconnect(self) -> Optional[float]:
+        """切断から再接続までの平均時間（秒）。再接続が無ければNone"""
+        return sum(self.outages) / len(self.outages) if self.outages else None
+
+    def last_message_age(self) -> float:
+        """最後にメッセージを受け取ってからの経過時間（秒）"""
+        return self._clock() - self.last_message_at
+
+    def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        """接続が戻るまで最大 `timeout` 秒待つ（接続中ならすぐにTrue）"""
+        with self._state:
+            return self._state.wait_for(lambda: self.connected, timeout)
+
+    # ---- 通知（ソケットスレッド） ----
+
+    def new_connection_status(self, status) -> None:
+        """pychromecastの接続状態リスナー"""
+        if status.status == CONNECTED:
+            self._mark_connected()
+            return
+        if status.status != LOST and status.status not in FAILED_STATUSES:
+            return
+        # 切断中はpychromecast自身の再接続を止め、前回のホストに届くことを確かめてから戻す
+        stop_socket_client_retries(self.cast.socket_client)
+        if status.status == LOST:
+            self._mark_disconnected("接続が切れました")
+        else:
+            self.failures += 1
+        self._wake.set()
+
+    def _on_status(self, kind: str, status) -> None:
+        self.last_message_at = self._clock()
+
+    # ---- 状態の切り替え ----
+
+    def _mark_disconnected(self, reason: str) -> None:
+        with self._state:
+            if not self.connected:
+                return
+            self.connected = False
+            self.disconnected_at = self._clock()
+            self.failures = 0
+            self.backoff.reset()
+            self._next_attempt_at = self.disconnected_at + self.backoff.next()
+        logging.warning("%s: %s。フェードを止めて再接続します。", self.name, reason)
+        metrics.CONNECTED.labels(self.name).set(0)
+        if self.monitor is not None:
+            self.monitor.set_connected(False)
+
+    def _mark_connected(self) -> None:
+        with self._state:
+            self.last_message_at = self._clock()
+            if self.connected:
+                return
+            outage = self.last_message_at - self.disconnected_at
+            self.connected = True
+            self.disconnected_at = None
+            self.failures = 0
+            self.outages.append(outage)
+            self._refresh_pending = True
+            self._state.notify_all()
+        logging.info(
+            "%s に再接続しました（切断 %.1f秒、平均 %.1f秒）。",
+            self.name, outage, self.mean_time_to_reconnect,
+        )
+        metrics.CONNECTED.labels(self.name).set(1)
+        metrics.RECONNECT_SECONDS.labels(self.name).observe(outage)
+        if self.monitor is not None:
+            self.monitor.set_connected(True)
+        self._wake.set()
+
+    # ---- 監視スレッド ----
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            if self.cast.socket_client.is_stopped:
+                return
+            try:
+                timeout = self._check_heartbeat() if self.connected else self._try_reconnect()
+            except Exception as e:
+                logging.warning("%s の接続の監視に失敗しました: %s", self.name, e)
+                timeout = self.heartbeat_interval
+            if timeout > 0:
+                self._wake.wait(timeout)
+            self._wake.clear()
+
+    def _check_heartbeat(self) -> float:
+        """最後のメッセージからの経過時間を確かめ、次に確かめるまでの秒数を返す"""
+        client = self.cast.socket_client
+        pong = client.heartbeat_controller.last_pong
+        if pong != self._last_pong:
+            self._last_pong = pong
+            self.last_message_at = self._clock()
+        if self._refresh_pending and self.monitor is not None:
+            # 切断中に変わったかもしれない状態を取り直す（応答は通知で受け取る）
+            self._refresh_pending = False
+            self.monitor.refresh(force=True, wait=0)
+
+        age = self.last_message_age()
+        if age > self.heartbeat_timeout:
+            metrics.HEARTBEAT_TIMEOUTS.labels(self.name).inc()
+            self._mark_disconnected(f"{age:.1f}秒間応答がありません")
+            force_socket_client_reconnect(self.cast.socket_client)
+            return 0.0
+        if age >= self.heartbeat_interval:
+            try:
+                client.heartbeat_controller.ping()
+            except Exception as e:
+                logging.debug("PINGを送信できませんでした: %s", e)
+        return self.heartbeat_interval
+
+    def _try_reconnect(self) -> float:
+        """
+        バックオフの時刻になったら前回のホストに届くか確かめ、届けば再接続先を戻す
+
+        Returns:
+            次に確かめるまでの秒数
+        """
+        with self._state:
+            if self.connected:
+                return 0.0
+            wait = self._next_attempt_at - self._clock()
+            if wait > 0:
+                return wait
+            self._next_attempt_at = self._clock() + self.backoff.next()
+        host, port = self.cast.cast_info.host, self.cast.cast_info.port
+        if self._probe(host, port, self.probe_timeout):
+            logging.info("%s (%s:%s) に届きます。再接続します。", self.name, host, port)
+            pin_host(self.cast, host, port)
+        else:
+            self.failures += 1
+            logging.info(
+                "%s (%s:%s) に届きません（%d回目）。%.0f秒後に再試行します。",
+                self.name, host, port, self.failures, self._next_attempt_at - self._clock(),
+            )
+            if self.failures >= self.rediscover_after:
+                # 再検索でホストが変わっていれば、新しいホストを再接続先にする
+                self.rediscover()
+        return max(0.0, self._next_attempt_at - self._clock())
@@ -0,0 +1,257 @@
+"""
+状態とコマンドのトレース（実機での一晩を記録し、`replay.py` で再生する）
+
+受信機とメディアの状態通知、接続状態の変化、nemucastが送ったコマンドを、
+記録開始からの経過秒付きで追記専用のJSON Linesファイルに1行ずつ書き込む。
+値がNoneの項目は書かない（再生時もNoneとして扱う）。
+
+レコード:
+    {"ev":"start","name":...,"uuid":...,"wall":...,"initial_volume":0.5,"resume_level":null,"params":{...},"options":{...}}
+    {"t":0.0,"ev":"cast","app_id":"CC1AD845","volume_level":0.5,...}
+    {"t":0.0,"ev":"media","player_state":"PLAYING","duration":1800.0,...}
+    {"t":12.5,"ev":"connection","connected":false}
+    {"t":1200.0,"ev":"cmd","op":"set_volume","level":0.46}
+    {"t":1200.1,"ev":"cmd","op":"get_status","kind":"cast"}
+    {"t":3600.0,"ev":"stop"}          # 停止要求（SIGTERM、ctl cancel など）
+    {"t":3600.1,"ev":"end"}
+
+標準ライブラリだけを使い、記録していないときのコマンドのフックは辞書を1回引くだけで済む。
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+
+from .clock import monotonic
+
+# 記録する受信機の状態（pychromecastのCastStatus）とメディアの状態（MediaStatus）の項目
+CAST_FIELDS = (
+    "app_id",
+    "display_name",
+    "volume_level",
+    "volume_muted",
+    "is_active_input",
+    "is_stand_by",
+)
+MEDIA_FIELDS = ("player_state", "content_id", "duration", "current_time")
+# 状態通知の種類（`status.CAST_STATUS` / `MEDIA_STATUS` / `CONNECTION` と同じ値）
+STATUS_EVENTS = ("cast", "media", "connection")
+
+# 記録中のデバイス（id(cast) → レコーダー）。コマンドのフックが参照する
+_ACTIVE: Dict[int, "TraceRecorder"] = {}
+
+
+def record_command(cast, op: str, **fields) -> None:
+    """`cast` を記録中ならコマンドを記録する（`commands.py` と `status.py` から呼ばれる）"""
+    recorder = _ACTIVE.get(id(cast))
+    if recorder is not None:
+        recorder.command(op, **fields)
+
+
+def record_stop(cast) -> None:
+    """`cast` を記録中なら停止要求（フェードの中止）を記録する。以降のコマンドは再生で比べない"""
+    recorder = _ACTIVE.get(id(cast))
+    if recorder is not None:
+        recorder.stop_requested()
+
+
+def snapshot(kind: str, status) -> dict:
+    """状態通知を記録する項目の辞書にする（Noneの項目は含めない）"""
+    if kind == "connection":
+        return {"connected": bool(status)}
+    names = CAST_FIELDS if kind == "cast" else MEDIA_FIELDS
+    values = {name: getattr(status, name, None) for name in names}
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def trace_path(name: str, directory: Path) -> Path:
+    """`directory` に置く新しいトレースファイルのパス（開始時刻とデバイス名）"""
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return Path(directory) / f"{stamp}-{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.jsonl"
+
+
+class TraceRecorder:
+    """
+    1台のデバイスの状態通知と送信したコマンドを記録する
+
+    Args:
+        path: 書き込むファイル（追記）。Noneならメモリ上の `records` にだけ残す
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path is not None else None
+        self.records: List[dict] = []
+        self._file: Optional[IO[str]] = None
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._cast = None
+        self._monitor = None
+
+    def start(
+        self,
+        cast,
+        monitor,
+        initial_volume: Optional[float] = None,
+        resume_level: Optional[float] = None,
+        params: Optional[dict] = None,
+        options: Optional[dict] = None,
+    ) -> "TraceRecorder":
+        """
+        記録を始める（開始レコードと現在の状態を書き、以降の状態通知とコマンドを記録する）
+
+        Args:
+            cast: 記録するデバイス
+            monitor: デバイスの `StatusMonitor`
+            initial_volume / resume_level: `main.begin_fade` で決めたフェードの開始時の音量
+            params: フェードの設定（`daemon.FadeParams` の項目名）
+            options: 再生に必要なその他の設定（`idle_poll_sec` / `status_ttl`）
+        """
+        if self.path is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            except OSError as e:
+                logging.warning("トレースファイルを開けません。記録しません: %s", e)
+                return self
+        info = cast.cast_info
+        self._started = monotonic()
+        self._write({
+            "ev": "start", "name": info.friendly_name, "uuid": str(info.uuid),
+            "wall": time.time(), "initial_volume": initial_volume, "resume_level": resume_level,
+            "params": params or {}, "options": options or {},
+        })
+        self._cast, self._monitor = cast, monitor
+        for kind, status in (("cast", monitor.cast_status), ("media", monitor.media_status)):
+            if status is not None:
+                self._on_status(kind, status)
+        monitor.add_listener(self._on_status)
+        _ACTIVE[id(cast)] = self
+        if self.path is not None:
+            logging.info("状態とコマンドを記録します: %s", self.path)
+        return self
+
+    def stop(self) -> None:
+        """終了レコードを書いて記録をやめる"""
+        if self._cast is None:
+            return
+        _ACTIVE.pop(id(self._cast), None)
+        self._monitor.remove_listener(self._on_status)
+        self._cast = self._monitor = None
+        self._write({"t": self._elapsed(), "ev": "end"})
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> "TraceRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def command(self, op: str, **fields) -> None:
+        """送信したコマンドを記録する"""
+        self._write({"t": self._elapsed(), "ev": "cmd", "op": op, **fields})
+
+    def stop_requested(self) -> None:
+        """停止要求を受けたことを記録する"""
+        self._write({"t": self._elapsed(), "ev": "stop"})
+
+    def _on_status(self, kind: str, status) -> None:
+        if kind in STATUS_EVENTS:
+            self._write({"t": self._elapsed(), "ev": kind, **snapshot(kind, status)})
+
+    def _elapsed(self) -> float:
+        return round(monotonic() - self._started, 3)
+
+    def _write(self, record: dict) -> None:
+        with self._lock:
+            if self._file is None:
+                self.records.append(record)
+                return
+            try:
+                line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+                self._file.write(line + "\n")
+                self._file.flush()
+            except OSError as e:
+                # 記録できなくても音量制御は続ける
+                logging.warning("トレースを書き込めませんでした: %s", e)
+
+
+@dataclass
+class Trace:
+    """読み込んだトレース（1回のフェード）"""
+
+    name: str
+    uuid: Optional[str] = None
+    wall: Optional[float] = None
+    initial_volume: Optional[float] = None
+    resume_level: Optional[float] = None
+    params: dict = field(default_factory=dict)
+    options: dict = field(default_factory=dict)
+    # (経過秒, 種類, 項目) の並び。種類は STATUS_EVENTS か "cmd"
+    events: List[Tuple[float, str, dict]] = field(default_factory=list)
+    # 終了レコードの時刻（異常終了などで無ければ最後のレコードの時刻）
+    duration: float = 0.0
+    # 停止要求を受けた時刻（最小音量に到達して終わった場合などはNone）
+    stopped_at: Optional[float] = None
+    path: Optional[Path] = None
+
+    @property
+    def commands(self) -> List[Tuple[float, str, dict]]:
+        return [event for event in self.events if event[1] == "cmd"]
+
+    @classmethod
+    def from_records(cls, records: List[dict], path: Optional[Path] = None) -> "Trace":
+        """
+        レコードの並びからトレースを作る
+
+        Raises:
+            ValueError: 開始レコードが無い場合
+        """
+        if not records or records[0].get("ev") != "start":
+            raise ValueError(f"トレースの開始レコードがありません: {path or '(memory)'}")
+        head = records[0]
+        trace = cls(
+            name=head.get("name", ""), uuid=head.get("uuid"), wall=head.get("wall"),
+            initial_volume=head.get("initial_volume"), resume_level=head.get("resume_level"),
+            params=head.get("params") or {}, options=head.get("options") or {}, path=path,
+        )
+        for record in records[1:]:
+            t = float(record["t"])
+            trace.duration = max(trace.duration, t)
+            if record["ev"] == "stop":
+                if trace.stopped_at is None:
+                    trace.stopped_at = t
+            elif record["ev"] != "end":
+                data = {key: value for key, value in record.items() if key not in ("t", "ev")}
+                trace.events.append((t, record["ev"], data))
+        return trace
+
+
+def load_trace(path: Path) -> Trace:
+    """
+    トレースファイルを読み込む
+
+    書き込み途中で止まった最後の行など、解析できない行は読み飛ばす。
+
+    Raises:
+        OSError: ファイルを読めない場合
+        ValueError: 開始レコードが無い場合
+    """
+    records = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+            if record["ev"] != "start":
+                float(record["t"])
+            records.append(record)
+        except (ValueError, KeyError, TypeError):
+            logging.warning("トレースの壊れた行を読み飛ばします: %r", line[:80])
+    return Trace.from_records(records, Path(path))
@@ -0,0 +1,11 @@
+"""テスト共通の設定"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_state_dir(tmp_path, monkeypatch):
+    """キャッシュなどの状態ファイルをテストごとの一時ディレクトリに保存する"""
+    state_dir = tmp_path / "state"
+    monkeypatch.setenv("NEMUCAST_STATE_DIR", str(state_dir))
+    return state_dir
@@ -0,0 +1,295 @@
+"""asyncio版音量制御ループのテスト"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from nemucast import aio
+from nemucast.aio import _run_until_stopped, async_volume_control_loop
+from nemucast.status import StatusMonitor
+
+
+def make_cast(volume_level=0.5, app_id="AndroidNativeApp"):
+    """set_volume・quit_appが状態に反映されるテスト用のChromecastを作成する"""
+    cast = Mock()
+    cast.status.app_id = app_id
+    cast.status.volume_level = volume_level
+    cast.media_controller.status.player_state = "PLAYING"
+
+    def set_volume(level):
+        cast.status.volume_level = level
+
+    def quit_app():
+        cast.status.app_id = None
+
+    cast.set_volume.side_effect = set_volume
+    cast.quit_app.side_effect = quit_app
+    return cast
+
+
+class TestAsyncVolumeControlLoop:
+    """asyncio版音量制御ループのテストクラス"""
+
+    def test_fades_to_min_and_standby(self):
+        """最小音量まで下げたら初期音量に戻してスタンバイにする"""
+        cast = make_cast(volume_level=0.5)
+
+        asyncio.run(async_volume_control_loop(cast, 0, -0.1, 0.3, 0.5))
+
+        volumes = [c.args[0] for c in cast.set_volume.call_args_list]
+        assert volumes == [0.4, 0.3, 0.5]
+        cast.quit_app.assert_called_once()
+
+    def test_cancel_restores_volume_immediately(self):
+        """長い待機中でも停止要求で即座に音量を戻す"""
+        cast = make_cast(volume_level=0.5)
+
+        async def scenario():
+            task = asyncio.ensure_future(_run_until_stopped(
+                async_volume_control_loop(cast, 1200, -0.1, 0.3, 0.5), cast, 0.5
+            ))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            return await task
+
+        started = time.monotonic()
+        completed = asyncio.run(scenario())
+
+        assert completed is False
+        assert time.monotonic() - started < 5
+        assert cast.set_volume.call_args_list[-1].args == (0.5,)
+        cast.quit_app.assert_not_called()
+
+    def test_idle_wait_woken_by_status_event(self):
+        """アイドル中に再生が始まったら間隔を待たずに音量調整する"""
+        cast = make_cast(volume_level=0.5, app_id=None)
+        monitor = StatusMonitor(cast, ttl=3600, refresh_wait=0)
+        monitor.new_media_status(Mock(player_state="PLAYING"))
+
+        def start_playback():
+            time.sleep(0.1)
+            active = Mock(app_id="AndroidNativeApp", volume_level=0.5)
+            cast.status = active
+            monitor.new_cast_status(active)
+
+        async def scenario():
+            task = asyncio.ensure_future(
+                async_volume_control_loop(cast, 1200, -0.1, 0.3, 0.5, monitor)
+            )
+            threading.Thread(target=start_playback).start()
+            for _ in range(50):
+                await asyncio.sleep(0.05)
+                if cast.set_volume.called:
+                    break
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+
+        cast.set_volume.assert_called_once_with(0.4)
+
+    def test_idle_ignores_non_playback_events(self):
+        """再生開始を示さない状態通知では起きず、起きた場合は遅延を記録する"""
+        cast = make_cast(volume_level=0.5, app_id=None)
+        monitor = StatusMonitor(cast, ttl=3600, refresh_wait=0)
+        stats = aio.WakeStats()
+
+        async def scenario():
+            task = asyncio.ensure_future(async_volume_control_loop(
+                cast, 1200, -0.1, 0.3, 0.5, monitor, wake_stats=stats
+            ))
+            await asyncio.sleep(0.05)
+            # 音量だけが変わった通知（アイドルのまま）
+            monitor.new_cast_status(Mock(app_id=None, volume_level=0.45))
+            await asyncio.sleep(0.05)
+            assert not cast.set_volume.called
+
+            cast.status = Mock(app_id="AndroidNativeApp", volume_level=0.5)
+            monitor.new_cast_status(cast.status)
+            for _ in range(50):
+                await asyncio.sleep(0.02)
+                if stats.lags:
+                    break
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+
+        cast.set_volume.assert_called_once_with(0.4)
+        assert len(stats.lags) == 1
+        assert 0 <= stats.mean < 1.0
+
+    def test_idle_fallback_poll(self):
+        """状態通知が無くても定期確認で再生開始を検知する"""
+        cast = make_cast(volume_level=0.5, app_id=None)
+
+        async def scenario():
+            task = asyncio.ensure_future(async_volume_control_loop(
+                cast, 1200, -0.1, 0.3, 0.5, None, idle_poll_sec=0.05
+            ))
+            await asyncio.sleep(0.02)
+            cast.status.app_id = "AndroidNativeApp"
+            for _ in range(50):
+                await asyncio.sleep(0.02)
+                if cast.set_volume.called:
+                    break
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+
+        cast.set_volume.assert_called_once_with(0.4)
+
+    def test_playback_event_right_after_idle_check_is_not_lost(self, monkeypatch):
+        """アイドルと判定した直後に届いた再生開始の通知でも、定期確認を待たずに起きる"""
+        cast = make_cast(volume_level=0.5, app_id=None)
+        monitor = StatusMonitor(cast, ttl=3600, refresh_wait=0)
+        checks = []
+
+        def is_active(_cast, _monitor):
+            checks.append(_cast.status.app_id)
+            if len(checks) == 1:
+                # 判定の直後（待ち受けを始める前）に再生が始まる
+                cast.status = Mock(app_id="AndroidNativeApp", volume_level=0.5)
+                monitor.new_cast_status(cast.status)
+                return False
+            return cast.status.app_id is not None
+
+        monkeypatch.setattr(aio, "is_chromecast_active", is_active)
+
+        async def scenario():
+            with aio.StatusWaker(monitor) as waker:
+                return await asyncio.wait_for(
+                    aio.wait_until_active(cast, monitor, waker, poll_sec=300), 5
+                )
+
+        assert asyncio.run(scenario()) is not None
+        assert len(checks) == 2
+
+
+class TestAsyncProfileFade:
+    """フェードカーブに沿った音量制御のテストクラス"""
+
+    def test_follows_plan_then_standby(self):
+        """計画通りに送信し、最後に初期音量へ戻してスタンバイにする"""
+        cast = make_cast(volume_level=0.5)
+        plan = [(0.0, 0.45), (0.01, 0.4)]
+
+        asyncio.run(aio.async_profile_fade(cast, plan, 0.5))
+
+        volumes = [c.args[0] for c in cast.set_volume.call_args_list]
+        assert volumes == [0.45, 0.4, 0.5]
+        cast.quit_app.assert_called_once()
+
+    def test_disconnect_pauses_fade(self):
+        """切断中はアイドル中と同じくフェードの経過時間を止め、再接続後に続きから下げる"""
+        from nemucast.sim import FakeChromecast, VirtualClock, virtual_time
+
+        clock = VirtualClock()
+        device = FakeChromecast(clock, volume_level=0.5, latency=0.0)
+        plan = [(0.0, 0.45), (300.0, 0.4), (600.0, 0.35)]
+        with virtual_time(clock):
+            monitor = StatusMonitor(device, refresh_wait=0).attach()
+            device.schedule(100.0, lambda: monitor.set_connected(False))
+
+            def reconnect():
+                # 再接続するとpychromecastが受信機の状態を受け取り直す
+                monitor.set_connected(True)
+                device._fire_cast_status()
+
+            device.schedule(1000.0, reconnect)
+            aio._run(aio.async_profile_fade(device, plan, 0.5, monitor))
+
+        assert device.stats.volume_history == [
+            (0.0, 0.45), (pytest.approx(1000.0), 0.4), (pytest.approx(1300.0), 0.35),
+            (pytest.approx(1300.0), 0.5),
+        ]
+
+
+class TestAsyncMediaFade:
+    """メディアの終了時刻に合わせたフェードのテストクラス（疑似Chromecastと仮想時計）"""
+
+    def run(self, scenario=None, duration=600.0, profile="step", volume_level=0.5):
+        """`scenario(device)` で状態の変化を予約し、フェードを最後まで実行する"""
+        from nemucast.sim import FakeChromecast, VirtualClock, virtual_time
+
+        clock = VirtualClock()
+        device = FakeChromecast(clock, volume_level=volume_level, latency=0.0)
+        device.play_media("episode-1", duration)
+        if scenario is not None:
+            scenario(device)
+        with virtual_time(clock):
+            monitor = StatusMonitor(device, refresh_wait=0).attach()
+            monitor.refresh(force=True)
+            requests_before = device.stats.status_requests
+            aio.run_async_media_fade(device, profile, -0.1, 0.3, volume_level, monitor)
+        device.status_requests_during_fade = device.stats.status_requests - requests_before
+        return device
+
+    def test_reaches_min_level_at_media_end(self):
+        """最後のステップをメディアの終了時刻に置き、終了と同時に音量を戻してスタンバイにする"""
+        device = self.run()
+
+        assert device.stats.volume_history == [
+            (pytest.approx(300.0), 0.4), (pytest.approx(600.0), 0.3), (pytest.approx(600.0), 0.5),
+        ]
+        assert device.stats.quit_app == 1
+        assert device.status.app_id is None
+        # 状態は通知で受け取り、問い合わせは終了時のスタンバイ確認の1回だけ
+        assert device.status_requests_during_fade <= 1
+
+    def test_profile_curve_ends_at_media_end(self):
+        device = self.run(profile="linear", duration=120.0)
+        levels = [level for _, level in device.stats.volume_history]
+        assert levels[-2:] == [0.3, 0.5]
+        assert device.stats.volume_history[-2][0] == pytest.approx(120.0)
+
+    def test_seek_replans_from_new_position(self):
+        """シークの通知で残り時間から計画を作り直す"""
+        device = self.run(lambda device: device.schedule(100.0, lambda: device.seek(400.0)))
+
+        assert device.stats.volume_history == [
+            (pytest.approx(200.0), 0.4), (pytest.approx(300.0), 0.3), (pytest.approx(300.0), 0.5),
+        ]
+
+    def test_pause_holds_fade(self):
+        """一時停止中はフェードを止め、再開後の残り時間で下げる"""
+        def scenario(device):
+            device.schedule(100.0, device.pause)
+            device.schedule(300.0, device.resume)
+
+        device = self.run(scenario)
+
+        assert [t for t, _ in device.stats.volume_history] == pytest.approx([550.0, 800.0, 800.0])
+
+    def test_finished_media_stands_by_immediately(self):
+        """予定より早く再生が終わったら、その時点で音量を戻してスタンバイにする"""
+        device = self.run(lambda device: device.schedule(450.0, device.finish_media))
+
+        assert device.stats.volume_history == [
+            (pytest.approx(300.0), 0.4), (pytest.approx(450.0), 0.5)
+        ]
+        assert device.stats.quit_app == 1
+
+    def test_next_item_near_end_counts_as_end(self):
+        """終了間際の項目の切り替え（自動再生）は終了とみなし、次の項目では下げ続けない"""
+        device = self.run(lambda device: device.schedule(
+            598.0, lambda: device.play_media("episode-2", 1800.0)
+        ))
+
+        assert [level for _, level in device.stats.volume_history] == [0.4, 0.5]
+        assert device.stats.volume_history[-1][0] == pytest.approx(598.0)
+
+    def test_new_item_replans_to_its_end(self):
+        device = self.run(lambda device: device.schedule(
+            200.0, lambda: device.play_media("movie", 1200.0)
+        ))
+
+        # 0.4 まで下げた後、新しい項目の終了時刻（200 + 1200秒）に最小音量へ到達する
+        assert device.stats.volume_history[-2] == (pytest.approx(1400.0), 0.3)
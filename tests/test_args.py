@@ -51,4 +51,11 @@ def test_parse_args_mixed():
     assert args.interval == 900
     assert args.name == "Kitchen"
     assert args.step == -0.02
-    assert args.min_level == 0.4  # デフォルト値
\ No newline at end of file
+    assert args.min_level == 0.4  # デフォルト値
+
+def test_parse_args_metrics():
+    """メトリクスの公開ポートと書き出し先の引数のテスト"""
+    args = parse_args(["--metrics-port", "9464", "--metrics-json", "/tmp/m.json"])
+    assert args.metrics_port == 9464
+    assert str(args.metrics_json) == "/tmp/m.json"
+    assert parse_args([]).metrics_port == 0
@@ -0,0 +1,162 @@
+"""接続先キャッシュのテスト"""
+
+from unittest.mock import Mock, patch
+from uuid import UUID
+
+from nemucast.cache import CachedEndpoint, EndpointCache, connect_from_cache
+from nemucast.main import connect_chromecast
+
+TARGET_UUID = UUID("12345678-1234-5678-1234-567812345678")
+
+
+def make_cast_info(name="Bedroom", host="192.168.1.20"):
+    """テスト用のCastInfoを作成する"""
+    info = Mock()
+    info.friendly_name = name
+    info.host = host
+    info.port = 8009
+    info.uuid = TARGET_UUID
+    info.model_name = "Chromecast"
+    info.cast_type = "cast"
+    info.manufacturer = "Google Inc."
+    return info
+
+
+class TestEndpointCache:
+    """接続先キャッシュのテストクラス"""
+
+    def test_store_and_reload(self, tmp_path):
+        """保存した接続先を別インスタンスから読み込める"""
+        path = tmp_path / "devices.json"
+        EndpointCache(path).store(make_cast_info())
+
+        entry = EndpointCache(path).get("Bedroom")
+
+        assert entry.host == "192.168.1.20"
+        assert entry.port == 8009
+        assert entry.uuid == str(TARGET_UUID)
+        assert entry.cast_type == "cast"
+
+    def test_default_path_in_state_dir(self, isolated_state_dir):
+        """デフォルトでは状態ディレクトリに保存する"""
+        cache = EndpointCache()
+        cache.store(make_cast_info())
+        assert (isolated_state_dir / "devices.json").exists()
+
+    def test_broken_file_is_ignored(self, tmp_path):
+        """壊れたキャッシュファイルは空として扱う"""
+        path = tmp_path / "devices.json"
+        path.write_text("{not json")
+        assert EndpointCache(path).get("Bedroom") is None
+
+    def test_is_stale(self):
+        """最終確認からの経過時間で古さを判定する"""
+        entry = CachedEndpoint("Bedroom", "h", 8009, str(TARGET_UUID), last_seen=1000.0)
+        assert not entry.is_stale(60, now=1059.0)
+        assert entry.is_stale(60, now=1061.0)
+
+    def test_to_cast_info(self):
+        """直接接続用のCastInfoにホストとcast_typeを引き継ぐ"""
+        entry = CachedEndpoint("Bedroom", "10.0.0.5", 8009, str(TARGET_UUID), cast_type="cast")
+        info = entry.to_cast_info()
+        assert info.host == "10.0.0.5"
+        assert info.uuid == TARGET_UUID
+        assert info.cast_type == "cast"
+
+    def test_connect_from_cache_failure(self):
+        """接続に失敗した場合はNoneを返す"""
+        entry = CachedEndpoint("Bedroom", "10.0.0.5", 8009, str(TARGET_UUID), cast_type="cast")
+        mock_cast = Mock()
+        mock_cast.wait.side_effect = TimeoutError("wait")
+
+        with patch("pychromecast.Chromecast", return_value=mock_cast):
+            assert connect_from_cache(entry, timeout=0.1) is None
+        mock_cast.disconnect.assert_called_once()
+
+
+class TestConnectChromecast:
+    """キャッシュ優先の接続処理のテストクラス"""
+
+    def test_uses_fresh_cache_without_discovery(self, tmp_path):
+        """新しいキャッシュがあれば検索せずに直接接続する"""
+        cache = EndpointCache(tmp_path / "devices.json")
+        cache.store(make_cast_info())
+        mock_cast = Mock()
+        mock_cast.cast_info = make_cast_info()
+
+        with patch("nemucast.main.connect_from_cache", return_value=mock_cast), patch(
+            "nemucast.main.discover_target_chromecast"
+        ) as mock_discover:
+            cast, browser = connect_chromecast("Bedroom", None, 1.0, cache)
+
+        assert cast is mock_cast
+        assert browser is None
+        mock_discover.assert_not_called()
+
+    def test_falls_back_to_discovery_and_refreshes(self, tmp_path):
+        """直接接続に失敗したら検索し、キャッシュを更新する"""
+        cache = EndpointCache(tmp_path / "devices.json")
+        cache.store(make_cast_info(host="192.168.1.20"))
+        mock_cast = Mock()
+        mock_cast.cast_info = make_cast_info(host="192.168.1.99")
+        mock_browser = Mock()
+
+        with patch("nemucast.main.connect_from_cache", return_value=None), patch(
+            "nemucast.main.discover_target_chromecast",
+            return_value=(mock_cast, mock_browser, 0.5),
+        ):
+            cast, browser = connect_chromecast("Bedroom", None, 1.0, cache)
+
+        assert cast is mock_cast
+        assert browser is mock_browser
+        assert cache.get("Bedroom").host == "192.168.1.99"
+
+    def test_stale_cache_skips_direct_connect(self, tmp_path):
+        """古いキャッシュは使わずに検索する"""
+        cache = EndpointCache(tmp_path / "devices.json")
+        cache.store(make_cast_info())
+        cache.get("Bedroom").last_seen = 0.0
+
+        with patch("nemucast.main.connect_from_cache") as mock_direct, patch(
+            "nemucast.main.discover_target_chromecast", return_value=(None, Mock(), 1.0)
+        ):
+            cast, _ = connect_chromecast("Bedroom", None, 1.0, cache, cache_max_age=60)
+
+        assert cast is None
+        mock_direct.assert_not_called()
+
+    def test_uuid_target_hits_cache(self, tmp_path):
+        """UUID指定の接続もキャッシュに保存し、次回は検索せずに直接接続する"""
+        cache = EndpointCache(tmp_path / "devices.json")
+        mock_cast = Mock()
+        mock_cast.cast_info = make_cast_info(name="Renamed")
+
+        with patch("nemucast.main.connect_from_cache") as mock_direct, patch(
+            "nemucast.main.discover_target_chromecast", return_value=(mock_cast, Mock(), 0.5)
+        ):
+            connect_chromecast("Dell", TARGET_UUID, 1.0, cache)
+        mock_direct.assert_not_called()
+
+        with patch("nemucast.main.connect_from_cache", return_value=mock_cast), patch(
+            "nemucast.main.discover_target_chromecast"
+        ) as mock_discover:
+            cast, browser = connect_chromecast("Dell", TARGET_UUID, 1.0, cache)
+
+        assert cast is mock_cast
+        assert browser is None
+        mock_discover.assert_not_called()
+        assert EndpointCache(tmp_path / "devices.json").get(str(TARGET_UUID)).name == "Renamed"
+
+    def test_name_target_uses_requested_name(self, tmp_path):
+        """名前指定の接続は、デバイスのfriendly_nameではなく指定された名前で保存する"""
+        cache = EndpointCache(tmp_path / "devices.json")
+        mock_cast = Mock()
+        mock_cast.cast_info = make_cast_info(name="Bedroom speaker")
+
+        with patch(
+            "nemucast.main.discover_target_chromecast", return_value=(mock_cast, Mock(), 0.5)
+        ):
+            connect_chromecast("Bedroom", None, 1.0, cache)
+
+        assert cache.get("Bedroom").name == "Bedroom speaker"
+        assert cache.get("Bedroom speaker") is None
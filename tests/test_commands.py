@@ -0,0 +1,121 @@
+"""反映を確認するCastコマンドのテスト"""
+
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from nemucast import metrics
+from nemucast.commands import (
+    app_stopped,
+    confirm_quit_app,
+    confirm_set_volume,
+    volume_matches,
+)
+from nemucast.sim import FakeChromecast, VirtualClock
+from nemucast.status import StatusMonitor
+
+
+def make_cast(volume_level=0.5, app_id="CC1AD845", drop_first=0):
+    """最初の `drop_first` 回の set_volume を無視するテスト用のChromecast"""
+    cast = Mock()
+    cast.cast_info.friendly_name = "Living TV"
+    cast.status = SimpleNamespace(volume_level=volume_level, app_id=app_id)
+    calls = []
+
+    def set_volume(level):
+        calls.append(level)
+        if len(calls) > drop_first:
+            cast.status.volume_level = level
+
+    cast.set_volume.side_effect = set_volume
+    cast.quit_app.side_effect = lambda: setattr(cast.status, "app_id", None)
+    return cast
+
+
+class TestPredicates:
+    """状態の判定のテストクラス"""
+
+    @pytest.mark.parametrize("current, level, expected", [
+        (0.4, 0.4, True),
+        (0.401, 0.4, True),
+        (0.42, 0.4, False),
+        (0.0, -0.02, True),    # デバイスは0〜1に丸める
+        (None, 0.4, False),
+    ])
+    def test_volume_matches(self, current, level, expected):
+        assert volume_matches(SimpleNamespace(volume_level=current), level) is expected
+
+    @pytest.mark.parametrize("app_id, expected", [
+        (None, True), ("E8C28D3C", True), ("Backdrop", True), ("CC1AD845", False),
+    ])
+    def test_app_stopped(self, app_id, expected):
+        assert app_stopped(SimpleNamespace(app_id=app_id)) is expected
+
+
+class TestConfirmSetVolume:
+    """音量設定の確認のテストクラス"""
+
+    def test_confirmed_without_retry(self):
+        """状態に反映されていれば問い合わせも再送もしない"""
+        cast = make_cast()
+        assert confirm_set_volume(cast, 0.4, timeout=0.1) is True
+        cast.set_volume.assert_called_once_with(0.4)
+
+    def test_dropped_command_is_resent(self):
+        """反映されなかった音量は再送される"""
+        metrics.REGISTRY.reset()
+        cast = make_cast(drop_first=1)
+        assert confirm_set_volume(cast, 0.4, timeout=0.05) is True
+        assert cast.set_volume.call_count == 2
+        assert metrics.RPC_RETRIES.labels("Living TV", "set_volume").value == 1
+        cast.socket_client.receiver_controller.update_status.assert_called_once()
+
+    def test_send_error_is_retried(self):
+        """送信に失敗した場合も再送する"""
+        cast = make_cast()
+        cast.set_volume.side_effect = [TimeoutError("no reply"), None]
+        cast.status.volume_level = 0.4
+        assert confirm_set_volume(cast, 0.4, timeout=0.05) is True
+        assert cast.set_volume.call_count == 2
+
+    def test_gives_up_after_retries(self, caplog):
+        """再送回数を使い切ったらFalseを返す（無限には再送しない）"""
+        cast = make_cast(drop_first=10)
+        started = time.monotonic()
+        assert confirm_set_volume(cast, 0.4, timeout=0.05, retries=2) is False
+        assert cast.set_volume.call_count == 3
+        assert time.monotonic() - started < 1
+        assert "反映を確認できませんでした" in caplog.text
+
+    def test_monitor_refresh_detects_drop(self):
+        """モニターがある場合はGET_STATUSの応答で判定し、失われていれば再送する"""
+        clock = VirtualClock()
+        device = FakeChromecast(clock, volume_level=0.5, latency=0.0, drop_rate=0.0)
+        monitor = StatusMonitor(device, refresh_wait=0).attach()
+        device.drop_rate = 1.0
+        assert confirm_set_volume(device, 0.4, monitor, timeout=0.05, retries=1) is False
+        assert device.stats.set_volume == 2
+        assert device.stats.status_requests == 2
+
+        device.drop_rate = 0.0
+        assert confirm_set_volume(device, 0.4, monitor, timeout=0.05) is True
+        assert monitor.volume_level == 0.4
+
+
+class TestConfirmQuitApp:
+    """アプリ終了の確認のテストクラス"""
+
+    def test_confirmed(self):
+        """アプリなしの状態になれば1回で終わる"""
+        cast = make_cast()
+        assert confirm_quit_app(cast, timeout=0.05) is True
+        cast.quit_app.assert_called_once()
+
+    def test_not_stopped_is_resent(self):
+        """アプリが終了していなければ再送する"""
+        cast = make_cast()
+        cast.quit_app.side_effect = None
+        assert confirm_quit_app(cast, timeout=0.01, retries=1) is False
+        assert cast.quit_app.call_count == 2
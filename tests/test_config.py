@@ -0,0 +1,215 @@
+"""設定ファイルとその再読み込み（実行中のフェードへの反映）のテスト"""
+
+import asyncio
+import json
+import shutil
+import threading
+import time
+from dataclasses import asdict
+
+import pytest
+
+from nemucast import aio, metrics
+from nemucast.config import ConfigWatcher, LiveSettings, NemucastConfig
+from nemucast.daemon import CastDaemon, FadeParams
+from nemucast.main import parse_args, plan_profile_fade
+from nemucast.sim import FakeChromecast, VirtualClock, virtual_time
+from nemucast.status import StatusMonitor
+
+CONFIG = """
+device = "Bedroom TV"
+
+[defaults]
+interval_sec = 600
+step = -0.05
+
+[devices."Bedroom TV"]
+profile = "linear"
+min_level = 0.2
+
+[devices."Living TV"]
+min_level = 0.1
+"""
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestNemucastConfig:
+    """設定ファイルの解析のテストクラス"""
+
+    def test_device_table_overrides_defaults(self):
+        config = NemucastConfig.parse(CONFIG)
+        assert config.device == "Bedroom TV"
+        assert config.params_for("Bedroom TV") == {
+            "interval_sec": 600, "step": -0.05, "profile": "linear", "min_level": 0.2,
+        }
+        assert config.params_for("Kitchen") == {"interval_sec": 600, "step": -0.05}
+
+    def test_changed_params(self):
+        old = NemucastConfig.parse(CONFIG)
+        new = NemucastConfig.parse(CONFIG.replace("min_level = 0.2", "").replace("600", "300"))
+        assert new.changed_params(old, "Bedroom TV") == ({"interval_sec": 300}, ["min_level"])
+        assert new.changed_params(old, "Kitchen") == ({"interval_sec": 300}, [])
+
+    @pytest.mark.parametrize("text", [
+        "[defaults\nstep = -0.1",
+        "volume = 0.5",
+        "[defaults]\ncolor = 'red'",
+        "[defaults]\nmin_level = 2",
+        "[defaults]\nprofile = 'sine'",
+        '[devices."TV"]\nstep = "fast"',
+        "[defaults]\nstep = 0",
+        "[defaults]\nstep = 0.1",
+        "devices = 1",
+    ])
+    def test_invalid_config(self, text):
+        with pytest.raises(ValueError):
+            NemucastConfig.parse(text)
+
+
+def test_watcher_reloads_valid_edits_and_keeps_previous_on_invalid(tmp_path):
+    metrics.REGISTRY.reset()
+    path = tmp_path / "nemucast.toml"
+    path.write_text(CONFIG, encoding="utf-8")
+    reloaded = []
+    watcher = ConfigWatcher(path, reloaded.append)
+    assert watcher.check() is None
+
+    path.write_text(CONFIG.replace("600", "300"), encoding="utf-8")
+    assert watcher.check().defaults["interval_sec"] == 300
+
+    # 保存途中などの不正な内容は読み込まず、同じ内容では何度も読み直さない
+    path.write_text("[defaults]\nstep = ", encoding="utf-8")
+    assert watcher.check() is None
+    assert watcher.check() is None
+    assert len(reloaded) == 1
+    assert metrics.CONFIG_RELOADS.labels("ok").value == 1
+    assert metrics.CONFIG_RELOADS.labels("invalid").value == 1
+
+
+def test_parse_args_uses_config_below_command_line(tmp_path):
+    """設定ファイルの値は環境変数より優先し、コマンドライン引数より優先しない"""
+    path = tmp_path / "nemucast.toml"
+    path.write_text(CONFIG, encoding="utf-8")
+
+    args = parse_args(["--config", str(path)])
+    assert (args.name, args.profile, args.min_level, args.interval) == (
+        "Bedroom TV", "linear", 0.2, 600,
+    )
+    args = parse_args(["--config", str(path), "-n", "Living TV", "-m", "0.3"])
+    assert (args.name, args.profile, args.min_level, args.step) == ("Living TV", "step", 0.3, -0.05)
+
+    path.write_text("[defaults]\nmin_level = 2\n", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        parse_args(["--config", str(path)])
+
+
+def test_apply_changes_defers_loop_switches():
+    params = FadeParams(profile="step", interval_sec=60, step=-0.1, min_level=0.2)
+    updated, deferred = params.apply_changes({"profile": "linear", "min_level": 0.3})
+    assert deferred == ["profile"]
+    assert (updated.profile, updated.min_level) == ("step", 0.3)
+    with pytest.raises(ValueError):
+        params.apply_changes({"interval_sec": 0})
+
+
+class TestLiveSettings:
+    """実行中のフェードへの設定の反映のテストクラス（疑似Chromecastと仮想時計）"""
+
+    def run(self, fade, params: FadeParams, changes: dict, at: float):
+        clock = VirtualClock()
+        device = FakeChromecast(clock, volume_level=0.5, latency=0.0)
+        settings = LiveSettings(params)
+        device.schedule(at, lambda: settings.update(params.apply_changes(changes)[0]))
+        with virtual_time(clock):
+            monitor = StatusMonitor(device, refresh_wait=0).attach()
+            aio._run(fade(device, monitor, settings))
+        return device
+
+    def test_step_loop_uses_new_step_and_interval(self):
+        """待っている期限を前回の音量調整から新しい間隔の後に置き直し、新しいステップで下げる"""
+        params = FadeParams(profile="step", interval_sec=100, step=-0.1, min_level=0.2)
+
+        def fade(device, monitor, settings):
+            return aio.async_volume_control_loop(
+                device, 100, -0.1, 0.2, 0.5, monitor, settings=settings
+            )
+
+        device = self.run(fade, params, {"interval_sec": 200, "step": -0.05}, at=150.0)
+
+        assert device.stats.volume_history == [
+            (0.0, 0.4), (pytest.approx(100.0), 0.3), (pytest.approx(300.0), 0.25),
+            (pytest.approx(500.0), 0.2), (pytest.approx(700.0), 0.5),
+        ]
+        assert device.stats.quit_app == 1
+
+    def test_profile_fade_replans_from_current_level(self):
+        """今の音量から新しい最小音量へ、フェードの開始から数えた時間で到達するよう作り直す"""
+        params = FadeParams(
+            profile="linear", interval_sec=60, step=-0.1, min_level=0.3, duration_sec=200,
+        )
+
+        def fade(device, monitor, settings):
+            plan = plan_profile_fade("linear", 60, -0.1, 0.3, 0.5, 200)
+            return aio.async_profile_fade(device, plan, 0.5, monitor, settings=settings)
+
+        device = self.run(fade, params, {"min_level": 0.2, "duration_sec": 300}, at=100.0)
+
+        history = device.stats.volume_history
+        assert min(level for t, level in history if t < 100.0) == pytest.approx(0.4)
+        # 丸めた音量が最小音量になる時点（終了の数秒前）で到達する
+        assert history[-2][1] == 0.2
+        assert 290.0 <= history[-2][0] <= 300.0
+        assert history[-1][1] == 0.5
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl が必要")
+def test_daemon_reload_changes_running_fade(tmp_path, isolated_state_dir):
+    """設定ファイルを書き換えると、接続を保ったままフェード中のデバイスに反映する"""
+    from nemucast.config import load_config
+    from nemucast.ctl import request
+    from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+
+    certfile, keyfile = ensure_self_signed_cert(tmp_path)
+    with StandInCastServer(volume_level=0.5, certfile=certfile, keyfile=keyfile) as server:
+        isolated_state_dir.mkdir(parents=True, exist_ok=True)
+        (isolated_state_dir / "devices.json").write_text(
+            json.dumps({server.name: asdict(server.endpoint())}), encoding="utf-8"
+        )
+        path = tmp_path / "nemucast.toml"
+        path.write_text("[defaults]\ninterval_sec = 60\nstep = -0.1\nmin_level = 0.2\n",
+                        encoding="utf-8")
+        daemon = CastDaemon(
+            socket_path=isolated_state_dir / "control.sock", default_name=server.name,
+            config=load_config(path), config_path=path,
+        )
+        thread = threading.Thread(
+            target=lambda: asyncio.run(daemon.serve(install_signals=False)), daemon=True
+        )
+        thread.start()
+        socket_path = daemon.socket_path
+        assert wait_for(lambda: socket_path.exists())
+        try:
+            assert wait_for(lambda: request({"cmd": "ping"}, socket_path)["ok"])
+            assert request({"cmd": "fade"}, socket_path, timeout=15)["ok"]
+            assert wait_for(lambda: server.volume_level == pytest.approx(0.4))
+
+            path.write_text(
+                f'[defaults]\ninterval_sec = 60\nstep = -0.1\nmin_level = 0.2\n\n'
+                f'[devices."{server.name}"]\ninterval_sec = 0.2\nstep = -0.05\n',
+                encoding="utf-8",
+            )
+            assert wait_for(lambda: daemon.devices[server.name].last_result == "completed")
+            levels = [level for _, level in server.stats.volume_history]
+            assert levels == pytest.approx([0.4, 0.35, 0.3, 0.25, 0.2, 0.5])
+            assert server.stats.connections == 1
+        finally:
+            request({"cmd": "shutdown"}, socket_path)
+            thread.join(timeout=15)
@@ -0,0 +1,252 @@
+"""常駐デーモンと制御クライアントのテスト（Cast代役サーバーに本物のpychromecastで接続する）"""
+
+import asyncio
+import json
+import shutil
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+
+import pytest
+
+from nemucast import metrics
+from nemucast.ctl import build_request, ctl_main, parse_ctl_args, request
+from nemucast.daemon import CastDaemon, DaemonAlreadyRunningError, FadeParams
+from nemucast.journal import FadeJournal
+from nemucast.schedule import Schedule
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+
+pytestmark = pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl が必要")
+
+
+@pytest.fixture(scope="module")
+def cert(tmp_path_factory):
+    return ensure_self_signed_cert(tmp_path_factory.mktemp("standin"))
+
+
+@pytest.fixture
+def server(cert):
+    certfile, keyfile = cert
+    with StandInCastServer(volume_level=0.5, certfile=certfile, keyfile=keyfile) as server:
+        yield server
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class DaemonThread:
+    """デーモンを別スレッドのイベントループで動かし、制御ソケット経由で操作する"""
+
+    def __init__(self, daemon: CastDaemon):
+        self.daemon = daemon
+        self.thread = threading.Thread(
+            target=lambda: asyncio.run(daemon.serve(install_signals=False)), daemon=True
+        )
+
+    def start(self) -> "DaemonThread":
+        self.thread.start()
+        # ソケットファイルは listen() より先に作られるため、応答が返るまで待つ
+        assert wait_for(self._responds)
+        return self
+
+    def _responds(self) -> bool:
+        try:
+            return self.call("ping")["ok"]
+        except OSError:
+            return False
+
+    def call(self, cmd: str, **fields) -> dict:
+        return request(dict(fields, cmd=cmd), self.daemon.socket_path, timeout=15)
+
+    def stop(self) -> None:
+        if self.thread.is_alive():
+            self.call("shutdown")
+        self.thread.join(timeout=15)
+        assert not self.thread.is_alive()
+
+
+@pytest.fixture
+def daemon(server, isolated_state_dir):
+    # キャッシュに代役サーバーの接続先を入れておき、mDNSなしで接続させる
+    isolated_state_dir.mkdir(parents=True, exist_ok=True)
+    (isolated_state_dir / "devices.json").write_text(
+        json.dumps({server.name: asdict(server.endpoint())}), encoding="utf-8"
+    )
+    defaults = FadeParams(profile="step", interval_sec=60, step=-0.1, min_level=0.2)
+    runner = DaemonThread(CastDaemon(
+        socket_path=isolated_state_dir / "control.sock",
+        defaults=defaults,
+        default_name=server.name,
+    )).start()
+    yield runner
+    runner.stop()
+
+
+def connect(server, daemon) -> dict:
+    """接続し、接続直後のメッセージ（PING、mediaの GET_STATUS）が落ち着くまで待つ"""
+    response = daemon.call("connect")
+    assert response["ok"], response
+    assert wait_for(lambda: (
+        server.stats.count("media", "GET_STATUS") >= 1
+        and server.stats.count("heartbeat", "PING") >= 1
+    ))
+    return response["result"]
+
+
+class TestDaemon:
+    """常駐デーモンのテストクラス"""
+
+    def test_fade_cancel_restores_volume(self, server, daemon):
+        """フェード開始はすぐに応答し、中止すると初期音量に戻る"""
+        connect(server, daemon)
+
+        response = daemon.call("fade")
+        assert response["ok"], response
+        assert response["result"]["fading"] is True
+        assert response["result"]["initial_volume"] == 0.5
+        assert wait_for(lambda: server.volume_level == pytest.approx(0.4))
+
+        status = daemon.call("status")["result"]["devices"][0]
+        assert status["fading"] is True
+        assert status["fade"]["step"] == -0.1
+
+        response = daemon.call("cancel")["result"]
+        assert response["cancelled"] is True
+        assert response["restored"] is True
+        assert response["fading"] is False
+        assert response["last_result"] == "cancelled"
+        assert server.volume_level == pytest.approx(0.5)
+
+    def test_warm_fade_reuses_connection(self, server, daemon):
+        """接続済みのデバイスではフェードの開始に接続もデバイス検索も伴わない"""
+        connect(server, daemon)
+        started = time.monotonic()
+        response = daemon.call("fade", step=-0.05)
+        elapsed = time.monotonic() - started
+
+        assert response["ok"], response
+        assert elapsed < 0.5
+        assert server.connection_count == 1
+        assert wait_for(lambda: server.volume_level == pytest.approx(0.45))
+
+    def test_fade_runs_to_completion(self, server, daemon):
+        """最小音量まで下げ終えたら音量を戻してスタンバイにする（デーモンは動き続ける）"""
+        connect(server, daemon)
+        assert daemon.call("fade", interval_sec=0.05, min_level=0.3)["ok"]
+
+        assert wait_for(lambda: server.app_id is None)
+        assert server.volume_level == pytest.approx(0.5)
+
+        def status():
+            return daemon.call("status", name=server.name)["result"]["devices"][0]
+
+        # スタンバイの後にジャーナルを削除してからフェードが終わる
+        assert wait_for(lambda: status()["fading"] is False)
+        assert status()["last_result"] == "completed"
+        assert not list((daemon.daemon.socket_path.parent / "journal").glob("*.jsonl"))
+        assert daemon.call("ping")["ok"]
+
+    def test_restore_to_given_volume(self, server, daemon):
+        connect(server, daemon)
+        response = daemon.call("restore", volume=0.35)
+        assert response["ok"], response
+        assert response["result"]["cancelled"] is False
+        assert server.volume_level == pytest.approx(0.35)
+
+    def test_rejects_invalid_requests(self, server, daemon):
+        """不正な要求はエラーを返し、デーモンは動き続ける"""
+        assert daemon.call("reboot") == {"ok": False, "error": "不明なコマンドです: 'reboot'"}
+        assert not daemon.call("fade", profile="zigzag")["ok"]
+        assert not daemon.call("fade", min_level=2)["ok"]
+        assert not daemon.call("cancel", name="Unknown TV")["ok"]
+        assert not daemon.call("restore")["ok"]
+
+        connect(server, daemon)
+        assert daemon.call("fade")["ok"]
+        assert "既にフェード中" in daemon.call("fade")["error"]
+
+    def test_shutdown_restores_fading_device(self, server, daemon):
+        """終了時はフェード中のデバイスの音量を戻し、ソケットファイルを削除する"""
+        connect(server, daemon)
+        assert daemon.call("fade")["ok"]
+        assert wait_for(lambda: server.volume_level == pytest.approx(0.4))
+
+        daemon.stop()
+        assert server.volume_level == pytest.approx(0.5)
+        assert not daemon.daemon.socket_path.exists()
+
+    def test_resumes_interrupted_fade_on_connect(self, server, daemon, isolated_state_dir):
+        """異常終了で残ったジャーナルがあれば、接続時に同じ設定でフェードを再開する"""
+        journal = FadeJournal(server.endpoint().uuid, isolated_state_dir / "journal")
+        journal.begin(server.name, server.endpoint().uuid, 0.8, {"step": -0.1, "interval_sec": 60})
+        journal.record_level(0.5)
+
+        result = connect(server, daemon)
+        assert result["fading"] is True
+        assert result["initial_volume"] == 0.8
+        assert result["fade"]["step"] == -0.1
+        assert wait_for(lambda: server.volume_level == pytest.approx(0.4))
+
+        response = daemon.call("cancel")["result"]
+        assert response["restored"] is True
+        assert server.volume_level == pytest.approx(0.8)
+        assert not journal.path.exists()
+
+    def test_scheduled_fade_fires_on_time(self, server, daemon, isolated_state_dir):
+        """スケジュールの発火時刻に、起動時に接続しておいたデバイスでフェードを始める"""
+        metrics.REGISTRY.reset()
+        fire_at = (datetime.now() + timedelta(seconds=2)).replace(microsecond=0)
+        schedule = Schedule.parse([f"daily {fire_at:%H:%M:%S} step=-0.2 interval=60"])
+        scheduled = DaemonThread(CastDaemon(
+            socket_path=isolated_state_dir / "scheduled.sock",
+            default_name=server.name,
+            schedule=schedule,
+        )).start()
+        try:
+            assert wait_for(lambda: server.volume_level == pytest.approx(0.3), timeout=10)
+            status = scheduled.call("status")["result"]["devices"][0]
+            assert status["fade"]["step"] == -0.2
+
+            upcoming = scheduled.call("schedule", count=2)["result"]["upcoming"]
+            assert [fire["at"] for fire in upcoming] == [
+                (fire_at + timedelta(days=days)).astimezone().isoformat() for days in (1, 2)
+            ]
+        finally:
+            scheduled.stop()
+        lateness = metrics.SCHEDULE_LATENESS_SECONDS.labels(server.name)
+        assert lateness.count == 1
+        assert lateness.sum < 0.1
+
+    def test_second_daemon_is_refused(self, daemon):
+        other = CastDaemon(socket_path=daemon.daemon.socket_path)
+        with pytest.raises(DaemonAlreadyRunningError):
+            other._prepare_socket()
+
+
+class TestCtl:
+    """制御クライアントのテストクラス"""
+
+    def test_build_request_omits_unset_fields(self):
+        args = parse_ctl_args(["fade", "-n", "Living TV", "-s", "-0.02", "--fade-duration", "600"])
+        assert build_request(args) == {
+            "cmd": "fade", "name": "Living TV", "step": -0.02, "duration_sec": 600.0,
+        }
+        assert build_request(parse_ctl_args(["cancel", "--keep-volume"])) == {
+            "cmd": "cancel", "restore": False,
+        }
+
+    def test_daemon_not_running(self, tmp_path, capsys):
+        assert ctl_main(["--socket", str(tmp_path / "none.sock"), "ping"]) == 2
+        assert "デーモンに接続できません" in capsys.readouterr().err
+
+    def test_prints_result(self, daemon, capsys):
+        assert ctl_main(["--socket", str(daemon.daemon.socket_path), "ping"]) == 0
+        assert "uptime" in json.loads(capsys.readouterr().out)
+        assert ctl_main(["--socket", str(daemon.daemon.socket_path), "cancel"]) == 1
@@ -0,0 +1,122 @@
+"""絶対期限スケジューラのテスト"""
+
+import pytest
+
+from nemucast.deadline import DeadlineSchedule, LatenessStats, plan_next_deadline
+from nemucast.sim import NightScenario, run_simulated_night
+
+
+class FakeClock:
+    """手動で進める時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPlanNextDeadline:
+    """次の期限の計画のテストクラス"""
+
+    def test_on_time(self):
+        """期限内に終われば前回の期限から1周期後"""
+        assert plan_next_deadline(100, 60, 130, "coalesce") == (160, 0)
+
+    @pytest.mark.parametrize("policy, expected", [
+        # 160, 220, 280 が過ぎている（現在 300）
+        ("skip", (340, 3)),
+        ("coalesce", (280, 2)),
+        ("catchup", (160, 0)),
+    ])
+    def test_missed_ticks(self, policy, expected):
+        """期限を過ぎた周期はポリシーに従って扱う"""
+        assert plan_next_deadline(100, 60, 300, policy) == expected
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            plan_next_deadline(0, 60, 0, "later")
+
+
+class TestDeadlineSchedule:
+    """DeadlineScheduleのテストクラス"""
+
+    def test_work_time_does_not_drift(self):
+        """処理にかかった時間は遅れとして記録されるだけで、以降の期限はずれない"""
+        clock = FakeClock()
+        schedule = DeadlineSchedule(60, clock=clock)
+        deadlines = []
+        for _ in range(5):
+            clock.now += schedule.delay()
+            clock.now += 0.5  # 状態取得などで実行開始が遅れる
+            schedule.begin_tick()
+            clock.now += 7  # 処理時間
+            deadlines.append(schedule.advance())
+
+        assert deadlines == [60, 120, 180, 240, 300]
+        assert schedule.stats.samples == [0.5] * 5
+
+    def test_coalesce_after_suspend(self):
+        """サスペンド明けは1回だけすぐ実行し、元の周期に戻る"""
+        clock = FakeClock()
+        stats = LatenessStats()
+        schedule = DeadlineSchedule(60, "coalesce", clock, stats)
+        schedule.begin_tick()
+        clock.now = 250  # 60, 120, 180, 240 の期限を寝過ごした
+        schedule.advance()
+
+        assert schedule.delay() == 0
+        assert schedule.deadline == 240
+        schedule.begin_tick()
+        assert schedule.advance() == 300
+        assert stats.missed == 3
+        assert stats.max == 10
+
+    def test_reset(self):
+        """reset()で期限を刻み直す"""
+        clock = FakeClock()
+        schedule = DeadlineSchedule(60, clock=clock)
+        clock.now = 1000
+        schedule.reset()
+        assert schedule.delay() == 0
+        assert schedule.advance() == 1060
+
+    def test_stats(self):
+        stats = LatenessStats([0.1, 0.2, 0.3, 4.0])
+        assert stats.count == 4
+        assert stats.mean == pytest.approx(1.15)
+        assert stats.max == 4.0
+        assert stats.percentile(0.5) == 0.3
+
+
+class TestNightSchedule:
+    """一晩分のシミュレーションでの周期のテストクラス"""
+
+    def test_slow_responses_do_not_shift_schedule(self):
+        """応答が遅くても遅れは積み重ならず、各周期は 1200秒刻みの期限どおりに実行される"""
+        report = run_simulated_night(NightScenario(latency=3.0))
+
+        times = [t for t, _ in report.volume_history][:8]
+        gaps = [b - a for a, b in zip(times[1:], times[2:])]
+        assert gaps == pytest.approx([1200] * 6)
+        assert max(report.lateness.samples) < 10
+
+    @pytest.mark.parametrize("policy, missed, changed_at_resume", [
+        ("skip", 3, 1),
+        ("coalesce", 2, 2),
+        ("catchup", 0, 4),
+    ])
+    def test_missed_tick_policy(self, policy, missed, changed_at_resume):
+        """
+        1300秒から5000秒間応答が止まると 3600, 4800, 6000 秒の周期を過ぎる。
+        ポリシーに従って捨てる・1回にまとめる・すべて実行する
+        """
+        report = run_simulated_night(NightScenario(
+            stalls=[(1300, 5000)], missed_tick_policy=policy,
+        ))
+
+        times = [round(t) for t, _ in report.volume_history]
+        assert report.lateness.missed == missed
+        assert times.count(6300) == changed_at_resume
+        # 再開後は元の 1200秒刻みに戻る
+        assert 7200 in times
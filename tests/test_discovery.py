@@ -0,0 +1,119 @@
+"""名前/UUID指定検索のテスト"""
+
+from unittest.mock import Mock, patch
+from uuid import UUID
+
+from nemucast.discovery import discover_target_chromecast, matches_target, rediscover_cast_info
+
+TARGET_UUID = UUID("12345678-1234-5678-1234-567812345678")
+OTHER_UUID = UUID("87654321-4321-8765-4321-876543218765")
+
+
+def make_cast_info(name, uuid):
+    """テスト用のCastInfoを作成する"""
+    info = Mock()
+    info.friendly_name = name
+    info.uuid = uuid
+    return info
+
+
+class FakeBrowser:
+    """start_discovery()で登録済みのデバイスを順に通知するCastBrowserの代替"""
+
+    def __init__(self, listener, _zconf, devices):
+        self.listener = listener
+        self.zc = Mock()
+        self._pending = devices
+        self.devices = {}
+        self.stopped = False
+
+    def start_discovery(self):
+        for info in self._pending:
+            self.devices[info.uuid] = info
+            self.listener.add_cast(info.uuid, "service")
+
+    def stop_discovery(self):
+        self.stopped = True
+
+
+def patch_browser(devices):
+    """CastBrowserを差し替えるパッチを返す"""
+    return patch(
+        "pychromecast.discovery.CastBrowser",
+        side_effect=lambda listener, zconf: FakeBrowser(listener, zconf, devices),
+    )
+
+
+class TestDiscovery:
+    """名前/UUID指定検索のテストクラス"""
+
+    def test_matches_target_by_name(self):
+        """名前で一致判定できる"""
+        info = make_cast_info("Living", OTHER_UUID)
+        assert matches_target(info, "Living", None)
+        assert not matches_target(info, "Bedroom", None)
+
+    def test_matches_target_by_uuid(self):
+        """名前が違ってもUUIDが一致すれば対象とみなす"""
+        info = make_cast_info("Renamed", TARGET_UUID)
+        assert matches_target(info, "Living", TARGET_UUID)
+
+    def test_matches_target_uuid_ignores_name(self):
+        """UUIDを指定した場合は、名前が一致してもUUIDが違うデバイスを対象にしない"""
+        info = make_cast_info("Living", OTHER_UUID)
+        assert not matches_target(info, "Living", TARGET_UUID)
+
+    def test_discover_by_uuid_skips_same_name(self):
+        """同じ名前のデバイスが複数あっても、UUIDが一致するデバイスに接続する"""
+        devices = [make_cast_info("Living", OTHER_UUID), make_cast_info("Living", TARGET_UUID)]
+
+        with patch_browser(devices), patch("zeroconf.Zeroconf"), patch(
+            "pychromecast.get_chromecast_from_cast_info", return_value=Mock()
+        ) as mock_connect:
+            cast, _, _ = discover_target_chromecast("Living", TARGET_UUID, timeout=5)
+
+        assert cast is not None
+        assert mock_connect.call_args[0][0] is devices[1]
+
+    def test_discover_returns_first_match(self):
+        """目的のデバイスが見つかった時点で返す"""
+        devices = [make_cast_info("Other", OTHER_UUID), make_cast_info("Target", TARGET_UUID)]
+        mock_cast = Mock()
+
+        with patch_browser(devices), patch("zeroconf.Zeroconf"), patch(
+            "pychromecast.get_chromecast_from_cast_info", return_value=mock_cast
+        ) as mock_connect:
+            cast, browser, elapsed = discover_target_chromecast("Target", timeout=5)
+
+        assert cast is mock_cast
+        assert mock_connect.call_args[0][0] is devices[1]
+        assert browser is not None
+        assert 0 <= elapsed < 5
+
+    def test_discover_timeout(self, caplog):
+        """見つからない場合はタイムアウト後にNoneを返す"""
+        devices = [make_cast_info("Other", OTHER_UUID)]
+
+        with patch_browser(devices), patch("zeroconf.Zeroconf"):
+            cast, browser, elapsed = discover_target_chromecast("Target", timeout=0.05)
+
+        assert cast is None
+        assert browser is not None
+        assert elapsed >= 0.05
+        assert "見つかりませんでした" in caplog.text
+
+    def test_rediscover_stops_browser(self):
+        """再検索はデバイス情報だけを返し、見つかった時点でブラウザを止める"""
+        devices = [make_cast_info("Renamed", TARGET_UUID)]
+        browsers = []
+
+        def make_browser(listener, zconf):
+            browsers.append(FakeBrowser(listener, zconf, devices))
+            return browsers[-1]
+
+        with patch("pychromecast.discovery.CastBrowser", side_effect=make_browser), \
+                patch("zeroconf.Zeroconf"):
+            cast_info = rediscover_cast_info("Living", TARGET_UUID, timeout=5)
+
+        assert cast_info is devices[0]
+        assert browsers[0].stopped
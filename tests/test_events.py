@@ -0,0 +1,188 @@
+"""外部連携向けのイベント（Webhook・SSE）のテスト"""
+
+import http.client
+import json
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from nemucast import events, metrics
+from nemucast.events import EventBus, EventQueue, EventStreamServer, WebhookSink
+from nemucast.main import StepResult, volume_control_step
+from nemucast.sim import FakeCastInfo
+
+
+class FakeCast:
+    cast_info = FakeCastInfo(friendly_name="Living TV")
+
+
+class WebhookReceiver:
+    """POSTされたJSONを記録するlocalhostのWebhook（`delay` 秒待ってから応答する）"""
+
+    def __init__(self, delay: float = 0.0):
+        self.batches = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.batches.append(json.loads(body)["events"])
+                time.sleep(delay)
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/hook"
+
+    @property
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def read_sse(response, count: int):
+    """SSEのレスポンスから `count` 件のイベントを読む"""
+    received = []
+    data = None
+    while len(received) < count:
+        line = response.readline().decode("utf-8").rstrip("\n")
+        if line.startswith("data: "):
+            data = json.loads(line[len("data: "):])
+        elif line == "" and data is not None:
+            received.append(data)
+            data = None
+    return received
+
+
+class TestEventQueue:
+    """上限つきキューのテストクラス"""
+
+    def test_drops_oldest_when_full(self):
+        metrics.REGISTRY.reset()
+        queue = EventQueue("test", maxsize=3)
+        for i in range(5):
+            queue.put({"id": i})
+
+        assert [event["id"] for event in queue.get_batch(10, timeout=0)] == [2, 3, 4]
+        assert queue.dropped == 2
+        assert metrics.EVENTS_DROPPED.labels("test", "overflow").value == 2
+
+    def test_close_returns_remaining_then_empty(self):
+        queue = EventQueue("test")
+        queue.put({"id": 1})
+        queue.close()
+        assert queue.get_batch(10, timeout=1) == [{"id": 1}]
+        assert queue.get_batch(10, timeout=1) == []
+
+
+def test_emit_without_subscribers_does_nothing():
+    bus = EventBus()
+    bus.emit(events.IDLE_SKIP, FakeCast())
+    queue = bus.subscribe("test")
+    bus.emit(events.VOLUME_CHANGED, FakeCast(), level=0.46, previous=0.5, confirmed=True)
+
+    (event,) = queue.get_batch(10, timeout=0)
+    assert {key: event[key] for key in ("id", "type", "device", "level", "previous")} == {
+        "id": 1, "type": "volume_changed", "device": "Living TV", "level": 0.46, "previous": 0.5,
+    }
+
+
+def test_webhook_batches_events():
+    receiver = WebhookReceiver()
+    bus = EventBus()
+    sink = WebhookSink(receiver.url, bus, batch_wait=0.2).start()
+    for level in (0.5, 0.46, 0.42):
+        bus.emit(events.VOLUME_CHANGED, FakeCast(), level=level)
+    sink.stop(timeout=5)
+    receiver.close()
+
+    assert [event["level"] for event in receiver.events] == [0.5, 0.46, 0.42]
+    assert len(receiver.batches) == 1
+    assert (sink.posts, sink.delivered) == (1, 3)
+
+
+def test_slow_webhook_does_not_stall_emit():
+    """応答の遅いWebhookがあっても emit() は待たず、溢れた分は古いものから捨てる"""
+    receiver = WebhookReceiver(delay=0.5)
+    bus = EventBus()
+    sink = WebhookSink(receiver.url, bus, queue_size=8, batch_size=4, batch_wait=0).start()
+
+    started = time.monotonic()
+    for i in range(200):
+        bus.emit(events.VOLUME_CHANGED, FakeCast(), level=i / 200)
+    elapsed = time.monotonic() - started
+    sink.stop(timeout=0)
+    receiver.close()
+
+    assert elapsed < 0.1
+    assert sink.dropped >= 200 - 8 - 4
+
+
+def test_unreachable_webhook_counts_errors():
+    metrics.REGISTRY.reset()
+    bus = EventBus()
+    sink = WebhookSink("http://127.0.0.1:9/hook", bus, batch_wait=0, timeout=1).start()
+    bus.emit(events.IDLE_SKIP, FakeCast())
+    sink.stop(timeout=5)
+    assert metrics.EVENTS_DROPPED.labels("webhook", "error").value == 1
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl が必要")
+def test_control_loop_events_over_sse_and_webhook(tmp_path):
+    """代役サーバーに対する音量調整・復元とスタンバイ・アイドルの見送りを、SSEとWebhookの両方に送る"""
+    from nemucast.cache import connect_from_cache
+    from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+    from nemucast.status import StatusMonitor
+
+    certfile, keyfile = ensure_self_signed_cert(tmp_path)
+    receiver = WebhookReceiver()
+    sink = WebhookSink(receiver.url).start()
+    stream = EventStreamServer(0).start()
+    with StandInCastServer(name="Living TV", volume_level=0.34,
+                           certfile=certfile, keyfile=keyfile) as server:
+        cast = connect_from_cache(server.endpoint())
+        connection = http.client.HTTPConnection("127.0.0.1", stream.port, timeout=10)
+        try:
+            connection.request("GET", "/events")
+            response = connection.getresponse()
+            assert response.getheader("Content-Type").startswith("text/event-stream")
+            deadline = time.monotonic() + 5
+            while stream.clients == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            monitor = StatusMonitor(cast).attach()
+            assert volume_control_step(cast, 60, -0.04, 0.3, 0.5, monitor) == StepResult(60)
+            assert volume_control_step(cast, 60, -0.04, 0.3, 0.5, monitor) is None
+            assert volume_control_step(cast, 60, -0.04, 0.3, 0.5, monitor) == StepResult(60)
+
+            streamed = read_sse(response, 4)
+        finally:
+            connection.close()
+            cast.disconnect(timeout=2)
+    stream.stop()
+    sink.stop(timeout=5)
+    receiver.close()
+
+    expected = [
+        ("volume_changed", {"level": 0.3, "previous": pytest.approx(0.34), "confirmed": True}),
+        ("volume_restored", {"level": 0.5, "confirmed": True}),
+        ("standby", {"confirmed": True, "already": False}),
+        ("idle_skip", {}),
+    ]
+    for received in (streamed, receiver.events):
+        assert [event["type"] for event in received] == [kind for kind, _ in expected]
+        for event, (_, fields) in zip(received, expected):
+            assert event["device"] == "Living TV"
+            assert {key: event[key] for key in fields} == fields
+    assert [event["id"] for event in streamed] == [event["id"] for event in receiver.events]
@@ -0,0 +1,115 @@
+"""フェードカーブのテスト"""
+
+import pytest
+
+from nemucast.fade import (
+    VolumeDispatcher,
+    build_fade_table,
+    curve_level,
+    fade_duration,
+    plan_commands,
+    plan_media_fade,
+    quantize,
+    resume_plan,
+    step_count,
+)
+
+
+class TestFadeCurve:
+    """フェードカーブのテストクラス"""
+
+    def test_step_count_matches_step_loop(self):
+        """ステップ式で最小音量に到達するまでの回数"""
+        assert step_count(0.6, 0.3, -0.04) == 8
+        assert step_count(0.6, 0.4, -0.04) == 5
+        assert step_count(0.3, 0.3, -0.04) == 0
+
+    def test_fade_duration(self):
+        """ステップ式と同じ時刻に最小音量へ到達する"""
+        assert fade_duration(0.6, 0.4, -0.04, 1200) == 6000
+
+    @pytest.mark.parametrize("profile", ["linear", "exponential", "perceptual"])
+    def test_curve_endpoints_and_monotonic(self, profile):
+        """開始・終了の音量が一致し、単調に下がる"""
+        levels = [curve_level(profile, 0.6, 0.3, i / 100) for i in range(101)]
+        assert levels[0] == pytest.approx(0.6)
+        assert levels[-1] == pytest.approx(0.3)
+        assert all(b <= a for a, b in zip(levels, levels[1:]))
+
+    def test_exponential_drops_faster_first(self):
+        """exponential は linear より序盤に大きく下がる"""
+        assert curve_level("exponential", 0.6, 0.3, 0.25) < curve_level("linear", 0.6, 0.3, 0.25)
+
+    def test_unknown_profile(self):
+        """未対応のプロファイルはValueError"""
+        with pytest.raises(ValueError):
+            curve_level("cubic", 0.6, 0.3, 0.5)
+
+    def test_step_table(self):
+        """step プロファイルは間隔ごとに1ステップ下げる表になる"""
+        table = build_fade_table("step", 0.5, 0.4, 0, step=-0.04, interval_sec=600)
+        assert table == [(0, 0.46), (600, 0.42), (1200, 0.38)]
+
+    def test_table_resolution(self):
+        """表は分解能ごとに点を持ち、最後は最小音量"""
+        table = build_fade_table("linear", 0.6, 0.3, 10, resolution_sec=2)
+        assert [t for t, _ in table] == [0, 2, 4, 6, 8, 10]
+        assert table[-1][1] == pytest.approx(0.3)
+
+    def test_media_step_plan_ends_at_remaining(self):
+        """メディアの残り時間をステップの回数で等分し、最後のステップを終了時刻に置く"""
+        plan = plan_media_fade("step", 0.5, 0.3, 600, -0.1)
+        assert plan == [(300, 0.4), (600, 0.3)]
+        assert plan_media_fade("step", 0.3, 0.3, 600, -0.1) == []
+
+    def test_media_curve_plan_ends_at_remaining(self):
+        """カーブのプロファイルも最小音量を終了時刻に送る"""
+        plan = plan_media_fade("linear", 0.6, 0.3, 90, -0.04)
+        assert plan[-1] == (90, 0.3)
+        assert [t for t, _ in plan] == sorted(t for t, _ in plan)
+
+
+class TestDispatcher:
+    """音量コマンド送信制御のテストクラス"""
+
+    def test_quantize(self):
+        """送信単位に丸める"""
+        assert quantize(0.456) == 0.46
+        assert quantize(0.44, 0.05) == 0.45
+
+    def test_only_sends_on_change(self):
+        """丸めた音量が変わらなければ送信しない"""
+        dispatcher = VolumeDispatcher(0.5, max_rate=0)
+        assert dispatcher.offer(0, 0.502) is None
+        assert dispatcher.offer(1, 0.494) == 0.49
+        assert dispatcher.offer(2, 0.491) is None
+        assert dispatcher.sent == 1
+
+    def test_rate_limit(self):
+        """上限レートを超える送信は見送る"""
+        dispatcher = VolumeDispatcher(0.5, max_rate=0.5)
+        assert dispatcher.offer(0.0, 0.4) == 0.4
+        assert dispatcher.offer(1.0, 0.3) is None
+        assert dispatcher.offer(2.0, 0.3) == 0.3
+
+    def test_plan_sends_each_level_once(self):
+        """linear 0.6→0.3 は0.01刻みで30回だけ送信する"""
+        table = build_fade_table("linear", 0.6, 0.3, 9600)
+        plan = plan_commands(table, 0.6)
+        assert len(plan) == 30
+        assert plan[-1][1] == 0.3
+        assert all(b[0] - a[0] >= 1.0 for a, b in zip(plan, plan[1:]))
+
+    def test_plan_keeps_final_level_under_rate_limit(self):
+        """レート上限で間引かれても最後の音量は必ず送信する"""
+        table = build_fade_table("linear", 0.6, 0.3, 3, resolution_sec=0.1)
+        plan = plan_commands(table, 0.6, max_rate=1.0)
+        assert plan[-1][1] == 0.3
+        assert all(b[0] - a[0] >= 1.0 for a, b in zip(plan, plan[1:]))
+
+    def test_resume_plan_continues_after_level(self):
+        """再開時は最後に送信した音量より低い送信だけを、その時点からの経過秒で続ける"""
+        plan = [(10.0, 0.5), (20.0, 0.45), (30.0, 0.4), (40.0, 0.35)]
+        assert resume_plan(plan, 0.45) == [(10.0, 0.4), (20.0, 0.35)]
+        assert resume_plan(plan, 0.6) == plan
+        assert resume_plan(plan, 0.35) == []
@@ -0,0 +1,160 @@
+"""キャストグループのフェード（メンバーへの同時送信）のテスト"""
+
+import json
+import shutil
+import time
+from dataclasses import asdict
+
+import pytest
+
+from nemucast import metrics
+from nemucast.cache import connect_from_cache
+from nemucast.group import CommandFanout, plan_group_step, resolve_group_members, run_group
+from nemucast.multi import DeviceConfig
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+
+# 代役サーバーが SET_VOLUME に応答するまでの遅延（秒）
+RESPONSE_DELAY = 0.1
+
+
+class TestPlanGroupStep:
+    """メンバーごとの次の音量のテストクラス"""
+
+    def test_steps_members_above_min(self):
+        levels = {"Kitchen": 0.5, "Living": 0.32, "Bedroom": 0.3}
+        assert plan_group_step(levels, -0.04, 0.3) == {"Kitchen": 0.46, "Living": 0.3}
+
+    def test_all_at_min_is_empty(self):
+        assert plan_group_step({"Kitchen": 0.3, "Living": 0.2}, -0.04, 0.3) == {}
+
+
+class TestCommandFanout:
+    """同時送信のテストクラス"""
+
+    def test_runs_calls_concurrently(self):
+        """全メンバーへ同時に送るため、所要時間は1台分で済み、スプレッドも小さい"""
+        fanout = CommandFanout(4)
+
+        def call():
+            time.sleep(0.1)
+            return True
+
+        started = time.monotonic()
+        result = fanout.run({name: call for name in ("a", "b", "c", "d")})
+        elapsed = time.monotonic() - started
+        fanout.close()
+
+        assert elapsed < 0.3
+        assert sorted(result.confirmed) == ["a", "b", "c", "d"]
+        assert result.spread < 0.08
+
+    def test_sequential_spread_grows(self):
+        fanout = CommandFanout(1)
+        result = fanout.run({name: lambda: time.sleep(0.05) or True for name in ("a", "b", "c")})
+        fanout.close()
+        assert result.spread >= 0.09
+
+    def test_failed_member_does_not_stop_others(self):
+        fanout = CommandFanout(3)
+
+        def broken():
+            raise OSError("connection lost")
+
+        result = fanout.run({"a": lambda: True, "b": lambda: False, "c": broken})
+        fanout.close()
+        assert result.applied["b"] is None
+        assert result.applied["c"] is None
+        assert result.confirmed == ["a"]
+        assert result.spread == 0.0
+
+
+@pytest.fixture
+def group(tmp_path, isolated_state_dir):
+    """グループ1台とメンバー2台の代役サーバー（すべて接続先キャッシュに登録）"""
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl が必要")
+    certfile, keyfile = ensure_self_signed_cert(tmp_path)
+    kitchen = StandInCastServer(name="Kitchen", volume_level=0.5, response_delay=RESPONSE_DELAY,
+                                certfile=certfile, keyfile=keyfile).start()
+    living = StandInCastServer(name="Living", volume_level=0.6, response_delay=RESPONSE_DELAY,
+                               certfile=certfile, keyfile=keyfile).start()
+    members = [(str(kitchen.uuid), kitchen.name), (str(living.uuid), living.name)]
+    whole = StandInCastServer(name="Whole House", members=members,
+                              certfile=certfile, keyfile=keyfile).start()
+    servers = (whole, kitchen, living)
+    isolated_state_dir.mkdir(parents=True, exist_ok=True)
+    (isolated_state_dir / "devices.json").write_text(
+        json.dumps({server.name: asdict(server.endpoint()) for server in servers}),
+        encoding="utf-8",
+    )
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def test_resolve_group_members(group):
+    whole, kitchen, living = group
+    cast = connect_from_cache(whole.endpoint())
+    try:
+        members = resolve_group_members(cast, timeout=5)
+    finally:
+        cast.disconnect(timeout=2)
+    assert members == {str(kitchen.uuid): "Kitchen", str(living.uuid): "Living"}
+
+
+def test_multizone_controller_keeps_member_names():
+    """resolve_group_members が読む pychromecast の内部の辞書がまだあることを確かめる"""
+    from pychromecast.controllers.multizone import MultizoneController
+
+    assert isinstance(MultizoneController("uuid")._members, dict)
+
+
+def test_resolve_group_members_without_member_names(monkeypatch, caplog):
+    """pychromecastからメンバー名の辞書が無くなった場合は、エラーを記録して空を返す"""
+    from pychromecast.controllers import multizone
+
+    class _Controller:
+        def __init__(self, uuid):
+            self._listener = None
+
+        def register_listener(self, listener):
+            self._listener = listener
+
+        def update_members(self):
+            self._listener.multizone_status_received()
+
+    class _Cast:
+        uuid = "group"
+        cast_info = type("CastInfo", (), {"friendly_name": "Whole"})()
+
+        def register_handler(self, handler):
+            pass
+
+    monkeypatch.setattr(multizone, "MultizoneController", _Controller)
+    assert resolve_group_members(_Cast(), timeout=0) == {}
+    assert "メンバー名を取得できません" in caplog.text
+
+
+def test_group_fades_members_in_lockstep(group):
+    """メンバーを同じ周期で下げ、各ステップの SET_VOLUME をメンバーへ同時に送る"""
+    from nemucast.cache import EndpointCache
+
+    whole, kitchen, living = group
+    metrics.REGISTRY.reset()
+    config = DeviceConfig("Whole House", step=-0.1, min_level=0.3, interval_sec=0)
+
+    assert run_group(config, discovery_timeout=1, status_ttl=300, cache=EndpointCache())
+
+    assert [level for _, level in kitchen.stats.volume_history] == pytest.approx([0.4, 0.3, 0.5])
+    assert [level for _, level in living.stats.volume_history] == pytest.approx(
+        [0.5, 0.4, 0.3, 0.6]
+    )
+    # 2ステップ目と復元は、応答の遅延（0.1秒）より短い差で両方のメンバーに反映される
+    # （1ステップ目は接続直後の状態の問い合わせの応答待ちと重なることがあるため比べない）
+    (k1, _), (k2, _) = kitchen.stats.volume_history[1], kitchen.stats.volume_history[-1]
+    (l1, _), (l2, _) = living.stats.volume_history[1], living.stats.volume_history[-1]
+    assert abs(k1 - l1) < RESPONSE_DELAY * 0.7
+    assert abs(k2 - l2) < RESPONSE_DELAY * 0.7
+    assert whole.app_id is None
+    spread = metrics.GROUP_SPREAD_SECONDS.labels("Whole House")
+    assert spread.count == 4
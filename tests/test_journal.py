@@ -0,0 +1,212 @@
+"""フェードのジャーナル（異常終了後の再開）のテスト"""
+
+import asyncio
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+from nemucast.aio import async_profile_fade
+from nemucast.journal import FadeJournal
+from nemucast.main import begin_fade
+from nemucast.sim import FakeChromecast, VirtualClock
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def make_device(volume_level=0.5):
+    return FakeChromecast(VirtualClock(), name="Living TV", volume_level=volume_level)
+
+
+class TestFadeJournal:
+    """ジャーナルの読み書きのテストクラス"""
+
+    def test_round_trip_and_complete(self, tmp_path):
+        journal = FadeJournal("tv", tmp_path)
+        journal.begin("Living TV", "uuid-1", 0.5, {"profile": "step"})
+        journal.record_level(0.46)
+        journal.record_level(0.42)
+
+        state = FadeJournal("tv", tmp_path).load()
+        assert (state.name, state.uuid, state.initial_volume) == ("Living TV", "uuid-1", 0.5)
+        assert state.level == 0.42
+        assert state.steps == 2
+        assert state.params == {"profile": "step"}
+
+        journal.complete()
+        assert not journal.path.exists()
+        assert journal.load() is None
+
+    def test_changed_params_replace_start_params(self, tmp_path):
+        """設定ファイルの再読み込みで変わった設定は、再開時に開始時の設定より優先する"""
+        journal = FadeJournal("tv", tmp_path)
+        journal.begin("Living TV", "uuid-1", 0.5, {"profile": "step", "step": -0.04})
+        journal.record_level(0.46)
+        journal.record_params({"profile": "step", "step": -0.02})
+
+        state = FadeJournal("tv", tmp_path).load()
+        assert state.params == {"profile": "step", "step": -0.02}
+        assert state.level == 0.46
+
+    def test_torn_last_line_is_ignored(self, tmp_path):
+        """書き込み途中で止まった行があっても、それまでの記録から復元する"""
+        journal = FadeJournal("tv", tmp_path)
+        journal.begin("Living TV", "uuid-1", 0.5)
+        journal.record_level(0.46)
+        journal.close()
+        with open(journal.path, "a", encoding="utf-8") as f:
+            f.write('{"event": "step", "lev')
+
+        state = journal.load()
+        assert state.initial_volume == 0.5
+        assert state.level == 0.46
+
+    def test_begin_compacts_previous_records(self, tmp_path):
+        journal = FadeJournal("tv", tmp_path)
+        journal.begin("Living TV", "uuid-1", 0.5)
+        for level in (0.46, 0.42, 0.38):
+            journal.record_level(level)
+
+        journal.begin("Living TV", "uuid-1", 0.5, level=0.38)
+        lines = journal.path.read_text(encoding="utf-8").splitlines()
+        assert len(lines) == 1
+        assert journal.load().level == 0.38
+
+    def test_key_is_safe_file_name(self, tmp_path):
+        assert FadeJournal("../Living TV", tmp_path).path.parent == tmp_path
+
+
+class TestBeginFade:
+    """起動時の音量の決め方（ジャーナルからの復旧）のテストクラス"""
+
+    def test_fresh_start_records_current_volume(self, tmp_path):
+        device = make_device(volume_level=0.6)
+        journal = FadeJournal("tv", tmp_path)
+
+        assert begin_fade(device, journal, params={"profile": "step"}) == (0.6, None)
+        assert journal.load().initial_volume == 0.6
+
+    def test_resume_uses_journal_volume(self, tmp_path):
+        """途中で終わったフェードは、下がった今の音量ではなくジャーナルの音量を起動時の音量とする"""
+        device = make_device(volume_level=0.38)
+        journal = FadeJournal("tv", tmp_path)
+        journal.begin("Living TV", "uuid-1", 0.5)
+        journal.record_level(0.38)
+
+        assert begin_fade(device, journal) == (0.5, 0.38)
+        assert device.status.volume_level == 0.38
+        assert journal.load().level == 0.38
+
+    def test_resume_uses_journal_params(self, tmp_path):
+        """再開する場合は、再読み込みでジャーナルに記録された設定で続ける"""
+        device = make_device(volume_level=0.38)
+        journal = FadeJournal("tv", tmp_path)
+        journal.begin("Living TV", "uuid-1", 0.5, {"step": -0.04, "interval_sec": 600})
+        journal.record_level(0.38)
+        journal.record_params({"step": -0.1, "interval_sec": 60})
+        params = {"step": -0.04, "interval_sec": 600, "min_level": 0.3}
+
+        assert begin_fade(device, journal, params=params) == (0.5, 0.38)
+        assert params == {"step": -0.1, "interval_sec": 60, "min_level": 0.3}
+        assert journal.load().params == params
+
+    def test_resume_ignores_invalid_journal_params(self, tmp_path):
+        device = make_device(volume_level=0.38)
+        journal = FadeJournal("tv", tmp_path)
+        journal.begin("Living TV", "uuid-1", 0.5, {"step": 0.1})
+        journal.record_level(0.38)
+        params = {"step": -0.04}
+
+        begin_fade(device, journal, params=params)
+        assert params == {"step": -0.04}
+
+    def test_restore_policy_and_stale_journal_restore_volume(self, tmp_path):
+        for policy, max_age in (("restore", 3600), ("resume", 0)):
+            device = make_device(volume_level=0.38)
+            journal = FadeJournal("tv", tmp_path)
+            journal.begin("Living TV", "uuid-1", 0.5)
+            journal.record_level(0.38)
+            time.sleep(0.01)
+
+            assert begin_fade(device, journal, policy=policy, max_age=max_age) == (0.5, None)
+            assert device.status.volume_level == 0.5
+            assert journal.load().level is None
+
+    def test_without_journal(self):
+        assert begin_fade(make_device(volume_level=0.4), None) == (0.4, None)
+
+
+def test_profile_fade_records_and_completes(tmp_path):
+    """送信した音量を記録し、音量を戻し終えたらジャーナルを削除する"""
+    device = make_device(volume_level=0.5)
+    journal = FadeJournal("tv", tmp_path)
+    journal.begin("Living TV", "uuid-1", 0.5)
+    recorded = []
+    original = journal.record_level
+
+    def record_level(level):
+        original(level)
+        recorded.append(journal.load().level)
+
+    journal.record_level = record_level
+    plan = [(0.0, 0.45), (0.0, 0.4)]
+
+    asyncio.run(
+        async_profile_fade(device, plan, 0.5, missed_tick_policy="catchup", journal=journal)
+    )
+
+    assert recorded == [0.45, 0.4]
+    assert device.status.volume_level == 0.5
+    assert not journal.path.exists()
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl が必要")
+def test_resumes_after_kill(tmp_path):
+    """SIGKILLで止まったフェードは、次の起動で続きから再開し、元の音量に戻す"""
+    certfile, keyfile = ensure_self_signed_cert(tmp_path / "standin")
+    state_dir = tmp_path / "state"
+    state_dir.mkdir()
+    env = dict(os.environ, PYTHONPATH=str(SRC), NEMUCAST_STATE_DIR=str(state_dir),
+               LOG_LEVEL="WARNING")
+    with StandInCastServer(volume_level=0.5, certfile=certfile, keyfile=keyfile) as server:
+        entry = server.endpoint()
+        (state_dir / "devices.json").write_text(
+            json.dumps({entry.name: asdict(entry)}), encoding="utf-8"
+        )
+        command = [sys.executable, "-m", "nemucast.main", "-n", entry.name, "-p", "linear",
+                   "-m", "0.3", "--fade-duration", "3", "--max-rate", "20"]
+
+        first = subprocess.Popen(command, env=env, cwd=tmp_path,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 30
+            while server.volume_level > 0.42 and time.monotonic() < deadline:
+                time.sleep(0.005)
+        finally:
+            first.send_signal(signal.SIGKILL)
+            first.wait()
+        assert server.volume_level <= 0.42
+
+        (journal_path,) = (state_dir / "journal").glob("*.jsonl")
+        state = FadeJournal(journal_path.stem, journal_path.parent).load()
+        assert state.initial_volume == 0.5
+        assert state.level is not None and state.level < 0.5
+
+        sent_before = len(server.stats.volume_history)
+        subprocess.run(command, env=env, cwd=tmp_path, check=True, timeout=60,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        resumed = [level for _, level in server.stats.volume_history[sent_before:]]
+
+    # 最初から下げ直さず続きから送り、最後は異常終了前の元の音量に戻す
+    assert resumed[0] < state.level
+    assert resumed[-1] == pytest.approx(0.5)
+    assert server.app_id is None
+    assert not journal_path.exists()
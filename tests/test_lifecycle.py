@@ -0,0 +1,124 @@
+"""接続のライフサイクル（検索の停止と必要時の再検索）のテスト"""
+
+import shutil
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from nemucast import metrics
+from nemucast.cache import EndpointCache, connect_from_cache
+from nemucast.lifecycle import ConnectionLifecycle, pin_host
+from nemucast.sim import FakeChromecast, VirtualClock
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def status(name):
+    return SimpleNamespace(status=name)
+
+
+def make_device():
+    device = FakeChromecast(VirtualClock(), name="Living TV")
+    device.socket_client.tries = 1
+    device.socket_client.zconf = Mock()
+    return device
+
+
+class TestConnectionLifecycle:
+    """接続状態に応じた再検索のテストクラス"""
+
+    def test_start_pins_host_and_stops_browser(self):
+        """接続後はホストに固定し、ブラウザ（zeroconf）を止め、再接続を無制限にする"""
+        device = make_device()
+        browser = Mock()
+
+        ConnectionLifecycle(device, reconnect_wait=2.0).start(browser)
+
+        browser.stop_discovery.assert_called_once()
+        (service,) = device.socket_client.services
+        assert (service.host, service.port) == ("127.0.0.1", 8009)
+        assert device.socket_client.zconf is None
+        assert device.socket_client.tries is None
+        assert device.socket_client.retry_wait == 2.0
+        assert device.cast_info.services == device.socket_client.services
+
+    def test_rediscovers_only_after_repeated_failures(self):
+        """接続が失われただけでは検索せず、再接続の失敗が続いたときだけ検索する"""
+        metrics.REGISTRY.reset()
+        rediscover = Mock(return_value=None)
+        lifecycle = ConnectionLifecycle(make_device(), rediscover_after=2, rediscover=rediscover)
+
+        for name in ("LOST", "CONNECTING", "FAILED", "CONNECTING", "CONNECTED", "FAILED"):
+            lifecycle.new_connection_status(status(name))
+        assert rediscover.call_count == 0
+
+        lifecycle.new_connection_status(status("FAILED_RESOLVE"))
+        assert wait_for(lambda: rediscover.call_count == 1 and not lifecycle.rediscovering)
+        rediscover.assert_called_once_with("Living TV", lifecycle.uuid, lifecycle.discovery_timeout)
+        assert lifecycle.failures == 0
+        assert metrics.REDISCOVERIES.labels("Living TV").value == 1
+
+    def test_new_host_is_pinned_and_cached(self, isolated_state_dir):
+        """別のホストで見つかれば再接続先を切り替え、キャッシュも更新する"""
+        device = make_device()
+        cache = EndpointCache()
+        found = SimpleNamespace(host="192.168.1.30", port=8009)
+        lifecycle = ConnectionLifecycle(device, cache, rediscover=Mock(return_value=found))
+        lifecycle.start()
+
+        assert lifecycle.rediscover() is True
+        (service,) = device.socket_client.services
+        assert service.host == "192.168.1.30"
+        assert cache.get("Living TV").host == "192.168.1.30"
+
+    def test_same_host_keeps_retrying(self):
+        device = make_device()
+        found = SimpleNamespace(host="127.0.0.1", port=8009)
+        lifecycle = ConnectionLifecycle(device, rediscover=Mock(return_value=found)).start()
+        assert lifecycle.rediscover() is False
+
+    def test_pin_host(self):
+        device = make_device()
+        pin_host(device, "10.0.0.5", 8010)
+        assert device.cast_info.host == "10.0.0.5"
+        assert device.cast_info.port == 8010
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl が必要")
+def test_reconnects_to_rediscovered_host(tmp_path):
+    """固定したホストが応答しなくなったら再検索し、新しいホストに本物のpychromecastで再接続する"""
+    certfile, keyfile = ensure_self_signed_cert(tmp_path)
+    old = StandInCastServer(volume_level=0.5, certfile=certfile, keyfile=keyfile).start()
+    new = StandInCastServer(volume_level=0.3, certfile=certfile, keyfile=keyfile).start()
+    cast = connect_from_cache(old.endpoint())
+    assert cast is not None
+    try:
+        found = []
+
+        def rediscover(name, uuid, timeout):
+            found.append(name)
+            return new.endpoint().to_cast_info()
+
+        lifecycle = ConnectionLifecycle(cast, reconnect_wait=0.05, rediscover=rediscover).start()
+        assert wait_for(lambda: old.stats.count("heartbeat", "PING") >= 1)
+
+        # 古いホストが消える（DHCPでアドレスが変わった場合など）
+        old.stop()
+        assert wait_for(lambda: new.connection_count == 1, timeout=10)
+        assert found == ["Stand-in TV"]
+        assert wait_for(lambda: cast.socket_client.is_connected and lifecycle.failures == 0)
+        assert cast.cast_info.port == new.port
+        assert wait_for(lambda: cast.status is not None and cast.status.volume_level == 0.3)
+    finally:
+        cast.disconnect(timeout=2)
+        new.stop()
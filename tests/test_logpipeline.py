@@ -0,0 +1,161 @@
+"""キュー経由のログ出力のテスト"""
+
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from nemucast.logpipeline import (
+    LOG_FILE_NAME,
+    JsonLinesFormatter,
+    LogPipeline,
+    get_log_dir,
+    start_logging,
+    stop_logging,
+)
+
+
+class BlockingStream(io.StringIO):
+    """`release` がセットされるまで書き込みを止めるストリーム（遅いディスク・端末の代わり）"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.release.wait(timeout=5)
+        return super().write(text)
+
+
+@pytest.fixture
+def pipeline_factory(tmp_path):
+    """テスト終了時に必ず停止するパイプラインを作る"""
+    pipelines = []
+
+    def factory(**kwargs):
+        kwargs.setdefault("log_dir", tmp_path)
+        kwargs.setdefault("stream", None)
+        pipeline = LogPipeline(**kwargs).start()
+        pipelines.append(pipeline)
+        return pipeline
+
+    yield factory
+    for pipeline in pipelines:
+        pipeline.stop()
+
+
+class TestLogDir:
+    """ログディレクトリのテストクラス"""
+
+    def test_defaults_to_state_dir(self, isolated_state_dir, monkeypatch):
+        """`LOG_DIR` が無ければ状態ディレクトリの logs/"""
+        monkeypatch.delenv("LOG_DIR", raising=False)
+        assert get_log_dir() == isolated_state_dir / "logs"
+        assert (isolated_state_dir / "logs").is_dir()
+
+    def test_log_dir_env(self, tmp_path, monkeypatch):
+        """`LOG_DIR` で保存先を変更できる"""
+        monkeypatch.setenv("LOG_DIR", str(tmp_path / "custom"))
+        assert get_log_dir() == tmp_path / "custom"
+
+
+class TestLogPipeline:
+    """ログパイプラインのテストクラス"""
+
+    def test_writes_text_file(self, tmp_path, pipeline_factory):
+        """停止時にキューに残ったログが書き出される"""
+        pipeline = pipeline_factory()
+        logging.getLogger("nemucast.test").info("音量を %.2f に設定", 0.4)
+        pipeline.stop()
+
+        text = (tmp_path / LOG_FILE_NAME).read_text(encoding="utf-8")
+        assert "INFO: 音量を 0.40 に設定" in text
+
+    def test_json_lines(self, tmp_path, pipeline_factory):
+        """json 形式では1行1レコードのJSONになる"""
+        pipeline = pipeline_factory(log_format="json")
+        logging.getLogger("nemucast.test").warning("停止します")
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            logging.getLogger("nemucast.test").exception("失敗")
+        pipeline.stop()
+
+        lines = (tmp_path / LOG_FILE_NAME).read_text(encoding="utf-8").splitlines()
+        records = [json.loads(line) for line in lines]
+        assert records[0]["level"] == "WARNING"
+        assert records[0]["logger"] == "nemucast.test"
+        assert records[0]["message"] == "停止します"
+        assert "RuntimeError: boom" in records[1]["exc"]
+
+    def test_logging_does_not_wait_for_io(self, pipeline_factory):
+        """書き込み先が止まっていても `logging.info()` はすぐに戻る"""
+        stream = BlockingStream()
+        pipeline = pipeline_factory(stream=stream)
+        logger = logging.getLogger("nemucast.test")
+        for i in range(100):
+            logger.info("tick %d", i)
+        # ここまで書き込み先は1行も受け付けていない
+        assert stream.getvalue() == ""
+
+        stream.release.set()
+        pipeline.stop()
+        assert stream.getvalue().count("tick") == 100
+
+    def test_full_queue_drops_records(self, pipeline_factory):
+        """キューが満杯なら待たずに捨て、捨てた件数を数える"""
+        stream = BlockingStream()
+        pipeline = pipeline_factory(stream=stream, queue_size=5)
+        logger = logging.getLogger("nemucast.test")
+        for i in range(50):
+            logger.info("tick %d", i)
+        assert pipeline.dropped > 0
+
+        stream.release.set()
+        pipeline.stop()
+        assert stream.getvalue().count("tick") == 50 - pipeline.dropped
+
+    def test_size_rotation_bounds_disk_use(self, tmp_path, pipeline_factory):
+        """size ローテーションでは古いファイルが backup_count 個までに制限される"""
+        pipeline = pipeline_factory(max_bytes=200, backup_count=2)
+        logger = logging.getLogger("nemucast.test")
+        for i in range(100):
+            logger.info("音量を調整しました %d", i)
+        pipeline.stop()
+
+        files = sorted(p.name for p in tmp_path.iterdir())
+        assert files == [LOG_FILE_NAME, f"{LOG_FILE_NAME}.1", f"{LOG_FILE_NAME}.2"]
+        assert all((tmp_path / name).stat().st_size <= 200 for name in files)
+
+    def test_time_rotation(self, tmp_path, pipeline_factory):
+        """time ローテーションを選べる"""
+        pipeline = pipeline_factory(rotation="time")
+        logging.getLogger("nemucast.test").info("hello")
+        pipeline.stop()
+        assert "hello" in (tmp_path / LOG_FILE_NAME).read_text(encoding="utf-8")
+
+    @pytest.mark.parametrize("kwargs", [{"log_format": "xml"}, {"rotation": "weekly"}])
+    def test_rejects_unknown_options(self, tmp_path, kwargs):
+        """未対応の形式・ローテーション方式はエラー"""
+        with pytest.raises(ValueError):
+            LogPipeline(log_dir=tmp_path, **kwargs)
+
+    def test_start_logging_replaces_previous(self, tmp_path):
+        """`start_logging()` を繰り返してもハンドラーは1つだけ"""
+        root = logging.getLogger()
+        try:
+            first = start_logging(log_dir=tmp_path, stream=None)
+            second = start_logging(log_dir=tmp_path, stream=None)
+            assert first.queue_handler not in root.handlers
+            assert root.handlers.count(second.queue_handler) == 1
+        finally:
+            stop_logging()
+        assert second.queue_handler not in root.handlers
+
+
+def test_json_formatter_without_pipeline():
+    """フォーマッター単体でもJSONを出力する"""
+    record = logging.LogRecord("nemucast", logging.INFO, __file__, 1, "a=%d", (1,), None)
+    assert json.loads(JsonLinesFormatter().format(record))["message"] == "a=1"
@@ -0,0 +1,164 @@
+"""動作計測のテスト"""
+
+import json
+import urllib.error
+import urllib.request
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from nemucast import metrics
+from nemucast.commands import quit_app
+from nemucast.main import StepResult, adjust_volume, volume_control_step
+from nemucast.metrics import (
+    ConnectionWatcher,
+    MetricsRegistry,
+    dump_json,
+    start_metrics_server,
+    time_rpc,
+)
+from nemucast.status import StatusMonitor
+
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    metrics.REGISTRY.reset()
+    yield
+    metrics.REGISTRY.reset()
+
+
+def make_cast(name="Living TV"):
+    cast = Mock()
+    cast.cast_info.friendly_name = name
+    cast.set_volume.side_effect = lambda level: setattr(cast.status, "volume_level", level)
+    return cast
+
+
+def rpc_count(device, op):
+    return metrics.RPC_SECONDS.labels(device, op).count
+
+
+class TestRegistry:
+    """メトリクスの定義と出力のテストクラス"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        hist = registry.histogram("rt_seconds", "往復時間", ("op",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            hist.labels("set_volume").observe(value)
+
+        text = registry.render_prometheus()
+        assert "# TYPE rt_seconds histogram" in text
+        assert 'rt_seconds_bucket{op="set_volume",le="0.1"} 2' in text
+        assert 'rt_seconds_bucket{op="set_volume",le="1"} 3' in text
+        assert 'rt_seconds_bucket{op="set_volume",le="+Inf"} 4' in text
+        assert 'rt_seconds_sum{op="set_volume"} 3.65' in text
+        assert 'rt_seconds_count{op="set_volume"} 4' in text
+
+    def test_counter_gauge_and_escaping(self):
+        registry = MetricsRegistry()
+        registry.counter("events_total", "件数", ("device",)).labels('TV "1"').inc(2)
+        registry.gauge("level", "音量").labels().set(0.35)
+
+        text = registry.render_prometheus()
+        assert 'events_total{device="TV \\"1\\""} 2' in text
+        assert "level 0.35" in text
+
+    def test_label_count_is_checked(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "件数", ("device",))
+        with pytest.raises(ValueError):
+            counter.labels("a", "b")
+
+    def test_duplicate_name_rejected(self):
+        registry = MetricsRegistry()
+        registry.counter("events_total", "件数")
+        with pytest.raises(ValueError):
+            registry.gauge("events_total", "件数")
+
+    def test_dump_json(self, tmp_path):
+        metrics.VOLUME.labels("Living TV", "initial").set(0.6)
+        metrics.RPC_SECONDS.labels("Living TV", "set_volume").observe(0.02)
+        path = tmp_path / "out" / "metrics.json"
+
+        dump_json(path)
+
+        data = json.loads(path.read_text(encoding="utf-8"))
+        volume = data["nemucast_volume_level"]["samples"][0]
+        assert volume == {"labels": {"device": "Living TV", "kind": "initial"}, "value": 0.6}
+        rpc = data["nemucast_rpc_seconds"]["samples"][0]
+        assert rpc["count"] == 1
+        assert rpc["buckets"]["0.025"] == 1
+
+
+class TestInstrumentation:
+    """音量制御の各処理が記録されるかのテストクラス"""
+
+    def test_time_rpc_counts_errors(self):
+        cast = make_cast()
+        with pytest.raises(RuntimeError):
+            with time_rpc("quit_app", cast):
+                raise RuntimeError("boom")
+        assert metrics.RPC_ERRORS.labels("Living TV", "quit_app").value == 1
+        assert rpc_count("Living TV", "quit_app") == 0
+
+    def test_adjust_volume_records_rpc_and_volume(self):
+        cast = make_cast()
+        assert adjust_volume(cast, 0.5, -0.04, 0.3) == 0.46
+        cast.set_volume.assert_called_once_with(0.46)
+        assert rpc_count("Living TV", "set_volume") == 1
+        assert metrics.VOLUME.labels("Living TV", "current").value == 0.46
+
+    def test_quit_app_records_rpc(self):
+        cast = make_cast()
+        quit_app(cast)
+        cast.quit_app.assert_called_once()
+        assert rpc_count("Living TV", "quit_app") == 1
+
+    def test_idle_tick_is_counted(self):
+        cast = make_cast()
+        cast.status.app_id = None
+        assert volume_control_step(cast, 1200, -0.04, 0.3, 0.5) == StepResult(1200)
+        assert metrics.IDLE_SKIPS.labels("Living TV").value == 1
+
+    def test_status_monitor_records_round_trip(self):
+        """応答が届けば往復時間を、届かなければ失敗を記録する"""
+        cast = make_cast()
+        cast.status = SimpleNamespace(app_id=None, volume_level=0.5)
+        monitor = StatusMonitor(cast, refresh_wait=0.01)
+        cast.socket_client.receiver_controller.update_status.side_effect = (
+            lambda: monitor.new_cast_status(cast.status)
+        )
+        monitor.refresh(force=True)
+        assert rpc_count("Living TV", "update_status") == 1
+
+        cast.socket_client.receiver_controller.update_status.side_effect = None
+        monitor.refresh(force=True)
+        assert metrics.RPC_ERRORS.labels("Living TV", "update_status").value == 1
+
+    def test_connection_watcher_counts_reconnects(self):
+        watcher = ConnectionWatcher("Living TV")
+        for status in ("LOST", "CONNECTING", "CONNECTED", "DISCONNECTED", "CONNECTED"):
+            watcher.new_connection_status(SimpleNamespace(status=status))
+        assert metrics.RECONNECTS.labels("Living TV").value == 2
+
+    def test_unknown_device_label(self):
+        assert metrics.device_label(object()) == "unknown"
+
+
+def test_metrics_server():
+    """localhost の /metrics でPrometheus形式を返す"""
+    metrics.RECONNECTS.labels("Living TV").inc()
+    server = start_metrics_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode("utf-8")
+        assert 'nemucast_reconnects_total{device="Living TV"} 1' in body
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other", timeout=5)
+    finally:
+        server.stop()
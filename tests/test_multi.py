@@ -0,0 +1,146 @@
+"""マルチデバイスモードのテスト"""
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+from nemucast.main import StepResult, parse_args
+from nemucast.multi import DeviceConfig, DeviceSession, FadeScheduler, parse_device_spec
+
+DEFAULT = DeviceConfig("Dell", -0.04, 0.3, 1200)
+
+
+class FakeClock:
+    """sleep()で進む仮想時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestParseDeviceSpec:
+    """デバイス指定の解析テストクラス"""
+
+    def test_name_only(self):
+        """名前だけなら他の項目はデフォルト値"""
+        config = parse_device_spec("Bedroom", DEFAULT)
+        assert config == DeviceConfig("Bedroom", -0.04, 0.3, 1200)
+
+    def test_all_fields(self):
+        """すべての項目を指定できる"""
+        config = parse_device_spec("Kids:-0.05:0.2:600", DEFAULT)
+        assert config == DeviceConfig("Kids", -0.05, 0.2, 600)
+
+    def test_empty_fields_use_default(self):
+        """空欄の項目はデフォルト値"""
+        config = parse_device_spec("Living::0.1", DEFAULT)
+        assert config == DeviceConfig("Living", -0.04, 0.1, 1200)
+
+    @pytest.mark.parametrize("spec", ["", ":-0.05", "A:1:2:3:4", "A:x"])
+    def test_invalid(self, spec):
+        """不正な指定はValueError"""
+        with pytest.raises(ValueError):
+            parse_device_spec(spec, DEFAULT)
+
+    def test_parse_args_multiple_devices(self):
+        """--deviceは繰り返し指定できる"""
+        args = parse_args(["-d", "A", "--device", "B:-0.1"])
+        assert args.device == ["A", "B:-0.1"]
+
+
+class TestFadeScheduler:
+    """スケジューラのテストクラス"""
+
+    def make_session(self, name, interval, ticks):
+        """`ticks` 回目で完了するセッションを作成する"""
+        session = DeviceSession(DeviceConfig(name, -0.04, 0.3, interval), Mock())
+        results = [StepResult(interval)] * (ticks - 1) + [None]
+        session.tick = Mock(side_effect=results)
+        return session
+
+    def test_runs_devices_in_due_order(self):
+        """次回実行時刻が早いデバイスから実行する"""
+        clock = FakeClock()
+        scheduler = FadeScheduler(clock=clock, sleep=clock.sleep)
+        fast = self.make_session("fast", 10, 3)
+        slow = self.make_session("slow", 25, 2)
+        scheduler.add(fast)
+        scheduler.add(slow)
+
+        order = []
+        while len(scheduler):
+            name = scheduler.run_once().config.name
+            order.append((clock.now, name))
+
+        assert order == [(0, "fast"), (0, "slow"), (10, "fast"), (20, "fast"), (25, "slow")]
+        assert fast.finished and slow.finished
+
+    def test_failure_does_not_stop_other_devices(self):
+        """1台の例外は間隔を置いて再試行し、他のデバイスは続行する"""
+        clock = FakeClock()
+        scheduler = FadeScheduler(clock=clock, sleep=clock.sleep)
+        broken = DeviceSession(DeviceConfig("broken", -0.04, 0.3, 60), Mock())
+        broken.tick = Mock(side_effect=[RuntimeError("boom"), None])
+        healthy = self.make_session("healthy", 30, 1)
+        scheduler.add(broken)
+        scheduler.add(healthy)
+
+        scheduler.run()
+
+        assert broken.finished and healthy.finished
+        assert clock.now == 60
+
+    def test_tick_time_does_not_drift(self):
+        """処理時間や再試行があっても、次回の期限は前回の期限から数える"""
+        clock = FakeClock()
+        scheduler = FadeScheduler(clock=clock, sleep=clock.sleep)
+        session = DeviceSession(DeviceConfig("slow", -0.04, 0.3, 60), Mock())
+        started = []
+
+        def tick():
+            started.append(clock.now)
+            clock.sleep(7)  # 状態取得に時間がかかる
+            return [StepResult(60), StepResult(5, retry=True), StepResult(60), StepResult(60),
+                    None][len(started) - 1]
+
+        session.tick = tick
+        scheduler.add(session)
+        scheduler.run()
+
+        # 2回目は再試行（5秒後）、再試行後も 60 秒刻みの期限に戻る
+        assert started == [0, 60, 72, 120, 180]
+        assert scheduler.stats.count == 5
+
+    def test_session_tick_uses_device_config(self):
+        """セッションはデバイスごとの設定で音量制御する"""
+        session = DeviceSession(DeviceConfig("A", -0.1, 0.2, 300), Mock(), None, 0.8)
+        with patch(
+            "nemucast.multi.volume_control_step", return_value=StepResult(300)
+        ) as mock_step:
+            assert session.tick() == StepResult(300)
+        mock_step.assert_called_once_with(session.cast, 300, -0.1, 0.2, 0.8, None)
+
+    def test_retry_with_interval_equal_to_retry_delay(self):
+        """周期が再試行の待ち時間と同じでも、再試行は周期の期限を進めない"""
+        clock = FakeClock()
+        scheduler = FadeScheduler(clock=clock, sleep=clock.sleep)
+        session = DeviceSession(DeviceConfig("short", -0.04, 0.3, 5), Mock())
+        started = []
+
+        def tick():
+            started.append(clock.now)
+            clock.sleep(1)
+            return [StepResult(5, retry=True), StepResult(5), None][len(started) - 1]
+
+        session.tick = tick
+        scheduler.add(session)
+        scheduler.run()
+
+        # 再試行は終了の5秒後（周期の期限の5秒後ではない）、過ぎた周期はその直後に実行する
+        assert started == [0, 6, 7]
+        assert scheduler.stats.missed == 0
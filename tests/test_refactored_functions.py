@@ -19,19 +19,25 @@ from nemucast.main import (
     adjust_volume,
     restore_volume_and_standby,
 )
+from nemucast.logpipeline import stop_logging
 import pychromecast
 
 
+def make_reflecting_cast():
+    """set_volume・quit_appが受信機の状態に反映されるモックを作成する"""
+    mock_cast = Mock()
+    mock_cast.set_volume.side_effect = (
+        lambda level: setattr(mock_cast.status, "volume_level", level)
+    )
+    mock_cast.quit_app.side_effect = lambda: setattr(mock_cast.status, "app_id", None)
+    return mock_cast
+
+
 class TestRefactoredFunctions:
     """リファクタリングされた関数のテストクラス"""
 
-    def test_setup_logging(self, tmp_path, monkeypatch):
+    def test_setup_logging(self, isolated_state_dir, monkeypatch):
         """ロギング設定のテスト"""
-        # 一時的なログディレクトリを使用
-        test_file = tmp_path / "test_main.py"
-        test_file.write_text("")
-        monkeypatch.setattr("nemucast.main.__file__", str(test_file))
-        
         # LOG_LEVELを設定
         monkeypatch.setenv("LOG_LEVEL", "DEBUG")
         
@@ -39,13 +45,29 @@ class TestRefactoredFunctions:
         logging.getLogger().handlers = []
         
         setup_logging()
-        
-        # ログレベルがDEBUGに設定されているか確認
-        assert logging.getLogger().level == logging.DEBUG
-        
-        # ログディレクトリが作成されているか確認
-        log_dir = test_file.parent / "logs"
-        assert log_dir.exists()
+        try:
+            # ログレベルがDEBUGに設定されているか確認
+            assert logging.getLogger().level == logging.DEBUG
+            
+            # ログディレクトリが状態ディレクトリに作成されているか確認
+            log_dir = isolated_state_dir / "logs"
+            assert log_dir.exists()
+        finally:
+            stop_logging()
+
+    def test_setup_logging_invalid_format_falls_back(self, isolated_state_dir, monkeypatch, caplog):
+        """未対応のLOG_FORMAT/LOG_ROTATIONはエラーを記録してデフォルトで続ける"""
+        monkeypatch.setenv("LOG_FORMAT", "yaml")
+        monkeypatch.setenv("LOG_ROTATION", "weekly")
+
+        setup_logging()
+        try:
+            assert (isolated_state_dir / "logs").exists()
+        finally:
+            stop_logging()
+
+        assert "LOG_FORMAT=yaml" in caplog.text
+        assert "LOG_ROTATION=weekly" in caplog.text
 
     def test_discover_chromecasts_found(self):
         """Chromecast検索のテスト（デバイスが見つかった場合）"""
@@ -151,7 +173,7 @@ class TestRefactoredFunctions:
 
     def test_adjust_volume_normal(self):
         """音量調整のテスト（通常）"""
-        mock_cast = Mock()
+        mock_cast = make_reflecting_cast()
         
         new_volume = adjust_volume(mock_cast, 0.6, -0.04, 0.4)
         
@@ -168,7 +190,7 @@ class TestRefactoredFunctions:
 
     def test_restore_volume_and_standby_active(self):
         """音量復元とスタンバイのテスト（アクティブ状態）"""
-        mock_cast = Mock()
+        mock_cast = make_reflecting_cast()
         
         with patch("nemucast.main.is_chromecast_active", return_value=True):
             restore_volume_and_standby(mock_cast, 0.7)
@@ -178,7 +200,7 @@ class TestRefactoredFunctions:
 
     def test_restore_volume_and_standby_already_idle(self):
         """音量復元とスタンバイのテスト（既にアイドル状態）"""
-        mock_cast = Mock()
+        mock_cast = make_reflecting_cast()
         
         with patch("nemucast.main.is_chromecast_active", return_value=False):
             restore_volume_and_standby(mock_cast, 0.7)
@@ -0,0 +1,156 @@
+"""全デバイスの状態の一覧（nemucast scan）のテスト"""
+
+import json
+import shutil
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from nemucast.scan import (
+    DeviceProbe,
+    FleetScanner,
+    format_table,
+    scan_cast_infos,
+    scan_main,
+    scan_network,
+)
+from nemucast.sim import FakeCastInfo
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+
+# 代役サーバーが1件の要求に応答するまでの遅延（秒）
+RESPONSE_DELAY = 0.2
+
+
+@pytest.fixture
+def fleet(tmp_path):
+    """アプリ起動中2台・アイドル1台・応答しない1台の代役サーバー"""
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl が必要")
+    certfile, keyfile = ensure_self_signed_cert(tmp_path)
+    servers = [
+        StandInCastServer(name=name, volume_level=volume, app_id=app_id,
+                          response_delay=RESPONSE_DELAY, certfile=certfile, keyfile=keyfile).start()
+        for name, volume, app_id in (
+            ("Living", 0.6, "CC1AD845"), ("Kitchen", 0.4, "CC1AD845"),
+            ("Bedroom", 0.3, None), ("Garage", 0.5, None),
+        )
+    ]
+    servers[-1].go_offline()
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def test_scan_probes_devices_concurrently(fleet):
+    """全体の時間は1台ずつの合計ではなく、最も遅い1台（応答しないデバイスのタイムアウト）で決まる"""
+    started = time.monotonic()
+    probes = scan_cast_infos([server.endpoint().to_cast_info() for server in fleet], timeout=1.0)
+    elapsed = time.monotonic() - started
+
+    by_name = {probe.name: probe for probe in probes}
+    assert [probe.name for probe in probes] == ["Bedroom", "Garage", "Kitchen", "Living"]
+    living, bedroom, garage = by_name["Living"], by_name["Bedroom"], by_name["Garage"]
+    assert (living.volume_level, living.app_id, living.is_stand_by, living.player_state) == (
+        pytest.approx(0.6), "CC1AD845", False, "PLAYING"
+    )
+    assert (bedroom.app_id, bedroom.is_stand_by, bedroom.player_state) == (None, True, None)
+    assert not garage.ok and garage.volume_level is None
+
+    assert elapsed < sum(probe.elapsed for probe in probes) - RESPONSE_DELAY
+    assert elapsed < max(probe.elapsed for probe in probes) + 0.5
+
+
+def test_worker_limit_bounds_concurrency():
+    """同時に問い合わせるデバイス数は `workers` を超えない"""
+    running, peak = [0], [0]
+
+    class SlowCast:
+        def __init__(self, cast_info):
+            self.cast_info = cast_info
+            self.status = None
+
+        def wait(self, timeout=None):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            running[0] -= 1
+            raise TimeoutError("no reply")
+
+        def disconnect(self, timeout=None):
+            pass
+
+    scanner = FleetScanner(SlowCast, workers=2, timeout=0.1)
+    for i in range(6):
+        scanner.submit(FakeCastInfo(friendly_name=f"TV {i}"))
+    probes = scanner.results()
+    scanner.close()
+
+    assert peak[0] <= 2
+    assert [probe.error for probe in probes] == ["no reply"] * 6
+
+
+def test_scan_network_stops_discovery_before_collecting(monkeypatch):
+    """検索を止めてから結果を集め、zeroconfはすべての問い合わせの後に閉じる"""
+    calls = []
+
+    class FakeBrowser:
+        def stop_discovery(self):
+            calls.append("stop_discovery")
+
+    def discover(window, on_found, zconf):
+        on_found(FakeCastInfo(friendly_name="Living"))
+        return [], FakeBrowser()
+
+    def connect(cast_info, zconf, timeout):
+        time.sleep(0.05)
+        calls.append("probe")
+        raise TimeoutError("no reply")
+
+    zconf = Mock(close=lambda: calls.append("zconf_close"))
+    monkeypatch.setattr("zeroconf.Zeroconf", lambda: zconf)
+    monkeypatch.setattr("nemucast.discovery.discover_all_chromecasts", discover)
+    monkeypatch.setattr("nemucast.scan.connect_cast_info", connect)
+
+    probes = scan_network(window=0, timeout=0.1)
+
+    assert [probe.name for probe in probes] == ["Living"]
+    assert calls == ["stop_discovery", "probe", "zconf_close"]
+
+
+def test_submit_after_close_is_ignored():
+    scanner = FleetScanner(lambda cast_info: None)
+    scanner.close()
+    scanner.submit(FakeCastInfo(friendly_name="Late"))
+    assert scanner.results() == []
+
+
+def test_format_table_aligns_wide_names():
+    probes = [
+        DeviceProbe("リビング", host="10.0.0.2", port=8009, cast_type="cast", volume_level=0.5,
+                    volume_muted=True, app_id="CC1AD845", display_name="YouTube",
+                    is_stand_by=False, player_state="PLAYING", elapsed=0.31),
+        DeviceProbe("Kitchen", host="10.0.0.3", port=8009, cast_type="cast", error="timed out"),
+    ]
+    lines = format_table(probes).splitlines()
+    assert lines[1].split() == [
+        "リビング", "cast", "10.0.0.2:8009", "0.50（ミュート）",
+        "YouTube", "いいえ", "PLAYING", "0.31秒",
+    ]
+    assert lines[2].endswith("失敗: timed out")
+    # 全角の名前は1文字2桁として揃える（「リビング」は8桁）
+    assert lines[1].index("cast") + 4 == lines[2].index("cast")
+
+
+def test_scan_main_json(monkeypatch, capsys):
+    probes = [DeviceProbe("Living", volume_level=0.5), DeviceProbe("Garage", error="timed out")]
+    monkeypatch.setattr("nemucast.scan.scan_network", lambda *args: probes)
+
+    assert scan_main(["--json"]) == 1
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(row["name"], row["error"]) for row in rows] == [
+        ("Living", None), ("Garage", "timed out")
+    ]
+
+    monkeypatch.setattr("nemucast.scan.scan_network", lambda *args: [])
+    assert scan_main([]) == 2
@@ -0,0 +1,136 @@
+"""曜日と時刻によるフェードのスケジュールのテスト"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from nemucast.daemon import daemon_main, load_schedule
+from nemucast.schedule import Schedule, ScheduleEntry, sleep_until
+
+
+@pytest.fixture
+def berlin(monkeypatch):
+    """夏時間のあるタイムゾーンでローカル時刻を扱う"""
+    if not Path("/usr/share/zoneinfo/Europe/Berlin").exists():
+        pytest.skip("タイムゾーンデータが必要")
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def local(*args) -> datetime:
+    return datetime(*args).astimezone()
+
+
+class TestScheduleEntry:
+    """スケジュールの1行の解析のテストクラス"""
+
+    def test_parse_days_time_and_params(self):
+        entry = ScheduleEntry.parse('fri,sat 23:00 interval=600 profile=linear name="Living TV"')
+        assert entry.days == {4, 5}
+        assert (entry.at.hour, entry.at.minute) == (23, 0)
+        assert entry.params == {"interval_sec": 600.0, "profile": "linear"}
+        assert entry.name == "Living TV"
+        assert entry.describe() == "Living TV interval=600 profile=linear"
+
+    def test_day_ranges_and_aliases(self):
+        assert ScheduleEntry.parse("mon-fri 21:30").days == set(range(5))
+        assert ScheduleEntry.parse("fri-mon 21:30").days == {4, 5, 6, 0}
+        assert ScheduleEntry.parse("weekends 21:30").days == {5, 6}
+        assert ScheduleEntry.parse("daily 21:30:15").at.second == 15
+
+    @pytest.mark.parametrize("spec", [
+        "22:00", "someday 22:00", "daily 25:00", "daily 22:00 interval", "daily 22:00 color=red",
+        "daily 22:00 step=fast",
+    ])
+    def test_invalid_spec(self, spec):
+        with pytest.raises(ValueError):
+            ScheduleEntry.parse(spec)
+
+    def test_next_after(self):
+        entry = ScheduleEntry.parse("fri,sat 23:00")
+        # 2026-10-15 は木曜日
+        assert entry.next_after(local(2026, 10, 15, 12, 0)) == local(2026, 10, 16, 23, 0)
+        assert entry.next_after(local(2026, 10, 16, 23, 0)) == local(2026, 10, 17, 23, 0)
+        assert entry.next_after(local(2026, 10, 17, 23, 30)) == local(2026, 10, 23, 23, 0)
+
+
+class TestSchedule:
+    """スケジュール全体の発火時刻のテストクラス"""
+
+    def test_upcoming_merges_entries_in_order(self):
+        schedule = Schedule.parse(["daily 22:00", "fri,sat 23:00 interval=600"])
+        fires = schedule.upcoming(local(2026, 10, 15, 22, 30), 10)
+
+        assert len(fires) == 10
+        assert [fire_at for fire_at, _ in fires] == sorted(fire_at for fire_at, _ in fires)
+        assert fires[0] == (local(2026, 10, 16, 22, 0), schedule.entries[0])
+        assert fires[1] == (local(2026, 10, 16, 23, 0), schedule.entries[1])
+        assert sum(entry is schedule.entries[1] for _, entry in fires) == 2
+
+    def test_daylight_saving_transitions(self, berlin):
+        """存在しない時刻はずれた時刻に1回、2回ある時刻は1回目だけ発火する"""
+        schedule = Schedule.parse(["daily 02:30"])
+
+        spring = [fire_at for fire_at, _ in schedule.upcoming(local(2026, 3, 28, 23, 0), 2)]
+        assert spring[0].date() == datetime(2026, 3, 29).date()
+        assert spring[1] == local(2026, 3, 30, 2, 30)
+
+        autumn = [fire_at for fire_at, _ in schedule.upcoming(local(2026, 10, 24, 23, 0), 2)]
+        offsets = [fire_at.utcoffset() for fire_at in autumn]
+        assert offsets == [timedelta(hours=2), timedelta(hours=1)]
+        assert autumn[1] - autumn[0] == timedelta(hours=25)
+
+    def test_load_file(self, tmp_path):
+        path = tmp_path / "schedule.txt"
+        path.write_text("# 平日\nmon-fri 22:00  # 毎晩\n\nfri,sat 23:00 interval=600\n",
+                        encoding="utf-8")
+        schedule = load_schedule(path, ["sun 21:00"])
+        assert [entry.spec for entry in schedule.entries] == [
+            "mon-fri 22:00", "fri,sat 23:00 interval=600", "sun 21:00",
+        ]
+
+    def test_load_reports_line_and_invalid_params(self, tmp_path):
+        path = tmp_path / "schedule.txt"
+        path.write_text("daily 22:00\ndaily 2200\n", encoding="utf-8")
+        with pytest.raises(ValueError, match="schedule.txt:2"):
+            load_schedule(path)
+        with pytest.raises(ValueError, match="min_level"):
+            load_schedule(None, ["daily 22:00 min=2"])
+
+
+def test_sleep_until_uses_wall_clock():
+    """単調時計で眠りすぎても、壁時計の残り時間で計算し直す"""
+    wall = [1000.0]
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        # 最初の眠りの間にサスペンドし、壁時計だけが30秒余分に進む
+        wall[0] += seconds + (30 if not sleeps else 0)
+        sleeps.append(seconds)
+
+    late = asyncio.run(sleep_until(1100.0, now=lambda: wall[0], sleep=fake_sleep, max_chunk=60))
+    assert sleeps == [60, 10]
+    assert late == 0.0
+
+
+def test_sleep_until_wakes_on_time():
+    target = time.time() + 0.05
+    late = asyncio.run(sleep_until(target))
+    assert 0.0 <= late < 0.02
+
+
+def test_dry_run_prints_next_fire_times(capsys):
+    argv = ["--at", "daily 22:00", "--at", "fri,sat 23:00 interval=600", "--dry-run"]
+    assert daemon_main(argv) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 10
+    assert sum("interval=600" in line for line in lines) in (2, 3)
+
+    assert daemon_main(["--dry-run"]) == 2
+    assert daemon_main(["--at", "daily 22:00 min=2", "--dry-run"]) == 2
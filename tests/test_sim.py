@@ -0,0 +1,146 @@
+"""疑似Chromecastと仮想時計のテスト"""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from nemucast import aio, clock
+from nemucast.main import main
+from nemucast.sim import (
+    FakeChromecast,
+    NightScenario,
+    VirtualClock,
+    run_simulated_night,
+    virtual_time,
+)
+
+
+class TestVirtualClock:
+    """仮想時計のテストクラス"""
+
+    def test_advance_runs_due_timers_in_order(self):
+        """登録した処理は時刻順に、その時刻で実行される"""
+        virtual_clock = VirtualClock()
+        fired = []
+        virtual_clock.call_at(20, lambda: fired.append(("b", virtual_clock.now)))
+        virtual_clock.call_at(10, lambda: fired.append(("a", virtual_clock.now)))
+
+        virtual_clock.sleep(30)
+
+        assert fired == [("a", 10), ("b", 20)]
+        assert virtual_clock.now == 30
+
+    def test_virtual_time_swaps_monotonic_and_loop(self):
+        """virtual_time() の間はnemucastの時計とイベントループが仮想時計になる"""
+        virtual_clock = VirtualClock(start=100.0)
+
+        async def long_sleep():
+            await asyncio.sleep(3600)
+            return asyncio.get_running_loop().time()
+
+        started = time.perf_counter()
+        with virtual_time(virtual_clock):
+            assert clock.monotonic() == 100.0
+            assert aio._run(long_sleep()) == pytest.approx(3700.0)
+        assert time.perf_counter() - started < 1.0
+        assert clock.monotonic() != 100.0
+
+
+class TestFakeChromecast:
+    """疑似Chromecastのテストクラス"""
+
+    def test_set_volume_pushes_status(self):
+        """set_volumeは音量を変え、登録したリスナーに状態を通知する"""
+        device = FakeChromecast(VirtualClock(), volume_level=0.5, latency=0.1)
+        received = []
+
+        class Listener:
+            def new_cast_status(self, status):
+                received.append(status.volume_level)
+
+        device.register_status_listener(Listener())
+        device.set_volume(0.4)
+
+        assert device.status.volume_level == 0.4
+        assert received == [0.4]
+        assert device.stats.volume_history == [(pytest.approx(0.1), 0.4)]
+
+    def test_drop_rate_loses_commands(self):
+        """drop_rate=1.0ではset_volumeが反映されない"""
+        device = FakeChromecast(VirtualClock(), volume_level=0.5, drop_rate=1.0)
+        device.set_volume(0.4)
+
+        assert device.status.volume_level == 0.5
+        assert device.stats.dropped == 1
+
+
+class TestSimulatedNight:
+    """一晩分のシミュレーションのテストクラス"""
+
+    def test_step_night_runs_fast(self):
+        """2時間以上の制御が実時間1秒未満で終わり、初期音量に戻ってスタンバイになる"""
+        report = run_simulated_night(NightScenario())
+
+        # 0.6 → 0.3 を -0.04 ずつ: 8回 + 初期音量への復元1回 + quit_app
+        assert report.set_volume == 9
+        assert report.commands == 10
+        assert report.simulated_sec > 8 * 1200
+        assert report.wall_sec < 1.0
+        assert report.final_volume == 0.6
+
+    def test_is_deterministic(self):
+        """同じシナリオは同じ結果になる"""
+        scenario = NightScenario(drop_rate=0.3, seed=1)
+        first = run_simulated_night(scenario)
+        second = run_simulated_night(scenario)
+
+        assert first.commands == second.commands
+        assert first.dropped == second.dropped
+        assert first.simulated_sec == second.simulated_sec
+
+    def test_dropped_commands_are_recovered(self):
+        """set_volumeが失われても次の周期で再送され、最小音量まで下がる"""
+        report = run_simulated_night(NightScenario(drop_rate=0.3, seed=1))
+
+        assert report.dropped > 0
+        assert report.set_volume > 9
+        assert report.final_volume == 0.6
+
+    def test_idle_to_active_is_detected_immediately(self):
+        """アイドルから再生開始した場合、ポーリング間隔を待たずに音量を調整する"""
+        report = run_simulated_night(NightScenario(
+            start_active=False, transitions=[(3600, "active")], idle_poll_sec=300,
+        ))
+
+        assert len(report.decision_lags) == 1
+        assert report.decision_lags[0] < 1.0
+
+    def test_profile_night(self):
+        """フェードプロファイルでも最後まで下げてから復元する"""
+        report = run_simulated_night(NightScenario(profile="linear"))
+
+        assert report.set_volume > 9
+        assert report.wall_sec < 1.0
+        assert report.final_volume == 0.6
+
+
+class TestMainWithFakeChromecast:
+    """main() を疑似Chromecastで実行するテストクラス"""
+
+    def test_main_end_to_end(self):
+        """検索以外は本物のコードパスでmain()が最後まで動く"""
+        virtual_clock = VirtualClock()
+        device = FakeChromecast(virtual_clock, volume_level=0.5)
+
+        with virtual_time(virtual_clock), \
+                patch("sys.argv", ["nemucast", "-s", "-0.1", "-m", "0.3", "-i", "600"]), \
+                patch("nemucast.main.setup_logging"), \
+                patch("nemucast.main.connect_chromecast", return_value=(device, None)):
+            main()
+
+        levels = [level for _, level in device.stats.volume_history]
+        assert levels == [0.4, 0.3, 0.5]
+        assert device.stats.quit_app == 1
+        assert virtual_clock.now >= 2 * 600
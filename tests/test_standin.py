@@ -0,0 +1,122 @@
+"""Cast代役サーバーのテスト（本物のpychromecastでlocalhostに接続する）"""
+
+import shutil
+import time
+
+import pytest
+
+from nemucast import metrics
+from nemucast.cache import connect_from_cache
+from nemucast.main import restore_volume_and_standby
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+from nemucast.status import StatusMonitor
+
+pytestmark = pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl が必要")
+
+
+@pytest.fixture(scope="module")
+def cert(tmp_path_factory):
+    return ensure_self_signed_cert(tmp_path_factory.mktemp("standin"))
+
+
+@pytest.fixture
+def server(cert):
+    certfile, keyfile = cert
+    with StandInCastServer(volume_level=0.5, certfile=certfile, keyfile=keyfile) as server:
+        yield server
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def wait_until_settled(server, cast, connections=1):
+    """
+    接続直後にソケットスレッドが送るメッセージ（PING、mediaチャンネルの GET_STATUS）を待つ
+
+    pychromecastは送信をスレッド間で排他しないため、これらと同時に送るとTLSの
+    レコードが混ざることがある
+    """
+    assert wait_for(lambda: (
+        server.stats.count("media", "GET_STATUS") >= connections
+        and server.stats.count("heartbeat", "PING") >= connections
+        and cast.socket_client.is_connected
+    ))
+
+
+@pytest.fixture
+def cast(server):
+    cast = connect_from_cache(server.endpoint())
+    assert cast is not None
+    wait_until_settled(server, cast)
+    yield cast
+    cast.disconnect(timeout=2)
+
+
+class TestStandInCastServer:
+    """Cast代役サーバーのテストクラス"""
+
+    def test_connect_without_mdns(self, server, cast):
+        """静的ホストで接続し、receiverの状態を受け取れる"""
+        assert cast.status.volume_level == 0.5
+        assert cast.status.app_id == "CC1AD845"
+        assert server.stats.count("receiver", "GET_STATUS") >= 1
+        assert server.stats.count("heartbeat", "PING") >= 1
+
+    def test_set_volume_and_quit_app(self, server, cast):
+        """SET_VOLUME と STOP がサーバーの状態に反映され、応答で状態が更新される"""
+        cast.set_volume(0.42)
+        assert server.volume_level == pytest.approx(0.42)
+        assert cast.status.volume_level == pytest.approx(0.42)
+
+        cast.quit_app()
+        assert wait_for(lambda: cast.status.app_id is None)
+        assert server.app_id is None
+
+    def test_media_status(self, server, cast):
+        """アプリ起動中はmediaチャンネルに接続してプレーヤーの状態を受け取る"""
+        monitor = StatusMonitor(cast).attach()
+        monitor.refresh(force=True)
+        assert monitor.player_state == "PLAYING"
+
+    def test_reconnects_after_drop(self, server, cast):
+        """切断を注入しても再接続してコマンドを送れる"""
+        server.drop_connections()
+        wait_until_settled(server, cast, connections=2)
+
+        cast.set_volume(0.3)
+        assert server.volume_level == pytest.approx(0.3)
+        assert server.stats.connections == 2
+        assert server.stats.drops == 1
+
+    def test_restore_and_standby_returns_on_confirmation(self, server, cast):
+        """終了処理は固定時間を待たず、デバイスが反映を返した時点で終わる"""
+        monitor = StatusMonitor(cast).attach()
+        cast.set_volume(0.3)
+        started = time.monotonic()
+        restore_volume_and_standby(cast, 0.5, monitor)
+        assert time.monotonic() - started < 2
+        assert server.volume_level == pytest.approx(0.5)
+        assert server.app_id is None
+        assert monitor.app_id is None
+
+    def test_reconnect_is_counted(self, server, cast):
+        """切断からの再接続がメトリクスに数えられる"""
+        metrics.watch_connection(cast)
+        reconnects = metrics.RECONNECTS.labels(cast.cast_info.friendly_name)
+        before = reconnects.value
+        server.drop_connections()
+        wait_until_settled(server, cast, connections=2)
+        assert wait_for(lambda: reconnects.value == before + 1)
+
+    def test_broadcasts_playback_start(self, server, cast):
+        """サーバー側の状態変化は接続中のクライアントに通知される"""
+        server.go_idle()
+        assert wait_for(lambda: cast.status.app_id is None)
+        server.start_playback()
+        assert wait_for(lambda: cast.status.app_id == "CC1AD845")
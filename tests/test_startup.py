@@ -0,0 +1,82 @@
+"""起動経路のテスト（重いモジュールを必要になるまで読み込まない）"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+HEAVY_MODULES = ["pychromecast", "zeroconf", "google.protobuf", "asyncio"]
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    return subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=60
+    )
+
+
+def test_parse_args_does_not_import_cast_stack():
+    """引数の解析までにpychromecastなどを読み込まない"""
+    result = run_python(
+        "import sys, json, nemucast.main as m; m.parse_args(['-i', '60']); "
+        f"print(json.dumps([n for n in {HEAVY_MODULES!r} if n in sys.modules]))"
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout) == []
+
+
+def test_multi_and_group_do_not_import_cast_stack():
+    """マルチデバイス・グループのモジュールも、読み込んだだけではpychromecastを読み込まない"""
+    result = run_python(
+        "import sys, json, nemucast.multi, nemucast.group; "
+        f"print(json.dumps([n for n in {HEAVY_MODULES!r} if n in sys.modules]))"
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout) == []
+
+
+def test_help_does_not_import_cast_stack():
+    """`--help` はpychromecastを読み込まずに終了する"""
+    result = run_python(
+        "import sys, runpy\n"
+        "sys.argv = ['nemucast', '--help']\n"
+        "try:\n"
+        "    runpy.run_module('nemucast.main', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('pychromecast' in sys.modules, file=sys.stderr)"
+    )
+    assert "--interval" in result.stdout
+    assert result.stderr.strip().endswith("False")
+
+
+def test_connect_loads_cast_stack_lazily():
+    """キャッシュからの接続時に初めてpychromecastを読み込む"""
+    result = run_python(
+        "import sys\n"
+        "from nemucast.cache import CachedEndpoint\n"
+        "entry = CachedEndpoint('TV', '127.0.0.1', 8009, '12345678-1234-5678-1234-567812345678')\n"
+        "before = 'pychromecast' in sys.modules\n"
+        "info = entry.to_cast_info()\n"
+        "print(before, 'pychromecast' in sys.modules, info.friendly_name)"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["False", "True", "TV"]
+
+
+def test_ctl_does_not_import_cast_stack():
+    """`nemucast ctl` はソケットとJSONだけで動き、pychromecastもasyncioも読み込まない"""
+    result = run_python(
+        "import sys, json\n"
+        "from nemucast.main import main\n"
+        "sys.argv = ['nemucast', 'ctl', '--socket', '/nonexistent/control.sock', 'ping']\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit as e:\n"
+        "    code = e.code\n"
+        f"print(json.dumps([code] + [n for n in {HEAVY_MODULES!r} if n in sys.modules]))"
+    )
+    assert json.loads(result.stdout) == [2]
+    assert "デーモンに接続できません" in result.stderr
@@ -0,0 +1,142 @@
+"""状態スナップショットのテスト"""
+
+from unittest.mock import Mock
+
+from nemucast.main import get_initial_volume, is_chromecast_active
+from nemucast.status import (
+    CAST_STATUS,
+    MEDIA_STATUS,
+    MediaPosition,
+    StatusMonitor,
+    is_playback_event,
+)
+
+
+class FakeClock:
+    """手動で進める時計"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_cast(app_id="AndroidNativeApp", volume_level=0.6):
+    """テスト用のChromecastを作成する"""
+    cast = Mock()
+    cast.status.app_id = app_id
+    cast.status.volume_level = volume_level
+    return cast
+
+
+def make_monitor(cast, clock, ttl=60.0):
+    """応答待ちをしないStatusMonitorを作成する"""
+    return StatusMonitor(cast, ttl=ttl, refresh_wait=0, clock=clock)
+
+
+class TestStatusMonitor:
+    """状態スナップショットのテストクラス"""
+
+    def test_attach_registers_listeners(self):
+        """cast/mediaの両方にリスナー登録する"""
+        cast = make_cast()
+        monitor = make_monitor(cast, FakeClock()).attach()
+        cast.register_status_listener.assert_called_once_with(monitor)
+        cast.media_controller.register_status_listener.assert_called_once_with(monitor)
+
+    def test_pushed_status_updates_snapshot(self):
+        """プッシュされた状態がスナップショットに反映される"""
+        clock = FakeClock(10.0)
+        monitor = make_monitor(make_cast(), clock)
+        media_status = Mock(player_state="PLAYING")
+        clock.now = 20.0
+
+        monitor.new_media_status(media_status)
+
+        assert monitor.player_state == "PLAYING"
+        assert monitor.media_status_at == 20.0
+
+    def test_refresh_only_when_stale(self):
+        """TTL以内なら問い合わせない"""
+        clock = FakeClock()
+        cast = make_cast()
+        monitor = make_monitor(cast, clock, ttl=60.0)
+        monitor.new_media_status(Mock(player_state="PLAYING"))
+
+        assert monitor.refresh() == 0
+        clock.now = 61.0
+        assert monitor.refresh() == 2
+        assert monitor.refresh() == 0
+        assert monitor.refresh_count == 2
+        cast.media_controller.update_status.assert_called_once()
+
+    def test_no_media_refresh_when_idle(self):
+        """アプリが起動していなければメディア状態は問い合わせない"""
+        cast = make_cast(app_id=None)
+        monitor = make_monitor(cast, FakeClock())
+        monitor.refresh(force=True)
+        cast.media_controller.update_status.assert_not_called()
+
+    def test_listener_receives_events(self):
+        """状態更新時にリスナーが呼ばれ、例外は握りつぶされる"""
+        monitor = make_monitor(make_cast(), FakeClock())
+        events = []
+        monitor.add_listener(lambda kind, status: 1 / 0)
+        monitor.add_listener(lambda kind, status: events.append(kind))
+
+        monitor.new_cast_status(Mock())
+        monitor.new_media_status(Mock())
+
+        assert events == [CAST_STATUS, MEDIA_STATUS]
+
+    def test_active_check_and_volume_share_snapshot(self):
+        """1回の判定と音量取得で問い合わせを繰り返さない"""
+        clock = FakeClock()
+        cast = make_cast(volume_level=0.7)
+        monitor = make_monitor(cast, clock)
+        monitor.new_media_status(Mock(player_state="PLAYING"))
+
+        assert is_chromecast_active(cast, monitor)
+        assert get_initial_volume(cast, monitor) == 0.7
+        cast.media_controller.update_status.assert_not_called()
+        assert monitor.refresh_count == 0
+
+    def test_is_playback_event(self):
+        """アプリ起動・PLAYING/BUFFERINGだけを再生開始とみなす"""
+        assert is_playback_event(CAST_STATUS, Mock(app_id="AndroidNativeApp"))
+        assert not is_playback_event(CAST_STATUS, Mock(app_id=None))
+        assert not is_playback_event(CAST_STATUS, Mock(app_id="E8C28D3C"))
+        assert is_playback_event(MEDIA_STATUS, Mock(player_state="BUFFERING"))
+        assert not is_playback_event(MEDIA_STATUS, Mock(player_state="PAUSED"))
+        assert not is_playback_event(MEDIA_STATUS, None)
+
+
+class TestMediaPosition:
+    """メディアの再生位置のテストクラス"""
+
+    def test_position_advances_only_while_playing(self):
+        playing = MediaPosition("ep1", "PLAYING", 600.0, 100.0, received_at=10.0)
+        assert playing.position_at(40.0) == 130.0
+        assert playing.remaining_at(40.0) == 470.0
+        assert playing.remaining_at(1000.0) == 0.0
+
+        paused = MediaPosition("ep1", "PAUSED", 600.0, 100.0, received_at=10.0)
+        assert paused.position_at(40.0) == 100.0
+
+    def test_media_position_from_snapshot(self):
+        """通知を受け取った時刻を基準にし、長さの分からないメディアではNone"""
+        clock = FakeClock(5.0)
+        monitor = make_monitor(make_cast(), clock)
+        assert monitor.media_position() is None
+
+        monitor.new_media_status(
+            Mock(content_id="ep1", player_state="PLAYING", duration=600, current_time=20)
+        )
+        clock.now = 15.0
+        position = monitor.media_position()
+        assert (position.content_id, position.received_at) == ("ep1", 5.0)
+        assert position.remaining_at(clock()) == 570.0
+
+        monitor.new_media_status(Mock(player_state="PLAYING", duration=None, current_time=20))
+        assert monitor.media_position() is None
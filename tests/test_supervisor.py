@@ -0,0 +1,199 @@
+"""接続の監視（ハートビートによる切断検知とバックオフでの再接続）のテスト"""
+
+import shutil
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from nemucast import metrics, supervisor
+from nemucast.cache import connect_from_cache
+from nemucast.main import is_chromecast_active
+from nemucast.sim import FakeChromecast, VirtualClock
+from nemucast.standin import StandInCastServer, ensure_self_signed_cert
+from nemucast.status import CONNECTION, StatusMonitor
+from nemucast.supervisor import (
+    SOCKET_CLIENT_INTERNALS,
+    Backoff,
+    ConnectionSupervisor,
+    force_socket_client_reconnect,
+    stop_socket_client_retries,
+)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def status(name):
+    return SimpleNamespace(status=name)
+
+
+class ManualClock:
+    """手動で進める時計"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_supervisor(**kwargs):
+    """監視スレッドを起動しない（通知と再接続の判定を直接呼び出す）"""
+    device = FakeChromecast(VirtualClock(), name="Living TV")
+    monitor = StatusMonitor(device, refresh_wait=0).attach()
+    clock = ManualClock()
+    supervisor = ConnectionSupervisor(device, monitor=monitor, clock=clock, **kwargs)
+    return supervisor, device, monitor, clock
+
+
+def test_backoff_doubles_up_to_cap():
+    backoff = Backoff(base=1.0, cap=8.0)
+    assert [backoff.next() for _ in range(6)] == [1.0, 2.0, 4.0, 8.0, 8.0, 8.0]
+    backoff.reset()
+    assert backoff.next() == 1.0
+
+
+def test_pychromecast_socket_client_keeps_internals():
+    """接続の監視が書き換える SocketClient の内部の属性がまだあることを確かめる"""
+    from pychromecast.socket_client import SocketClient
+
+    client = SocketClient(
+        cast_type="cast", tries=1, timeout=1, retry_wait=1, services=set(), zconf=None
+    )
+    try:
+        for name in SOCKET_CLIENT_INTERNALS:
+            assert hasattr(client, name), name
+    finally:
+        for sock in client.socketpair:
+            sock.close()
+
+
+def test_missing_socket_client_internals_are_skipped_with_warning(monkeypatch, caplog):
+    """内部の属性が無い SocketClient には何もせず、警告を残す"""
+    monkeypatch.setattr(supervisor, "_warned_internals", set())
+    client = SimpleNamespace()
+    stop_socket_client_retries(client)
+    force_socket_client_reconnect(client)
+    assert vars(client) == {}
+    assert "がありません" in caplog.text
+
+
+class TestConnectionSupervisor:
+    """切断・再接続の状態遷移のテストクラス"""
+
+    def test_lost_connection_pauses_fade(self):
+        """切断中は再接続先を空にし、スナップショットを切断状態にしてアクティブとみなさない"""
+        metrics.REGISTRY.reset()
+        supervisor, device, monitor, _ = make_supervisor()
+        events = []
+        monitor.add_listener(
+            lambda kind, connected: kind == CONNECTION and events.append(connected)
+        )
+        assert is_chromecast_active(device, monitor)
+
+        supervisor.new_connection_status(status("LOST"))
+
+        assert not supervisor.connected
+        assert device.socket_client.services == set()
+        assert not monitor.connected
+        assert not is_chromecast_active(device, monitor)
+        assert monitor.refresh(force=True) == 0
+        assert events == [False]
+        assert metrics.CONNECTED.labels("Living TV").value == 0
+
+    def test_reconnect_records_time_to_reconnect(self):
+        metrics.REGISTRY.reset()
+        supervisor, device, monitor, clock = make_supervisor()
+        for outage in (4.0, 2.0):
+            supervisor.new_connection_status(status("LOST"))
+            clock.now += outage
+            supervisor.new_connection_status(status("CONNECTED"))
+
+        assert supervisor.connected and monitor.connected
+        assert supervisor.outages == [4.0, 2.0]
+        assert supervisor.mean_time_to_reconnect == 3.0
+        assert supervisor.wait_connected(timeout=0)
+        reconnect = metrics.RECONNECT_SECONDS.labels("Living TV")
+        assert (reconnect.count, reconnect.sum) == (2, 6.0)
+        assert metrics.CONNECTED.labels("Living TV").value == 1
+
+    def test_probes_last_host_with_backoff_then_rediscovers(self):
+        """前回のホストをバックオフの間隔で確かめ、届かない状態が続いたら再検索する"""
+        probe = Mock(return_value=False)
+        rediscover = Mock(return_value=None)
+        supervisor, device, _, clock = make_supervisor(
+            probe=probe, rediscover=rediscover, max_backoff=4.0, rediscover_after=3,
+        )
+        supervisor.new_connection_status(status("LOST"))
+
+        assert supervisor._try_reconnect() == 1.0
+        waits = []
+        for _ in range(5):
+            clock.now += supervisor._try_reconnect()
+            waits.append(supervisor._try_reconnect())
+        # 切断の1秒後に確かめ、その後は上限（4秒）まで間隔を2倍にする
+        assert waits == [2.0, 4.0, 4.0, 4.0, 4.0]
+        probe.assert_called_with("127.0.0.1", 8009, supervisor.probe_timeout)
+        assert probe.call_count == 5
+        assert rediscover.call_count == 1
+        assert device.socket_client.services == set()
+
+        # 届くようになったら再接続先を戻し、pychromecastに再接続させる
+        probe.return_value = True
+        clock.now += 4.0
+        supervisor._try_reconnect()
+        (service,) = device.socket_client.services
+        assert (service.host, service.port) == ("127.0.0.1", 8009)
+
+    def test_failed_attempt_stops_pychromecast_retries(self):
+        supervisor, device, _, _ = make_supervisor()
+        supervisor.new_connection_status(status("LOST"))
+        supervisor._try_reconnect()
+        supervisor.new_connection_status(status("FAILED"))
+        assert device.socket_client.services == set()
+        assert supervisor.failures == 1
+
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl が必要")
+def test_detects_silent_device_and_reconnects(tmp_path):
+    """応答が途絶えたデバイスをpychromecastのタイムアウト（20秒）より早く検知し、戻ったら再接続する"""
+    metrics.REGISTRY.reset()
+    certfile, keyfile = ensure_self_signed_cert(tmp_path)
+    server = StandInCastServer(certfile=certfile, keyfile=keyfile).start()
+    cast = connect_from_cache(server.endpoint())
+    assert cast is not None
+    supervisor = None
+    try:
+        cast.wait()
+        monitor = StatusMonitor(cast, refresh_wait=0).attach()
+        supervisor = ConnectionSupervisor(cast, monitor=monitor, heartbeat_timeout=0.6).start()
+        assert wait_for(lambda: server.stats.count("heartbeat", "PING") >= 2)
+        assert supervisor.connected
+
+        server.go_offline()
+        went_offline = time.monotonic()
+        assert wait_for(lambda: not supervisor.connected)
+        assert time.monotonic() - went_offline < 2.0
+        assert not monitor.connected
+        assert metrics.HEARTBEAT_TIMEOUTS.labels(server.name).value == 1
+
+        server.come_online()
+        assert supervisor.wait_connected(timeout=10)
+        assert wait_for(lambda: monitor.connected)
+        assert len(supervisor.outages) == 1
+        assert metrics.RECONNECT_SECONDS.labels(server.name).count == 1
+        # 再接続後は状態を取り直す
+        assert wait_for(lambda: server.stats.count("receiver", "GET_STATUS") >= 2)
+    finally:
+        if supervisor is not None:
+            supervisor.stop()
+        cast.disconnect(timeout=2)
+        server.stop()
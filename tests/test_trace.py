@@ -0,0 +1,123 @@
+"""状態とコマンドのトレース（記録と再生）のテスト"""
+
+import json
+
+import pytest
+
+from nemucast.commands import quit_app, set_volume
+from nemucast.replay import activity_timeline, replay_main, replay_trace
+from nemucast.sim import FakeChromecast, NightScenario, VirtualClock, run_simulated_night
+from nemucast.status import StatusMonitor
+from nemucast.trace import Trace, TraceRecorder, load_trace
+
+
+def record_night(scenario: NightScenario, path=None) -> Trace:
+    recorder = TraceRecorder(path)
+    run_simulated_night(scenario, recorder)
+    return load_trace(path) if path is not None else Trace.from_records(recorder.records)
+
+
+class TestTraceRecorder:
+    """トレースの記録のテストクラス"""
+
+    def test_records_statuses_and_commands(self, tmp_path):
+        device = FakeChromecast(VirtualClock(), name="Living TV", volume_level=0.5, latency=0.0)
+        monitor = StatusMonitor(device, refresh_wait=0).attach()
+        path = tmp_path / "night.jsonl"
+
+        with TraceRecorder(path).start(device, monitor, 0.5, params={"step": -0.1}):
+            set_volume(device, 0.4)
+            device.push_cast_status(app_id="Backdrop")
+        # 記録を終えた後のコマンドは書かない
+        quit_app(device)
+
+        trace = load_trace(path)
+        assert (trace.name, trace.initial_volume) == ("Living TV", 0.5)
+        assert trace.params == {"step": -0.1}
+        assert [(kind, data) for _, kind, data in trace.events] == [
+            ("cast", {"app_id": "CC1AD845", "volume_level": 0.5, "volume_muted": False}),
+            ("cmd", {"op": "set_volume", "level": 0.4}),
+            ("cast", {"app_id": "CC1AD845", "volume_level": 0.4, "volume_muted": False}),
+            ("cast", {"app_id": "Backdrop", "volume_level": 0.4, "volume_muted": False}),
+        ]
+
+    def test_torn_last_line_is_ignored(self, tmp_path):
+        path = tmp_path / "night.jsonl"
+        trace = record_night(NightScenario(), path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"t":1,"ev":"cm')
+        assert load_trace(path).events == trace.events
+
+        path.write_text('{"t":0,"ev":"cast"}\n', encoding="utf-8")
+        with pytest.raises(ValueError):
+            load_trace(path)
+
+
+class TestReplay:
+    """トレースの再生のテストクラス"""
+
+    @pytest.mark.parametrize("scenario", [
+        NightScenario(),
+        NightScenario(transitions=[(2500, "idle"), (4000, "active")]),
+        NightScenario(start_active=False, transitions=[(1800, "active")]),
+        NightScenario(profile="perceptual"),
+    ])
+    def test_replay_matches_recorded_night(self, scenario):
+        """同じ判定と制御ループなら、記録と同じコマンドを同じ時刻に送る"""
+        trace = record_night(scenario)
+        result = replay_trace(trace)
+
+        assert result.completed
+        assert result.divergence() is None
+        assert result.simulated_sec == pytest.approx(trace.duration, abs=1.0)
+
+    def test_changed_decision_diverges(self):
+        trace = record_night(NightScenario())
+        result = replay_trace(trace, {"min_level": 0.4})
+        # 最小音量に早く到達し、記録より先に音量を戻す
+        assert result.divergence() == (
+            "6件目: 記録は set_volume 0.36（6000.1秒）、再生は set_volume 0.60（6000.0秒）"
+        )
+
+    def test_backdrop_and_missing_player_state(self):
+        """アンビエントモード（Backdrop）はアイドル、player_state の無いアプリ起動はアクティブ"""
+        records = [
+            {"ev": "start", "name": "TV", "initial_volume": 0.5, "params": {"interval_sec": 60}},
+            {"t": 0, "ev": "cast", "app_id": "Backdrop", "volume_level": 0.5},
+            {"t": 100, "ev": "cast", "app_id": "CC1AD845", "volume_level": 0.5},
+            {"t": 100, "ev": "media"},
+            {"t": 200, "ev": "connection", "connected": False},
+            {"t": 300, "ev": "end"},
+        ]
+        trace = Trace.from_records(records)
+
+        assert activity_timeline(trace) == [(0, False), (100, True), (200, False)]
+        result = replay_trace(trace)
+        # 再生開始の通知で起きて下げ、切断中は下げない
+        levels = [
+            (t, data["level"]) for t, _, data in result.commands if data["op"] == "set_volume"
+        ]
+        assert levels == [(100, pytest.approx(0.46)), (160, pytest.approx(0.42))]
+        assert not result.completed
+
+    def test_commands_after_stop_are_not_compared(self):
+        trace = record_night(NightScenario())
+        cut = trace.commands[3][0] + 1
+        trace.events.append((cut + 1, "cmd", {"op": "set_volume", "level": 0.6}))
+        trace.stopped_at = cut
+        assert replay_trace(trace).divergence() is None
+
+
+def test_replay_main(tmp_path, capsys):
+    traces = tmp_path / "traces"
+    traces.mkdir()
+    record_night(NightScenario(), traces / "a.jsonl")
+    record_night(NightScenario(profile="linear"), traces / "b.jsonl")
+
+    assert replay_main([str(traces), "--json"]) == 0
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(r["divergence"], r["completed"]) for r in results] == [(None, True), (None, True)]
+
+    assert replay_main([str(traces), "--set", "min_level=0.4"]) == 1
+    assert "不一致" in capsys.readouterr().out
+    assert replay_main([str(tmp_path / "missing.jsonl")]) == 2
@@ -36,10 +36,10 @@ class TestVolumeControl:
         assert not (0.41 <= min_level)
         assert not (0.5 <= min_level)
 
-    @patch('pychromecast.get_chromecasts')
-    def test_chromecast_discovery_no_devices(self, mock_get_chromecasts):
+    @patch('nemucast.main.discover_target_chromecast')
+    def test_chromecast_discovery_no_devices(self, mock_discover):
         """Chromecastが見つからない場合のテスト"""
-        mock_get_chromecasts.return_value = ([], Mock())
+        mock_discover.return_value = (None, Mock(), 10.0)
         
         from nemucast.main import main
         